@@ -0,0 +1,72 @@
+"""
+知识库快照备份/恢复脚本
+
+直接备份 Milvus 中的分块和向量，灾难恢复或克隆到测试环境时无需重新向量化。
+
+使用方法：
+    python backup_knowledge.py backup                 # 全量快照
+    python backup_knowledge.py backup --incremental   # 增量快照（上次快照之后新增的分块）
+    python backup_knowledge.py list
+    python backup_knowledge.py restore 20240101-120000-000000 --drop-existing
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.services import KnowledgeService, BackupService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='知识库快照备份与恢复')
+    parser.add_argument('--backup-dir', default=None, help='快照目录（默认使用配置）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = subparsers.add_parser('backup', help='创建快照')
+    backup_parser.add_argument('--incremental', action='store_true', help='只备份上次快照之后新增的分块')
+
+    subparsers.add_parser('list', help='列出快照')
+
+    restore_parser = subparsers.add_parser('restore', help='恢复快照')
+    restore_parser.add_argument('snapshot_id', help='快照ID')
+    restore_parser.add_argument('--drop-existing', action='store_true', help='恢复前清空当前知识库')
+    restore_parser.add_argument('--force', action='store_true', help='模型与当前配置不一致时仍然恢复')
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        # 列出快照不需要连接 Milvus
+        service = BackupService(knowledge_service=None, backup_dir=args.backup_dir)
+        for manifest in service.list_snapshots():
+            kind = f'增量(基于 {manifest["base"]})' if manifest['base'] else '全量'
+            print(
+                f'{manifest["snapshot_id"]}  {kind}  分块数: {manifest["total"]}  '
+                f'模型: {manifest["model"]}  水位: {manifest["watermark"]}'
+            )
+        return
+
+    service = BackupService(knowledge_service=KnowledgeService(), backup_dir=args.backup_dir)
+    try:
+        if args.command == 'backup':
+            manifest = service.create_snapshot(incremental=args.incremental)
+            print(f'快照已创建: {manifest["snapshot_id"]}（分块数: {manifest["total"]}）')
+        else:
+            result = service.restore_snapshot(
+                args.snapshot_id,
+                drop_existing=args.drop_existing,
+                force=args.force,
+            )
+            print(
+                f'恢复完成: {" -> ".join(result["chain"])}'
+                f'（分块数: {result["restored_chunks"]}）'
+            )
+    except ValueError as e:
+        print(f'错误: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
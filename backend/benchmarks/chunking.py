@@ -0,0 +1,115 @@
+"""分块性能对比.
+
+对比原实现（固定 500 字窗口切片、按内容去重叠还原）与按句子边界分块
+（``split_spans`` 只返回位置、``join_spans`` 按位置还原）在大文本上的耗时；
+``--memory`` 时另外统计 Python 内存峰值（tracemalloc 会显著拖慢耗时）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.chunking --chars 5000000
+    python -m benchmarks.chunking --chars 5000000 --memory
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, List
+
+from src.utils.helpers import join_spans, merge_chunks, split_spans
+
+
+SENTENCES = [
+    '每天补充足量的蛋白质有助于维持肌肉量',
+    '老年人应适当增加户外活动时间',
+    '长期熬夜会影响内分泌和免疫功能',
+    '膳食纤维可以促进肠道蠕动并帮助控制血糖',
+    'Regular exercise improves insulin sensitivity',
+    '研究表明，规律的有氧运动能够降低心血管疾病风险，并改善睡眠质量',
+]
+ENDINGS = ['。', '！', '？', '；', '. ', '\n']
+
+
+def build_text(chars: int, seed: int = 0) -> str:
+    """生成中英文混排、句子长短不一的测试文本."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < chars:
+        sentence = '，'.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+        sentence += rng.choice(ENDINGS)
+        parts.append(sentence)
+        total += len(sentence)
+    return ''.join(parts)[:chars]
+
+
+def legacy_split(text: str, chunk_size: int = 500, chunk_overlap: int = 50) -> List[str]:
+    """原实现：固定长度窗口切片（可能从句子中间切断）."""
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - chunk_overlap
+    return chunks
+
+
+def measure(name: str, func: Callable[[], Any], memory: bool = False) -> Any:
+    """运行一次并打印耗时（以及内存峰值）."""
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+
+    line = f'{name:<24} 耗时: {elapsed * 1000:9.1f} ms'
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f'  内存峰值: {peak / 1e6:7.1f} MB'
+    print(line)
+    return result
+
+
+def mid_sentence_ratio(text: str, ends: List[int]) -> float:
+    """分块结尾落在句子中间的比例."""
+    boundaries = set('。！？；\n ')
+    cut = [end for end in ends[:-1] if text[end - 1] not in boundaries]
+    return len(cut) / max(len(ends) - 1, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='分块性能对比')
+    parser.add_argument('--chars', type=int, default=5_000_000, help='文本字符数')
+    parser.add_argument('--chunk-size', type=int, default=500, help='每块最大字符数')
+    parser.add_argument('--chunk-overlap', type=int, default=50, help='块之间最大重叠字符数')
+    parser.add_argument('--memory', action='store_true', help='统计内存峰值')
+    args = parser.parse_args()
+
+    text = build_text(args.chars)
+    size, overlap = args.chunk_size, args.chunk_overlap
+    print(f'文本: {len(text)} 字符')
+
+    chunks = measure('legacy split', lambda: legacy_split(text, size, overlap), args.memory)
+    merged = measure('legacy merge', lambda: merge_chunks(chunks, overlap), args.memory)
+    spans = measure('split_spans', lambda: split_spans(text, size, overlap), args.memory)
+    span_chunks = measure(
+        'split_spans + slice',
+        lambda: [text[start:end] for start, end in spans],
+        args.memory,
+    )
+    joined = measure('join_spans', lambda: join_spans(span_chunks, spans), args.memory)
+
+    legacy_ends = [min(i * (size - overlap) + size, len(text)) for i in range(len(chunks))]
+    print(
+        f'legacy      分块数: {len(chunks):>7}  句中切断: {mid_sentence_ratio(text, legacy_ends):6.1%}'
+        f'  还原一致: {merged == text}'
+    )
+    print(
+        f'split_spans 分块数: {len(spans):>7}  句中切断: '
+        f'{mid_sentence_ratio(text, [end for _, end in spans]):6.1%}  还原一致: {joined == text}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""分块文本压缩对比.
+
+对比分块文本原样保存、压缩保存（不使用字典）和使用按语料训练的字典压缩保存时
+Milvus ``content`` 字段占用的字节数（加载后常驻内存），以及写入时的编码耗时和
+检索命中后解码 ``top_k`` 个分块的耗时。未安装 ``zstandard`` 时只对比 zlib。
+
+语料默认由常见健康知识句子随机组合生成，也可以用 ``--input`` 指定知识 JSON 文件
+（``[{"content": ...}, ...]``，例如 anti_aging_knowledge_example.json）。字典样本取自
+参与对比的分块，语料很小时样本覆盖全部分块，使用字典的压缩率会明显偏乐观。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.content_compression --docs 2000
+    python -m benchmarks.content_compression --input anti_aging_knowledge_example.json
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Any, Callable, List, Optional
+
+from src.services.content_codec import ContentCodec
+from src.utils.helpers import split_spans
+
+
+SENTENCES = [
+    'NAD+水平随年龄增长逐渐下降，与代谢紊乱和神经退行性疾病有关',
+    '每天补充足量的蛋白质有助于维持肌肉量，预防老年肌少症',
+    '长期熬夜会影响内分泌和免疫功能，增加慢性炎症风险',
+    '膳食纤维可以促进肠道蠕动并帮助控制血糖',
+    '研究表明，规律的有氧运动能够降低心血管疾病风险，并改善睡眠质量',
+    '热量限制在多种模式生物中延长了寿命，但在人体中的长期效果仍需验证',
+    '二甲双胍可能通过激活AMPK通路延缓衰老相关疾病的发生',
+    '维生素D缺乏与骨质疏松、肌力下降和跌倒风险增加相关',
+    '端粒长度常被用作生物学年龄的标志物之一',
+    'Regular exercise improves insulin sensitivity and mitochondrial function',
+]
+ENDINGS = ['。', '。', '；', '！', '\n']
+TOPICS = ['细胞代谢', '运动医学', '营养学', '睡眠', '内分泌', '心血管', '神经科学']
+
+
+def build_documents(count: int, seed: int = 0) -> List[str]:
+    """生成长短不一、术语重复多的健康知识文档."""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        parts = [f'【{rng.choice(TOPICS)}】']
+        for _ in range(rng.randint(3, 40)):
+            sentence = '，'.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 3)))
+            parts.append(sentence + rng.choice(ENDINGS))
+        documents.append(''.join(parts))
+    return documents
+
+
+def load_documents(path: str) -> List[str]:
+    """读取知识 JSON 文件中的文档内容."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return [item['content'] for item in data if item.get('content')]
+
+
+def measure(name: str, func: Callable[[], Any]) -> Any:
+    """运行一次并打印耗时."""
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f'{name:<28} 耗时: {elapsed * 1000:9.1f} ms')
+    return result
+
+
+def compare(
+    name: str,
+    chunks: List[str],
+    samples: List[str],
+    compression: Optional[str],
+    dictionary_size: int,
+    top_k: int,
+) -> None:
+    """编码全部分块并统计字节数、编码耗时和命中解码耗时."""
+    raw_bytes = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+    if compression is None:
+        print(f'{name:<28} 字节数: {raw_bytes:>12,}  压缩率: {1:6.1%}')
+        return
+
+    with tempfile.TemporaryDirectory() as dictionary_dir:
+        codec = ContentCodec(dictionary_dir if dictionary_size else None, compression)
+        if dictionary_size:
+            measure(f'{name} 训练字典', lambda: codec.train(samples, dictionary_size))
+
+        started = time.perf_counter()
+        encoded = [codec.encode(chunk) for chunk in chunks]
+        encode_elapsed = time.perf_counter() - started
+
+        hits = random.Random(1).sample(encoded, min(top_k, len(encoded)))
+        rounds = 200
+        started = time.perf_counter()
+        for _ in range(rounds):
+            decoded = [codec.decode(hit) for hit in hits]
+        decode_elapsed = (time.perf_counter() - started) / rounds
+
+        assert all(codec.decode(value) == chunk for value, chunk in zip(encoded, chunks))
+        assert len(decoded) == len(hits)
+
+    stored_bytes = sum(len(value.encode('utf-8')) for value in encoded)
+    print(
+        f'{name:<28} 字节数: {stored_bytes:>12,}  压缩率: {stored_bytes / raw_bytes:6.1%}'
+        f'  编码: {encode_elapsed / len(chunks) * 1e6:7.1f} µs/块'
+        f'  解码 top_{top_k}: {decode_elapsed * 1e6:7.1f} µs'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='分块文本压缩对比')
+    parser.add_argument('--input', help='知识 JSON 文件（为空时生成语料）')
+    parser.add_argument('--docs', type=int, default=2000, help='生成的文档数')
+    parser.add_argument('--chunk-size', type=int, default=500, help='每块最大字符数')
+    parser.add_argument('--chunk-overlap', type=int, default=50, help='块之间最大重叠字符数')
+    parser.add_argument('--samples', type=int, default=5000, help='训练字典的抽样分块数')
+    parser.add_argument('--dictionary-size', type=int, default=64 * 1024, help='字典大小（字节）')
+    parser.add_argument('--top-k', type=int, default=5, help='每次检索解码的命中数')
+    args = parser.parse_args()
+
+    documents = load_documents(args.input) if args.input else build_documents(args.docs)
+    chunks = [
+        document[start:end]
+        for document in documents
+        for start, end in split_spans(document, args.chunk_size, args.chunk_overlap)
+    ]
+    samples = random.Random(0).sample(chunks, min(args.samples, len(chunks)))
+    print(f'文档: {len(documents)}  分块: {len(chunks)}  字典样本: {len(samples)}')
+
+    try:
+        import zstandard  # noqa: F401
+        compressions = ['zlib', 'zstd']
+    except ImportError:
+        print('未安装 zstandard，只对比 zlib')
+        compressions = ['zlib']
+
+    compare('原文', chunks, samples, None, 0, args.top_k)
+    for compression in compressions:
+        compare(compression, chunks, samples, compression, 0, args.top_k)
+        compare(f'{compression} + 字典', chunks, samples, compression, args.dictionary_size, args.top_k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Excel 导入解析性能对比.
+
+对比原实现（``pd.read_excel`` + ``iterrows``）与只读流式读取 + 按列清洗的
+耗时；``--memory`` 时另外统计 Python 内存峰值（tracemalloc 会显著拖慢耗时）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.excel_import --rows 100000
+    python -m benchmarks.excel_import --rows 100000 --memory
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+from openpyxl import Workbook
+
+from src.services.import_export_service import ImportExportService
+
+
+def build_workbook(rows: int) -> bytes:
+    """生成测试用工作簿（content/category/title/tags 四列）."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['content', 'category', 'title', 'tags'])
+    for i in range(rows):
+        sheet.append([
+            f'第 {i} 条知识内容：每天补充蛋白质有助于维持肌肉量。' * 3,
+            ['营养', '运动', '睡眠'][i % 3],
+            f'标题 {i}' if i % 2 else None,
+            'a, b , c' if i % 4 else None,
+        ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_parse(file_content: bytes) -> List[Dict[str, Any]]:
+    """原实现：整体读入 DataFrame 后逐行构造记录."""
+    df = pd.read_excel(io.BytesIO(file_content), engine='openpyxl')
+    result = []
+    for _, row in df.iterrows():
+        content = str(row.get('content', '')).strip()
+        if not content or content == 'nan':
+            continue
+        tags = []
+        if 'tags' in row and pd.notna(row['tags']):
+            tags = [tag.strip() for tag in str(row['tags']).split(',') if tag.strip()]
+        result.append({
+            'content': content,
+            'category': str(row.get('category', '未分类')).strip(),
+            'title': str(row.get('title', '')).strip() or None if 'title' in row else None,
+            'tags': tags,
+        })
+    return result
+
+
+def streaming_parse(file_content: bytes) -> int:
+    """新实现：只读模式逐批读取、按列清洗，逐条消费（不保留结果）."""
+    return sum(
+        1 for _ in ImportExportService().iter_records(io.BytesIO(file_content), 'excel')
+    )
+
+
+def measure(
+    name: str,
+    func: Callable[[bytes], Any],
+    file_content: bytes,
+    memory: bool = False,
+) -> None:
+    """运行一次并打印耗时（以及内存峰值）."""
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func(file_content)
+    elapsed = time.perf_counter() - started
+
+    count = result if isinstance(result, int) else len(result)
+    line = f'{name:<10} 记录: {count:>7}  耗时: {elapsed:7.2f}s  速度: {count / elapsed:9.0f} 行/s'
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f'  内存峰值: {peak / 1e6:7.1f} MB'
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Excel 导入解析性能对比')
+    parser.add_argument('--rows', type=int, default=100_000, help='工作表行数')
+    parser.add_argument('--memory', action='store_true', help='统计内存峰值')
+    args = parser.parse_args()
+
+    file_content = build_workbook(args.rows)
+    print(f'工作簿: {args.rows} 行, {len(file_content) / 1e6:.1f} MB')
+    measure('legacy', legacy_parse, file_content, args.memory)
+    measure('streaming', streaming_parse, file_content, args.memory)
+
+
+if __name__ == '__main__':
+    main()
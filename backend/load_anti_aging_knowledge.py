@@ -8,8 +8,8 @@ import asyncio
 import json
 from pathlib import Path
 
+from src.services.ingest_pipeline import IngestPipeline, batched, numbered
 from src.services.knowledge_service import KnowledgeService
-from src.models.schemas import KnowledgeCreate
 from src.utils import logger
 
 
@@ -30,29 +30,19 @@ async def load_knowledge():
     # 初始化知识库服务
     knowledge_service = KnowledgeService()
     
-    # 逐条添加知识
-    success_count = 0
-    failed_count = 0
-    
-    for idx, item in enumerate(knowledge_list, 1):
-        try:
-            knowledge = KnowledgeCreate(
-                content=item['content'],
-                category=item['category'],
-                metadata=item.get('metadata', {}),
-            )
-            
-            doc_id = await knowledge_service.add_knowledge(knowledge)
-            
-            logger.info(
-                f'[{idx}/{len(knowledge_list)}] 添加成功 - '
-                f'分类: {item["category"]}, ID: {doc_id}'
-            )
-            success_count += 1
-            
-        except Exception as e:
-            logger.error(f'[{idx}/{len(knowledge_list)}] 添加失败: {e}')
-            failed_count += 1
+    # 通过写入流水线批量添加（分块、向量化、写入并发执行）
+    records = [
+        {'content': item.get('content'), 'category': item.get('category')}
+        for item in knowledge_list
+    ]
+    result = await IngestPipeline(knowledge_service, name='load-anti-aging').run(
+        numbered(batched(records))
+    )
+    for idx, error in sorted(result.errors):
+        logger.error(f'[{idx}/{len(knowledge_list)}] 添加失败: {error}')
+    
+    success_count = result.success_count
+    failed_count = result.failed_count
     
     # 统计结果
     total_count = await knowledge_service.get_knowledge_count()
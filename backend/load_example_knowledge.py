@@ -13,8 +13,8 @@ from pathlib import Path
 # 添加src到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.services import KnowledgeService
-from src.models.schemas import KnowledgeCreate
+from src.services import KnowledgeService, IngestPipeline
+from src.services.ingest_pipeline import batched, numbered
 from src.utils import logger
 
 
@@ -34,23 +34,18 @@ async def load_knowledge_from_json(json_file: str = 'example_knowledge.json'):
         # 初始化服务
         service = KnowledgeService()
         
-        # 批量添加
-        success_count = 0
-        for idx, item in enumerate(knowledge_list, 1):
-            try:
-                knowledge = KnowledgeCreate(
-                    content=item['content'],
-                    category=item['category'],
-                )
-                
-                doc_id = await service.add_knowledge(knowledge)
-                logger.info(f'[{idx}/{len(knowledge_list)}] 添加成功 - {item["category"]}: {doc_id}')
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f'[{idx}/{len(knowledge_list)}] 添加失败: {e}')
+        # 通过写入流水线批量添加（分块、向量化、写入并发执行）
+        records = [
+            {'content': item.get('content'), 'category': item.get('category')}
+            for item in knowledge_list
+        ]
+        result = await IngestPipeline(service, name='load-example').run(
+            numbered(batched(records))
+        )
+        for idx, error in sorted(result.errors):
+            logger.error(f'[{idx}/{len(knowledge_list)}] 添加失败: {error}')
         
-        logger.info(f'✅ 完成！成功添加 {success_count}/{len(knowledge_list)} 条知识')
+        logger.info(f'✅ 完成！成功添加 {result.success_count}/{len(knowledge_list)} 条知识')
         
         # 显示统计
         total = await service.get_knowledge_count()
@@ -6,7 +6,19 @@
 
 from typing import Generator
 
-from ..services import KnowledgeService, AliyunService, RAGService, ImportExportService
+from ..config import settings
+from ..services import (
+    KnowledgeService,
+    AliyunService,
+    RAGService,
+    ImportExportService,
+    JobStore,
+    IngestQueue,
+    ImportJobRunner,
+    BackupService,
+    ReindexService,
+    MaintenanceScheduler,
+)
 
 
 # 服务实例缓存
@@ -14,6 +26,12 @@ _knowledge_service: KnowledgeService = None
 _aliyun_service: AliyunService = None
 _rag_service: RAGService = None
 _import_export_service: ImportExportService = None
+_job_store: JobStore = None
+_ingest_queue: IngestQueue = None
+_import_job_runner: ImportJobRunner = None
+_backup_service: BackupService = None
+_reindex_service: ReindexService = None
+_maintenance_scheduler: MaintenanceScheduler = None
 
 
 def get_knowledge_service() -> KnowledgeService:
@@ -66,3 +84,85 @@ def get_import_export_service() -> ImportExportService:
         _import_export_service = ImportExportService()
     return _import_export_service
 
+
+
+def get_job_store() -> JobStore:
+    """获取后台任务存储实例（单例）.
+    
+    Returns:
+        任务存储实例
+    """
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore(settings.job_store_path, settings.job_lease_seconds)
+    return _job_store
+
+
+def get_ingest_queue() -> IngestQueue:
+    """获取异步写入队列实例（单例）.
+    
+    Returns:
+        写入队列实例
+    """
+    global _ingest_queue
+    if _ingest_queue is None:
+        _ingest_queue = IngestQueue(
+            job_store=get_job_store(),
+            knowledge_service_provider=get_knowledge_service,
+        )
+    return _ingest_queue
+
+
+def get_import_job_runner() -> ImportJobRunner:
+    """获取后台导入任务执行器实例（单例）.
+    
+    Returns:
+        导入任务执行器实例
+    """
+    global _import_job_runner
+    if _import_job_runner is None:
+        _import_job_runner = ImportJobRunner(
+            job_store=get_job_store(),
+            import_service=get_import_export_service(),
+            knowledge_service_provider=get_knowledge_service,
+        )
+    return _import_job_runner
+
+
+def get_backup_service() -> BackupService:
+    """获取知识库快照服务实例（单例）.
+    
+    Returns:
+        快照服务实例
+    """
+    global _backup_service
+    if _backup_service is None:
+        _backup_service = BackupService(knowledge_service=get_knowledge_service())
+    return _backup_service
+
+
+def get_reindex_service() -> ReindexService:
+    """获取在线重建索引服务实例（单例）.
+    
+    Returns:
+        重建索引服务实例
+    """
+    global _reindex_service
+    if _reindex_service is None:
+        _reindex_service = ReindexService(knowledge_service=get_knowledge_service())
+    return _reindex_service
+
+
+def get_maintenance_scheduler() -> MaintenanceScheduler:
+    """获取集合维护调度器实例（单例）.
+    
+    Returns:
+        维护调度器实例
+    """
+    global _maintenance_scheduler
+    if _maintenance_scheduler is None:
+        _maintenance_scheduler = MaintenanceScheduler(
+            knowledge_service_provider=get_knowledge_service,
+            job_store=get_job_store(),
+        )
+    return _maintenance_scheduler
@@ -0,0 +1,375 @@
+"""运维管理API路由.
+
+提供知识库快照的创建、恢复和查询接口，在线重建索引，集合维护，分块文本压缩字典训练，
+写入流水线的运行统计，近似重复检测报告和近似重复索引重建。
+快照、恢复、重建索引、维护、字典训练和近似重复索引重建耗时较长，接口创建后台任务后立即返回，
+可通过 /api/v1/knowledge/jobs/{job_id} 查询进度。
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ...config import settings
+from ...models.schemas import BackupRequest, RestoreRequest, ReindexRequest, SnapshotInfo, JobInfo
+from ...services import BackupService, JobStore, KnowledgeService, MaintenanceScheduler, ReindexService
+from ...services.ingest_pipeline import pipeline_metrics
+from ...services.job_store import run_job_in_background
+from ...services.maintenance import MAINTENANCE_JOB_KIND
+from ...utils import logger
+from ..dependencies import (
+    get_backup_service,
+    get_job_store,
+    get_knowledge_service,
+    get_maintenance_scheduler,
+    get_reindex_service,
+)
+
+
+BACKUP_JOB_KIND = 'backup'
+RESTORE_JOB_KIND = 'restore'
+REINDEX_JOB_KIND = 'reindex'
+DICTIONARY_JOB_KIND = 'content_dictionary'
+NEAR_DUP_JOB_KIND = 'near_dup_rebuild'
+
+router = APIRouter(
+    prefix='/api/v1/admin',
+    tags=['运维管理'],
+)
+
+# 持有后台任务的引用，避免任务在执行中被回收
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _start_job(job_store: JobStore, kind: str, payload: dict, func) -> dict:
+    """创建任务记录并在后台执行."""
+    job = job_store.create(kind, payload)
+    task = asyncio.create_task(run_job_in_background(job_store, job, func))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return job
+
+
+@router.get(
+    '/backups',
+    response_model=List[SnapshotInfo],
+    summary='快照列表',
+    description='列出所有知识库快照（按创建时间先后）',
+)
+async def list_backups(
+    backup_service: BackupService = Depends(get_backup_service),
+) -> List[SnapshotInfo]:
+    """列出所有快照.
+
+    Args:
+        backup_service: 快照服务
+
+    Returns:
+        快照清单列表
+    """
+    return [SnapshotInfo(**manifest) for manifest in backup_service.list_snapshots()]
+
+
+@router.post(
+    '/backups',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='创建快照',
+    description='备份分块ID、标量字段和向量（可选增量），后台执行',
+)
+async def create_backup(
+    request: BackupRequest,
+    backup_service: BackupService = Depends(get_backup_service),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """创建知识库快照.
+
+    Args:
+        request: 快照参数
+        backup_service: 快照服务
+        job_store: 任务存储
+
+    Returns:
+        后台任务信息
+    """
+    if request.incremental and not backup_service.list_snapshots():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='没有可作为基础的快照，请先创建全量快照',
+        )
+
+    job = _start_job(
+        job_store,
+        BACKUP_JOB_KIND,
+        request.model_dump(),
+        lambda: backup_service.create_snapshot(incremental=request.incremental),
+    )
+    logger.info(f'快照任务已创建 - 任务: {job["id"]}, 增量: {request.incremental}')
+    return JobInfo.from_job(job)
+
+
+@router.post(
+    '/backups/{snapshot_id}/restore',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='恢复快照',
+    description='按主键覆盖写入快照数据（增量快照会先恢复其基础快照），后台执行',
+)
+async def restore_backup(
+    snapshot_id: str,
+    request: RestoreRequest,
+    backup_service: BackupService = Depends(get_backup_service),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """恢复知识库快照.
+
+    Args:
+        snapshot_id: 快照ID
+        request: 恢复参数
+        backup_service: 快照服务
+        job_store: 任务存储
+
+    Returns:
+        后台任务信息
+    """
+    if backup_service.get_snapshot(snapshot_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'快照不存在: {snapshot_id}',
+        )
+
+    job = _start_job(
+        job_store,
+        RESTORE_JOB_KIND,
+        {'snapshot_id': snapshot_id, **request.model_dump()},
+        lambda: backup_service.restore_snapshot(
+            snapshot_id,
+            drop_existing=request.drop_existing,
+            force=request.force,
+        ),
+    )
+    logger.info(f'恢复任务已创建 - 任务: {job["id"]}, 快照: {snapshot_id}')
+    return JobInfo.from_job(job)
+
+
+@router.post(
+    '/reindex',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='在线重建索引',
+    description=(
+        '按新的向量化模型或索引类型构建影子集合，期间写入同时作用于新旧集合，'
+        '校验分块数和抽样召回率后切换别名，后台执行'
+    ),
+)
+async def reindex(
+    request: ReindexRequest,
+    reindex_service: ReindexService = Depends(get_reindex_service),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """在线重建索引.
+    
+    Args:
+        request: 重建参数
+        reindex_service: 重建索引服务
+        job_store: 任务存储
+        
+    Returns:
+        后台任务信息
+    """
+    if reindex_service.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='已有重建索引任务在执行',
+        )
+    try:
+        reindex_service.check_model_change(request.embedding_model)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    def run() -> Dict[str, Any]:
+        return reindex_service.reindex(
+            embedding_model=request.embedding_model,
+            index_type=request.index_type,
+            index_params=request.index_params,
+            on_progress=lambda progress: job_store.update(job['id'], progress=progress),
+        )
+    
+    job = _start_job(job_store, REINDEX_JOB_KIND, request.model_dump(), run)
+    logger.info(f'重建索引任务已创建 - 任务: {job["id"]}')
+    return JobInfo.from_job(job)
+
+
+@router.get(
+    '/maintenance',
+    summary='集合维护状态',
+    description='分段数、小分段数、已删除行占比、未建索引行占比，以及最近一次压实和补建索引的时间',
+)
+async def get_maintenance_status(
+    scheduler: MaintenanceScheduler = Depends(get_maintenance_scheduler),
+) -> Dict[str, Any]:
+    """获取集合维护状态.
+    
+    Args:
+        scheduler: 维护调度器
+        
+    Returns:
+        分段状态、超过的阈值和各维护操作最近的执行时间
+    """
+    return await asyncio.to_thread(scheduler.status)
+
+
+@router.post(
+    '/maintenance',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='立即执行集合维护',
+    description='不等待低峰期，立即压实并补建索引（force=false 时只执行超过阈值的操作），后台执行',
+)
+async def run_maintenance(
+    force: bool = Query(True, description='是否忽略阈值执行全部维护操作'),
+    scheduler: MaintenanceScheduler = Depends(get_maintenance_scheduler),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """立即执行集合维护.
+    
+    Args:
+        force: 是否忽略阈值执行全部维护操作
+        scheduler: 维护调度器
+        job_store: 任务存储
+        
+    Returns:
+        后台任务信息
+    """
+    if scheduler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='已有维护在执行',
+        )
+    
+    job = job_store.create(MAINTENANCE_JOB_KIND, {'trigger': 'manual', 'force': force})
+    task = asyncio.create_task(asyncio.to_thread(scheduler.run_job, job, force))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    logger.info(f'维护任务已创建 - 任务: {job["id"]}, 强制: {force}')
+    return JobInfo.from_job(job)
+
+
+@router.post(
+    '/compression/dictionary',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='训练分块文本压缩字典',
+    description=(
+        '抽样知识库中的分块文本训练压缩字典，content_storage=compressed 时之后写入的分块使用新字典压缩，'
+        '已有分块在重建索引时重新压缩，后台执行'
+    ),
+)
+async def train_content_dictionary(
+    sample_size: Optional[int] = Query(None, ge=1, le=100000, description='抽样分块数（为空使用配置）'),
+    service: KnowledgeService = Depends(get_knowledge_service),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """训练分块文本压缩字典.
+    
+    Args:
+        sample_size: 抽样分块数
+        service: 知识库服务
+        job_store: 任务存储
+        
+    Returns:
+        后台任务信息
+    """
+    if not settings.content_dictionary_dir:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='未配置分块文本字典目录',
+        )
+    
+    job = _start_job(
+        job_store,
+        DICTIONARY_JOB_KIND,
+        {'sample_size': sample_size},
+        lambda: service.train_content_dictionary(sample_size),
+    )
+    logger.info(f'压缩字典训练任务已创建 - 任务: {job["id"]}')
+    return JobInfo.from_job(job)
+
+
+@router.get(
+    '/ingest/metrics',
+    summary='写入流水线统计',
+    description='运行中和最近完成的写入流水线各阶段的吞吐量、忙碌时间和队列深度',
+)
+async def get_ingest_metrics() -> Dict[str, List[Dict[str, Any]]]:
+    """获取写入流水线统计.
+
+    Returns:
+        {'active': 运行中的流水线, 'recent': 最近完成的流水线}
+    """
+    return pipeline_metrics()
+
+
+@router.get(
+    '/near-duplicates',
+    summary='近似重复检测报告',
+    description='写入时检测到的与已有文档近似重复（SimHash 汉明距离不超过阈值）的文档',
+)
+async def get_near_duplicate_report(
+    action: Optional[str] = Query(None, pattern='^(flag|drop)$', description='按处理方式筛选'),
+    limit: int = Query(100, ge=1, le=1000, description='返回条数'),
+    offset: int = Query(0, ge=0, description='偏移量'),
+    service: KnowledgeService = Depends(get_knowledge_service),
+) -> Dict[str, Any]:
+    """获取近似重复检测报告.
+
+    Args:
+        action: 处理方式（flag：已写入并标记；drop：未写入）
+        limit: 返回条数
+        offset: 偏移量
+        service: 知识库服务
+
+    Returns:
+        处理方式、索引规模、各处理方式的数量和检测记录
+    """
+    if service.near_duplicates is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='近似重复检测未启用',
+        )
+    report = await asyncio.to_thread(
+        service.near_duplicates.report, action=action, limit=limit, offset=offset
+    )
+    return {'mode': settings.near_dup_mode, **report}
+
+
+@router.post(
+    '/near-duplicates/rebuild',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='重建近似重复索引',
+    description='遍历知识库为全部已有文档写入 SimHash 指纹（启用检测前写入的文档），后台执行',
+)
+async def rebuild_near_duplicate_index(
+    service: KnowledgeService = Depends(get_knowledge_service),
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """重建近似重复索引.
+
+    Args:
+        service: 知识库服务
+        job_store: 任务存储
+
+    Returns:
+        后台任务信息
+    """
+    if service.near_duplicates is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='近似重复检测未启用',
+        )
+
+    job = _start_job(job_store, NEAR_DUP_JOB_KIND, {}, service.rebuild_near_duplicates)
+    logger.info(f'近似重复索引重建任务已创建 - 任务: {job["id"]}')
+    return JobInfo.from_job(job)
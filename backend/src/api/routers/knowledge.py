@@ -4,22 +4,41 @@
 遵守RESTful规范和企业级最佳实践。
 """
 
+import asyncio
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query, Response
+from fastapi.responses import StreamingResponse
 
 from ...models.schemas import (
     KnowledgeCreate,
     KnowledgeUpdate,
+    KnowledgeFilter,
+    KnowledgeBulkUpdate,
     KnowledgeResponse,
     KnowledgeSearchResult,
     KnowledgeDetail,
     ImportResult,
-    ImportErrorDetail,
+    JobInfo,
+)
+from ...services import (
+    KnowledgeService,
+    ImportExportService,
+    IngestPipeline,
+    IngestQueue,
+    ImportJobRunner,
+    JobStore,
+)
+from ...services.import_export_service import ARCHIVE_FORMATS
+from ...services.ingest_pipeline import batched, numbered
+from ...utils import logger, KnowledgeBaseError
+from ..dependencies import (
+    get_knowledge_service,
+    get_import_export_service,
+    get_ingest_queue,
+    get_import_job_runner,
+    get_job_store,
 )
-from ...services import KnowledgeService, ImportExportService
-from ...utils import logger
-from ..dependencies import get_knowledge_service, get_import_export_service
 
 
 router = APIRouter(
@@ -31,31 +50,33 @@ router = APIRouter(
 @router.post(
     '/add',
     response_model=KnowledgeResponse,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     summary='添加知识条目',
-    description='向知识库添加新的知识条目，支持自定义分类和元数据',
+    description='校验后加入异步写入队列并立即返回任务ID，可通过 /jobs/{job_id} 查询进度',
 )
 async def add_knowledge(
     knowledge: KnowledgeCreate,
-    service: KnowledgeService = Depends(get_knowledge_service),
+    queue: IngestQueue = Depends(get_ingest_queue),
 ) -> KnowledgeResponse:
-    """添加知识条目.
+    """添加知识条目（异步写入）.
     
     Args:
         knowledge: 知识条目数据
-        service: 知识库服务（依赖注入）
+        queue: 写入队列（依赖注入）
         
     Returns:
-        操作结果
+        操作结果（包含文档ID和任务ID）
     """
     try:
-        doc_id = await service.add_knowledge(knowledge)
+        job = queue.submit(knowledge)
         
         return KnowledgeResponse(
             success=True,
-            message='知识条目添加成功',
-            doc_id=doc_id,
+            message='知识条目已加入写入队列',
+            doc_id=job['payload']['doc_id'],
             data={
+                'job_id': job['id'],
+                'status': job['status'],
                 'category': knowledge.category,
                 'content_length': len(knowledge.content),
             },
@@ -69,36 +90,156 @@ async def add_knowledge(
         )
 
 
+@router.get(
+    '/jobs/{job_id}',
+    response_model=JobInfo,
+    summary='查询后台任务状态',
+    description='查询异步写入、文件导入等后台任务的执行状态、进度和结果',
+)
+async def get_job(
+    job_id: str,
+    job_store: JobStore = Depends(get_job_store),
+) -> JobInfo:
+    """查询后台任务状态.
+    
+    Args:
+        job_id: 任务ID
+        job_store: 任务存储
+        
+    Returns:
+        任务状态
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'任务不存在: {job_id}',
+        )
+    
+    return JobInfo.from_job(job)
+
+
+@router.post(
+    '/jobs/{job_id}/cancel',
+    response_model=JobInfo,
+    summary='取消导入任务',
+    description='排队中的任务立即取消；运行中的任务在当前批次提交后停止',
+)
+async def cancel_job(
+    job_id: str,
+    runner: ImportJobRunner = Depends(get_import_job_runner),
+) -> JobInfo:
+    """取消导入任务.
+    
+    Args:
+        job_id: 任务ID
+        runner: 导入任务执行器
+        
+    Returns:
+        任务状态
+    """
+    try:
+        job = runner.cancel(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'导入任务不存在: {job_id}',
+        )
+    return JobInfo.from_job(job)
+
+
+@router.post(
+    '/jobs/{job_id}/resume',
+    response_model=JobInfo,
+    summary='继续导入任务',
+    description='已取消或失败的导入任务从最后提交的行之后继续',
+)
+async def resume_job(
+    job_id: str,
+    runner: ImportJobRunner = Depends(get_import_job_runner),
+) -> JobInfo:
+    """从检查点继续导入任务.
+    
+    Args:
+        job_id: 任务ID
+        runner: 导入任务执行器
+        
+    Returns:
+        任务状态
+    """
+    try:
+        job = runner.resume(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'导入任务不存在: {job_id}',
+        )
+    return JobInfo.from_job(job)
+
+
 @router.post(
     '/add-batch',
     response_model=KnowledgeResponse,
     status_code=status.HTTP_201_CREATED,
     summary='批量添加知识',
-    description='批量添加多个知识条目',
+    description='批量添加多个知识条目（分块、向量化、写入流水线并发执行）',
 )
 async def add_knowledge_batch(
     knowledge_list: List[KnowledgeCreate],
+    response: Response,
     service: KnowledgeService = Depends(get_knowledge_service),
 ) -> KnowledgeResponse:
     """批量添加知识条目.
     
+    ``doc_ids`` 与输入按位置对应，失败条目为 None；部分条目写入失败时返回 207，
+    并给出失败条目的下标（从 0 开始）和原因。
+    
     Args:
         knowledge_list: 知识条目列表
+        response: 响应（部分失败时设置 207 状态码）
         service: 知识库服务
         
     Returns:
         操作结果
     """
     try:
-        doc_ids = []
-        for knowledge in knowledge_list:
-            doc_id = await service.add_knowledge(knowledge)
-            doc_ids.append(doc_id)
+        pipeline = IngestPipeline(service, name='add-batch')
+        result = await pipeline.run(numbered(batched(knowledge_list), first_row=0))
+        
+        if knowledge_list and result.success_count == 0:
+            raise KnowledgeBaseError(result.errors[0][1])
+        
+        doc_ids = [result.doc_ids.get(index) for index in range(len(knowledge_list))]
+        data = {
+            'doc_ids': doc_ids,
+            'inserted': result.inserted,
+            'updated': result.updated,
+            'skipped': result.skipped,
+            'near_duplicates': result.near_duplicates,
+        }
+        message = f'成功添加 {result.success_count} 条知识'
+        if result.skipped:
+            message += f'（{result.skipped} 条未变化已跳过）'
+        if result.near_duplicates:
+            message += f'，{result.near_duplicates} 条与已有知识近似重复'
+        if result.errors:
+            data['errors'] = [
+                {'index': index, 'error': error}
+                for index, error in sorted(result.errors)
+            ]
+            message += f'，失败 {result.failed_count} 条'
+            response.status_code = status.HTTP_207_MULTI_STATUS
         
         return KnowledgeResponse(
-            success=True,
-            message=f'成功添加 {len(doc_ids)} 条知识',
-            data={'doc_ids': doc_ids},
+            success=not result.errors,
+            message=message,
+            data=data,
         )
         
     except Exception as e:
@@ -192,6 +333,96 @@ async def delete_knowledge(
         )
 
 
+@router.post(
+    '/bulk-delete',
+    response_model=KnowledgeResponse,
+    summary='批量删除知识',
+    description=(
+        '按文档ID列表、分类、标签或创建时间范围批量删除（条件之间为 and，至少指定一个）。'
+        '服务端一次表达式删除、一次 flush，返回删除的文档数和分块数'
+    ),
+)
+async def bulk_delete_knowledge(
+    knowledge_filter: KnowledgeFilter,
+    service: KnowledgeService = Depends(get_knowledge_service),
+) -> KnowledgeResponse:
+    """按条件批量删除知识条目.
+    
+    Args:
+        knowledge_filter: 筛选条件
+        service: 知识库服务
+        
+    Returns:
+        操作结果（data 中包含删除的文档数和分块数）
+    """
+    try:
+        counts = await service.bulk_delete(knowledge_filter)
+        return KnowledgeResponse(
+            success=True,
+            message=f'已删除 {counts["documents"]} 个文档',
+            data=counts,
+        )
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f'批量删除知识失败: {e}')
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'批量删除失败: {str(e)}',
+        )
+
+
+@router.post(
+    '/bulk-update',
+    response_model=KnowledgeResponse,
+    summary='批量更新知识',
+    description=(
+        '按条件批量修改分类和标签（标签整体替换），内容和向量不变。'
+        '服务端分批 upsert、一次 flush，返回更新的文档数和分块数'
+    ),
+)
+async def bulk_update_knowledge(
+    request: KnowledgeBulkUpdate,
+    service: KnowledgeService = Depends(get_knowledge_service),
+) -> KnowledgeResponse:
+    """按条件批量更新知识条目的分类和标签.
+    
+    Args:
+        request: 筛选条件和要更新的字段
+        service: 知识库服务
+        
+    Returns:
+        操作结果（data 中包含更新的文档数和分块数）
+    """
+    try:
+        counts = await service.bulk_update(
+            request.filter,
+            category=request.category,
+            tags=request.tags,
+        )
+        return KnowledgeResponse(
+            success=True,
+            message=f'已更新 {counts["documents"]} 个文档',
+            data=counts,
+        )
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f'批量更新知识失败: {e}')
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'批量更新失败: {str(e)}',
+        )
+
+
 @router.get(
     '/count',
     response_model=dict,
@@ -248,6 +479,66 @@ async def get_knowledge_list(
         )
 
 
+@router.get(
+    '/export',
+    summary='导出知识库',
+    description='流式导出整个知识库（NDJSON/CSV/Parquet，可选 gzip），内存占用与知识库大小无关',
+    response_class=StreamingResponse,
+)
+async def export_knowledge(
+    format: str = Query('ndjson', description='导出格式（ndjson/csv/parquet）'),
+    level: str = Query('document', description='导出粒度（document 还原完整文档 / chunk 按分块）'),
+    include_vectors: bool = Query(False, description='是否包含向量（仅 chunk 粒度）'),
+    category: Optional[str] = Query(None, description='只导出指定分类'),
+    compress: bool = Query(False, alias='gzip', description='是否 gzip 压缩'),
+    knowledge_service: KnowledgeService = Depends(get_knowledge_service),
+    import_service: ImportExportService = Depends(get_import_export_service),
+) -> StreamingResponse:
+    """流式导出知识库.
+    
+    按主键顺序遍历集合，边读边写入响应。chunk 粒度且带向量的导出文件
+    可在使用同一向量化模型的其他环境中直接导入，无需重新向量化。
+    
+    Args:
+        format: 导出格式
+        level: 导出粒度
+        include_vectors: 是否包含向量
+        category: 分类过滤
+        compress: 是否 gzip 压缩
+        knowledge_service: 知识库服务
+        import_service: 导入导出服务
+        
+    Returns:
+        文件流响应
+    """
+    try:
+        import_service.check_export_options(format, level, include_vectors)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    media_type, filename = import_service.export_content_type(format, compress)
+    records = import_service.iter_export_records(
+        knowledge_service,
+        level=level,
+        include_vectors=include_vectors,
+        category=category,
+    )
+    logger.info(f'开始导出知识库 - 格式: {format}, 粒度: {level}, 向量: {include_vectors}')
+    
+    # 同步生成器由 Starlette 在线程池中迭代，不阻塞事件循环
+    return StreamingResponse(
+        import_service.iter_export_bytes(
+            records,
+            format=format,
+            level=level,
+            include_vectors=include_vectors,
+            compress=compress,
+        ),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get(
     '/{doc_id}',
     response_model=KnowledgeDetail,
@@ -289,7 +580,7 @@ async def get_knowledge_detail(
     '/{doc_id}',
     response_model=KnowledgeResponse,
     summary='更新知识条目',
-    description='根据文档ID更新知识条目',
+    description='根据文档ID更新知识条目（只重新向量化有变化的分块）',
 )
 async def update_knowledge(
     doc_id: str,
@@ -334,17 +625,21 @@ async def update_knowledge(
     '/import',
     response_model=ImportResult,
     summary='导入知识库文件',
-    description='从文件批量导入知识库（支持 JSON/CSV/Excel/TXT/Markdown/PDF）',
+    description='从文件批量导入知识库（支持 JSON/JSONL/CSV/Excel/TXT/Markdown/PDF/Parquet/Arrow 及其 zip/tar.gz 压缩包）',
 )
 async def import_knowledge(
     file: UploadFile = File(..., description='上传的文件'),
-    format: Optional[str] = Form(None, description='文件格式（auto/json/csv/excel/txt/markdown）'),
+    format: Optional[str] = Form(None, description='文件格式（auto/json/jsonl/csv/excel/txt/markdown/pdf/parquet/arrow/zip/tar）'),
     default_category: str = Form('未分类', description='默认分类（用于 TXT 格式）'),
     knowledge_service: KnowledgeService = Depends(get_knowledge_service),
     import_service: ImportExportService = Depends(get_import_export_service),
 ) -> ImportResult:
     """导入知识库文件.
     
+    CSV/TXT/JSONL/Markdown 按块流式解析并分批写入，不会把整个文件读入内存；
+    其他格式整体解析后同样分批写入。zip/tar 压缩包内的文件并发解析、
+    合并批次写入，返回逐文件结果。
+    
     Args:
         file: 上传的文件
         format: 文件格式（可选，自动检测）
@@ -356,21 +651,63 @@ async def import_knowledge(
         导入结果
     """
     try:
-        # 读取文件内容
-        file_content = await file.read()
+        filename = file.filename or 'unknown'
+        if format is None or format == 'auto':
+            format = import_service.detect_file_format(filename)
         
-        if len(file_content) == 0:
+        # 只读取第一个字节判断是否为空文件
+        if not await file.read(1):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail='文件内容为空',
             )
+        await file.seek(0)
+        
+        if format in ARCHIVE_FORMATS:
+            try:
+                result = await import_service.import_archive(
+                    file.file,
+                    format=format,
+                    knowledge_service=knowledge_service,
+                    default_category=default_category,
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f'文件解析失败: {str(e)}',
+                )
+            
+            if not result.files:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail='压缩包中没有可导入的文件',
+                )
+            
+            logger.info(
+                f'压缩包导入完成 - 文件: {filename}, 包含文件数: {len(result.files)}, '
+                f'总数: {result.total_count}, 成功: {result.success_count}, '
+                f'失败: {result.failed_count}'
+            )
+            return result
         
-        # 解析文件
         try:
-            parsed_data = await import_service.parse_file(
-                file_content=file_content,
-                filename=file.filename or 'unknown',
-                format=format,
+            if import_service.supports_streaming(format):
+                records = import_service.iter_records(
+                    file.file,
+                    format=format,
+                    default_category=default_category,
+                )
+            else:
+                records = iter(await import_service.parse_file(
+                    file_content=await file.read(),
+                    filename=filename,
+                    format=format,
+                    default_category=default_category,
+                ))
+            
+            result = await import_service.import_records(
+                import_service.aiter_record_batches(records),
+                knowledge_service=knowledge_service,
                 default_category=default_category,
             )
         except ValueError as e:
@@ -379,56 +716,19 @@ async def import_knowledge(
                 detail=f'文件解析失败: {str(e)}',
             )
         
-        if not parsed_data:
+        if result.total_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail='文件中没有有效的数据',
             )
         
-        # 预览数据（前5条）
-        preview = parsed_data[:5]
-        
-        # 批量导入
-        success_count = 0
-        failed_count = 0
-        errors = []
-        
-        for idx, item in enumerate(parsed_data):
-            try:
-                # 验证数据
-                knowledge = KnowledgeCreate(
-                    content=item['content'],
-                    category=item.get('category', default_category),
-                    title=item.get('title'),
-                    tags=item.get('tags', []),
-                )
-                
-                # 导入知识库
-                await knowledge_service.add_knowledge(knowledge)
-                success_count += 1
-                
-            except Exception as e:
-                failed_count += 1
-                errors.append(
-                    ImportErrorDetail(
-                        row=idx + 1,
-                        error=str(e),
-                    )
-                )
-                logger.warning(f'导入第 {idx + 1} 行失败: {e}')
-        
         logger.info(
-            f'文件导入完成 - 文件: {file.filename}, '
-            f'总数: {len(parsed_data)}, 成功: {success_count}, 失败: {failed_count}'
+            f'文件导入完成 - 文件: {filename}, '
+            f'总数: {result.total_count}, 成功: {result.success_count}, '
+            f'失败: {result.failed_count}'
         )
         
-        return ImportResult(
-            success_count=success_count,
-            failed_count=failed_count,
-            total_count=len(parsed_data),
-            errors=errors,
-            preview=preview,
-        )
+        return result
         
     except HTTPException:
         raise
@@ -440,6 +740,53 @@ async def import_knowledge(
         )
 
 
+@router.post(
+    '/import/jobs',
+    response_model=JobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='创建后台导入任务',
+    description='上传文件暂存到服务器后立即返回任务ID，后台分批导入，可通过 /jobs/{job_id} 查询进度',
+)
+async def create_import_job(
+    file: UploadFile = File(..., description='上传的文件'),
+    format: Optional[str] = Form(None, description='文件格式（auto/json/jsonl/csv/excel/txt/markdown/pdf/parquet/arrow）'),
+    default_category: str = Form('未分类', description='默认分类（用于 TXT 格式）'),
+    runner: ImportJobRunner = Depends(get_import_job_runner),
+) -> JobInfo:
+    """创建后台导入任务.
+    
+    适合大文件：请求只负责把上传内容写入本地暂存目录，
+    解析、向量化和写入由后台任务分批完成，支持取消和断点续传。
+    
+    Args:
+        file: 上传的文件
+        format: 文件格式（可选，自动检测）
+        default_category: 默认分类
+        runner: 导入任务执行器
+        
+    Returns:
+        任务状态
+    """
+    try:
+        job = await asyncio.to_thread(
+            runner.submit,
+            file.file,
+            file.filename or 'unknown',
+            format,
+            default_category,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f'创建导入任务失败: {e}')
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'创建导入任务失败: {str(e)}',
+        )
+    
+    return JobInfo.from_job(job)
+
+
 @router.delete(
     '/clear',
     response_model=KnowledgeResponse,
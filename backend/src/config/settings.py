@@ -8,7 +8,7 @@
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -31,11 +31,28 @@ class Settings(BaseSettings):
     # 服务器配置
     host: str = '0.0.0.0'
     port: int = 8000
+    # worker 进程数（uvicorn 同样从 WEB_CONCURRENCY 读取 --workers 的默认值），
+    # 多进程部署时在线重建索引不能更换向量化模型
+    web_concurrency: int = 1
     
     # 向量数据库配置（Milvus）
     milvus_host: str = 'localhost'
     milvus_port: int = 19530
+    milvus_collection: str = 'knowledge_base'  # 服务读写的集合别名（实际集合为 {别名}_v{版本}）
+    milvus_index_type: str = 'IVF_FLAT'  # 新建集合的向量索引类型
+    milvus_index_params: Dict[str, Any] = {'nlist': 128}  # 新建集合的向量索引参数
     embedding_model: str = 'BAAI/bge-large-zh-v1.5'  # 中文检索优化模型
+    embedding_max_batch_tokens: int = 16384  # 单个向量化批次填充后的 token 总数上限
+    embedding_max_batch_size: int = 128  # 单个向量化批次最多文本数
+    embedding_interactive_weight: float = 8.0  # 交互查询通道相对批量导入通道的调度权重
+    embedding_interactive_max_latency_ms: float = 50.0  # 交互查询最长排队时间，超过后优先执行
+    embedding_cache_path: Optional[str] = 'data/embedding_cache.sqlite3'  # 为空时禁用向量缓存
+    embedding_cache_max_entries: int = 1_000_000
+    
+    # 共享向量化 Sidecar 配置（多 worker 部署时共用一份模型）
+    embedding_server_socket: Optional[str] = None  # 为空时在进程内加载模型
+    embedding_server_max_batch_size: int = 64
+    embedding_server_max_wait_ms: int = 5
     
     # 大模型配置
     default_llm_model: str = 'qwen-max'
@@ -49,6 +66,79 @@ class Settings(BaseSettings):
     chunk_overlap: int = 50
     knowledge_relevance_threshold: float = 0.60  # 知识库相似度阈值（0-1），低于此值视为超出范围
     
+    # 批量导入配置
+    ingest_workers: int = 0  # 并行向量化进程数（0 表示按 CPU 核数）
+    ingest_batch_size: int = 256  # 每个向量化批次的分块数
+    import_batch_size: int = 200  # 文件导入时每批写入的记录数
+    export_batch_size: int = 1000  # 导出时每次从 Milvus 读取的分块数
+    ingest_pipeline_queue_size: int = 4  # 流水线阶段之间的队列容量（批次数）
+    ingest_pipeline_embed_workers: int = 1  # 流水线向量化阶段并发数
+    ingest_pipeline_insert_workers: int = 2  # 流水线写入阶段并发数
+    
+    # 近似重复检测配置（SimHash）
+    near_dup_mode: str = 'flag'  # off：不检测；flag：照常写入并记录；drop：不写入近似重复的文档
+    near_dup_index_path: Optional[str] = 'data/near_dup.sqlite3'  # 为空时禁用近似重复检测
+    near_dup_max_distance: int = 4  # 视为近似重复的最大汉明距离（64 位指纹）
+    near_dup_shingle_size: int = 4  # 字符 shingle 长度
+    near_dup_min_length: int = 100  # 参与检测的最短文本长度（去掉空白和标点后的字符数）
+    
+    # 分块文本保存配置
+    # milvus：分块文本保存在 Milvus；compressed：压缩后保存在 Milvus，命中后解压；
+    # docstore：全文保存在本地文档存储，Milvus 只保存分块位置
+    content_storage: str = 'milvus'
+    docstore_path: Optional[str] = 'data/docstore.sqlite3'  # 本地文档存储文件
+    docstore_compression: str = 'zlib'  # none / zlib / zstd（需安装 zstandard，未安装时使用 zlib）
+    content_compression: str = 'zstd'  # compressed 模式的压缩方式：zlib / zstd（未安装 zstandard 时使用 zlib）
+    content_dictionary_dir: Optional[str] = 'data/content_dicts'  # 压缩字典目录（为空时不使用字典）
+    content_dictionary_size: int = 64 * 1024  # 训练的字典大小（字节，zlib 最多 32KB）
+    content_dictionary_samples: int = 5000  # 训练字典时抽样的分块数
+    
+    # PDF 解析配置
+    pdf_workers: int = 0  # PDF 提取进程数（0 表示按 CPU 核数）
+    pdf_pages_per_task: int = 8  # 每个提取任务的页数
+    pdf_page_timeout: float = 30.0  # 单页提取超时（秒，0 表示不限制）
+    pdf_cache_dir: Optional[str] = 'data/pdf_cache'  # 提取结果缓存目录（留空禁用）
+    pdf_cache_max_size: int = 512 * 1024 * 1024  # 缓存目录总大小上限（字节），超过时删除最久未使用的结果
+    pdf_cache_max_age: float = 30 * 24 * 3600  # 缓存结果最长保留时间（秒，按最近使用时间计算）
+    
+    # 压缩包导入配置
+    archive_parse_concurrency: int = 4  # 同时解析的成员文件数
+    archive_max_member_size: int = 100 * 1024 * 1024  # 单个成员文件解压后的最大字节数
+    archive_max_total_size: int = 1024 * 1024 * 1024  # 全部成员文件解压后的最大总字节数
+    archive_max_members: int = 10000  # 压缩包中最多导入的文件数
+    
+    # 异步写入队列配置
+    job_store_path: str = 'data/jobs.sqlite3'  # 后台任务持久化文件
+    job_lease_seconds: float = 60.0  # 运行中任务的租约时长，进程退出后超过该时间由其他进程接手
+    ingest_queue_batch_size: int = 64  # 后台单次合并写入的最大任务数
+    ingest_queue_poll_interval: float = 1.0  # 队列空闲时的轮询间隔（秒）
+    
+    # 备份配置
+    backup_dir: str = 'data/backups'  # 知识库快照目录
+    backup_part_size: int = 20000  # 快照每个分片文件的分块数
+    backup_watermark_lag_seconds: int = 300  # 增量快照水位比快照开始时间提前的秒数（覆盖正在写入的分块）
+    
+    # 在线重建索引配置
+    reindex_batch_size: int = 512  # 回填影子集合时每批的分块数
+    reindex_sample_size: int = 200  # 切换前抽样检查召回的分块数
+    reindex_min_recall: float = 0.95  # 抽样分块能检索到自身的比例下限，低于时放弃切换
+    reindex_watermark_lag_seconds: int = 60  # 补写其他进程写入时，水位比本轮开始时间提前的秒数
+    
+    # 集合维护配置（压实、索引）
+    maintenance_enabled: bool = True  # 是否自动维护
+    maintenance_check_interval: float = 300.0  # 检查是否需要维护的间隔（秒）
+    maintenance_window: str = '02:00-06:00'  # 允许自动维护的时间段（本地时间，可跨零点，空表示不限）
+    maintenance_idle_seconds: float = 120.0  # 最近多久没有检索和写入才视为低峰
+    maintenance_min_interval: float = 6 * 3600  # 两次自动维护的最小间隔（秒）
+    maintenance_deleted_ratio: float = 0.1  # 已删除行占比超过时压实
+    maintenance_small_segment_rows: int = 10000  # 行数低于此值的分段视为小分段
+    maintenance_max_small_segments: int = 8  # 小分段数超过时压实
+    maintenance_unindexed_ratio: float = 0.05  # 未建索引行占比超过时补建索引
+    maintenance_timeout: float = 3600.0  # 等待压实或建索引完成的超时（秒）
+    
+    # 后台导入任务配置
+    import_spool_dir: str = 'data/imports'  # 上传文件的本地暂存目录
+    
     model_config = SettingsConfigDict(
         # 配置加载优先级：环境变量 > env_file
         # 环境变量会覆盖文件中的值
@@ -16,7 +16,14 @@ from fastapi.responses import JSONResponse
 
 from .config import settings
 from .utils import logger, ApiError
-from .api.routers import knowledge, chat
+from .api.routers import knowledge, chat, admin
+from .api.dependencies import (
+    get_ingest_queue,
+    get_maintenance_scheduler,
+    get_import_job_runner,
+    get_import_export_service,
+    get_job_store,
+)
 
 
 @asynccontextmanager
@@ -30,9 +37,37 @@ async def lifespan(app: FastAPI):
     logger.info(f'Debug模式: {settings.debug}')
     logger.info(f'Milvus地址: {settings.milvus_host}:{settings.milvus_port}')
     
+    # 启动后台写入队列（恢复重启前未完成的任务）
+    ingest_queue = get_ingest_queue()
+    await ingest_queue.start()
+    
+    # 启动后台导入任务（中断的任务从检查点继续）
+    import_job_runner = get_import_job_runner()
+    await import_job_runner.start()
+    
+    # 快照/恢复/重建索引/维护/字典训练/近似重复索引重建任务不支持续跑，重启前未完成的标记为失败
+    for kind in (
+        admin.BACKUP_JOB_KIND,
+        admin.RESTORE_JOB_KIND,
+        admin.REINDEX_JOB_KIND,
+        admin.MAINTENANCE_JOB_KIND,
+        admin.DICTIONARY_JOB_KIND,
+        admin.NEAR_DUP_JOB_KIND,
+    ):
+        get_job_store().fail_running(kind, '服务重启，任务中断')
+    
+    # 启动集合维护调度（低峰期自动压实、补建索引）
+    maintenance_scheduler = get_maintenance_scheduler()
+    if settings.maintenance_enabled:
+        await maintenance_scheduler.start()
+    
     yield
     
     # 关闭时
+    await maintenance_scheduler.stop()
+    await import_job_runner.stop()
+    await ingest_queue.stop()
+    get_import_export_service().close()
     logger.info('应用关闭')
 
 
@@ -110,6 +145,7 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
 # 注册路由
 app.include_router(knowledge.router)
 app.include_router(chat.router)
+app.include_router(admin.router)
 
 
 # 根路径
@@ -4,6 +4,8 @@ from .knowledge import (
     KnowledgeBase,
     KnowledgeCreate,
     KnowledgeUpdate,
+    KnowledgeFilter,
+    KnowledgeBulkUpdate,
     KnowledgeResponse,
     KnowledgeSearchResult,
     KnowledgeDetail,
@@ -11,7 +13,10 @@ from .knowledge import (
     KnowledgeListResponse,
     ImportResult,
     ImportErrorDetail,
+    ImportFileResult,
 )
+from .job import JobInfo
+from .admin import BackupRequest, RestoreRequest, SnapshotInfo, ReindexRequest
 from .chat import (
     ChatRequest,
     ChatResponse,
@@ -22,6 +27,8 @@ __all__ = [
     'KnowledgeBase',
     'KnowledgeCreate',
     'KnowledgeUpdate',
+    'KnowledgeFilter',
+    'KnowledgeBulkUpdate',
     'KnowledgeResponse',
     'KnowledgeSearchResult',
     'KnowledgeDetail',
@@ -29,6 +36,12 @@ __all__ = [
     'KnowledgeListResponse',
     'ImportResult',
     'ImportErrorDetail',
+    'ImportFileResult',
+    'JobInfo',
+    'BackupRequest',
+    'RestoreRequest',
+    'SnapshotInfo',
+    'ReindexRequest',
     'ChatRequest',
     'ChatResponse',
     'Message',
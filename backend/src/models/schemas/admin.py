@@ -0,0 +1,61 @@
+"""运维管理相关的Pydantic模型.
+
+用于知识库快照的创建、恢复和查询，以及在线重建索引。
+"""
+
+from typing import Optional, List, Dict, Any
+
+from pydantic import BaseModel, Field
+
+
+class BackupRequest(BaseModel):
+    """创建快照请求模型."""
+    
+    incremental: bool = Field(
+        default=False,
+        description='是否只备份最近一次快照之后新增的分块',
+    )
+
+
+class RestoreRequest(BaseModel):
+    """恢复快照请求模型."""
+    
+    drop_existing: bool = Field(
+        default=False,
+        description='恢复前是否清空当前知识库',
+    )
+    force: bool = Field(
+        default=False,
+        description='快照模型与当前配置不一致时是否仍然恢复',
+    )
+
+
+class SnapshotInfo(BaseModel):
+    """快照清单模型."""
+    
+    snapshot_id: str = Field(..., description='快照ID')
+    created_at: str = Field(..., description='创建时间')
+    model: str = Field(..., description='向量化模型')
+    dim: int = Field(..., description='向量维度')
+    base: Optional[str] = Field(None, description='增量快照的基础快照ID')
+    since: Optional[str] = Field(None, description='增量起点（created_at）')
+    watermark: Optional[str] = Field(None, description='快照包含的最新 created_at')
+    total: int = Field(..., description='分块数')
+    parts: List[Dict[str, Any]] = Field(default_factory=list, description='分片文件列表')
+
+
+class ReindexRequest(BaseModel):
+    """在线重建索引请求模型（未指定的项使用当前模型和配置）."""
+    
+    embedding_model: Optional[str] = Field(
+        None,
+        description='新的向量化模型（为空表示模型不变，直接复制向量）',
+    )
+    index_type: Optional[str] = Field(
+        None,
+        description='新的向量索引类型（如 IVF_FLAT、HNSW）',
+    )
+    index_params: Optional[Dict[str, Any]] = Field(
+        None,
+        description='新的向量索引参数（如 {"M": 16, "efConstruction": 200}）',
+    )
@@ -0,0 +1,53 @@
+"""后台任务相关的Pydantic模型.
+
+用于查询异步写入、文件导入等后台任务的状态。
+"""
+
+from typing import Optional, Dict, Any
+
+from pydantic import BaseModel, Field
+
+
+class JobInfo(BaseModel):
+    """后台任务状态模型."""
+    
+    job_id: str = Field(..., description='任务ID')
+    kind: str = Field(..., description='任务类型')
+    status: str = Field(
+        ...,
+        description='任务状态（queued/running/succeeded/failed/cancelling/cancelled）',
+    )
+    created_at: str = Field(..., description='创建时间')
+    updated_at: str = Field(..., description='更新时间')
+    progress: Optional[Dict[str, Any]] = Field(None, description='执行进度（导入任务）')
+    result: Optional[Dict[str, Any]] = Field(None, description='执行结果')
+    error: Optional[str] = Field(None, description='错误信息')
+    
+    @classmethod
+    def from_job(cls, job: Dict[str, Any]) -> 'JobInfo':
+        """由任务存储中的记录构建."""
+        return cls(
+            job_id=job['id'],
+            kind=job['kind'],
+            status=job['status'],
+            created_at=job['created_at'],
+            updated_at=job['updated_at'],
+            progress=job['progress'],
+            result=job['result'],
+            error=job['error'],
+        )
+    
+    model_config = {
+        'json_schema_extra': {
+            'example': {
+                'job_id': '3f2b9c0d8e7a4b6c9d1e2f3a4b5c6d7e',
+                'kind': 'add',
+                'status': 'succeeded',
+                'created_at': '2024-01-01T00:00:00',
+                'updated_at': '2024-01-01T00:00:01',
+                'progress': None,
+                'result': {'doc_id': 'a1b2c3d4e5f6'},
+                'error': None,
+            }
+        }
+    }
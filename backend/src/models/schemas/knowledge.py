@@ -4,10 +4,15 @@
 遵守企业级规范：完整类型提示、字段验证、文档说明。
 """
 
+import re
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+# 文档ID为内容的 MD5（32 位小写十六进制），不含 like 通配符
+DOC_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
 
 
 class KnowledgeCreate(BaseModel):
@@ -97,6 +102,80 @@ class KnowledgeUpdate(BaseModel):
         return v.strip() if v else None
 
 
+class KnowledgeFilter(BaseModel):
+    """批量操作的筛选条件（同时满足所有指定的条件，至少指定一个）."""
+    
+    doc_ids: Optional[List[str]] = Field(
+        None,
+        max_length=1000,
+        description='文档ID列表',
+    )
+    category: Optional[str] = Field(None, description='知识分类')
+    tag: Optional[str] = Field(None, description='包含的标签')
+    created_after: Optional[str] = Field(
+        None,
+        description='创建时间下限（含，ISO 格式，如 2024-01-01 或 2024-01-01T08:00:00）',
+    )
+    created_before: Optional[str] = Field(
+        None,
+        description='创建时间上限（不含，ISO 格式）',
+    )
+    
+    @field_validator('doc_ids')
+    @classmethod
+    def validate_doc_ids(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        """文档ID必须是 32 位小写十六进制（避免 ``%``、``_`` 等通配符匹配到其他文档）."""
+        for doc_id in v or []:
+            if not DOC_ID_PATTERN.fullmatch(doc_id):
+                raise ValueError(f'文档ID格式不正确: {doc_id}')
+        return v
+    
+    @model_validator(mode='after')
+    def validate_not_empty(self) -> 'KnowledgeFilter':
+        """不允许空条件（避免误操作整个知识库）.
+        
+        与 ``filter_expression`` 的判断一致：文档ID列表非空时生效，其余字段不为 None 即生效
+        （空字符串分类也是筛选条件）。
+        """
+        if not self.doc_ids and all(
+            value is None
+            for value in (self.category, self.tag, self.created_after, self.created_before)
+        ):
+            raise ValueError('至少指定一个筛选条件')
+        return self
+    
+    model_config = {
+        'json_schema_extra': {
+            'example': {
+                'category': '旧版产品手册',
+                'created_before': '2024-01-01',
+            }
+        }
+    }
+
+
+class KnowledgeBulkUpdate(BaseModel):
+    """批量更新请求模型（只更新分类和标签，不改变内容和向量）."""
+    
+    filter: KnowledgeFilter = Field(..., description='筛选条件')
+    category: Optional[str] = Field(
+        None,
+        max_length=50,
+        description='新的分类',
+    )
+    tags: Optional[List[str]] = Field(
+        None,
+        description='新的标签列表（替换原有标签）',
+    )
+    
+    @model_validator(mode='after')
+    def validate_changes(self) -> 'KnowledgeBulkUpdate':
+        """至少更新一个字段."""
+        if self.category is None and self.tags is None:
+            raise ValueError('至少指定 category 或 tags')
+        return self
+
+
 class KnowledgeBase(BaseModel):
     """知识库条目完整模型.
     
@@ -187,6 +266,18 @@ class ImportErrorDetail(BaseModel):
     
     row: int = Field(..., description='行号（从1开始）')
     error: str = Field(..., description='错误信息')
+    file: Optional[str] = Field(None, description='所在文件（压缩包导入时为包内路径）')
+
+
+class ImportFileResult(BaseModel):
+    """压缩包内单个文件的导入结果."""
+    
+    filename: str = Field(..., description='包内文件路径')
+    format: Optional[str] = Field(None, description='识别出的文件格式')
+    success_count: int = Field(0, description='成功导入数量')
+    failed_count: int = Field(0, description='失败数量')
+    total_count: int = Field(0, description='解析出的记录数')
+    error: Optional[str] = Field(None, description='文件级错误（解析失败、格式不支持等）')
 
 
 class ImportResult(BaseModel):
@@ -195,6 +286,13 @@ class ImportResult(BaseModel):
     success_count: int = Field(..., description='成功导入数量')
     failed_count: int = Field(..., description='失败数量')
     total_count: int = Field(..., description='总数量')
+    inserted_count: int = Field(0, description='新写入的文档数')
+    updated_count: int = Field(0, description='已存在但有变化、覆盖写入的文档数')
+    skipped_count: int = Field(
+        0, description='已存在且未变化、跳过的文档数（含文件内重复和丢弃的近似重复文档）'
+    )
+    near_duplicate_count: int = Field(0, description='检测到与已有文档近似重复的文档数')
     errors: List[ImportErrorDetail] = Field(default_factory=list, description='错误列表')
     preview: List[Dict[str, Any]] = Field(default_factory=list, description='预览数据（前5条）')
+    files: List[ImportFileResult] = Field(default_factory=list, description='逐文件结果（仅压缩包导入）')
 
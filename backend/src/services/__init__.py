@@ -3,12 +3,26 @@
 from .knowledge_service import KnowledgeService
 from .aliyun_service import AliyunService
 from .rag_service import RAGService
+from .ingest_pipeline import IngestPipeline
 from .import_export_service import ImportExportService
+from .job_store import JobStore
+from .ingest_queue import IngestQueue
+from .import_jobs import ImportJobRunner
+from .backup_service import BackupService
+from .reindex_service import ReindexService
+from .maintenance import MaintenanceScheduler
 
 __all__ = [
     'KnowledgeService',
     'AliyunService',
     'RAGService',
+    'IngestPipeline',
     'ImportExportService',
+    'JobStore',
+    'IngestQueue',
+    'ImportJobRunner',
+    'BackupService',
+    'ReindexService',
+    'MaintenanceScheduler',
 ]
 
@@ -0,0 +1,266 @@
+"""知识库快照备份与恢复.
+
+从源文件重建集合需要数小时的向量化，本模块直接备份 Milvus 中的数据：
+- 分块ID、标量字段写入 gzip 压缩的 JSONL 分片，向量写入 ``.npy`` 分片
+- ``manifest.json`` 记录向量化模型、维度、分片列表和时间水位
+- 增量快照导出上次快照之后写入（新增或覆盖写入）的分块，恢复时沿链依次写入
+- 恢复按主键覆盖写入（upsert），重复恢复不会产生重复数据
+
+分块写入 Milvus 时记录写入时间（``updated_at``），修改内容、批量修改分类和标签、
+导入的预计算分块都会更新它。水位取快照开始时间减去 ``backup_watermark_lag_seconds``，
+覆盖快照开始时已记录写入时间、但尚未在 Milvus 中可见的分块（相邻快照可能有少量重复，
+恢复时按主键覆盖）。没有 ``updated_at`` 字段的旧集合按 ``created_at`` 筛选，
+只能导出新增的分块，重建索引后即可按写入时间筛选。
+
+增量快照不记录删除，快照之间被删除的分块恢复后仍会存在。
+"""
+
+import asyncio
+import gzip
+import json
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..config import settings
+from ..utils import logger
+from .knowledge_service import UPDATED_AT_FIELD
+
+
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class BackupService:
+    """知识库快照服务."""
+
+    def __init__(
+        self,
+        knowledge_service: Any,
+        backup_dir: Optional[str] = None,
+        part_size: Optional[int] = None,
+    ):
+        """初始化快照服务.
+
+        Args:
+            knowledge_service: 知识库服务
+            backup_dir: 快照根目录
+            part_size: 每个分片文件的分块数
+        """
+        self.knowledge_service = knowledge_service
+        self.backup_dir = Path(backup_dir or settings.backup_dir)
+        self.part_size = part_size or settings.backup_part_size
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """列出所有快照的清单（按创建时间先后）."""
+        if not self.backup_dir.exists():
+            return []
+        manifests = []
+        for path in sorted(self.backup_dir.glob(f'*/{MANIFEST_NAME}')):
+            manifests.append(json.loads(path.read_text(encoding='utf-8')))
+        return sorted(manifests, key=lambda manifest: manifest['created_at'])
+
+    def get_snapshot(self, snapshot_id: str) -> Optional[Dict[str, Any]]:
+        """读取快照清单，不存在时返回 None."""
+        path = self.backup_dir / snapshot_id / MANIFEST_NAME
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def create_snapshot(self, incremental: bool = False) -> Dict[str, Any]:
+        """创建快照.
+
+        Args:
+            incremental: 是否只备份最近一次快照之后写入的分块
+
+        Returns:
+            快照清单
+
+        Raises:
+            ValueError: 请求增量快照但没有可作为基础的快照
+        """
+        started = datetime.now()
+        watermark_field = (
+            UPDATED_AT_FIELD if self.knowledge_service.has_field(UPDATED_AT_FIELD) else 'created_at'
+        )
+        base = None
+        expr = ''
+        if incremental:
+            snapshots = self.list_snapshots()
+            if not snapshots:
+                raise ValueError('没有可作为基础的快照，请先创建全量快照')
+            base = snapshots[-1]
+            if base['watermark']:
+                expr = f'{watermark_field} > {json.dumps(base["watermark"])}'
+            if watermark_field == 'created_at':
+                logger.warning('集合没有写入时间字段，增量快照只包含新增的分块（重建索引后可导出修改）')
+
+        snapshot_id = started.strftime('%Y%m%d-%H%M%S-%f')
+        tmp_dir = self.backup_dir / f'{snapshot_id}.tmp'
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest: Dict[str, Any] = {
+            'snapshot_id': snapshot_id,
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'model': self.knowledge_service.model_name,
+            'dim': self.knowledge_service.vector_dim,
+            'base': base['snapshot_id'] if base else None,
+            'since': base['watermark'] if base else None,
+            'watermark': (
+                started - timedelta(seconds=settings.backup_watermark_lag_seconds)
+            ).isoformat(),
+            'watermark_field': watermark_field,
+            'total': 0,
+            'parts': [],
+        }
+
+        try:
+            pending: List[Dict[str, Any]] = []
+            for batch in self.knowledge_service.iter_chunks(
+                expr=expr,
+                include_vectors=True,
+                include_updated_at=True,
+            ):
+                pending.extend(batch)
+                while len(pending) >= self.part_size:
+                    self._write_part(tmp_dir, manifest, pending[:self.part_size])
+                    pending = pending[self.part_size:]
+            if pending:
+                self._write_part(tmp_dir, manifest, pending)
+
+            (tmp_dir / MANIFEST_NAME).write_text(
+                json.dumps(manifest, ensure_ascii=False, indent=2),
+                encoding='utf-8',
+            )
+            # 写完再改名，目录存在即代表快照完整
+            tmp_dir.rename(self.backup_dir / snapshot_id)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        logger.info(
+            f'快照创建完成 - ID: {snapshot_id}, 类型: {"增量" if base else "全量"}, '
+            f'分块数: {manifest["total"]}, 分片数: {len(manifest["parts"])}'
+        )
+        return manifest
+
+    def restore_snapshot(
+        self,
+        snapshot_id: str,
+        drop_existing: bool = False,
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        """恢复快照（增量快照会先依次恢复其基础快照）.
+
+        Args:
+            snapshot_id: 快照ID
+            drop_existing: 恢复前是否清空当前集合
+            force: 模型或维度与当前配置不一致时是否仍然恢复
+
+        Returns:
+            恢复统计（快照链、写入分块数）
+
+        Raises:
+            ValueError: 快照不存在，或模型/维度不匹配
+        """
+        chain = self._resolve_chain(snapshot_id)
+        target = chain[-1]
+
+        if target['dim'] != self.knowledge_service.vector_dim:
+            raise ValueError(
+                f'快照向量维度 {target["dim"]} 与当前模型维度 '
+                f'{self.knowledge_service.vector_dim} 不一致'
+            )
+        if target['model'] != self.knowledge_service.model_name and not force:
+            raise ValueError(
+                f'快照使用的模型 {target["model"]} 与当前配置 '
+                f'{self.knowledge_service.model_name} 不一致（确认兼容可使用 force）'
+            )
+
+        if drop_existing:
+            self._clear_collection()
+
+        restored = 0
+        for manifest in chain:
+            snapshot_dir = self.backup_dir / manifest['snapshot_id']
+            for part in manifest['parts']:
+                rows = self._read_part(snapshot_dir, part)
+                for start in range(0, len(rows), settings.export_batch_size):
+                    self.knowledge_service.restore_rows(
+                        rows[start:start + settings.export_batch_size]
+                    )
+                restored += len(rows)
+            logger.info(f'快照已恢复 - ID: {manifest["snapshot_id"]}, 分块数: {manifest["total"]}')
+
+        self.knowledge_service.restore_rows([], flush=True)
+
+        # 快照中不含近似重复索引，按恢复后的集合重新生成指纹
+        fingerprints = None
+        if self.knowledge_service.near_duplicates is not None:
+            fingerprints = self.knowledge_service.rebuild_near_duplicates()['fingerprints']
+        return {
+            'snapshot_id': snapshot_id,
+            'chain': [manifest['snapshot_id'] for manifest in chain],
+            'restored_chunks': restored,
+            'near_duplicate_fingerprints': fingerprints,
+        }
+
+    def _resolve_chain(self, snapshot_id: str) -> List[Dict[str, Any]]:
+        """沿 base 找到全量快照，返回从全量到目标的快照链."""
+        chain = []
+        current: Optional[str] = snapshot_id
+        while current:
+            manifest = self.get_snapshot(current)
+            if manifest is None:
+                raise ValueError(f'快照不存在: {current}')
+            chain.append(manifest)
+            current = manifest['base']
+        return list(reversed(chain))
+
+    def _clear_collection(self) -> None:
+        """清空当前集合（同步执行 ``clear_all``）."""
+        if not asyncio.run(self.knowledge_service.clear_all()):
+            raise RuntimeError('清空知识库失败')
+
+    def _write_part(
+        self,
+        snapshot_dir: Path,
+        manifest: Dict[str, Any],
+        rows: List[Dict[str, Any]],
+    ) -> None:
+        """写入一个分片（标量 JSONL.gz + 向量 npy），并更新清单."""
+        index = len(manifest['parts'])
+        scalars_name = f'part-{index:05d}.jsonl.gz'
+        vectors_name = f'part-{index:05d}.npy'
+
+        with gzip.open(snapshot_dir / scalars_name, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                scalars = {key: value for key, value in row.items() if key != 'vector'}
+                f.write(json.dumps(scalars, ensure_ascii=False) + '\n')
+        np.save(
+            snapshot_dir / vectors_name,
+            np.asarray([row['vector'] for row in rows], dtype=np.float32),
+        )
+
+        manifest['parts'].append({
+            'scalars': scalars_name,
+            'vectors': vectors_name,
+            'count': len(rows),
+        })
+        manifest['total'] += len(rows)
+
+    @staticmethod
+    def _read_part(snapshot_dir: Path, part: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """读取一个分片，合并为带向量的分块行."""
+        vectors = np.load(snapshot_dir / part['vectors'])
+        with gzip.open(snapshot_dir / part['scalars'], 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        if len(rows) != len(vectors):
+            raise ValueError(f'分片损坏: {part["scalars"]} 与 {part["vectors"]} 行数不一致')
+        for row, vector in zip(rows, vectors):
+            row['vector'] = vector.tolist()
+        return rows
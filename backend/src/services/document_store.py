@@ -0,0 +1,212 @@
+"""本地文档存储（文档全文与元数据）.
+
+默认每个分块行都在 Milvus 中保存分块文本（最长 65535 字符，相邻分块还有重叠），
+这些文本全部常驻 Milvus 内存。``content_storage=docstore`` 时文档全文、标题、标签和
+元数据保存在本地 SQLite 文件中（可压缩），Milvus 分块行只保留向量、分块位置和过滤字段，
+检索命中后按分块位置从全文中截取分块文本（一次批量查询）。
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..utils import logger
+from .content_codec import compress, decompress, resolve_compression
+
+
+CONTENT_STORAGE_MODES = ('milvus', 'docstore', 'compressed')
+
+# SQLite 单条语句的参数数量上限较低，批量查询时分段执行
+_SQL_BATCH_SIZE = 500
+
+
+class DocumentStore:
+    """基于 SQLite 的文档存储.
+
+    每篇文档一行，正文按写入时的压缩方式编码（记录在行中，修改压缩配置后旧文档仍可读取）。
+    多个 worker 进程可以共用同一个文件（WAL 模式）。
+    """
+
+    def __init__(self, path: str, compression: str = 'zlib'):
+        """打开（或创建）文档存储文件.
+
+        Args:
+            path: SQLite 文件路径
+            compression: 新写入文档的压缩方式（none / zlib / zstd）
+        """
+        self.path = path
+        self.compression = resolve_compression(compression)
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                category TEXT,
+                title TEXT,
+                tags TEXT,
+                metadata TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            ) WITHOUT ROWID;
+        ''')
+
+        count = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        logger.info(f'文档存储已加载 - 路径: {path}, 压缩: {self.compression}, 文档数: {count}')
+
+    def put_many(self, documents: Sequence[Dict[str, Any]]) -> None:
+        """批量写入（或覆盖）文档.
+
+        Args:
+            documents: 文档列表，包含 doc_id、content、category、created_at，
+                可选 title、tags、metadata
+        """
+        if not documents:
+            return
+
+        now = datetime.now().isoformat()
+        rows = []
+        for document in documents:
+            data = document['content'].encode('utf-8')
+            rows.append((
+                document['doc_id'],
+                self.compression,
+                compress(data, self.compression),
+                len(data),
+                document.get('category'),
+                document.get('title'),
+                json.dumps(document.get('tags') or [], ensure_ascii=False),
+                json.dumps(document.get('metadata') or {}, ensure_ascii=False),
+                document.get('created_at'),
+                now,
+            ))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO documents '
+                '(doc_id, codec, content, size, category, title, tags, metadata, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+    def get_many(self, doc_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取文档.
+
+        Args:
+            doc_ids: 文档ID列表
+
+        Returns:
+            {文档ID: 文档}，不存在的文档不在结果中
+        """
+        unique_ids = list(dict.fromkeys(doc_ids))
+        rows = []
+        with self._lock:
+            for start in range(0, len(unique_ids), _SQL_BATCH_SIZE):
+                part = unique_ids[start:start + _SQL_BATCH_SIZE]
+                placeholders = ','.join('?' * len(part))
+                rows.extend(self._conn.execute(
+                    f'SELECT doc_id, codec, content, category, title, tags, metadata, '
+                    f'created_at, updated_at FROM documents WHERE doc_id IN ({placeholders})',
+                    part,
+                ).fetchall())
+
+        return {
+            doc_id: {
+                'doc_id': doc_id,
+                'content': decompress(content, codec).decode('utf-8'),
+                'category': category,
+                'title': title,
+                'tags': json.loads(tags) if tags else [],
+                'metadata': json.loads(metadata) if metadata else {},
+                'created_at': created_at,
+                'updated_at': updated_at,
+            }
+            for doc_id, codec, content, category, title, tags, metadata, created_at, updated_at in rows
+        }
+
+    def update_many(
+        self,
+        doc_ids: Sequence[str],
+        category: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+    ) -> None:
+        """批量修改文档的分类和标签（正文不变）.
+
+        Args:
+            doc_ids: 文档ID列表
+            category: 新的分类（为空表示不修改）
+            tags: 新的标签列表（为空表示不修改）
+        """
+        assignments = ['updated_at = ?']
+        values: List[Any] = [datetime.now().isoformat()]
+        if category is not None:
+            assignments.append('category = ?')
+            values.append(category)
+        if tags is not None:
+            assignments.append('tags = ?')
+            values.append(json.dumps(tags, ensure_ascii=False))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'UPDATE documents SET {", ".join(assignments)} WHERE doc_id = ?',
+                [(*values, doc_id) for doc_id in doc_ids],
+            )
+
+    def delete(self, doc_ids: Sequence[str]) -> None:
+        """删除文档."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM documents WHERE doc_id = ?',
+                [(doc_id,) for doc_id in doc_ids],
+            )
+
+    def clear(self) -> None:
+        """清空文档（知识库清空时调用）."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM documents')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_document_store(
+    path: Optional[str],
+    mode: str,
+    compression: str,
+) -> Optional[DocumentStore]:
+    """按配置打开文档存储.
+
+    ``docstore`` 模式下必须能打开；其他模式下只在文件已存在时打开
+    （之前以 ``docstore`` 模式写入的分块仍需从中读取文本）。
+
+    Args:
+        path: SQLite 文件路径
+        mode: 分块文本的保存位置（milvus / compressed / docstore）
+        compression: 新写入文档的压缩方式
+
+    Returns:
+        文档存储实例，不需要时返回 None
+
+    Raises:
+        ValueError: ``docstore`` 模式下未配置路径
+    """
+    if mode not in CONTENT_STORAGE_MODES:
+        logger.warning(f'未知的分块文本保存位置: {mode}，将保存在 Milvus 中')
+        mode = 'milvus'
+    if mode == 'docstore':
+        if not path:
+            raise ValueError('content_storage=docstore 时必须配置 docstore_path')
+        return DocumentStore(path, compression)
+    if path and Path(path).exists():
+        return DocumentStore(path, compression)
+    return None
@@ -0,0 +1,236 @@
+"""按 token 长度分桶的向量化批处理.
+
+``embedding_model.encode(chunks)`` 按文档顺序接收分块，20 字的 TXT 行和
+500 字的 PDF 分块混在一个批次里时，整批都会被填充到最长的长度。
+本模块负责：
+- 只分词一次，按 token 数排序分桶
+- 以批次的填充后 token 总数（而不是条数）作为上限组批
+- 推理后恢复原始顺序
+- 报告超出模型窗口（如 512 token）而被截断的分块
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..utils import logger
+
+
+@dataclass
+class EncodePlan:
+    """向量化批处理计划.
+
+    Attributes:
+        batches: 每个批次包含的原始下标（批内按长度升序）
+        token_counts: 每条文本的 token 数（含特殊 token）
+        overflow: 超出模型窗口、会被截断的文本下标
+        input_ids: 分词结果（仅本地模型可用，供推理复用）
+    """
+
+    batches: List[List[int]]
+    token_counts: List[int]
+    overflow: List[int] = field(default_factory=list)
+    input_ids: Optional[List[List[int]]] = None
+
+
+class TokenAwareBatcher:
+    """按 token 预算组批的向量化调度器.
+
+    本地 ``SentenceTransformer`` 模型会复用规划阶段的分词结果直接推理；
+    远程 Sidecar 或进程池等没有分词器的模型按字符数近似规划，
+    再调用其 ``encode`` 接口。
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_batch_tokens: Optional[int] = None,
+        max_batch_size: Optional[int] = None,
+    ):
+        """初始化调度器.
+
+        Args:
+            model: 向量化模型（兼容 SentenceTransformer 接口）
+            max_batch_tokens: 单批填充后 token 总数上限
+            max_batch_size: 单批最多文本数
+        """
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens or settings.embedding_max_batch_tokens
+        self.max_batch_size = max_batch_size or settings.embedding_max_batch_size
+        self.tokenizer = getattr(model, 'tokenizer', None)
+        self.max_seq_length: int = getattr(model, 'max_seq_length', None) or 512
+
+    def plan(self, texts: Sequence[str]) -> EncodePlan:
+        """生成批处理计划.
+
+        Args:
+            texts: 待向量化文本
+
+        Returns:
+            批处理计划
+        """
+        input_ids = None
+        if self.tokenizer is not None:
+            input_ids = self.tokenizer(
+                list(texts),
+                add_special_tokens=True,
+                truncation=False,
+                verbose=False,
+            )['input_ids']
+            token_counts = [len(ids) for ids in input_ids]
+        else:
+            # 没有分词器时按字符数近似（中文约 1 字 1 token，另加 CLS/SEP）
+            token_counts = [len(text) + 2 for text in texts]
+
+        overflow = [
+            idx for idx, count in enumerate(token_counts)
+            if count > self.max_seq_length
+        ]
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for idx in sorted(range(len(texts)), key=lambda i: token_counts[i]):
+            padded_length = min(token_counts[idx], self.max_seq_length)
+            # 升序排列，当前文本就是批内最长的，填充后总量 = 长度 × 条数
+            if current and (
+                len(current) >= self.max_batch_size
+                or padded_length * (len(current) + 1) > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+
+        return EncodePlan(
+            batches=batches,
+            token_counts=token_counts,
+            overflow=overflow,
+            input_ids=input_ids,
+        )
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        normalize_embeddings: bool = True,
+        plan: Optional[EncodePlan] = None,
+    ) -> np.ndarray:
+        """按计划分批向量化，并恢复原始顺序.
+
+        Args:
+            texts: 待向量化文本
+            normalize_embeddings: 是否归一化
+            plan: 预先生成的计划（为空时自动生成）
+
+        Returns:
+            与输入顺序一致的向量矩阵
+        """
+        if plan is None:
+            plan = self.plan(texts)
+
+        vectors: Optional[np.ndarray] = None
+        for batch in plan.batches:
+            batch_vectors = self.encode_batch(texts, batch, plan, normalize_embeddings)
+            if vectors is None:
+                vectors = np.zeros((len(texts), batch_vectors.shape[1]), dtype=np.float32)
+            vectors[batch] = batch_vectors
+
+        if vectors is None:
+            dim = self.model.get_sentence_embedding_dimension()
+            return np.zeros((0, dim), dtype=np.float32)
+        return vectors
+
+    def encode_batch(
+        self,
+        texts: Sequence[str],
+        batch: List[int],
+        plan: EncodePlan,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        """向量化计划中的一个批次.
+
+        Args:
+            texts: 全部文本
+            batch: 批次内的原始下标
+            plan: 批处理计划
+            normalize_embeddings: 是否归一化
+
+        Returns:
+            批次内文本的向量（顺序与 ``batch`` 一致）
+        """
+        if plan.input_ids is not None and hasattr(self.model, 'forward'):
+            return self._forward_tokenized(
+                [plan.input_ids[idx] for idx in batch],
+                normalize_embeddings,
+            )
+
+        return np.asarray(
+            self.model.encode(
+                [texts[idx] for idx in batch],
+                batch_size=len(batch),
+                normalize_embeddings=normalize_embeddings,
+                show_progress_bar=False,
+            ),
+            dtype=np.float32,
+        )
+
+    def _forward_tokenized(
+        self,
+        batch_ids: List[List[int]],
+        normalize_embeddings: bool,
+    ) -> np.ndarray:
+        """复用分词结果直接推理（不再重复分词）."""
+        import torch
+        from sentence_transformers.util import batch_to_device
+
+        truncated = [
+            ids if len(ids) <= self.max_seq_length
+            else ids[:self.max_seq_length - 1] + ids[-1:]  # 保留结尾的 [SEP]
+            for ids in batch_ids
+        ]
+        max_length = max(len(ids) for ids in truncated)
+        pad_id = self.tokenizer.pad_token_id or 0
+        features = {
+            'input_ids': torch.tensor(
+                [ids + [pad_id] * (max_length - len(ids)) for ids in truncated]
+            ),
+            'attention_mask': torch.tensor(
+                [[1] * len(ids) + [0] * (max_length - len(ids)) for ids in truncated]
+            ),
+        }
+        features = batch_to_device(features, self.model.device)
+
+        self.model.eval()
+        with torch.no_grad():
+            embeddings = self.model.forward(features)['sentence_embedding']
+            if normalize_embeddings:
+                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+
+        return embeddings.float().cpu().numpy()
+
+
+def report_overflow(
+    plan: EncodePlan,
+    labels: Optional[Sequence[str]] = None,
+    max_seq_length: int = 512,
+) -> None:
+    """记录超出模型窗口的分块（推理时会被截断）.
+
+    Args:
+        plan: 批处理计划
+        labels: 文本标识（如分块ID），用于日志定位
+        max_seq_length: 模型窗口大小
+    """
+    if not plan.overflow:
+        return
+
+    examples = [
+        f'{labels[idx] if labels else idx}({plan.token_counts[idx]} tokens)'
+        for idx in plan.overflow[:5]
+    ]
+    logger.warning(
+        f'{len(plan.overflow)} 个分块超过模型窗口 {max_seq_length} tokens，'
+        f'超出部分将被截断: {", ".join(examples)}'
+    )
@@ -0,0 +1,231 @@
+"""持久化的内容寻址向量缓存.
+
+重复导入同一文件、或删除后重新添加文档时，
+相同文本的分块会被重复向量化。本模块在本地 SQLite 文件中按
+（模型名称, 文本 MD5）缓存向量：
+- 向量以 float16 紧凑存储（归一化向量精度损失可忽略）
+- 超过容量上限时按最近使用时间淘汰
+- ``embedding_model`` 配置变化时自动清空旧模型的缓存
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..utils import logger
+
+
+# SQLite 单条语句的参数数量上限较低，批量查询时分段执行
+_SQL_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """计算文本的内容哈希（与文档ID一致使用 MD5）."""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """基于 SQLite 的向量缓存.
+
+    多个 worker 进程可以共用同一个缓存文件（WAL 模式）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        max_entries: int = 1_000_000,
+    ):
+        """打开（或创建）缓存文件.
+
+        Args:
+            path: 缓存文件路径
+            model_name: 当前向量化模型名称
+            max_entries: 最多缓存的向量条数
+        """
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                ON embeddings (last_used);
+        ''')
+        self._invalidate_other_models()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+        logger.info(f'向量缓存已加载 - 路径: {path}, 模型: {model_name}, 条数: {self._count}')
+
+    def _invalidate_other_models(self) -> None:
+        """模型变化时清空其他模型的缓存."""
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'model'"
+            ).fetchone()
+            if row and row[0] == self.model_name:
+                return
+
+            deleted = self._conn.execute(
+                'DELETE FROM embeddings WHERE model != ?',
+                (self.model_name,),
+            ).rowcount
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('model', ?)",
+                (self.model_name,),
+            )
+        if row:
+            logger.warning(
+                f'向量化模型已从 {row[0]} 变更为 {self.model_name}，'
+                f'已清空旧缓存 {deleted} 条'
+            )
+
+    def get_many(self, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """批量查询缓存.
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            命中的 {下标: 向量}
+        """
+        if not texts:
+            return {}
+
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, bytes] = {}
+
+        with self._lock:
+            unique_hashes = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique_hashes), _SQL_BATCH_SIZE):
+                part = unique_hashes[start:start + _SQL_BATCH_SIZE]
+                placeholders = ','.join('?' * len(part))
+                rows = self._conn.execute(
+                    f'SELECT text_hash, vector FROM embeddings '
+                    f'WHERE model = ? AND text_hash IN ({placeholders})',
+                    (self.model_name, *part),
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        'UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?',
+                        [(now, self.model_name, h) for h in found],
+                    )
+
+        return {
+            idx: np.frombuffer(found[h], dtype=np.float16).astype(np.float32).tolist()
+            for idx, h in enumerate(hashes)
+            if h in found
+        }
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+    ) -> None:
+        """批量写入缓存，超过容量时淘汰最久未使用的条目.
+
+        Args:
+            texts: 文本列表
+            vectors: 与文本对应的向量
+        """
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (
+                self.model_name,
+                text_hash(text),
+                np.asarray(vector, dtype=np.float16).tobytes(),
+                now,
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            with self._conn:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) '
+                    'VALUES (?, ?, ?, ?)',
+                    rows,
+                )
+                self._count += self._conn.total_changes - before
+
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目，保留容量的 90%."""
+        target = int(self.max_entries * 0.9)
+        with self._conn:
+            deleted = self._conn.execute(
+                'DELETE FROM embeddings WHERE (model, text_hash) IN ('
+                'SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)',
+                (self._count - target,),
+            ).rowcount
+        self._count -= deleted
+        logger.info(f'向量缓存淘汰 {deleted} 条，剩余 {self._count} 条')
+
+    def clear(self) -> None:
+        """清空缓存."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute('DELETE FROM embeddings')
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        """关闭缓存文件."""
+        with self._lock:
+            self._conn.close()
+
+
+def open_embedding_cache(
+    path: Optional[str],
+    model_name: str,
+    max_entries: int,
+) -> Optional[EmbeddingCache]:
+    """按配置打开向量缓存，失败时降级为不使用缓存.
+
+    Args:
+        path: 缓存文件路径（为空表示禁用）
+        model_name: 当前向量化模型名称
+        max_entries: 最多缓存的向量条数
+
+    Returns:
+        向量缓存实例，禁用或打开失败时返回 None
+    """
+    if not path:
+        return None
+    try:
+        return EmbeddingCache(path, model_name, max_entries)
+    except Exception as e:
+        logger.warning(f'向量缓存打开失败，将不使用缓存: {e}')
+        return None
@@ -0,0 +1,232 @@
+"""向量化模型的优先级调度.
+
+导入运行时，对话查询的向量化要排在成千上万个导入分块后面等待唯一的模型。
+本模块在模型前增加一个调度器：
+- 分为交互（``search_knowledge`` 的查询）和批量（添加/导入/重建）两条通道
+- 通道之间按加权公平队列（WFQ）分配模型时间
+- 以批次为单位抢占：批量任务被拆成多个批次，每个批次结束后重新选择通道
+- 交互通道设置最大等待时间，超过后无条件优先执行
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from ..config import settings
+from ..utils import logger
+from .embedding_batcher import EncodePlan, TokenAwareBatcher
+
+
+class EmbeddingLane:
+    """调度通道常量."""
+
+    INTERACTIVE = 'interactive'
+    BULK = 'bulk'
+
+
+@dataclass
+class _EmbeddingJob:
+    """一次向量化请求（可能被拆成多个批次执行）."""
+
+    texts: List[str]
+    lane: str
+    future: Future
+    normalize: bool = True
+    plan: Optional[EncodePlan] = None
+    pending_batches: Deque[List[int]] = field(default_factory=deque)
+    vectors: Optional[np.ndarray] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingScheduler:
+    """带优先级通道的向量化调度器.
+
+    模型只在调度器的工作线程中执行，调用方通过 ``submit`` 获得 Future。
+    """
+
+    def __init__(
+        self,
+        batcher: TokenAwareBatcher,
+        weights: Optional[Dict[str, float]] = None,
+        interactive_max_latency_ms: Optional[float] = None,
+    ):
+        """初始化调度器.
+
+        Args:
+            batcher: 按 token 分桶的批处理器
+            weights: 各通道权重（默认交互:批量 = 配置值:1）
+            interactive_max_latency_ms: 交互通道的最大等待时间（毫秒）
+        """
+        self.batcher = batcher
+        self.weights = weights or {
+            EmbeddingLane.INTERACTIVE: settings.embedding_interactive_weight,
+            EmbeddingLane.BULK: 1.0,
+        }
+        self.interactive_max_latency = (
+            interactive_max_latency_ms
+            if interactive_max_latency_ms is not None
+            else settings.embedding_interactive_max_latency_ms
+        ) / 1000
+
+        self._lanes: Dict[str, Deque[_EmbeddingJob]] = {
+            lane: deque() for lane in self.weights
+        }
+        # WFQ 虚拟时间：执行一个批次后按 token 开销 / 权重 累加
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in self.weights}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._interactive_latencies: Deque[float] = deque(maxlen=1000)
+
+    def submit(
+        self,
+        texts: List[str],
+        lane: str = EmbeddingLane.BULK,
+        normalize: bool = True,
+        plan: Optional[EncodePlan] = None,
+    ) -> Future:
+        """提交向量化请求.
+
+        Args:
+            texts: 待向量化文本
+            lane: 调度通道
+            normalize: 是否归一化
+            plan: 预先生成的批处理计划（为空时在工作线程中生成）
+
+        Returns:
+            结果为向量矩阵（与输入顺序一致）的 Future
+        """
+        future: Future = Future()
+        if not texts:
+            future.set_result(
+                np.zeros((0, self.batcher.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            )
+            return future
+
+        job = _EmbeddingJob(
+            texts=list(texts),
+            lane=lane,
+            future=future,
+            normalize=normalize,
+            plan=plan,
+            pending_batches=deque(plan.batches) if plan else deque(),
+        )
+        with self._condition:
+            self._ensure_worker()
+            queue = self._lanes[lane]
+            if not queue:
+                # 通道从空闲变为活跃时不累积历史额度，避免空闲后长期霸占模型
+                active = [self._virtual_time[name] for name, jobs in self._lanes.items() if jobs]
+                if active:
+                    self._virtual_time[lane] = max(self._virtual_time[lane], min(active))
+            queue.append(job)
+            self._condition.notify()
+        return future
+
+    def stats(self) -> Dict[str, object]:
+        """获取调度统计（各通道排队数、交互通道延迟分位数）."""
+        with self._condition:
+            pending = {lane: len(jobs) for lane, jobs in self._lanes.items()}
+            latencies = sorted(self._interactive_latencies)
+
+        def percentile(ratio: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * ratio))] * 1000, 2)
+
+        return {
+            'pending_jobs': pending,
+            'interactive_latency_ms': {'p50': percentile(0.5), 'p99': percentile(0.99)},
+        }
+
+    def close(self) -> None:
+        """关闭调度器：已提交的任务执行完后工作线程退出（更换模型后释放旧调度器）."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _ensure_worker(self) -> None:
+        """按需启动工作线程（调用方需持有锁）."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run,
+                name='embedding-scheduler',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _select_lane(self) -> Optional[str]:
+        """选择下一个执行批次的通道（调用方需持有锁）."""
+        interactive = self._lanes.get(EmbeddingLane.INTERACTIVE)
+        if interactive:
+            waited = time.monotonic() - interactive[0].enqueued_at
+            if waited >= self.interactive_max_latency:
+                return EmbeddingLane.INTERACTIVE
+
+        active = [lane for lane, jobs in self._lanes.items() if jobs]
+        if not active:
+            return None
+        return min(active, key=lambda lane: self._virtual_time[lane])
+
+    def _run(self) -> None:
+        """工作线程主循环：每次只执行一个批次，然后重新调度."""
+        while True:
+            with self._condition:
+                lane = self._select_lane()
+                while lane is None:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    lane = self._select_lane()
+                job = self._lanes[lane][0]
+
+            try:
+                cost = self._run_next_batch(job)
+            except Exception as e:
+                logger.error(f'向量化调度执行失败 - 通道: {lane}, 错误: {e}')
+                with self._condition:
+                    self._lanes[lane].popleft()
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+
+            with self._condition:
+                self._virtual_time[lane] += cost / self.weights[lane]
+                if not job.pending_batches:
+                    self._lanes[lane].popleft()
+
+            if not job.pending_batches:
+                if lane == EmbeddingLane.INTERACTIVE:
+                    self._interactive_latencies.append(time.monotonic() - job.enqueued_at)
+                job.future.set_result(job.vectors)
+
+    def _run_next_batch(self, job: _EmbeddingJob) -> int:
+        """执行任务的下一个批次.
+
+        Args:
+            job: 向量化任务
+
+        Returns:
+            本批次填充后的 token 开销（用于 WFQ 记账）
+        """
+        if job.plan is None:
+            job.plan = self.batcher.plan(job.texts)
+            job.pending_batches = deque(job.plan.batches)
+
+        batch = job.pending_batches.popleft()
+        vectors = self.batcher.encode_batch(job.texts, batch, job.plan, job.normalize)
+
+        if job.vectors is None:
+            job.vectors = np.zeros((len(job.texts), vectors.shape[1]), dtype=np.float32)
+        job.vectors[batch] = vectors
+
+        max_length = min(
+            max(job.plan.token_counts[idx] for idx in batch),
+            self.batcher.max_seq_length,
+        )
+        return max_length * len(batch)
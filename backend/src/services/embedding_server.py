@@ -0,0 +1,406 @@
+"""共享向量化模型服务（Sidecar 进程）.
+
+使用 ``uvicorn --workers N`` 时，每个 worker 都会加载一份向量化模型
+（bge-large 超过 1GB），内存成为 worker 数量的上限。本模块把模型放到
+一个本地 Sidecar 进程中，各 worker 通过 Unix Socket 调用，
+Sidecar 负责跨 worker 的动态批处理。
+
+协议（长度前缀帧，4 字节大端长度 + 负载）：
+- 请求：JSON 帧 ``{'op': 'encode', 'texts': [...], 'normalize': bool}``
+  或 ``{'op': 'info'}``
+- 响应：JSON 头帧 ``{'shape': [n, dim]}``（或 ``{'error': ...}``），
+  encode 请求随后再返回一个 float32 原始字节帧
+
+启动方式：
+    python -m src.services.embedding_server --socket /tmp/rag_embedding.sock
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from ..config import settings
+from ..utils import logger
+
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+@dataclass
+class _EncodeRequest:
+    """等待批处理的向量化请求."""
+
+    texts: List[str]
+    normalize: bool
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """读取一个长度前缀帧，连接关闭时返回 None."""
+    try:
+        header = await reader.readexactly(_FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = _FRAME_HEADER.unpack(header)
+    return await reader.readexactly(length)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes) -> None:
+    """写入一个长度前缀帧."""
+    writer.write(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+class EmbeddingServer:
+    """向量化模型 Sidecar 服务.
+
+    功能：
+    1. 进程内只加载一份向量化模型
+    2. 通过 Unix Socket 接收多个 worker 的请求
+    3. 在短时间窗口内合并请求，动态批量推理
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model_name: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[int] = None,
+    ):
+        """初始化 Sidecar 服务.
+
+        Args:
+            socket_path: Unix Socket 路径
+            model_name: 向量化模型名称（默认使用配置）
+            max_batch_size: 单次推理最多合并的文本数
+            max_wait_ms: 等待合并请求的最长时间（毫秒）
+        """
+        self.socket_path = socket_path
+        self.model_name = model_name or settings.embedding_model
+        self.max_batch_size = max_batch_size or settings.embedding_server_max_batch_size
+        self.max_wait_ms = (
+            max_wait_ms
+            if max_wait_ms is not None
+            else settings.embedding_server_max_wait_ms
+        )
+
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name)
+        self.vector_dim = self.model.get_sentence_embedding_dimension()
+        # 模型推理只在单个线程中执行，避免多线程争用同一份模型
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue: Optional[asyncio.Queue] = None
+        logger.info(
+            f'向量化 Sidecar 模型加载成功: {self.model_name}, 维度: {self.vector_dim}'
+        )
+
+    async def serve_forever(self) -> None:
+        """启动 Unix Socket 服务并持续运行."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._queue = asyncio.Queue()
+        batch_task = asyncio.create_task(self._batch_loop())
+        server = await asyncio.start_unix_server(
+            self._handle_connection,
+            path=self.socket_path,
+        )
+        os.chmod(self.socket_path, 0o660)
+        logger.info(
+            f'向量化 Sidecar 已启动 - socket: {self.socket_path}, '
+            f'最大批量: {self.max_batch_size}, 合并窗口: {self.max_wait_ms}ms'
+        )
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """处理单个 worker 连接（一个连接上可顺序发送多个请求）."""
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                if frame is None:
+                    break
+
+                request = json.loads(frame.decode('utf-8'))
+                op = request.get('op', 'encode')
+
+                if op == 'info':
+                    _write_frame(writer, json.dumps({
+                        'model': self.model_name,
+                        'dim': self.vector_dim,
+                    }).encode('utf-8'))
+                    await writer.drain()
+                    continue
+
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put(_EncodeRequest(
+                    texts=list(request.get('texts', [])),
+                    normalize=bool(request.get('normalize', False)),
+                    future=future,
+                ))
+
+                try:
+                    vectors: np.ndarray = await future
+                except Exception as e:
+                    _write_frame(writer, json.dumps({'error': str(e)}).encode('utf-8'))
+                    await writer.drain()
+                    continue
+
+                _write_frame(writer, json.dumps({
+                    'shape': list(vectors.shape),
+                }).encode('utf-8'))
+                _write_frame(writer, vectors.astype(np.float32).tobytes())
+                await writer.drain()
+
+        except Exception as e:
+            logger.warning(f'向量化 Sidecar 连接异常: {e}')
+        finally:
+            writer.close()
+
+    async def _batch_loop(self) -> None:
+        """动态批处理主循环：收集窗口期内的请求后一次推理."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            total = len(first.texts)
+            deadline = first.enqueued_at + self.max_wait_ms / 1000
+
+            while total < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                total += len(item.texts)
+
+            # normalize 参数不同的请求需要分开推理
+            for normalize in (True, False):
+                group = [r for r in batch if r.normalize == normalize]
+                if group:
+                    await self._run_group(loop, group, normalize)
+
+    async def _run_group(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        group: List[_EncodeRequest],
+        normalize: bool,
+    ) -> None:
+        """对一组请求执行一次合并推理并分发结果."""
+        texts = [text for request in group for text in request.texts]
+        try:
+            vectors = await loop.run_in_executor(
+                self._executor,
+                lambda: self.model.encode(
+                    texts,
+                    normalize_embeddings=normalize,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                ),
+            )
+        except Exception as e:
+            logger.error(f'向量化 Sidecar 推理失败: {e}')
+            for request in group:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in group:
+            count = len(request.texts)
+            if not request.future.done():
+                request.future.set_result(vectors[offset:offset + count])
+            offset += count
+
+        logger.debug(f'向量化 Sidecar 批量推理 - 请求数: {len(group)}, 文本数: {len(texts)}')
+
+
+class RemoteEmbeddingModel:
+    """远程向量化模型客户端.
+
+    接口与 ``SentenceTransformer`` 的 ``encode`` /
+    ``get_sentence_embedding_dimension`` 保持一致，可直接替换
+    ``KnowledgeService.embedding_model``。每个线程复用一个 Socket 连接。
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        """初始化客户端并读取模型信息.
+
+        Args:
+            socket_path: Sidecar 的 Unix Socket 路径
+            timeout: 单次请求超时时间（秒）
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        info = self._request({'op': 'info'})
+        self.model_name: str = info['model']
+        self.vector_dim: int = int(info['dim'])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """获取向量维度."""
+        return self.vector_dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        """向量化文本（由 Sidecar 合并批处理）.
+
+        Args:
+            sentences: 单条文本或文本列表
+            normalize_embeddings: 是否归一化
+            show_progress_bar: 兼容参数，忽略
+
+        Returns:
+            单条文本返回一维向量，列表返回二维矩阵
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            return np.zeros((0, self.vector_dim), dtype=np.float32)
+
+        header = self._request({
+            'op': 'encode',
+            'texts': texts,
+            'normalize': normalize_embeddings,
+        })
+        try:
+            payload = self._recv_frame(self._connection())
+        except BaseException:
+            # 未读完的响应留在连接中会被下一次请求读到，直接丢弃连接
+            self._reset_connection()
+            raise
+        vectors = np.frombuffer(payload, dtype=np.float32).reshape(header['shape'])
+
+        return vectors[0] if single else vectors
+
+    def _connection(self) -> socket.socket:
+        """获取当前线程的 Socket 连接（懒加载）."""
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset_connection(self) -> None:
+        """关闭当前线程的连接，下次请求时重连."""
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """发送请求并读取 JSON 响应头（连接断开时重试一次）.
+
+        任何异常（包括读取超时）都会丢弃当前连接：连接中可能残留未读完的响应，
+        继续使用会把上一次请求的结果当作下一次的返回。
+        """
+        payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+                header = json.loads(self._recv_frame(sock).decode('utf-8'))
+                break
+            except (ConnectionError, FileNotFoundError):
+                self._reset_connection()
+                if attempt == 1:
+                    raise
+            except BaseException:
+                self._reset_connection()
+                raise
+
+        if 'error' in header:
+            raise RuntimeError(f'向量化 Sidecar 返回错误: {header["error"]}')
+        return header
+
+    def _recv_frame(self, sock: socket.socket) -> bytes:
+        """读取一个长度前缀帧."""
+        (length,) = _FRAME_HEADER.unpack(self._recv_exactly(sock, _FRAME_HEADER.size))
+        return self._recv_exactly(sock, length)
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+        """从 Socket 读取指定长度的字节."""
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = sock.recv(min(size - len(buffer), 1 << 20))
+            if not chunk:
+                self._reset_connection()
+                raise ConnectionError('向量化 Sidecar 连接已关闭')
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+
+def main() -> None:
+    """命令行入口：启动向量化 Sidecar."""
+    parser = argparse.ArgumentParser(description='共享向量化模型 Sidecar 服务')
+    parser.add_argument(
+        '--socket',
+        default=settings.embedding_server_socket or '/tmp/rag_embedding.sock',
+        help='Unix Socket 路径',
+    )
+    parser.add_argument('--model', default=settings.embedding_model, help='向量化模型名称')
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=settings.embedding_server_max_batch_size,
+        help='单次推理最多合并的文本数',
+    )
+    parser.add_argument(
+        '--max-wait-ms',
+        type=int,
+        default=settings.embedding_server_max_wait_ms,
+        help='等待合并请求的最长时间（毫秒）',
+    )
+    args = parser.parse_args()
+
+    server = EmbeddingServer(
+        socket_path=args.socket,
+        model_name=args.model,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info('向量化 Sidecar 已停止')
+
+
+if __name__ == '__main__':
+    main()
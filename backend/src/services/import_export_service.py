@@ -1,27 +1,131 @@
 """导入导出服务.
 
-负责解析各种格式的文件并批量导入知识库。
-支持格式：JSON, CSV, Excel, TXT, Markdown, PDF
+负责解析各种格式的文件并批量导入知识库，以及流式导出知识库数据。
+支持格式：JSON, JSONL, CSV, Excel, TXT, Markdown, PDF, Parquet, Arrow，以及它们的 zip/tar 压缩包
 
 解析逻辑：
 - JSON: 数组中的每个对象 = 1条知识
+- JSONL: 每一行 JSON 对象 = 1条知识
+- Parquet/Arrow: 每一行 = 1条知识（需要 pyarrow）
 - CSV/Excel: 除了表头外的每一行 = 1条知识
 - TXT: 每一行 = 1条知识
 - Markdown: 每个 ## 标题块 = 1条知识
 - PDF: 每一页 = 1条知识
+
+zip/tar（含 tar.gz）压缩包按扩展名把包内文件分发给上述解析器并发解析，
+所有文件的记录汇入同一个批量写入流程，结果按文件汇总。
+
+JSONL/Parquet/Arrow 可以带 ``vector`` 列（同一向量化模型导出的向量），
+这些记录作为单个分块直接写入 Milvus，不再向量化。
+
+CSV/TXT/JSONL/Markdown/Excel/Parquet/Arrow 支持流式解析：按块读取上传文件、逐条产出记录，
+直接分批写入知识库，内存占用与文件大小无关。
+
+导出支持 NDJSON/CSV/Parquet（可选 gzip），按主键顺序遍历集合边读边写，
+内存占用与知识库大小无关。
 """
 
+import asyncio
+import codecs
 import json
 import csv
 import io
-from typing import List, Dict, Any, Optional
+import itertools
+import tarfile
+import zipfile
+import zlib
+from typing import (
+    List, Dict, Any, Optional, BinaryIO, Iterator, Iterable, AsyncIterator, Tuple,
+)
 from pathlib import Path
 
 import pandas as pd
-from PyPDF2 import PdfReader
 
-from ..models.schemas import KnowledgeCreate
+from ..config import settings
+from ..models.schemas import ImportResult, ImportErrorDetail, ImportFileResult
 from ..utils import logger
+from ..utils.helpers import heading_level, merge_chunk_rows
+from .ingest_pipeline import PARSE_ERROR_KEY, IngestPipeline, batched, numbered
+from .pdf_extractor import PdfExtractor
+
+
+# 支持流式解析的格式
+STREAMING_FORMATS = {'csv', 'txt', 'jsonl', 'markdown', 'excel', 'parquet', 'arrow'}
+
+# 流式读取上传文件的块大小（字节）
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Excel/Parquet/Arrow 按行批次读取时每批的行数
+ROW_BATCH_SIZE = 5000
+
+# 文件扩展名到格式的映射
+FORMAT_BY_EXTENSION = {
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+    '.xlsx': 'excel',
+    '.xls': 'excel',
+    '.txt': 'txt',
+    '.md': 'markdown',
+    '.markdown': 'markdown',
+    '.pdf': 'pdf',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.zip': 'zip',
+}
+
+# tar 包（含 gzip/bzip2/xz 压缩）的文件名后缀
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# 压缩包格式：包内每个文件按扩展名分发给对应的解析器
+ARCHIVE_FORMATS = {'zip', 'tar'}
+
+# 导出格式：(Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# 导出粒度：document 按文档还原全文，chunk 按分块导出（可带向量）
+EXPORT_COLUMNS = {
+    'document': ['doc_id', 'content', 'category', 'tags', 'created_at', 'chunk_count'],
+    'chunk': [
+        'id', 'doc_id', 'content', 'category', 'tags', 'created_at', 'chunk_index',
+        'start_offset', 'end_offset', 'heading_path',
+    ],
+}
+
+
+class _ByteSink:
+    """只追加的写入目标，供 ParquetWriter 边写边取出已写入的字节."""
+    
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        """取出并清空已写入的字节."""
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
 
 
 class ImportExportService:
@@ -33,6 +137,26 @@ class ImportExportService:
     3. 导出知识库数据
     """
     
+    def __init__(self, pdf_extractor: Optional[PdfExtractor] = None):
+        """初始化导入导出服务.
+        
+        Args:
+            pdf_extractor: PDF 文本提取器（为空时首次解析 PDF 时创建）
+        """
+        self._pdf_extractor = pdf_extractor
+    
+    @property
+    def pdf_extractor(self) -> PdfExtractor:
+        """PDF 文本提取器（按需创建进程池）."""
+        if self._pdf_extractor is None:
+            self._pdf_extractor = PdfExtractor()
+        return self._pdf_extractor
+    
+    def close(self) -> None:
+        """释放 PDF 提取进程池等资源."""
+        if self._pdf_extractor is not None:
+            self._pdf_extractor.close()
+    
     def detect_file_format(self, filename: str) -> str:
         """检测文件格式.
         
@@ -40,22 +164,13 @@ class ImportExportService:
             filename: 文件名
             
         Returns:
-            格式名称：json, csv, excel, txt, markdown
+            格式名称：json, jsonl, csv, excel, txt, markdown, pdf, parquet, arrow, zip, tar
         """
-        ext = Path(filename).suffix.lower()
-        
-        format_map = {
-            '.json': 'json',
-            '.csv': 'csv',
-            '.xlsx': 'excel',
-            '.xls': 'excel',
-            '.txt': 'txt',
-            '.md': 'markdown',
-            '.markdown': 'markdown',
-            '.pdf': 'pdf',
-        }
+        name = filename.lower()
+        if name.endswith(TAR_SUFFIXES):
+            return 'tar'
         
-        return format_map.get(ext, 'txt')
+        return FORMAT_BY_EXTENSION.get(Path(name).suffix, 'txt')
     
     async def parse_json_file(self, file_content: bytes) -> List[Dict[str, Any]]:
         """解析 JSON 文件.
@@ -105,25 +220,12 @@ class ImportExportService:
             知识条目列表
         """
         try:
-            content_str = file_content.decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(content_str))
-            
             result = []
-            for idx, row in enumerate(csv_reader):
-                if 'content' not in row or not row['content']:
+            lines = self._iter_text_lines(io.BytesIO(file_content))
+            for idx, record in enumerate(self._iter_csv_records(lines)):
+                if not record['content']:
                     raise ValueError(f'第 {idx + 2} 行：缺少 content 字段')
-                
-                # 解析 tags（逗号分隔）
-                tags = []
-                if row.get('tags'):
-                    tags = [tag.strip() for tag in row['tags'].split(',') if tag.strip()]
-                
-                result.append({
-                    'content': row['content'],
-                    'category': row.get('category', '未分类'),
-                    'title': row.get('title', '').strip() or None,
-                    'tags': tags,
-                })
+                result.append(record)
             
             return result
             
@@ -131,7 +233,7 @@ class ImportExportService:
             raise ValueError(f'解析 CSV 文件失败: {str(e)}')
     
     async def parse_excel_file(self, file_content: bytes) -> List[Dict[str, Any]]:
-        """解析 Excel 文件.
+        """解析 Excel 文件（第一个工作表，空 content 行跳过）.
         
         Args:
             file_content: 文件内容（字节）
@@ -140,33 +242,9 @@ class ImportExportService:
             知识条目列表
         """
         try:
-            df = pd.read_excel(io.BytesIO(file_content), engine='openpyxl')
-            
-            # 检查必需的列
-            if 'content' not in df.columns:
-                raise ValueError('Excel 文件必须包含 content 列')
-            
-            result = []
-            for idx, row in df.iterrows():
-                content = str(row.get('content', '')).strip()
-                if not content or content == 'nan':
-                    continue  # 跳过空行
-                
-                # 解析 tags
-                tags = []
-                if 'tags' in row and pd.notna(row['tags']):
-                    tags_str = str(row['tags'])
-                    tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                
-                result.append({
-                    'content': content,
-                    'category': str(row.get('category', '未分类')).strip(),
-                    'title': str(row.get('title', '')).strip() or None if 'title' in row else None,
-                    'tags': tags,
-                })
-            
-            return result
-            
+            return await asyncio.to_thread(
+                lambda: list(self._iter_excel_records(io.BytesIO(file_content)))
+            )
         except Exception as e:
             raise ValueError(f'解析 Excel 文件失败: {str(e)}')
     
@@ -185,37 +263,8 @@ class ImportExportService:
             知识条目列表
         """
         try:
-            content_str = file_content.decode('utf-8')
-            lines = content_str.strip().split('\n')
-            
-            result = []
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # 支持分隔符格式：分类|内容
-                if '|' in line:
-                    parts = line.split('|', 1)
-                    if len(parts) == 2:
-                        category = parts[0].strip() or default_category
-                        content = parts[1].strip()
-                    else:
-                        category = default_category
-                        content = line
-                else:
-                    category = default_category
-                    content = line
-                
-                if content:
-                    result.append({
-                        'content': content,
-                        'category': category,
-                        'title': None,
-                        'tags': [],
-                    })
-            
-            return result
+            lines = self._iter_text_lines(io.BytesIO(file_content))
+            return list(self._iter_txt_records(lines, default_category))
             
         except Exception as e:
             raise ValueError(f'解析 TXT 文件失败: {str(e)}')
@@ -230,66 +279,27 @@ class ImportExportService:
             知识条目列表
         """
         try:
-            content_str = file_content.decode('utf-8')
-            
-            # 简单的 Markdown 解析逻辑
-            # 支持格式：# 分类名称\n\n## 标题\n内容
-            lines = content_str.split('\n')
-            
-            result = []
-            current_category = '未分类'
-            current_title = None
-            current_content = []
+            lines = self._iter_text_lines(io.BytesIO(file_content))
+            return list(self._iter_markdown_records(lines))
             
-            for line in lines:
-                line = line.strip()
-                
-                # 一级标题 = 分类
-                if line.startswith('# ') and not line.startswith('##'):
-                    # 保存上一条知识
-                    if current_content:
-                        result.append({
-                            'content': '\n'.join(current_content).strip(),
-                            'category': current_category,
-                            'title': current_title,
-                            'tags': [],
-                        })
-                    
-                    current_category = line[2:].strip()
-                    current_title = None
-                    current_content = []
-                
-                # 二级标题 = 知识标题
-                elif line.startswith('## '):
-                    # 保存上一条知识
-                    if current_content:
-                        result.append({
-                            'content': '\n'.join(current_content).strip(),
-                            'category': current_category,
-                            'title': current_title,
-                            'tags': [],
-                        })
-                    
-                    current_title = line[3:].strip()
-                    current_content = []
-                
-                # 内容
-                elif line:
-                    current_content.append(line)
-            
-            # 保存最后一条知识
-            if current_content:
-                result.append({
-                    'content': '\n'.join(current_content).strip(),
-                    'category': current_category,
-                    'title': current_title,
-                    'tags': [],
-                })
+        except Exception as e:
+            raise ValueError(f'解析 Markdown 文件失败: {str(e)}')
+    
+    async def parse_jsonl_file(self, file_content: bytes) -> List[Dict[str, Any]]:
+        """解析 JSONL（NDJSON）文件.
+        
+        Args:
+            file_content: 文件内容（字节）
             
-            return result
+        Returns:
+            知识条目列表（无效的行以失败行占位）
+        """
+        try:
+            lines = self._iter_text_lines(io.BytesIO(file_content))
+            return list(self._iter_jsonl_records(lines))
             
         except Exception as e:
-            raise ValueError(f'解析 Markdown 文件失败: {str(e)}')
+            raise ValueError(f'解析 JSONL 文件失败: {str(e)}')
     
     async def parse_pdf_file(
         self,
@@ -298,6 +308,9 @@ class ImportExportService:
     ) -> List[Dict[str, Any]]:
         """解析 PDF 文件.
         
+        识别到编号标题（第X章、一、、1.2 等）时按小节生成条目，标题为小节的标题路径，
+        小节可以跨页；没有识别到标题时每页 1 条（按页码顺序）。
+        
         Args:
             file_content: 文件内容（字节）
             default_category: 默认分类
@@ -306,29 +319,25 @@ class ImportExportService:
             知识条目列表
         """
         try:
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PdfReader(pdf_file)
+            extractor = self.pdf_extractor
             
-            result = []
+            def extract() -> List[Dict[str, Any]]:
+                pages = list(extractor.extract_pages(file_content))
+                return (
+                    self._pdf_section_records(pages, default_category)
+                    or [
+                        {
+                            'content': text,
+                            'category': default_category,
+                            'title': f'PDF 第 {page_num} 页',
+                            'tags': [],
+                        }
+                        for page_num, text in pages
+                    ]
+                )
             
-            # 提取每一页的文本
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text and text.strip():
-                        # 清理文本（移除多余空白）
-                        cleaned_text = ' '.join(text.split())
-                        
-                        if cleaned_text:
-                            result.append({
-                                'content': cleaned_text,
-                                'category': default_category,
-                                'title': f'PDF 第 {page_num + 1} 页',
-                                'tags': [],
-                            })
-                except Exception as e:
-                    logger.warning(f'提取 PDF 第 {page_num + 1} 页失败: {e}')
-                    continue
+            # 提取在进程池中并行执行，这里只在线程中等待结果，不阻塞事件循环
+            result = await asyncio.to_thread(extract)
             
             if not result:
                 raise ValueError('PDF 文件中没有提取到任何文本内容')
@@ -365,6 +374,8 @@ class ImportExportService:
         # 根据格式解析
         if format == 'json':
             return await self.parse_json_file(file_content)
+        elif format == 'jsonl':
+            return await self.parse_jsonl_file(file_content)
         elif format == 'csv':
             return await self.parse_csv_file(file_content)
         elif format == 'excel':
@@ -375,6 +386,966 @@ class ImportExportService:
             return await self.parse_markdown_file(file_content)
         elif format == 'pdf':
             return await self.parse_pdf_file(file_content, default_category)
+        elif format in ('parquet', 'arrow'):
+            return await asyncio.to_thread(
+                lambda: list(self._iter_columnar_records(io.BytesIO(file_content), format))
+            )
         else:
             raise ValueError(f'不支持的格式: {format}')
 
+    
+    def supports_streaming(self, format: str) -> bool:
+        """判断格式是否支持流式解析."""
+        return format in STREAMING_FORMATS
+    
+    def iter_records(
+        self,
+        stream: BinaryIO,
+        format: str,
+        default_category: str = '未分类',
+    ) -> Iterator[Dict[str, Any]]:
+        """流式解析文件，逐条产出知识记录.
+        
+        按块读取 ``stream``，不会把整个文件读入内存。记录本身不做必填校验，
+        缺少 content 的记录会在写入时被判定为失败行。Excel、Parquet、Arrow
+        按行批次读取（``stream`` 需可随机访问）。
+        
+        Args:
+            stream: 二进制文件流（如上传文件的 file 对象）
+            format: 文件格式（csv/txt/jsonl/markdown/excel/parquet/arrow）
+            default_category: 默认分类
+            
+        Yields:
+            知识记录
+        """
+        if format == 'excel':
+            yield from self._iter_excel_records(stream)
+            return
+        if format in ('parquet', 'arrow'):
+            yield from self._iter_columnar_records(stream, format)
+            return
+        
+        lines = self._iter_text_lines(stream)
+        
+        if format == 'csv':
+            yield from self._iter_csv_records(lines)
+        elif format == 'txt':
+            yield from self._iter_txt_records(lines, default_category)
+        elif format == 'jsonl':
+            yield from self._iter_jsonl_records(lines)
+        elif format == 'markdown':
+            yield from self._iter_markdown_records(lines)
+        else:
+            raise ValueError(f'格式不支持流式解析: {format}')
+    
+    async def aiter_record_batches(
+        self,
+        records: Iterator[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """在线程中消费记录迭代器，按批次异步产出（不阻塞事件循环）.
+        
+        Args:
+            records: 记录迭代器
+            batch_size: 每批记录数
+            
+        Yields:
+            记录批次
+        """
+        batch_size = batch_size or settings.import_batch_size
+        
+        def next_batch() -> List[Dict[str, Any]]:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+        
+        while True:
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                return
+            yield batch
+    
+    def check_export_options(
+        self,
+        format: str,
+        level: str,
+        include_vectors: bool,
+    ) -> None:
+        """在开始输出前校验导出参数.
+        
+        Raises:
+            ValueError: 参数不合法或缺少依赖
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f'不支持的导出格式: {format}')
+        if level not in EXPORT_COLUMNS:
+            raise ValueError(f'不支持的导出粒度: {level}')
+        if include_vectors and level != 'chunk':
+            raise ValueError('向量属于分块，导出向量时请使用 level=chunk')
+        if format == 'parquet':
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise ValueError('导出 Parquet 文件需要安装 pyarrow')
+    
+    def export_content_type(self, format: str, compress: bool) -> Tuple[str, str]:
+        """获取导出文件的 Content-Type 和文件名."""
+        media_type, extension = EXPORT_FORMATS[format]
+        filename = f'knowledge_export.{extension}'
+        if compress:
+            return 'application/gzip', f'{filename}.gz'
+        return media_type, filename
+    
+    def iter_export_records(
+        self,
+        knowledge_service: Any,
+        level: str = 'document',
+        include_vectors: bool = False,
+        category: Optional[str] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """按主键顺序遍历知识库，逐批产出导出记录.
+        
+        document 粒度下，同一文档的连续分块按 chunk_index 排序后去重叠合并；
+        任意时刻只在内存中保留一个读取批次和一个未完成的文档。
+        
+        Args:
+            knowledge_service: 知识库服务
+            level: 导出粒度（document/chunk）
+            include_vectors: 是否包含向量（仅 chunk 粒度）
+            category: 只导出指定分类
+            
+        Yields:
+            导出记录批次
+        """
+        expr = f'category == {json.dumps(category, ensure_ascii=False)}' if category else ''
+        chunk_batches = knowledge_service.iter_chunks(expr=expr, include_vectors=include_vectors)
+        
+        if level == 'chunk':
+            for batch in chunk_batches:
+                yield [self._chunk_record(chunk, include_vectors) for chunk in batch]
+            return
+        
+        current: List[Dict[str, Any]] = []
+        for batch in chunk_batches:
+            documents = []
+            for chunk in batch:
+                if current and self._doc_id_of(chunk['id']) != self._doc_id_of(current[0]['id']):
+                    documents.append(self._document_record(current))
+                    current = []
+                current.append(chunk)
+            if documents:
+                yield documents
+        if current:
+            yield [self._document_record(current)]
+    
+    def iter_export_bytes(
+        self,
+        record_batches: Iterable[List[Dict[str, Any]]],
+        format: str,
+        level: str = 'document',
+        include_vectors: bool = False,
+        compress: bool = False,
+    ) -> Iterator[bytes]:
+        """将导出记录批次编码为文件字节流（可选 gzip）.
+        
+        Args:
+            record_batches: 导出记录批次
+            format: 导出格式（ndjson/csv/parquet）
+            level: 导出粒度
+            include_vectors: 是否包含向量列
+            compress: 是否 gzip 压缩
+            
+        Yields:
+            文件内容片段
+        """
+        columns = list(EXPORT_COLUMNS[level])
+        if include_vectors:
+            columns.append('vector')
+        
+        if format == 'ndjson':
+            encoded = self._encode_ndjson(record_batches)
+        elif format == 'csv':
+            encoded = self._encode_csv(record_batches, columns)
+        else:
+            encoded = self._encode_parquet(record_batches, columns)
+        
+        if not compress:
+            yield from encoded
+            return
+        
+        compressor = zlib.compressobj(wbits=31)  # 31 = gzip 格式
+        for data in encoded:
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    
+    @staticmethod
+    def _doc_id_of(chunk_id: str) -> str:
+        """从分块ID中取出文档ID."""
+        return chunk_id.rsplit('_chunk_', 1)[0]
+    
+    def _chunk_record(self, chunk: Dict[str, Any], include_vectors: bool) -> Dict[str, Any]:
+        """构建分块粒度的导出记录."""
+        record = {
+            'id': chunk['id'],
+            'doc_id': self._doc_id_of(chunk['id']),
+            'content': chunk['content'],
+            'category': chunk['category'],
+            'tags': list(chunk.get('tags', [])),
+            'created_at': chunk['created_at'],
+            'chunk_index': chunk['chunk_index'],
+            'start_offset': chunk.get('start_offset', -1),
+            'end_offset': chunk.get('end_offset', -1),
+            'heading_path': chunk.get('heading_path', ''),
+        }
+        if include_vectors:
+            record['vector'] = [float(value) for value in chunk['vector']]
+        return record
+    
+    def _document_record(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """将同一文档的分块合并为文档粒度的导出记录."""
+        chunks = sorted(chunks, key=lambda chunk: chunk['chunk_index'])
+        return {
+            'doc_id': self._doc_id_of(chunks[0]['id']),
+            'content': merge_chunk_rows(chunks, chunk_overlap=settings.chunk_overlap),
+            'category': chunks[0]['category'],
+            'tags': list(chunks[0].get('tags', [])),
+            'created_at': chunks[0]['created_at'],
+            'chunk_count': len(chunks),
+        }
+    
+    @staticmethod
+    def _encode_ndjson(record_batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        for batch in record_batches:
+            yield ''.join(
+                json.dumps(record, ensure_ascii=False) + '\n' for record in batch
+            ).encode('utf-8')
+    
+    @staticmethod
+    def _encode_csv(
+        record_batches: Iterable[List[Dict[str, Any]]],
+        columns: List[str],
+    ) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        # 带 BOM，Excel 打开时可正确识别 UTF-8
+        yield buffer.getvalue().encode('utf-8-sig')
+        
+        for batch in record_batches:
+            buffer.seek(0)
+            buffer.truncate()
+            for record in batch:
+                writer.writerow([
+                    json.dumps(record[column]) if column == 'vector'
+                    # 标签按逗号连接，导入时按逗号拆分
+                    else ','.join(record[column]) if column == 'tags'
+                    else record[column]
+                    for column in columns
+                ])
+            yield buffer.getvalue().encode('utf-8')
+    
+    @staticmethod
+    def _encode_parquet(
+        record_batches: Iterable[List[Dict[str, Any]]],
+        columns: List[str],
+    ) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        types = {
+            'chunk_count': pa.int64(),
+            'chunk_index': pa.int64(),
+            'start_offset': pa.int64(),
+            'end_offset': pa.int64(),
+            'tags': pa.list_(pa.string()),
+            'vector': pa.list_(pa.float32()),
+        }
+        schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        
+        sink = _ByteSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in record_batches:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+    
+    async def import_records(
+        self,
+        record_batches: AsyncIterator[List[Dict[str, Any]]],
+        knowledge_service: Any,
+        default_category: str = '未分类',
+    ) -> ImportResult:
+        """将记录批次校验后通过流水线写入知识库.
+        
+        解析、校验、分块、向量化和插入分阶段并发执行；
+        批量向量化或插入失败时逐条重试以定位失败行。
+        已有批次写入后文件才解析失败（如中途出现无法解码的字节）时不再继续读取，
+        返回已写入部分的结果，未读取的剩余部分计为一条失败行。
+        
+        Args:
+            record_batches: 记录批次（异步迭代器）
+            knowledge_service: 知识库服务
+            default_category: 默认分类
+            
+        Returns:
+            导入结果
+            
+        Raises:
+            ValueError: 读取第一批记录时解析失败（尚未写入任何数据）
+        """
+        preview: List[Dict[str, Any]] = []
+        parse_error: Optional[str] = None
+        
+        async def with_preview() -> AsyncIterator[List[Dict[str, Any]]]:
+            nonlocal parse_error
+            started = False
+            try:
+                async for batch in record_batches:
+                    started = True
+                    self.extend_preview(preview, batch)
+                    yield batch
+            except ValueError as e:
+                if not started:
+                    raise
+                parse_error = str(e)
+        
+        pipeline = IngestPipeline(knowledge_service, default_category, name='import')
+        result = await pipeline.run(numbered(with_preview()))
+        
+        errors = self._error_details(result.errors)
+        total, failed = result.total, result.failed_count
+        if parse_error is not None:
+            logger.warning(f'文件解析中断，已写入前 {total} 行: {parse_error}')
+            total += 1
+            failed += 1
+            errors.append(ImportErrorDetail(
+                row=total, error=f'文件解析中断，之后的内容未导入: {parse_error}'
+            ))
+        
+        return ImportResult(
+            success_count=total - failed,
+            failed_count=failed,
+            total_count=total,
+            inserted_count=result.inserted,
+            updated_count=result.updated,
+            skipped_count=result.skipped,
+            near_duplicate_count=result.near_duplicates,
+            errors=errors,
+            preview=preview,
+        )
+    
+    @staticmethod
+    def extend_preview(preview: List[Dict[str, Any]], records: List[Dict[str, Any]]) -> None:
+        """补充预览记录（最多 5 条，跳过解析失败的行）."""
+        for record in records:
+            if len(preview) >= 5:
+                return
+            if not record.get(PARSE_ERROR_KEY):
+                preview.append(record)
+    
+    async def import_archive(
+        self,
+        stream: BinaryIO,
+        format: str,
+        knowledge_service: Any,
+        default_category: str = '未分类',
+    ) -> ImportResult:
+        """导入 zip/tar 压缩包中的所有文件.
+        
+        流式解压成员文件，按扩展名分发给对应的解析器并发解析（PDF 在进程池中提取），
+        所有文件的记录汇入同一条写入流水线，跨文件组成向量化批次。
+        同时在内存中的成员文件数受 ``archive_parse_concurrency`` 限制。
+        
+        Args:
+            stream: 压缩包二进制流（zip 需可随机访问）
+            format: 压缩包格式（zip/tar）
+            knowledge_service: 知识库服务
+            default_category: 默认分类
+            
+        Returns:
+            导入结果（``files`` 为逐文件结果，行级错误带所在文件）
+            
+        Raises:
+            ValueError: 压缩包无法读取
+        """
+        files: List[ImportFileResult] = []
+        preview: List[Dict[str, Any]] = []
+        batch_size = settings.import_batch_size
+        slots = asyncio.Semaphore(settings.archive_parse_concurrency)
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=settings.archive_parse_concurrency)
+        
+        async def parse_member(index: int, data: bytes) -> None:
+            file_result = files[index]
+            try:
+                if self.supports_streaming(file_result.format):
+                    records = await asyncio.to_thread(lambda: list(self.iter_records(
+                        io.BytesIO(data), file_result.format, default_category
+                    )))
+                else:
+                    records = await self.parse_file(
+                        data, file_result.filename, file_result.format, default_category
+                    )
+            except Exception as e:
+                file_result.error = str(e)
+                records = []
+            finally:
+                slots.release()
+            
+            if not records and file_result.error is None:
+                file_result.error = '文件中没有有效的数据'
+            file_result.total_count = len(records)
+            await parsed.put((index, records))
+        
+        async def member_batches() -> AsyncIterator[List[Tuple[Tuple[int, int], Dict[str, Any]]]]:
+            # 引用为 (文件下标, 文件内行号)
+            while True:
+                item = await parsed.get()
+                if item is None:
+                    return
+                index, records = item
+                self.extend_preview(preview, records)
+                for start in range(0, len(records), batch_size):
+                    yield [
+                        ((index, row), record)
+                        for row, record in enumerate(records[start:start + batch_size], start=start + 1)
+                    ]
+        
+        pipeline = IngestPipeline(knowledge_service, default_category, name='import-archive')
+        writer = asyncio.create_task(pipeline.run(member_batches()))
+        parse_tasks: List[asyncio.Task] = []
+        
+        async def unless_writer_done(aw: Any) -> Any:
+            # 写入流水线异常或提前结束时不再有人消费 parsed 队列，解析任务会一直阻塞在 put 上；
+            # 等待期间同时观察写入任务，它先结束则抛出其异常
+            task = asyncio.ensure_future(aw)
+            done, _ = await asyncio.wait({task, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                return task.result()
+            task.cancel()
+            writer.result()
+            raise RuntimeError('写入流水线提前结束')
+        
+        members = self._iter_archive_members(
+            stream,
+            format,
+            settings.archive_max_member_size,
+            settings.archive_max_total_size,
+            settings.archive_max_members,
+        )
+        try:
+            while True:
+                # 先占用解析名额再解压下一个成员，限制同时驻留内存的成员文件数
+                await unless_writer_done(slots.acquire())
+                try:
+                    member = await unless_writer_done(asyncio.to_thread(next, members, None))
+                except Exception:
+                    slots.release()
+                    raise
+                if member is None:
+                    slots.release()
+                    break
+                
+                name, data, error = member
+                file_result = ImportFileResult(filename=name, format=self._member_format(name))
+                files.append(file_result)
+                if error is None and file_result.format is None:
+                    error = '不支持的文件类型'
+                if error is not None:
+                    file_result.error = error
+                    slots.release()
+                    continue
+                parse_tasks.append(asyncio.create_task(parse_member(len(files) - 1, data)))
+            
+            await unless_writer_done(asyncio.gather(*parse_tasks))
+            await unless_writer_done(parsed.put(None))
+            result = await writer
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise ValueError(f'压缩包读取失败: {e}')
+        finally:
+            for task in [*parse_tasks, writer]:
+                task.cancel()
+            members.close()
+        
+        errors: List[ImportErrorDetail] = []
+        for (index, row), message in sorted(result.errors, key=lambda error: error[0]):
+            files[index].failed_count += 1
+            errors.append(ImportErrorDetail(row=row, error=message, file=files[index].filename))
+        for file_result in files:
+            file_result.success_count = file_result.total_count - file_result.failed_count
+        
+        logger.info(
+            f'压缩包导入完成 - 文件数: {len(files)}, '
+            f'失败文件: {sum(1 for file_result in files if file_result.error)}, '
+            f'成功: {result.success_count}, 失败: {result.failed_count}'
+        )
+        return ImportResult(
+            success_count=result.success_count,
+            failed_count=result.failed_count,
+            total_count=result.total,
+            inserted_count=result.inserted,
+            updated_count=result.updated,
+            skipped_count=result.skipped,
+            near_duplicate_count=result.near_duplicates,
+            errors=errors,
+            preview=preview,
+            files=files,
+        )
+    
+    async def import_batch(
+        self,
+        batch: List[Dict[str, Any]],
+        first_row: int,
+        knowledge_service: Any,
+        default_category: str = '未分类',
+    ) -> ImportResult:
+        """校验并写入一个记录批次（批次结束时数据已 flush，可作为检查点）.
+        
+        带 ``vector`` 的记录（同一向量化模型导出的数据）直接写入，不再向量化；
+        已存在且未变化的文档跳过，因此重复写入同一批次是幂等的。
+        
+        Args:
+            batch: 记录批次
+            first_row: 批次第一条记录的行号（从 1 开始）
+            knowledge_service: 知识库服务
+            default_category: 默认分类
+            
+        Returns:
+            批次的导入结果（不含预览）
+        """
+        pipeline = IngestPipeline(knowledge_service, default_category, name='import-batch')
+        result = await pipeline.run(numbered(batched(batch, len(batch)), first_row))
+        return ImportResult(
+            success_count=result.success_count,
+            failed_count=result.failed_count,
+            total_count=result.total,
+            inserted_count=result.inserted,
+            updated_count=result.updated,
+            skipped_count=result.skipped,
+            near_duplicate_count=result.near_duplicates,
+            errors=self._error_details(result.errors),
+        )
+    
+    @staticmethod
+    def _error_details(errors: List[Tuple[int, str]]) -> List[ImportErrorDetail]:
+        """将流水线错误（行号, 信息）按行号排序转换为错误详情."""
+        return [
+            ImportErrorDetail(row=row, error=message)
+            for row, message in sorted(errors, key=lambda error: error[0])
+        ]
+    
+    @staticmethod
+    def _member_format(name: str) -> Optional[str]:
+        """按扩展名识别压缩包成员的格式，不支持的类型（含嵌套压缩包）返回 None."""
+        format = FORMAT_BY_EXTENSION.get(Path(name.lower()).suffix)
+        return None if format in ARCHIVE_FORMATS else format
+    
+    @staticmethod
+    def _iter_archive_members(
+        stream: BinaryIO,
+        format: str,
+        max_size: int,
+        max_total_size: int,
+        max_members: int,
+    ) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+        """逐个解压压缩包中的普通文件（跳过目录、隐藏文件和 macOS 元数据）.
+        
+        tar 包按流模式顺序读取，不需要随机访问；zip 从中央目录定位成员，
+        中央目录记录的文件数或总大小超过限制时直接拒绝。解压过程中累计的文件数或
+        解压后总大小超过限制时，该成员记为错误并停止解压（之前的成员照常导入）。
+        
+        Args:
+            stream: 压缩包二进制流
+            format: 压缩包格式（zip/tar）
+            max_size: 单个成员解压后的最大字节数
+            max_total_size: 全部成员解压后的最大总字节数
+            max_members: 最多解压的成员文件数
+            
+        Yields:
+            (包内路径, 文件内容, 错误信息)，超过大小限制的成员内容为 None
+            
+        Raises:
+            ValueError: 格式不支持，或 zip 中央目录记录的文件数/总大小超过限制
+        """
+        def skipped(name: str) -> bool:
+            parts = Path(name).parts
+            return not parts or parts[0] == '__MACOSX' or any(part.startswith('.') for part in parts)
+        
+        too_large = f'文件超过大小限制（{max_size} 字节）'
+        too_many = f'压缩包文件数超过限制（{max_members} 个），之后的文件未导入'
+        total_too_large = f'压缩包解压后总大小超过限制（{max_total_size} 字节），之后的文件未导入'
+        count = 0
+        total_size = 0
+        
+        if format == 'zip':
+            with zipfile.ZipFile(stream) as archive:
+                infos = [info for info in archive.infolist() if not info.is_dir()]
+                if len(infos) > max_members:
+                    raise ValueError(f'压缩包文件数超过限制（{max_members} 个）')
+                if sum(info.file_size for info in infos) > max_total_size:
+                    raise ValueError(f'压缩包解压后总大小超过限制（{max_total_size} 字节）')
+                for info in infos:
+                    name = info.filename
+                    if not info.flag_bits & 0x800:
+                        # 未标记 UTF-8 的文件名（Windows 压缩工具）通常是 GBK 编码
+                        try:
+                            name = name.encode('cp437').decode('gbk')
+                        except (UnicodeEncodeError, UnicodeDecodeError):
+                            pass
+                    if skipped(name):
+                        continue
+                    if info.file_size > max_size:
+                        yield name, None, too_large
+                        continue
+                    with archive.open(info) as member:
+                        # 不信任中央目录记录的大小，多读一个字节校验
+                        data = member.read(min(max_size, max_total_size - total_size) + 1)
+                    if len(data) > max_total_size - total_size:
+                        yield name, None, total_too_large
+                        return
+                    if len(data) > max_size:
+                        yield name, None, too_large
+                        continue
+                    total_size += len(data)
+                    yield name, data, None
+        elif format == 'tar':
+            with tarfile.open(fileobj=stream, mode='r|*') as archive:
+                for info in archive:
+                    if not info.isfile() or skipped(info.name):
+                        continue
+                    count += 1
+                    if count > max_members:
+                        yield info.name, None, too_many
+                        return
+                    if info.size > max_size:
+                        yield info.name, None, too_large
+                        continue
+                    if info.size > max_total_size - total_size:
+                        yield info.name, None, total_too_large
+                        return
+                    total_size += info.size
+                    yield info.name, archive.extractfile(info).read(), None
+        else:
+            raise ValueError(f'不支持的压缩包格式: {format}')
+    
+    @staticmethod
+    def _iter_text_lines(
+        stream: BinaryIO,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[str]:
+        """按块读取二进制流并增量解码为文本行（保留换行符）.
+        
+        Args:
+            stream: 二进制文件流
+            chunk_size: 每次读取的字节数
+            
+        Yields:
+            文本行
+        """
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        pending = ''
+        
+        while True:
+            chunk = stream.read(chunk_size)
+            pending += decoder.decode(chunk, final=not chunk)
+            
+            # 最后一段可能是不完整的行，留到下一块继续拼接
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                yield line + '\n'
+            
+            if not chunk:
+                break
+        
+        if pending:
+            yield pending
+    
+    @staticmethod
+    def _iter_csv_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """逐行解析 CSV 记录."""
+        for row in csv.DictReader(lines):
+            # 解析 tags（逗号分隔）
+            tags = []
+            if row.get('tags'):
+                tags = [tag.strip() for tag in row['tags'].split(',') if tag.strip()]
+            
+            yield {
+                'content': row.get('content') or '',
+                'category': row.get('category') or '未分类',
+                'title': (row.get('title') or '').strip() or None,
+                'tags': tags,
+            }
+    
+    @classmethod
+    def _iter_excel_records(
+        cls,
+        stream: BinaryIO,
+        batch_rows: int = ROW_BATCH_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """以只读模式逐批读取第一个工作表，按列批量清洗后逐条产出."""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            columns = [str(name).strip() if name is not None else '' for name in header or ()]
+            if 'content' not in columns:
+                raise ValueError('Excel 文件必须包含 content 列')
+            
+            while True:
+                chunk = list(itertools.islice(rows, batch_rows))
+                if not chunk:
+                    break
+                frame = pd.DataFrame(chunk, columns=columns)
+                yield from cls._clean_excel_frame(frame)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _clean_excel_frame(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """按列批量清洗一批 Excel 行（跳过 content 为空的行）."""
+        def text_column(name: str) -> pd.Series:
+            if name not in frame.columns:
+                return pd.Series('', index=frame.index, dtype=object)
+            column = frame[name]
+            if isinstance(column, pd.DataFrame):
+                column = column.iloc[:, 0]  # 重名列取第一列
+            return column.where(column.notna(), '').astype(str).str.strip()
+        
+        content = text_column('content')
+        keep = (content != '') & (content != 'nan')
+        if not keep.any():
+            return []
+        
+        category = text_column('category')[keep]
+        title = text_column('title')[keep]
+        tags = (
+            text_column('tags')[keep]
+            .str.replace(r'\s*,\s*', ',', regex=True)
+            .str.strip(', ')
+        )
+        
+        cleaned = pd.DataFrame({
+            'content': content[keep],
+            'category': category.mask(category == '', '未分类'),
+            'title': title.mask(title == '', None),
+            'tags': [
+                [tag for tag in value.split(',') if tag] if value else []
+                for value in tags
+            ],
+        })
+        return cleaned.to_dict('records')
+    
+    @staticmethod
+    def _iter_txt_records(
+        lines: Iterable[str],
+        default_category: str,
+    ) -> Iterator[Dict[str, Any]]:
+        """逐行解析 TXT 记录（支持 分类|内容 格式）."""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            # 支持分隔符格式：分类|内容
+            if '|' in line:
+                category, content = line.split('|', 1)
+                category = category.strip() or default_category
+                content = content.strip()
+            else:
+                category = default_category
+                content = line
+            
+            if content:
+                yield {
+                    'content': content,
+                    'category': category,
+                    'title': None,
+                    'tags': [],
+                }
+    
+    @staticmethod
+    def _iter_jsonl_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """逐行解析 JSONL 记录."""
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            # 无效的行记为失败行，不中断其余行的导入
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {PARSE_ERROR_KEY: f'第 {line_number} 行：JSON 解析失败: {str(e)}'}
+                continue
+            if not isinstance(item, dict):
+                yield {PARSE_ERROR_KEY: f'第 {line_number} 行：必须是对象'}
+                continue
+            
+            yield ImportExportService._normalize_record(item)
+    
+    @classmethod
+    def _iter_columnar_records(
+        cls,
+        stream: BinaryIO,
+        format: str,
+        batch_rows: int = ROW_BATCH_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """按 record batch 读取 Parquet / Arrow IPC 文件（需要 pyarrow）."""
+        try:
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError('导入 Parquet/Arrow 文件需要安装 pyarrow')
+        
+        if format == 'parquet':
+            batches = pyarrow.parquet.ParquetFile(stream).iter_batches(batch_size=batch_rows)
+        else:
+            reader = pyarrow.ipc.open_file(stream)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        
+        for record_batch in batches:
+            if 'content' not in record_batch.schema.names:
+                raise ValueError('文件必须包含 content 列')
+            for item in record_batch.to_pylist():
+                yield cls._normalize_record(item)
+    
+    @staticmethod
+    def _normalize_record(item: Dict[str, Any]) -> Dict[str, Any]:
+        """规范化 JSONL / 列式文件中的一条记录.
+        
+        tags 可以是列表或逗号分隔的字符串；可选的 vector、id、chunk_index、
+        start_offset、end_offset、heading_path、created_at 原样保留（用于写入预计算向量）。
+        """
+        tags = item.get('tags') or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        
+        record = {
+            'content': str(item.get('content') or ''),
+            'category': str(item.get('category') or '未分类'),
+            'title': item.get('title'),
+            'tags': list(tags),
+        }
+        for key in (
+            'vector', 'id', 'chunk_index', 'start_offset', 'end_offset', 'heading_path', 'created_at',
+        ):
+            if item.get(key) not in (None, ''):
+                record[key] = item[key]
+        return record
+    
+    @staticmethod
+    def _pdf_section_records(
+        pages: List[Tuple[int, str]],
+        default_category: str,
+    ) -> List[Dict[str, Any]]:
+        """按编号标题把 PDF 各页文本切分为小节条目.
+        
+        每个条目是一个最低层级的小节（从标题行到下一个标题行之前），
+        标题为各级标题组成的路径；第一个标题之前的内容单独成为一条。
+        
+        Returns:
+            小节条目列表，没有识别到标题时返回空列表
+        """
+        records: List[Dict[str, Any]] = []
+        stack: List[Tuple[int, str]] = []
+        lines: List[str] = []
+        first_page = pages[0][0] if pages else 1
+        found = False
+        has_body = False
+        
+        def flush(last_page: int) -> None:
+            nonlocal has_body
+            # 只有标题行的小节并入下一个小节
+            if not has_body:
+                return
+            pages_label = (
+                f'第 {first_page} 页' if first_page == last_page
+                else f'第 {first_page}-{last_page} 页'
+            )
+            records.append({
+                'content': '\n'.join(lines),
+                'category': default_category,
+                'title': ' > '.join(title for _, title in stack) or None,
+                'tags': [f'PDF {pages_label}'],
+            })
+            lines.clear()
+            has_body = False
+        
+        for page_num, text in pages:
+            for raw_line in text.splitlines():
+                line = raw_line.strip()
+                level = heading_level(line)
+                if level is not None:
+                    found = True
+                    flush(page_num)
+                    if not lines:
+                        first_page = page_num
+                    while stack and stack[-1][0] >= level:
+                        stack.pop()
+                    stack.append((level, line))
+                    lines.append(line)
+                elif line:
+                    if not lines:
+                        first_page = page_num
+                    lines.append(line)
+                    has_body = True
+        if pages:
+            flush(pages[-1][0])
+        return records if found else []
+    
+    @staticmethod
+    def _iter_markdown_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """逐行解析 Markdown 记录.
+        
+        支持格式：# 分类名称\n\n## 标题\n内容
+        """
+        current_category = '未分类'
+        current_title = None
+        current_content: List[str] = []
+        
+        def build_record() -> Dict[str, Any]:
+            return {
+                'content': '\n'.join(current_content).strip(),
+                'category': current_category,
+                'title': current_title,
+                'tags': [],
+            }
+        
+        for line in lines:
+            line = line.strip()
+            
+            # 一级标题 = 分类
+            if line.startswith('# ') and not line.startswith('##'):
+                # 保存上一条知识
+                if current_content:
+                    yield build_record()
+                
+                current_category = line[2:].strip()
+                current_title = None
+                current_content = []
+            
+            # 二级标题 = 知识标题
+            elif line.startswith('## '):
+                # 保存上一条知识
+                if current_content:
+                    yield build_record()
+                
+                current_title = line[3:].strip()
+                current_content = []
+            
+            # 内容
+            elif line:
+                current_content.append(line)
+        
+        # 保存最后一条知识
+        if current_content:
+            yield build_record()
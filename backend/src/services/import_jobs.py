@@ -0,0 +1,360 @@
+"""后台文件导入任务.
+
+大文件通过 ``/knowledge/import`` 在一个 HTTP 请求内导入时，代理容易超时，
+进程中断后也只能从头再来。导入任务的流程：
+- 上传文件先写入本地暂存目录，接口立即返回任务ID
+- 后台 worker 分批解析、向量化、写入，每批提交后记录检查点（最后提交的行号）
+- 进度（已解析/已向量化/已写入行数、速度、预计剩余时间）随时可查
+- 支持取消；取消、失败或服务重启后从检查点继续
+"""
+
+import asyncio
+import itertools
+import shutil
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional
+
+from ..config import settings
+from ..models.schemas import ImportResult
+from ..utils import logger
+from .import_export_service import ARCHIVE_FORMATS, ImportExportService, STREAM_CHUNK_SIZE
+from .job_store import JobStatus, JobStore, JobWorker
+
+
+IMPORT_JOB_KIND = 'import'
+
+# 进度中最多保留的失败行明细
+_MAX_PROGRESS_ERRORS = 100
+
+
+class ImportJobRunner(JobWorker):
+    """文件导入任务的后台执行器.
+
+    同一时间只执行一个导入任务，任务之间按提交顺序排队。
+    """
+
+    job_kind = IMPORT_JOB_KIND
+    name = '导入任务'
+
+    def __init__(
+        self,
+        job_store: JobStore,
+        import_service: ImportExportService,
+        knowledge_service_provider: Callable[[], Any],
+        spool_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        """初始化导入任务执行器.
+
+        Args:
+            job_store: 任务存储
+            import_service: 导入导出服务
+            knowledge_service_provider: 返回知识库服务实例的函数（首次执行任务时调用）
+            spool_dir: 上传文件暂存目录
+            batch_size: 每批写入的记录数（即检查点间隔）
+            poll_interval: 空闲时轮询间隔（秒）
+        """
+        super().__init__(job_store, poll_interval or settings.ingest_queue_poll_interval)
+        self.import_service = import_service
+        self.knowledge_service_provider = knowledge_service_provider
+        self.spool_dir = Path(spool_dir or settings.import_spool_dir)
+        self.batch_size = batch_size or settings.import_batch_size
+
+    def submit(
+        self,
+        stream: BinaryIO,
+        filename: str,
+        format: Optional[str] = None,
+        default_category: str = '未分类',
+    ) -> Dict[str, Any]:
+        """将上传文件写入暂存目录并创建导入任务.
+
+        Args:
+            stream: 上传文件的二进制流
+            filename: 文件名
+            format: 文件格式（可选，auto 表示自动检测）
+            default_category: 默认分类
+
+        Returns:
+            任务信息
+
+        Raises:
+            ValueError: 格式不支持或文件为空
+        """
+        if format is None or format == 'auto':
+            format = self.import_service.detect_file_format(filename)
+        if format in ARCHIVE_FORMATS:
+            raise ValueError('压缩包请通过 /knowledge/import 导入')
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        spool_path = self.spool_dir / f'{uuid.uuid4().hex}{Path(filename).suffix.lower()}'
+        with open(spool_path, 'wb') as spool:
+            shutil.copyfileobj(stream, spool, STREAM_CHUNK_SIZE)
+
+        file_size = spool_path.stat().st_size
+        if file_size == 0:
+            spool_path.unlink()
+            raise ValueError('文件内容为空')
+
+        job = self.job_store.create(IMPORT_JOB_KIND, {
+            'filename': filename,
+            'format': format,
+            'default_category': default_category,
+            'spool_path': str(spool_path),
+            'file_size': file_size,
+        })
+        self.notify()
+
+        logger.info(f'导入任务已创建 - 任务: {job["id"]}, 文件: {filename}, 大小: {file_size}')
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消导入任务.
+
+        排队中的任务立即取消；运行中的任务在当前批次提交后停止。
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务信息，不存在时返回 None
+
+        Raises:
+            ValueError: 任务已结束，无法取消
+        """
+        job = self.job_store.get(job_id)
+        if job is None or job['kind'] != IMPORT_JOB_KIND:
+            return None
+
+        if not (
+            self.job_store.transition(job_id, [JobStatus.QUEUED], JobStatus.CANCELLED)
+            or self.job_store.transition(job_id, [JobStatus.RUNNING], JobStatus.CANCELLING)
+        ):
+            job = self.job_store.get(job_id)
+            if job['status'] not in (JobStatus.CANCELLING, JobStatus.CANCELLED):
+                raise ValueError(f'任务已结束，无法取消: {job["status"]}')
+
+        return self.job_store.get(job_id)
+
+    def resume(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """从检查点继续已取消或失败的导入任务.
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务信息，不存在时返回 None
+
+        Raises:
+            ValueError: 任务状态不允许继续，或暂存文件已不存在
+        """
+        job = self.job_store.get(job_id)
+        if job is None or job['kind'] != IMPORT_JOB_KIND:
+            return None
+
+        if not Path(job['payload']['spool_path']).exists():
+            raise ValueError('暂存文件已不存在，无法继续')
+        if not self.job_store.transition(
+            job_id,
+            [JobStatus.CANCELLED, JobStatus.FAILED],
+            JobStatus.QUEUED,
+        ):
+            raise ValueError(f'任务状态不允许继续: {job["status"]}')
+
+        self.notify()
+        return self.job_store.get(job_id)
+
+    async def process_batch(self) -> int:
+        """领取并执行一个导入任务.
+
+        Returns:
+            本次处理的任务数
+        """
+        jobs = self.job_store.claim(IMPORT_JOB_KIND, 1)
+        if not jobs:
+            return 0
+
+        job = jobs[0]
+        try:
+            await self._run_job(job)
+        except asyncio.CancelledError:
+            # 服务关闭：任务保持运行中状态，重启后从检查点继续
+            raise
+        except Exception as e:
+            logger.error(f'导入任务失败 - 任务: {job["id"]}, 错误: {e}')
+            self.job_store.update(job['id'], JobStatus.FAILED, error=str(e))
+        return 1
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        """执行导入任务：跳过检查点之前的行，分批写入并记录进度."""
+        job_id = job['id']
+        payload = job['payload']
+        progress = {**self._initial_progress(payload), **(job['progress'] or {})}
+        checkpoint = progress['checkpoint_row']
+        if checkpoint:
+            logger.info(f'导入任务从检查点继续 - 任务: {job_id}, 已提交行: {checkpoint}')
+
+        service = await asyncio.to_thread(self.knowledge_service_provider)
+
+        with open(payload['spool_path'], 'rb') as stream:
+            records = await self._open_records(stream, payload, progress)
+
+            # 检查点之前的行已提交，只解析不写入
+            await asyncio.to_thread(
+                deque, itertools.islice(records, checkpoint), maxlen=0
+            )
+            progress['rows_parsed'] = checkpoint
+
+            started_at = time.monotonic()
+            start_offset = stream.tell()
+            start_row = checkpoint
+
+            async for batch in self.import_service.aiter_record_batches(records, self.batch_size):
+                first_row = progress['rows_parsed'] + 1
+                progress['rows_parsed'] += len(batch)
+                if not progress['preview']:
+                    self.import_service.extend_preview(progress['preview'], batch)
+                self.job_store.update(job_id, progress=progress)
+
+                batch_result = await self.import_service.import_batch(
+                    batch,
+                    first_row=first_row,
+                    knowledge_service=service,
+                    default_category=payload['default_category'],
+                )
+
+                # 向量化与插入在同一批次内完成并 flush，之后才推进检查点；
+                # 未变化的文档被跳过，重放已提交的批次不会产生重复数据
+                written = batch_result.inserted_count + batch_result.updated_count
+                progress['rows_embedded'] += written
+                progress['rows_inserted'] += batch_result.inserted_count
+                progress['rows_updated'] += batch_result.updated_count
+                progress['rows_skipped'] += batch_result.skipped_count
+                progress['rows_near_duplicate'] += batch_result.near_duplicate_count
+                progress['rows_failed'] += batch_result.failed_count
+                progress['errors'] = (
+                    progress['errors'] + [error.model_dump() for error in batch_result.errors]
+                )[:_MAX_PROGRESS_ERRORS]
+                progress['checkpoint_row'] = progress['rows_parsed']
+                self._update_rates(
+                    progress,
+                    elapsed=time.monotonic() - started_at,
+                    rows_done=progress['rows_parsed'] - start_row,
+                    bytes_done=stream.tell() - start_offset,
+                    bytes_read=stream.tell(),
+                )
+                self.job_store.update(job_id, progress=progress)
+
+                if self.job_store.get(job_id)['status'] == JobStatus.CANCELLING:
+                    self.job_store.update(job_id, JobStatus.CANCELLED, progress=progress)
+                    logger.info(
+                        f'导入任务已取消 - 任务: {job_id}, '
+                        f'已提交行: {progress["checkpoint_row"]}'
+                    )
+                    return
+
+        if progress['rows_parsed'] == 0:
+            raise ValueError('文件中没有有效的数据')
+
+        progress['eta_seconds'] = 0
+        result = ImportResult(
+            success_count=(
+                progress['rows_inserted'] + progress['rows_updated'] + progress['rows_skipped']
+            ),
+            failed_count=progress['rows_failed'],
+            total_count=progress['rows_parsed'],
+            inserted_count=progress['rows_inserted'],
+            updated_count=progress['rows_updated'],
+            skipped_count=progress['rows_skipped'],
+            near_duplicate_count=progress['rows_near_duplicate'],
+            errors=progress['errors'],
+            preview=progress['preview'],
+        )
+        self.job_store.update(
+            job_id,
+            JobStatus.SUCCEEDED,
+            result=result.model_dump(),
+            progress=progress,
+        )
+        Path(payload['spool_path']).unlink(missing_ok=True)
+
+        logger.info(
+            f'导入任务完成 - 任务: {job_id}, 文件: {payload["filename"]}, '
+            f'总数: {result.total_count}, 成功: {result.success_count}, '
+            f'失败: {result.failed_count}'
+        )
+
+    async def _open_records(
+        self,
+        stream: BinaryIO,
+        payload: Dict[str, Any],
+        progress: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        """打开暂存文件的记录迭代器（不支持流式的格式整体解析，并记录总行数）."""
+        format = payload['format']
+        if self.import_service.supports_streaming(format):
+            return self.import_service.iter_records(
+                stream,
+                format=format,
+                default_category=payload['default_category'],
+            )
+
+        records = await self.import_service.parse_file(
+            file_content=await asyncio.to_thread(stream.read),
+            filename=payload['filename'],
+            format=format,
+            default_category=payload['default_category'],
+        )
+        progress['total_rows'] = len(records)
+        return iter(records)
+
+    @staticmethod
+    def _initial_progress(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """新任务的初始进度."""
+        return {
+            'rows_parsed': 0,
+            'rows_embedded': 0,
+            'rows_inserted': 0,
+            'rows_updated': 0,
+            'rows_skipped': 0,
+            'rows_near_duplicate': 0,
+            'rows_failed': 0,
+            'checkpoint_row': 0,
+            'total_rows': None,
+            'bytes_read': 0,
+            'total_bytes': payload['file_size'],
+            'rows_per_second': None,
+            'eta_seconds': None,
+            'errors': [],
+            'preview': [],
+        }
+
+    @staticmethod
+    def _update_rates(
+        progress: Dict[str, Any],
+        elapsed: float,
+        rows_done: int,
+        bytes_done: int,
+        bytes_read: int,
+    ) -> None:
+        """按本次运行的处理速度计算行速率和预计剩余时间.
+
+        整体解析的格式按剩余行数估算；流式格式按剩余字节数估算。
+        """
+        progress['bytes_read'] = bytes_read
+        if elapsed <= 0 or rows_done <= 0:
+            return
+
+        rows_per_second = rows_done / elapsed
+        progress['rows_per_second'] = round(rows_per_second, 1)
+
+        if progress['total_rows'] is not None:
+            remaining = max(progress['total_rows'] - progress['rows_parsed'], 0)
+            progress['eta_seconds'] = round(remaining / rows_per_second, 1)
+        elif bytes_done > 0:
+            remaining = max(progress['total_bytes'] - bytes_read, 0)
+            progress['eta_seconds'] = round(remaining * elapsed / bytes_done, 1)
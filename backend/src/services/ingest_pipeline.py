@@ -0,0 +1,547 @@
+"""分阶段流水线写入.
+
+批量写入原来按“解析 → 向量化 → 插入”逐批串行执行，CPU 密集的向量化和
+Milvus 的网络 I/O 无法重叠。本模块把写入拆成六个阶段：
+
+    parse → validate → chunk（split_spans）→ dedupe → embed → insert
+
+阶段之间用有界 ``asyncio.Queue`` 连接，下游变慢时上游在 ``put`` 处等待（背压），
+驻留内存的批次数有上限；向量化和插入阶段可配置多个并发 worker。
+去重阶段用一次 ``in`` 查询判定每批文档是新增、未变化还是有变化（见 ``WriteAction``），
+未变化的文档不向量化也不写入，重复导入同一份语料几乎没有开销；新文档再批量查询
+近似重复索引（见 ``near_duplicate``），按 ``near_dup_mode`` 记录或丢弃近似重复的文档；
+之后按分块数重新组成向量化批次（``ingest_batch_size``）。整个流水线结束后只 flush 一次。
+
+每个阶段统计处理量、忙碌时间和队列深度，运行中和最近完成的流水线
+可通过 :func:`pipeline_metrics` 查看。
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config import settings
+from ..models.schemas import KnowledgeCreate
+from ..utils import logger
+from .knowledge_service import WriteAction
+
+
+# 保留的最近完成的流水线统计数
+RECENT_RUNS_LIMIT = 20
+
+_run_ids = itertools.count(1)
+_active_runs: Dict[int, 'IngestPipeline'] = {}
+_recent_runs: Deque[Dict[str, Any]] = deque(maxlen=RECENT_RUNS_LIMIT)
+
+# 阶段之间传递的单元：(引用, 数据)，引用由调用方提供（如行号），用于回报错误
+Item = Tuple[Any, Any]
+
+# 解析失败的行以只含该键（值为错误信息）的记录占位，校验阶段记为失败行
+PARSE_ERROR_KEY = '_parse_error'
+
+
+class StageMetrics:
+    """单个阶段的处理量、忙碌时间和输入队列深度."""
+
+    def __init__(self, name: str, workers: int = 1, queue: Optional[asyncio.Queue] = None):
+        """初始化统计.
+
+        Args:
+            name: 阶段名称
+            workers: 并发 worker 数
+            queue: 阶段的输入队列
+        """
+        self.name = name
+        self.workers = workers
+        self.queue = queue
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def record(self, items: int, seconds: float, errors: int = 0) -> None:
+        """累加一次处理的数量和耗时."""
+        self.items += items
+        self.errors += errors
+        self.busy_seconds += seconds
+
+    def observe_queue(self) -> None:
+        """记录输入队列的最大深度."""
+        if self.queue is not None:
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        """导出统计（吞吐量按流水线总耗时计算，利用率 = 忙碌时间 / (总耗时 × worker 数)）."""
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'items_per_second': round(self.items / elapsed, 1) if elapsed > 0 else 0.0,
+            'utilization': (
+                round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed > 0 else 0.0
+            ),
+            'queue_depth': self.queue.qsize() if self.queue is not None else None,
+            'max_queue_depth': self.max_queue_depth if self.queue is not None else None,
+            'queue_capacity': self.queue.maxsize if self.queue is not None else None,
+        }
+
+
+class PipelineResult:
+    """流水线写入结果."""
+
+    def __init__(self):
+        self.total = 0
+        self.chunks = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.near_duplicates = 0
+        self.doc_ids: Dict[Any, str] = {}
+        self.errors: List[Tuple[Any, str]] = []
+        self.stages: List[Dict[str, Any]] = []
+        self.seconds = 0.0
+
+    @property
+    def failed_count(self) -> int:
+        return len(self.errors)
+
+    @property
+    def success_count(self) -> int:
+        return self.total - len(self.errors)
+
+
+class IngestPipeline:
+    """分阶段并发写入流水线（每次 ``run`` 使用一个新实例）."""
+
+    def __init__(
+        self,
+        knowledge_service: Any,
+        default_category: str = '未分类',
+        name: str = 'ingest',
+        embed_batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        insert_workers: Optional[int] = None,
+    ):
+        """初始化流水线.
+
+        Args:
+            knowledge_service: 知识库服务
+            default_category: 记录缺少分类时使用的分类
+            name: 流水线名称（用于日志和统计）
+            embed_batch_size: 每个向量化批次的分块数
+            queue_size: 阶段之间的队列容量（批次数）
+            embed_workers: 向量化阶段并发数
+            insert_workers: 插入阶段并发数
+        """
+        self.knowledge_service = knowledge_service
+        self.default_category = default_category
+        self.name = name
+        self.embed_batch_size = embed_batch_size or settings.ingest_batch_size
+        self.queue_size = queue_size or settings.ingest_pipeline_queue_size
+        self.embed_workers = embed_workers or settings.ingest_pipeline_embed_workers
+        self.insert_workers = insert_workers or settings.ingest_pipeline_insert_workers
+        self.near_dup_mode = settings.near_dup_mode
+
+        self.run_id = next(_run_ids)
+        self.result = PipelineResult()
+        self.started_at: Optional[float] = None
+        # 去重判定：本次运行已出现的文档（按首个分块ID）、每个引用的写入方式、预计算分块的引用
+        self._seen_ids: Set[str] = set()
+        self._actions: Dict[Any, str] = {}
+        self._partial_refs: Set[Any] = set()
+        # 本次运行已接受、可能尚未写入索引的文档指纹分段，用于运行内的近似重复检测
+        self._near_dup_bands: Dict[int, List[Tuple[str, int]]] = {}
+        self._queues = {
+            stage: asyncio.Queue(maxsize=self.queue_size)
+            for stage in ('validate', 'chunk', 'dedupe', 'embed', 'insert')
+        }
+        self.stages = {
+            'parse': StageMetrics('parse'),
+            'validate': StageMetrics('validate', queue=self._queues['validate']),
+            'chunk': StageMetrics('chunk', queue=self._queues['chunk']),
+            'dedupe': StageMetrics('dedupe', queue=self._queues['dedupe']),
+            'embed': StageMetrics('embed', self.embed_workers, self._queues['embed']),
+            'insert': StageMetrics('insert', self.insert_workers, self._queues['insert']),
+        }
+
+    async def run(self, batches: AsyncIterator[List[Item]]) -> PipelineResult:
+        """运行流水线直到输入耗尽.
+
+        Args:
+            batches: 记录批次，每条为 (引用, 记录)；记录可以是字典或 ``KnowledgeCreate``，
+                带 ``vector`` 的字典跳过分块和向量化直接插入
+
+        Returns:
+            写入结果（错误按引用回报）
+
+        Raises:
+            Exception: 读取输入失败（如文件解析错误）时原样抛出
+        """
+        self.started_at = time.monotonic()
+        _active_runs[self.run_id] = self
+
+        embed_tasks = [asyncio.create_task(self._embed_worker()) for _ in range(self.embed_workers)]
+        insert_tasks = [asyncio.create_task(self._insert_worker()) for _ in range(self.insert_workers)]
+
+        async def close_embed() -> None:
+            await asyncio.gather(*embed_tasks)
+            for _ in insert_tasks:
+                await self._queues['insert'].put(None)
+
+        tasks = [
+            asyncio.create_task(self._parse(batches)),
+            asyncio.create_task(self._validate()),
+            asyncio.create_task(self._chunk()),
+            asyncio.create_task(self._dedupe()),
+            asyncio.create_task(close_embed()),
+            *embed_tasks,
+            *insert_tasks,
+        ]
+        try:
+            await asyncio.gather(*tasks)
+            if self.result.chunks:
+                await asyncio.to_thread(self.knowledge_service.flush)
+        finally:
+            for task in tasks:
+                task.cancel()
+            _active_runs.pop(self.run_id, None)
+            self.result.seconds = time.monotonic() - self.started_at
+            self.result.stages = self.metrics()['stages']
+            _recent_runs.append(self.metrics())
+
+        logger.info(
+            f'流水线写入完成 - {self.name}, 记录数: {self.result.total}, '
+            f'失败: {self.result.failed_count}, 分块数: {self.result.chunks}, '
+            f'耗时: {self.result.seconds:.2f}s'
+        )
+        return self.result
+
+    def metrics(self) -> Dict[str, Any]:
+        """当前统计（运行中也可调用）."""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'run_id': self.run_id,
+            'name': self.name,
+            'running': self.run_id in _active_runs,
+            'elapsed_seconds': round(elapsed, 2),
+            'records': self.result.total,
+            'failed': self.result.failed_count,
+            'chunks': self.result.chunks,
+            'inserted': self.result.inserted,
+            'updated': self.result.updated,
+            'skipped': self.result.skipped,
+            'near_duplicates': self.result.near_duplicates,
+            'stages': [stage.to_dict(elapsed) for stage in self.stages.values()],
+        }
+
+    async def _put(self, stage: str, item: Any) -> None:
+        """放入下一阶段的输入队列（队列满时等待，形成背压）."""
+        await self._queues[stage].put(item)
+        self.stages[stage].observe_queue()
+
+    async def _parse(self, batches: AsyncIterator[List[Item]]) -> None:
+        """解析阶段：从输入读取记录批次（读取耗时即解析耗时）."""
+        iterator = batches.__aiter__()
+        while True:
+            started = time.monotonic()
+            try:
+                batch = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            self.stages['parse'].record(len(batch), time.monotonic() - started)
+            self.result.total += len(batch)
+            if batch:
+                await self._put('validate', batch)
+        await self._put('validate', None)
+
+    async def _validate(self) -> None:
+        """校验阶段：构建 ``KnowledgeCreate``，带向量的记录跳过分块直接送往去重阶段."""
+        while True:
+            batch = await self._queues['validate'].get()
+            if batch is None:
+                break
+            started = time.monotonic()
+            plain: List[Item] = []
+            embedded: List[Item] = []
+            failed = 0
+            for ref, record in batch:
+                try:
+                    if isinstance(record, KnowledgeCreate):
+                        plain.append((ref, record))
+                        continue
+                    if record.get(PARSE_ERROR_KEY):
+                        raise ValueError(record[PARSE_ERROR_KEY])
+                    knowledge = KnowledgeCreate(
+                        content=record.get('content') or '',
+                        category=record.get('category') or self.default_category,
+                        title=record.get('title'),
+                        tags=record.get('tags', []),
+                    )
+                    if record.get('vector') is None:
+                        plain.append((ref, knowledge))
+                    else:
+                        embedded.append((ref, [self.knowledge_service.prepare_embedded_chunk({
+                            **record,
+                            'content': knowledge.content,
+                            'category': knowledge.category,
+                        })]))
+                except Exception as e:
+                    self.result.errors.append((ref, str(e)))
+                    failed += 1
+            self.stages['validate'].record(len(batch), time.monotonic() - started, failed)
+
+            if plain:
+                await self._put('chunk', plain)
+            if embedded:
+                await self._put('dedupe', (embedded, False))
+        await self._put('chunk', None)
+
+    async def _chunk(self) -> None:
+        """分块阶段：按句子边界分块（``split_spans``）."""
+        prepare = self.knowledge_service.prepare_document
+        while True:
+            batch = await self._queues['chunk'].get()
+            if batch is None:
+                break
+            started = time.monotonic()
+            documents = await asyncio.to_thread(
+                lambda: [(ref, prepare(knowledge)) for ref, knowledge in batch]
+            )
+            self.stages['chunk'].record(len(batch), time.monotonic() - started)
+            documents = [(ref, rows) for ref, rows in documents if rows]
+            if documents:
+                await self._put('dedupe', (documents, True))
+        await self._put('dedupe', None)
+
+    async def _dedupe(self) -> None:
+        """去重阶段：跳过未变化的文档，其余按分块数重新组成向量化批次.
+
+        预计算向量的分块不需要向量化，判定后直接送往插入阶段。
+        """
+        pending: List[Item] = []
+        pending_chunks = 0
+        while True:
+            item = await self._queues['dedupe'].get()
+            if item is None:
+                break
+            documents, complete = item
+            started = time.monotonic()
+
+            # 本次运行中重复出现的内容只写一次
+            unique: List[Item] = []
+            for ref, rows in documents:
+                if rows[0]['id'] in self._seen_ids:
+                    self._skip(ref, rows)
+                else:
+                    self._seen_ids.add(rows[0]['id'])
+                    unique.append((ref, rows))
+
+            try:
+                actions = await asyncio.to_thread(
+                    self.knowledge_service.classify_documents,
+                    [rows for _, rows in unique],
+                    complete,
+                )
+            except Exception as e:
+                # 查询失败时按主键覆盖写入，结果同样是幂等的
+                logger.warning(f'查询已有分块失败，改为覆盖写入: {e}')
+                actions = [WriteAction.UPDATE] * len(unique)
+
+            ready: List[Item] = []
+            for (ref, rows), action in zip(unique, actions):
+                if action == WriteAction.SKIP:
+                    self._skip(ref, rows)
+                    continue
+                self._actions[ref] = action
+                if not complete:
+                    self._partial_refs.add(ref)
+                ready.append((ref, rows))
+            if complete and ready:
+                ready = await self._near_duplicates(ready)
+            self.stages['dedupe'].record(len(documents), time.monotonic() - started)
+
+            if not complete:
+                if ready:
+                    await self._put('insert', ready)
+                continue
+            for ref, rows in ready:
+                pending.append((ref, rows))
+                pending_chunks += len(rows)
+                if pending_chunks >= self.embed_batch_size:
+                    await self._put('embed', pending)
+                    pending, pending_chunks = [], 0
+        if pending:
+            await self._put('embed', pending)
+        for _ in range(self.embed_workers):
+            await self._put('embed', None)
+
+    async def _near_duplicates(self, documents: List[Item]) -> List[Item]:
+        """近似重复检测：新文档与已有文档近似重复时记录（flag）或丢弃（drop）.
+
+        丢弃的文档计入跳过数，引用对应的文档ID为与之近似重复的已有文档。
+        """
+        index = self.knowledge_service.near_duplicates
+        candidates = [
+            (ref, rows) for ref, rows in documents if self._actions[ref] == WriteAction.INSERT
+        ]
+        if index is None or self.near_dup_mode == 'off' or not candidates:
+            return documents
+
+        try:
+            matches = await asyncio.to_thread(
+                self.knowledge_service.find_near_duplicates,
+                [rows for _, rows in candidates],
+                self._near_dup_bands,
+            )
+        except Exception as e:
+            logger.warning(f'近似重复检测失败，本批照常写入: {e}')
+            return documents
+
+        dropped: Set[Any] = set()
+        records = []
+        for (ref, rows), match in zip(candidates, matches):
+            if match is None:
+                continue
+            duplicate_of, distance = match
+            self.result.near_duplicates += 1
+            records.append({
+                'doc_id': self.knowledge_service.document_id(rows),
+                'duplicate_of': duplicate_of,
+                'distance': distance,
+                'action': self.near_dup_mode,
+                'category': rows[0]['category'],
+                'preview': rows[0]['content'][:100],
+                'source': self.name,
+            })
+            if self.near_dup_mode == 'drop':
+                dropped.add(ref)
+                self.result.skipped += 1
+                self.result.doc_ids[ref] = duplicate_of
+        if records:
+            await asyncio.to_thread(index.record_matches, records)
+        return [(ref, rows) for ref, rows in documents if ref not in dropped]
+
+    def _skip(self, ref: Any, rows: List[Dict[str, Any]]) -> None:
+        """记录未变化（或本次运行中重复）的文档."""
+        self.result.skipped += 1
+        self.result.doc_ids[ref] = rows[0]['id'].rsplit('_chunk_', 1)[0]
+
+    async def _embed_worker(self) -> None:
+        """向量化阶段：整批向量化，失败时逐个文档重试."""
+        while True:
+            documents = await self._queues['embed'].get()
+            if documents is None:
+                break
+            started = time.monotonic()
+            rows = [row for _, doc_rows in documents for row in doc_rows]
+            ready = documents
+            try:
+                await self.knowledge_service.embed_rows(rows)
+            except Exception as e:
+                logger.warning(f'批量向量化失败，改为逐条向量化: {e}')
+                ready = []
+                for ref, doc_rows in documents:
+                    try:
+                        await self.knowledge_service.embed_rows(doc_rows)
+                        ready.append((ref, doc_rows))
+                    except Exception as doc_error:
+                        self.result.errors.append((ref, str(doc_error)))
+            self.stages['embed'].record(
+                len(rows), time.monotonic() - started, len(documents) - len(ready)
+            )
+            if ready:
+                await self._put('insert', ready)
+
+    async def _insert_worker(self) -> None:
+        """插入阶段：新文档插入、有变化的文档覆盖写入（不 flush），失败时逐个文档重试."""
+        while True:
+            documents = await self._queues['insert'].get()
+            if documents is None:
+                break
+            started = time.monotonic()
+            rows = [row for _, doc_rows in documents for row in doc_rows]
+            written = documents
+            try:
+                await self._write(documents)
+            except Exception as e:
+                logger.warning(f'批量插入失败，改为逐条插入: {e}')
+                written = []
+                for ref, doc_rows in documents:
+                    try:
+                        await self._write([(ref, doc_rows)])
+                        written.append((ref, doc_rows))
+                    except Exception as doc_error:
+                        self.result.errors.append((ref, str(doc_error)))
+            for ref, doc_rows in written:
+                self.result.doc_ids[ref] = doc_rows[0]['id'].rsplit('_chunk_', 1)[0]
+                self.result.chunks += len(doc_rows)
+                if self._actions[ref] == WriteAction.UPDATE:
+                    self.result.updated += 1
+                else:
+                    self.result.inserted += 1
+            self.stages['insert'].record(
+                len(rows), time.monotonic() - started, len(documents) - len(written)
+            )
+
+    async def _write(self, documents: List[Item]) -> None:
+        """写入一批文档（同一批内全部是完整文档或全部是预计算分块）."""
+        await asyncio.to_thread(
+            self.knowledge_service.write_documents,
+            [rows for _, rows in documents],
+            [self._actions[ref] for ref, _ in documents],
+            documents[0][0] not in self._partial_refs,
+        )
+
+
+async def numbered(
+    record_batches: AsyncIterator[List[Any]],
+    first_row: int = 1,
+) -> AsyncIterator[List[Item]]:
+    """给记录批次编号（引用为行号）.
+
+    Args:
+        record_batches: 记录批次
+        first_row: 第一条记录的行号
+
+    Yields:
+        [(行号, 记录)]
+    """
+    row = first_row
+    async for batch in record_batches:
+        yield [(row + offset, record) for offset, record in enumerate(batch)]
+        row += len(batch)
+
+
+async def batched(
+    items: Iterable[Any],
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[List[Any]]:
+    """把内存中的记录按批次异步产出（用于已在内存中的列表）.
+
+    Args:
+        items: 记录
+        batch_size: 每批记录数
+
+    Yields:
+        记录批次
+    """
+    iterator = iter(items)
+    batch_size = batch_size or settings.import_batch_size
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def pipeline_metrics() -> Dict[str, List[Dict[str, Any]]]:
+    """运行中和最近完成的流水线统计."""
+    return {
+        'active': [pipeline.metrics() for pipeline in _active_runs.values()],
+        'recent': list(_recent_runs),
+    }
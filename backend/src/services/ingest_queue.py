@@ -0,0 +1,111 @@
+"""异步写入队列（Write-behind）.
+
+``POST /knowledge/add`` 不再在请求中完成分块、向量化、插入和 flush：
+接口校验后把任务写入本地持久化队列并立即返回任务ID，
+后台 worker 把排队的任务合并成批次，走批量向量化/插入路径。
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import settings
+from ..models.schemas import KnowledgeCreate
+from ..utils import logger
+from ..utils.helpers import generate_doc_id
+from .job_store import JobStatus, JobStore, JobWorker
+
+
+ADD_JOB_KIND = 'add'
+
+
+class IngestQueue(JobWorker):
+    """知识写入队列.
+
+    功能：
+    1. 接收写入请求并持久化（重启不丢失）
+    2. 后台合并批次写入知识库
+    3. 记录每个任务的执行状态
+    """
+
+    job_kind = ADD_JOB_KIND
+    name = '写入队列'
+
+    def __init__(
+        self,
+        job_store: JobStore,
+        knowledge_service_provider: Callable[[], Any],
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        """初始化写入队列.
+
+        Args:
+            job_store: 任务存储
+            knowledge_service_provider: 返回知识库服务实例的函数（首次处理任务时调用）
+            batch_size: 单次合并的最大任务数
+            poll_interval: 空闲时轮询间隔（秒）
+        """
+        super().__init__(job_store, poll_interval or settings.ingest_queue_poll_interval)
+        self.knowledge_service_provider = knowledge_service_provider
+        self.batch_size = batch_size or settings.ingest_queue_batch_size
+
+    def submit(self, knowledge: KnowledgeCreate) -> Dict[str, Any]:
+        """提交写入任务.
+
+        Args:
+            knowledge: 已校验的知识条目
+
+        Returns:
+            任务信息（包含预先计算的文档ID）
+        """
+        payload = knowledge.model_dump()
+        payload['doc_id'] = generate_doc_id(knowledge.content)
+        job = self.job_store.create(ADD_JOB_KIND, payload)
+        self.notify()
+        return job
+
+    async def process_batch(self) -> int:
+        """领取并处理一批任务.
+
+        Returns:
+            本次处理的任务数
+        """
+        jobs = self.job_store.claim(ADD_JOB_KIND, self.batch_size)
+        if not jobs:
+            return 0
+
+        service = await asyncio.to_thread(self.knowledge_service_provider)
+        knowledge_list = [self._to_knowledge(job) for job in jobs]
+
+        try:
+            doc_ids = await service.add_knowledge_batch(knowledge_list)
+            for job, doc_id in zip(jobs, doc_ids):
+                self.job_store.update(job['id'], JobStatus.SUCCEEDED, result={'doc_id': doc_id})
+        except Exception as e:
+            # 整批失败时逐条重试，隔离出有问题的任务
+            logger.warning(f'批量写入失败，改为逐条写入: {e}')
+            await self._process_individually(service, jobs, knowledge_list)
+
+        logger.info(f'写入队列处理完成 - 任务数: {len(jobs)}')
+        return len(jobs)
+
+    async def _process_individually(
+        self,
+        service: Any,
+        jobs: List[Dict[str, Any]],
+        knowledge_list: List[KnowledgeCreate],
+    ) -> None:
+        """逐条写入任务并分别记录结果."""
+        for job, knowledge in zip(jobs, knowledge_list):
+            try:
+                doc_id = await service.add_knowledge(knowledge)
+                self.job_store.update(job['id'], JobStatus.SUCCEEDED, result={'doc_id': doc_id})
+            except Exception as e:
+                self.job_store.update(job['id'], JobStatus.FAILED, error=str(e))
+
+    @staticmethod
+    def _to_knowledge(job: Dict[str, Any]) -> KnowledgeCreate:
+        """将任务负载还原为知识条目."""
+        payload = dict(job['payload'])
+        payload.pop('doc_id', None)
+        return KnowledgeCreate(**payload)
@@ -0,0 +1,524 @@
+"""后台任务持久化存储.
+
+异步写入队列、文件导入等后台任务的状态保存在本地 SQLite 文件中，
+服务重启后已接受但尚未完成的任务不会丢失。
+
+多个 worker 进程共用同一个文件：领取任务在写事务（``BEGIN IMMEDIATE``）中完成，
+同一任务只会被一个进程领取；运行中的任务记录所属进程和租约到期时间，
+所属进程定期续约，只有租约过期（进程已退出）的任务才会被重新排队或标记为失败。
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils import logger
+
+
+class JobStatus:
+    """任务状态常量."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLING = 'cancelling'
+    CANCELLED = 'cancelled'
+
+
+class JobStore:
+    """基于 SQLite 的任务存储.
+
+    每个任务包含：类型、状态、请求负载、执行进度、执行结果和错误信息，
+    运行中的任务还记录所属进程（``owner``）和租约到期时间（``lease_expires_at``）。
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        """打开（或创建）任务存储文件.
+
+        Args:
+            path: SQLite 文件路径
+            lease_seconds: 运行中任务的租约时长（秒），所属进程每隔三分之一租约续约一次
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                owner TEXT,
+                lease_expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_kind_status
+                ON jobs (kind, status, created_at);
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        ''')
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """为旧版本的任务文件补充新增的列."""
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        with self._conn:
+            if 'progress' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+            if 'owner' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+            if 'lease_expires_at' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN lease_expires_at REAL')
+
+    def create(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """创建排队中的任务.
+
+        Args:
+            kind: 任务类型（如 add）
+            payload: 任务负载（需可 JSON 序列化）
+
+        Returns:
+            任务信息
+        """
+        now = datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, kind, JobStatus.QUEUED, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务.
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务信息，不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def recent(self, kind: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """查询指定类型最近创建的任务（按创建时间倒序）.
+
+        Args:
+            kind: 任务类型
+            limit: 最多返回数量
+
+        Returns:
+            任务列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT ?',
+                (kind, limit),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def claim(self, kind: str, limit: int) -> List[Dict[str, Any]]:
+        """领取一批排队中的任务（按创建时间先后），并标记为本进程运行中.
+
+        查询和标记在同一个写事务中完成，多个进程同时领取时不会拿到同一任务。
+
+        Args:
+            kind: 任务类型
+            limit: 最多领取数量
+
+        Returns:
+            领取到的任务列表
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT * FROM jobs WHERE kind = ? AND status = ? '
+                    'ORDER BY created_at LIMIT ?',
+                    (kind, JobStatus.QUEUED, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE jobs SET status = ?, updated_at = ?, owner = ?, lease_expires_at = ? '
+                    'WHERE id = ?',
+                    [
+                        (JobStatus.RUNNING, now, self.owner, self._lease_deadline(), row['id'])
+                        for row in rows
+                    ],
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        jobs = [self._row_to_dict(row) for row in rows]
+        for job in jobs:
+            job['status'] = JobStatus.RUNNING
+            job['owner'] = self.owner
+        if jobs:
+            self._ensure_heartbeat()
+        return jobs
+
+    def update(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        progress: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """更新任务状态、进度、结果或错误信息.
+
+        Args:
+            job_id: 任务ID
+            status: 新状态
+            result: 执行结果
+            error: 错误信息
+            progress: 执行进度
+        """
+        assignments = ['updated_at = ?']
+        values: List[Any] = [datetime.now().isoformat()]
+        if status is not None:
+            assignments.append('status = ?')
+            values.append(status)
+        if status == JobStatus.RUNNING:
+            assignments.extend(['owner = ?', 'lease_expires_at = ?'])
+            values.extend([self.owner, self._lease_deadline()])
+        if progress is not None:
+            assignments.append('progress = ?')
+            values.append(json.dumps(progress, ensure_ascii=False))
+        if result is not None:
+            assignments.append('result = ?')
+            values.append(json.dumps(result, ensure_ascii=False))
+        if error is not None:
+            assignments.append('error = ?')
+            values.append(error)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'UPDATE jobs SET {", ".join(assignments)} WHERE id = ?',
+                (*values, job_id),
+            )
+        if status == JobStatus.RUNNING:
+            self._ensure_heartbeat()
+
+    def transition(
+        self,
+        job_id: str,
+        from_statuses: List[str],
+        to_status: str,
+    ) -> bool:
+        """仅当任务处于指定状态之一时切换状态（原子操作）.
+
+        Args:
+            job_id: 任务ID
+            from_statuses: 允许切换的当前状态
+            to_status: 目标状态
+
+        Returns:
+            是否切换成功
+        """
+        placeholders = ','.join('?' * len(from_statuses))
+        with self._lock, self._conn:
+            count = self._conn.execute(
+                f'UPDATE jobs SET status = ?, updated_at = ? '
+                f'WHERE id = ? AND status IN ({placeholders})',
+                (to_status, datetime.now().isoformat(), job_id, *from_statuses),
+            ).rowcount
+        return count > 0
+
+    def requeue_running(self, kind: str) -> int:
+        """将租约已过期（所属进程已退出）的运行中任务重新放回队列.
+
+        服务启动时和 worker 空闲时调用；其他进程仍在执行的任务不受影响。
+        中断前已请求取消的任务直接标记为已取消。
+
+        Args:
+            kind: 任务类型
+
+        Returns:
+            重新排队的任务数
+        """
+        now = datetime.now().isoformat()
+        expired = '(lease_expires_at IS NULL OR lease_expires_at < ?)'
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'UPDATE jobs SET status = ?, updated_at = ?, owner = NULL '
+                f'WHERE kind = ? AND status = ? AND {expired}',
+                (JobStatus.CANCELLED, now, kind, JobStatus.CANCELLING, time.time()),
+            )
+            count = self._conn.execute(
+                f'UPDATE jobs SET status = ?, updated_at = ?, owner = NULL '
+                f'WHERE kind = ? AND status = ? AND {expired}',
+                (JobStatus.QUEUED, now, kind, JobStatus.RUNNING, time.time()),
+            ).rowcount
+        if count:
+            logger.warning(f'{count} 个中断的 {kind} 任务已重新排队')
+        return count
+
+    def fail_running(self, kind: str, error: str) -> int:
+        """将租约已过期、无法续跑的任务标记为失败（服务启动时调用）.
+
+        排队中的任务由创建它的进程立即开始执行，超过一个租约仍在排队说明该进程已退出。
+
+        Args:
+            kind: 任务类型
+            error: 错误信息
+
+        Returns:
+            标记为失败的任务数
+        """
+        stale_before = (datetime.now() - timedelta(seconds=self.lease_seconds)).isoformat()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE kind = ? AND ('
+                '(status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)) '
+                'OR (status = ? AND updated_at < ?))',
+                (
+                    JobStatus.FAILED, error, datetime.now().isoformat(), kind,
+                    JobStatus.RUNNING, time.time(),
+                    JobStatus.QUEUED, stale_before,
+                ),
+            ).rowcount
+
+    def renew_leases(self) -> int:
+        """为本进程运行中的任务续约.
+
+        Returns:
+            续约的任务数
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status IN (?, ?)',
+                (self._lease_deadline(), self.owner, JobStatus.RUNNING, JobStatus.CANCELLING),
+            ).rowcount
+
+    def release_leases(self, kind: str) -> int:
+        """放弃本进程运行中任务的租约（服务正常关闭时调用，其他进程可立即接手）.
+
+        Args:
+            kind: 任务类型
+
+        Returns:
+            放弃租约的任务数
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'UPDATE jobs SET lease_expires_at = 0 WHERE kind = ? AND owner = ? AND status IN (?, ?)',
+                (kind, self.owner, JobStatus.RUNNING, JobStatus.CANCELLING),
+            ).rowcount
+
+    def acquire_lease(self, name: str, seconds: float) -> bool:
+        """获取（或延长本进程持有的）命名租约，用于多个进程间的互斥.
+
+        Args:
+            name: 租约名称
+            seconds: 租约时长（秒）
+
+        Returns:
+            是否由本进程持有；其他进程持有且未过期时返回 False
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, '
+                'expires_at = excluded.expires_at '
+                'WHERE leases.owner = excluded.owner OR leases.expires_at < ?',
+                (name, self.owner, now + seconds, now),
+            )
+            row = self._conn.execute(
+                'SELECT owner FROM leases WHERE name = ?', (name,)
+            ).fetchone()
+        return row['owner'] == self.owner
+
+    def release_lease(self, name: str) -> None:
+        """释放本进程持有的命名租约."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.owner)
+            )
+
+    def active_leases(self, prefix: str) -> List[str]:
+        """其他进程持有、尚未过期的命名租约.
+
+        Args:
+            prefix: 租约名称前缀
+
+        Returns:
+            租约名称列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT name FROM leases WHERE name LIKE ? AND owner != ? AND expires_at >= ?',
+                (f'{prefix}%', self.owner, time.time()),
+            ).fetchall()
+        return [row['name'] for row in rows]
+
+    def _lease_deadline(self) -> float:
+        """新的租约到期时间（Unix 时间戳）."""
+        return time.time() + self.lease_seconds
+
+    def _ensure_heartbeat(self) -> None:
+        """按需启动续约线程（不依赖事件循环，任务阻塞事件循环时租约也不会过期）."""
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(
+                target=self._renew_loop,
+                name='job-lease-heartbeat',
+                daemon=True,
+            )
+            self._heartbeat.start()
+
+    def _renew_loop(self) -> None:
+        """续约线程主循环."""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+            except Exception as e:
+                logger.warning(f'任务租约续约失败: {e}')
+
+    def count(self, kind: str, status: str) -> int:
+        """统计指定类型和状态的任务数."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = ?',
+                (kind, status),
+            ).fetchone()[0]
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        """将数据库行转换为任务信息字典."""
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+async def run_job_in_background(
+    job_store: JobStore,
+    job: Dict[str, Any],
+    func: Callable[[], Dict[str, Any]],
+) -> None:
+    """在线程中执行一次性的后台任务，并记录状态和结果.
+
+    Args:
+        job_store: 任务存储
+        job: 已创建的任务
+        func: 任务函数（同步执行，返回结果字典）
+    """
+    job_store.update(job['id'], JobStatus.RUNNING)
+    try:
+        result = await asyncio.to_thread(func)
+        job_store.update(job['id'], JobStatus.SUCCEEDED, result=result)
+    except Exception as e:
+        logger.error(f'{job["kind"]} 任务失败 - 任务: {job["id"]}, 错误: {e}')
+        job_store.update(job['id'], JobStatus.FAILED, error=str(e))
+
+
+class JobWorker(ABC):
+    """单一类型后台任务的 worker 基类.
+
+    负责启动/停止后台主循环：循环调用 ``process_batch``，
+    没有任务时等待 ``notify`` 唤醒或按间隔轮询。
+    """
+
+    job_kind: str = ''
+    name: str = '后台任务'
+
+    def __init__(self, job_store: JobStore, poll_interval: float):
+        """初始化 worker.
+
+        Args:
+            job_store: 任务存储
+            poll_interval: 空闲时轮询间隔（秒）
+        """
+        self.job_store = job_store
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """有新任务时唤醒后台 worker."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """启动后台 worker（并恢复已退出进程中断的任务）."""
+        if self._task is not None:
+            return
+        self.job_store.requeue_running(self.job_kind)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f'{self.name}已启动')
+
+    async def stop(self) -> None:
+        """停止后台 worker（未处理的任务保留在队列中）."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # 中断的任务交给其他进程或重启后的进程继续
+        self.job_store.release_leases(self.job_kind)
+        logger.info(f'{self.name}已停止')
+
+    async def _run(self) -> None:
+        """后台主循环：领取任务并处理，空闲时等待唤醒或轮询."""
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'{self.name}处理失败: {e}')
+                processed = 0
+
+            if processed == 0:
+                # 空闲时接手租约过期（所属进程已退出）的任务
+                try:
+                    if self.job_store.requeue_running(self.job_kind):
+                        continue
+                except Exception as e:
+                    logger.warning(f'{self.name}恢复中断任务失败: {e}')
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    @abstractmethod
+    async def process_batch(self) -> int:
+        """领取并处理一批任务，返回处理的任务数."""
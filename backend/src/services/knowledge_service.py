@@ -8,9 +8,15 @@
 - 单一职责
 """
 
+import asyncio
+import json
+import random
+import re
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Iterable, Iterator, Tuple
 
 from pymilvus import (
     connections,
@@ -20,12 +26,75 @@ from pymilvus import (
     DataType,
     utility,
 )
-from sentence_transformers import SentenceTransformer
 
 from ..config import settings
-from ..models.schemas import KnowledgeCreate, KnowledgeUpdate, KnowledgeSearchResult, KnowledgeDetail
+from ..models.schemas import (
+    KnowledgeCreate,
+    KnowledgeUpdate,
+    KnowledgeFilter,
+    KnowledgeSearchResult,
+    KnowledgeDetail,
+)
+from ..models.schemas.knowledge import DOC_ID_PATTERN
 from ..utils import logger, KnowledgeBaseError, VectorSearchError
-from ..utils.helpers import generate_doc_id, split_text
+from ..utils.helpers import generate_doc_id, merge_chunk_rows, split_sections, split_spans
+from .embedding_batcher import TokenAwareBatcher, report_overflow
+from .embedding_cache import open_embedding_cache
+from .content_codec import ContentCodec, compress
+from .document_store import DocumentStore, open_document_store
+from .embedding_scheduler import EmbeddingLane, EmbeddingScheduler
+from .near_duplicate import NearDuplicateIndex, open_near_duplicate_index
+
+if TYPE_CHECKING:
+    from .reindex_service import ShadowCollection
+
+
+# 旧集合可能没有的字段及写入时分块行缺少该字段（如旧快照、导入的预计算分块）使用的默认值：
+# 分块在文档原文中的位置（-1 表示未知，还原原文时按内容去重叠）、分块所在小节的标题路径、标签
+_FIELD_DEFAULTS = {'start_offset': -1, 'end_offset': -1, 'heading_path': '', 'tags': []}
+
+# 分块写入 Milvus 的时间（每次插入或覆盖写入时记录，增量快照据此导出变化的分块）；
+# 不属于分块内容，读取时只在快照和重建索引中返回
+UPDATED_AT_FIELD = 'updated_at'
+_COLUMN_DEFAULTS = {**_FIELD_DEFAULTS, UPDATED_AT_FIELD: ''}
+
+# 每个文档最多保存的标签数及单个标签的最大长度
+_MAX_TAGS = 32
+_MAX_TAG_LENGTH = 64
+
+# 标题路径的分隔符，以及路径的最大字符数（超出时保留靠后的部分）
+HEADING_SEPARATOR = ' > '
+_MAX_HEADING_PATH = 200
+
+# 按ID批量查询时每次查询的ID数（Milvus 单次查询的 offset + limit 不能超过 16384）
+_QUERY_ID_BATCH = 1000
+
+# 各索引类型的检索参数（未列出的类型使用 IVF 的参数）
+_SEARCH_PARAMS = {
+    'FLAT': {},
+    'IVF_FLAT': {'nprobe': 10},
+    'IVF_SQ8': {'nprobe': 10},
+    'IVF_PQ': {'nprobe': 10},
+    'HNSW': {'ef': 64},
+}
+
+# 集合描述中记录向量化模型（加载时检查与当前模型是否一致）
+_COLLECTION_DESCRIPTION = '企业知识库（向量化模型: {model}）'
+_DESCRIPTION_MODEL = re.compile(r'向量化模型: (.+)）$')
+
+
+class WriteAction:
+    """写入去重的判定结果.
+    
+    文档ID是内容的 md5，同一内容重复导入时分块ID相同：
+    - INSERT: 集合中不存在，直接插入
+    - SKIP: 分块内容、分类和标签都未变化，跳过向量化和写入
+    - UPDATE: 分块存在但有变化（分类不同、分块参数调整导致切分不同），覆盖写入并删除多余分块
+    """
+    
+    INSERT = 'insert'
+    SKIP = 'skip'
+    UPDATE = 'update'
 
 
 class KnowledgeService:
@@ -38,14 +107,61 @@ class KnowledgeService:
     4. 知识库持久化
     """
     
-    def __init__(self):
+    # 近似重复索引（禁用时为 None），随写入和删除同步维护
+    near_duplicates: Optional[NearDuplicateIndex] = None
+    
+    # 文档全文存储（content_storage=milvus 且没有旧文件时为 None）
+    docstore: Optional[DocumentStore] = None
+    
+    # 分块文本压缩编码器（读取时始终用于解压，content_storage=compressed 时用于写入）
+    content_codec: Optional[ContentCodec] = None
+    
+    # 在线重建索引期间的影子集合（未重建时为 None），写入和删除同步到影子集合
+    shadow: Optional['ShadowCollection'] = None
+    
+    # 向量化模型版本（在线重建索引更换模型后加一）；分块行的 ``model_version``
+    # 记录向量化时的版本，写入时版本已变化的分块按新模型重新向量化
+    model_version: int = 0
+    
+    # 最近一次检索或写入的时间（time.monotonic），维护任务据此判断是否处于低峰
+    last_activity: float = 0.0
+    
+    # 向量检索参数（随集合的索引类型确定）
+    search_params: Dict[str, Any] = {'metric_type': 'COSINE', 'params': _SEARCH_PARAMS['IVF_FLAT']}
+    
+    def __init__(self, embedding_model: Optional[Any] = None):
         """初始化知识库服务.
         
         创建Milvus连接和加载向量化模型。
+        
+        Args:
+            embedding_model: 可选的向量化模型实例（需兼容 SentenceTransformer
+                的 encode 接口，如并行向量化进程池）；为空时按配置加载
         """
         self._initialize_milvus()
-        self._initialize_embedding_model()
+        if embedding_model is not None:
+            self.embedding_model = embedding_model
+            self.vector_dim = embedding_model.get_sentence_embedding_dimension()
+        else:
+            self._initialize_embedding_model()
+        self._initialize_encoding()
         self._create_collection()
+        self.near_duplicates = open_near_duplicate_index(
+            settings.near_dup_index_path,
+            settings.near_dup_mode,
+            settings.near_dup_max_distance,
+            settings.near_dup_shingle_size,
+            settings.near_dup_min_length,
+        )
+        self.docstore = open_document_store(
+            settings.docstore_path,
+            settings.content_storage,
+            settings.docstore_compression,
+        )
+        self.content_codec = ContentCodec(
+            settings.content_dictionary_dir,
+            settings.content_compression,
+        )
         logger.info('知识库服务初始化完成（Milvus）')
     
     def _initialize_milvus(self) -> None:
@@ -79,11 +195,29 @@ class KnowledgeService:
                     raise KnowledgeBaseError(f'Milvus连接失败: {str(e)}')
     
     def _initialize_embedding_model(self) -> None:
-        """初始化文本向量化模型."""
+        """初始化文本向量化模型.
+        
+        配置了 ``embedding_server_socket`` 时连接共享的向量化 Sidecar，
+        不在本进程加载模型（也不导入 torch），worker 更轻量、启动更快。
+        """
         try:
-            self.embedding_model = SentenceTransformer(
-                settings.embedding_model
-            )
+            if settings.embedding_server_socket:
+                from .embedding_server import RemoteEmbeddingModel
+                
+                self.embedding_model = RemoteEmbeddingModel(
+                    settings.embedding_server_socket
+                )
+                if self.embedding_model.model_name != settings.embedding_model:
+                    logger.warning(
+                        f'Sidecar 模型 {self.embedding_model.model_name} '
+                        f'与配置 {settings.embedding_model} 不一致'
+                    )
+            else:
+                from sentence_transformers import SentenceTransformer
+                
+                self.embedding_model = SentenceTransformer(
+                    settings.embedding_model
+                )
             # 获取向量维度
             self.vector_dim = self.embedding_model.get_sentence_embedding_dimension()
             logger.info(
@@ -95,87 +229,255 @@ class KnowledgeService:
             logger.error(f'向量化模型加载失败: {e}')
             raise KnowledgeBaseError(f'模型加载失败: {str(e)}')
     
+    def _initialize_encoding(self) -> None:
+        """初始化向量化调度链路（分桶批处理、优先级调度、向量缓存）."""
+        self.embedding_batcher = TokenAwareBatcher(self.embedding_model)
+        self.embedding_scheduler = EmbeddingScheduler(self.embedding_batcher)
+        self.embedding_cache = open_embedding_cache(
+            settings.embedding_cache_path,
+            self.model_name,
+            settings.embedding_cache_max_entries,
+        )
+    
+    @property
+    def uses_docstore(self) -> bool:
+        """新写入的文档是否把全文保存在文档存储中（Milvus 分块行不保存文本）."""
+        return self.docstore is not None and settings.content_storage == 'docstore'
+    
+    @property
+    def model_name(self) -> str:
+        """当前向量化模型的名称."""
+        return getattr(self.embedding_model, 'model_name', None) or settings.embedding_model
+    
     def _create_collection(self) -> None:
-        """创建或获取Milvus集合."""
+        """创建或获取Milvus集合.
+        
+        服务通过别名 ``milvus_collection`` 读写集合，实际集合按版本命名（``{别名}_v{版本}``），
+        在线重建索引后切换别名即可原子替换。启用别名之前创建的同名集合仍直接使用。
+        """
         try:
-            collection_name = 'knowledge_base'
+            alias = settings.milvus_collection
             
             # 如果集合已存在，直接加载
-            if utility.has_collection(collection_name):
-                self.collection = Collection(collection_name)
+            if utility.has_collection(alias):
+                self.collection = Collection(alias)
                 self.collection.load()
+                self.search_params = self.index_search_params(self.collection)
+                self._check_collection_model()
                 logger.info(
-                    f'加载现有集合: {collection_name}, '
+                    f'加载现有集合: {alias}, '
                     f'文档数: {self.collection.num_entities}'
                 )
                 return
             
-            # 定义字段
-            fields = [
-                FieldSchema(
-                    name='id',
-                    dtype=DataType.VARCHAR,
-                    max_length=100,
-                    is_primary=True,
-                ),
-                FieldSchema(
-                    name='content',
-                    dtype=DataType.VARCHAR,
-                    max_length=65535,
-                ),
-                FieldSchema(
-                    name='vector',
-                    dtype=DataType.FLOAT_VECTOR,
-                    dim=self.vector_dim,
-                ),
-                FieldSchema(
-                    name='category',
-                    dtype=DataType.VARCHAR,
-                    max_length=100,
-                ),
-                FieldSchema(
-                    name='created_at',
-                    dtype=DataType.VARCHAR,
-                    max_length=50,
-                ),
-                FieldSchema(
-                    name='chunk_index',
-                    dtype=DataType.INT64,
-                ),
-            ]
-            
-            # 创建schema
-            schema = CollectionSchema(
-                fields=fields,
-                description='企业知识库（多模态支持）',
+            name = self.next_collection_name()
+            self.build_collection(
+                name,
+                vector_dim=self.vector_dim,
+                model_name=self.model_name,
+                index_type=settings.milvus_index_type,
+                index_params=settings.milvus_index_params,
             )
+            utility.create_alias(name, alias)
+            self.collection = Collection(alias)
+            self.search_params = self.index_search_params(self.collection)
             
-            # 创建集合
-            self.collection = Collection(
-                name=collection_name,
-                schema=schema,
-            )
-            
-            # 创建索引
-            index_params = {
-                'metric_type': 'COSINE',  # 余弦相似度
-                'index_type': 'IVF_FLAT',
-                'params': {'nlist': 128},
-            }
-            self.collection.create_index(
-                field_name='vector',
-                index_params=index_params,
-            )
-            
-            # 加载集合到内存
-            self.collection.load()
-            
-            logger.info(f'创建新集合: {collection_name}')
+            logger.info(f'创建新集合: {name}（别名: {alias}）')
             
         except Exception as e:
             logger.error(f'创建集合失败: {e}')
             raise KnowledgeBaseError(f'集合创建失败: {str(e)}')
     
+    @staticmethod
+    def build_collection(
+        name: str,
+        vector_dim: int,
+        model_name: str,
+        index_type: str,
+        index_params: Dict[str, Any],
+    ) -> Collection:
+        """创建集合、建立向量索引并加载到内存.
+        
+        Args:
+            name: 集合名称
+            vector_dim: 向量维度
+            model_name: 向量化模型名称（记录在集合描述中）
+            index_type: 向量索引类型
+            index_params: 向量索引参数
+            
+        Returns:
+            已加载的集合
+        """
+        # 定义字段
+        fields = [
+            FieldSchema(
+                name='id',
+                dtype=DataType.VARCHAR,
+                max_length=100,
+                is_primary=True,
+            ),
+            FieldSchema(
+                name='content',
+                dtype=DataType.VARCHAR,
+                max_length=65535,
+            ),
+            FieldSchema(
+                name='vector',
+                dtype=DataType.FLOAT_VECTOR,
+                dim=vector_dim,
+            ),
+            FieldSchema(
+                name='category',
+                dtype=DataType.VARCHAR,
+                max_length=100,
+            ),
+            FieldSchema(
+                name='created_at',
+                dtype=DataType.VARCHAR,
+                max_length=50,
+            ),
+            FieldSchema(
+                name='chunk_index',
+                dtype=DataType.INT64,
+            ),
+            FieldSchema(
+                name='start_offset',
+                dtype=DataType.INT64,
+            ),
+            FieldSchema(
+                name='end_offset',
+                dtype=DataType.INT64,
+            ),
+            FieldSchema(
+                name='heading_path',
+                dtype=DataType.VARCHAR,
+                max_length=1024,
+            ),
+            FieldSchema(
+                name='tags',
+                dtype=DataType.ARRAY,
+                element_type=DataType.VARCHAR,
+                max_capacity=_MAX_TAGS,
+                max_length=_MAX_TAG_LENGTH,
+            ),
+            FieldSchema(
+                name=UPDATED_AT_FIELD,
+                dtype=DataType.VARCHAR,
+                max_length=50,
+            ),
+        ]
+        
+        # 创建schema
+        schema = CollectionSchema(
+            fields=fields,
+            description=_COLLECTION_DESCRIPTION.format(model=model_name),
+        )
+        
+        # 创建集合
+        collection = Collection(
+            name=name,
+            schema=schema,
+        )
+        
+        # 创建索引（余弦相似度）
+        collection.create_index(
+            field_name='vector',
+            index_params={
+                'metric_type': 'COSINE',
+                'index_type': index_type,
+                'params': index_params,
+            },
+        )
+        
+        # 加载集合到内存
+        collection.load()
+        return collection
+    
+    @staticmethod
+    def next_collection_name() -> str:
+        """下一个版本的集合名称（``{别名}_v{版本}``）."""
+        alias = settings.milvus_collection
+        pattern = re.compile(rf'{re.escape(alias)}_v(\d+)$')
+        versions = [
+            int(match.group(1))
+            for match in map(pattern.match, utility.list_collections())
+            if match
+        ]
+        return f'{alias}_v{max(versions, default=0) + 1}'
+    
+    @staticmethod
+    def collection_behind_alias() -> Optional[str]:
+        """别名当前指向的集合（启用别名之前创建的同名集合返回 None）."""
+        for name in utility.list_collections():
+            if settings.milvus_collection in utility.list_aliases(name):
+                return name
+        return None
+    
+    @staticmethod
+    def index_search_params(collection: Collection) -> Dict[str, Any]:
+        """按集合的索引类型确定检索参数."""
+        index_type = collection.indexes[0].params.get('index_type') if collection.indexes else None
+        return {
+            'metric_type': 'COSINE',
+            'params': _SEARCH_PARAMS.get(index_type, _SEARCH_PARAMS['IVF_FLAT']),
+        }
+    
+    def _check_collection_model(self) -> None:
+        """检查集合的向量维度和记录的向量化模型是否与当前模型一致（不一致时记录错误）."""
+        for field in self.collection.schema.fields:
+            if field.name == 'vector' and field.params.get('dim') != self.vector_dim:
+                logger.error(
+                    f'集合向量维度 {field.params.get("dim")} 与当前模型维度 {self.vector_dim} 不一致，'
+                    f'请检查 EMBEDDING_MODEL 配置'
+                )
+        match = _DESCRIPTION_MODEL.search(self.collection.schema.description or '')
+        if match and match.group(1) != self.model_name:
+            logger.error(
+                f'集合由模型 {match.group(1)} 构建，当前模型为 {self.model_name}，'
+                f'请检查 EMBEDDING_MODEL 配置'
+            )
+    
+    def switch_collection(self, name: str, embedding_model: Optional[Any] = None) -> str:
+        """将别名切换到指定集合（在线重建索引的最后一步）.
+        
+        启用别名之前创建的同名集合先改名为 ``{别名}_v0`` 保留，再创建别名，
+        两步之间有短暂的不可用；之后的切换是原子的。调用方需持有影子集合的锁，
+        等待锁的写入在切换后按新模型检查向量（见 :meth:`insert_rows`）。
+        
+        Args:
+            name: 新集合名称
+            embedding_model: 新集合使用的向量化模型（为空表示模型不变）
+            
+        Returns:
+            切换前别名指向的集合名称（保留用于回滚）
+        """
+        alias = settings.milvus_collection
+        previous = self.collection_behind_alias()
+        if previous is None:
+            previous = f'{alias}_v0'
+            utility.rename_collection(alias, previous)
+            utility.create_alias(name, alias)
+        else:
+            utility.alter_alias(name, alias)
+        
+        if embedding_model is not None:
+            previous_scheduler = self.embedding_scheduler
+            previous_cache = self.embedding_cache
+            self.embedding_model = embedding_model
+            self.vector_dim = embedding_model.get_sentence_embedding_dimension()
+            self._initialize_encoding()
+            self.model_version += 1
+            # 旧调度器执行完已提交的任务后退出
+            previous_scheduler.close()
+            if previous_cache is not None:
+                previous_cache.close()
+        self.collection = Collection(alias)
+        self.search_params = self.index_search_params(self.collection)
+        self.shadow = None
+        
+        logger.info(f'集合别名已切换 - {alias}: {previous} -> {name}')
+        return previous
+    
     async def add_knowledge(
         self,
         knowledge: KnowledgeCreate,
@@ -195,23 +497,6 @@ class KnowledgeService:
             # 生成文档ID
             doc_id = generate_doc_id(knowledge.content)
             
-            # 文本分块（如果内容过长）
-            chunks = split_text(
-                knowledge.content,
-                chunk_size=settings.chunk_size,
-                chunk_overlap=settings.chunk_overlap,
-            )
-            
-            # 向量化（使用normalize确保向量归一化，优化相似度计算）
-            embeddings = self.embedding_model.encode(
-                chunks,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            ).tolist()
-            
-            # 准备数据
-            created_at = datetime.now().isoformat()
-            
             # 使用新的方法（支持 title 和 tags）
             return await self.add_knowledge_with_metadata(knowledge, doc_id)
             
@@ -241,60 +526,77 @@ class KnowledgeService:
         Raises:
             VectorSearchError: 检索失败时抛出
         """
+        self.last_activity = time.monotonic()
         try:
             # 向量化查询（使用normalize确保向量归一化，优化相似度计算）
-            query_embedding = self.embedding_model.encode(
-                query,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            ).tolist()
+            # 查询走交互通道，导入进行中也不会排在批量分块后面
+            model_version = self.model_version
+            query_embedding = (
+                await self._encode_async([query], lane=EmbeddingLane.INTERACTIVE)
+            )[0]
+            if self.model_version != model_version:
+                # 向量化期间更换了模型，按新模型重新向量化
+                query_embedding = (
+                    await self._encode_async([query], lane=EmbeddingLane.INTERACTIVE)
+                )[0]
             
             # 构建过滤表达式
             expr = None
             if category:
                 expr = f'category == "{category}"'
             
-            # 搜索参数
-            search_params = {
-                'metric_type': 'COSINE',
-                'params': {'nprobe': 10},
-            }
+            output_fields = ['content', 'category', 'created_at']
+            optional_fields = self.optional_fields()
+            with_heading = 'heading_path' in optional_fields
+            if with_heading:
+                output_fields.append('heading_path')
+            if self.docstore is not None and 'start_offset' in optional_fields:
+                output_fields.extend(['start_offset', 'end_offset'])
             
             # 执行检索
             results = self.collection.search(
                 data=[query_embedding],
                 anns_field='vector',
-                param=search_params,
+                param=self.search_params,
                 limit=top_k,
                 expr=expr,
-                output_fields=['content', 'category', 'created_at'],
+                output_fields=output_fields,
             )
             
             # 解析结果
-            search_results = []
-            
+            hits = []
             if results and len(results) > 0:
                 for hit in results[0]:
+                    # 获取entity数据
+                    row = {
+                        name: getattr(hit.entity, name)
+                        for name in output_fields if hasattr(hit.entity, name)
+                    }
+                    row['id'] = hit.id
                     # Milvus使用COSINE metric_type时，返回的是相似度(0-1)，不是距离
                     # 无需转换，直接使用
-                    score = hit.distance
-                    
-                    # 获取entity数据
-                    content = hit.entity.content if hasattr(hit.entity, 'content') else ''
-                    category = hit.entity.category if hasattr(hit.entity, 'category') else '未分类'
-                    created_at = hit.entity.created_at if hasattr(hit.entity, 'created_at') else ''
-                    
-                    search_results.append(
-                        KnowledgeSearchResult(
-                            content=content,
-                            category=category,
-                            score=round(max(0.0, score), 4),
-                            metadata={
-                                'created_at': created_at,
-                                'id': hit.id,
-                            },
-                        )
+                    hits.append((hit.distance, row))
+            
+            # 只对命中的分块解压文本；文本保存在文档存储中的分块一次批量取回
+            self.hydrate_rows([row for _, row in hits])
+            
+            search_results = []
+            for score, row in hits:
+                metadata = {
+                    'created_at': row.get('created_at', ''),
+                    'id': row['id'],
+                }
+                if with_heading and row.get('heading_path'):
+                    metadata['heading_path'] = row['heading_path']
+                
+                search_results.append(
+                    KnowledgeSearchResult(
+                        content=row.get('content', ''),
+                        category=row.get('category', '未分类'),
+                        score=round(max(0.0, score), 4),
+                        metadata=metadata,
                     )
+                )
             
             logger.info(
                 f'知识检索完成 - 查询: {query[:50]}..., '
@@ -323,8 +625,12 @@ class KnowledgeService:
             # 构建删除表达式（删除所有相关分块）
             expr = f'id like "{doc_id}%"'
             
-            self.collection.delete(expr)
+            self.delete_chunks(expr, [doc_id])
             self.collection.flush()
+            if self.near_duplicates is not None:
+                self.near_duplicates.remove([doc_id])
+            if self.docstore is not None:
+                self.docstore.delete([doc_id])
             
             logger.info(f'知识条目删除成功 - ID: {doc_id}')
             return True
@@ -333,6 +639,137 @@ class KnowledgeService:
             logger.error(f'删除知识条目失败: {e}')
             raise KnowledgeBaseError(f'删除失败: {str(e)}')
     
+    def filter_expression(self, knowledge_filter: KnowledgeFilter) -> str:
+        """将批量操作的筛选条件转换为 Milvus 过滤表达式（各条件之间为 and）.
+        
+        Args:
+            knowledge_filter: 筛选条件
+        
+        Returns:
+            过滤表达式
+        
+        Raises:
+            ValueError: 时间格式不正确，或按标签筛选但集合没有标签字段
+        """
+        conditions = []
+        if knowledge_filter.doc_ids:
+            # 文档ID经过格式校验（不含通配符），前缀匹配只会命中该文档的分块
+            for doc_id in knowledge_filter.doc_ids:
+                if not DOC_ID_PATTERN.fullmatch(doc_id):
+                    raise ValueError(f'文档ID格式不正确: {doc_id}')
+            conditions.append('(' + ' or '.join(
+                f'id like "{doc_id}_chunk_%"' for doc_id in knowledge_filter.doc_ids
+            ) + ')')
+        if knowledge_filter.category is not None:
+            conditions.append(f'category == {json.dumps(knowledge_filter.category, ensure_ascii=False)}')
+        if knowledge_filter.tag is not None:
+            if 'tags' not in self.optional_fields():
+                raise ValueError('当前集合没有标签字段，请先重建索引')
+            conditions.append(f'array_contains(tags, {json.dumps(knowledge_filter.tag, ensure_ascii=False)})')
+        # created_at 为 ISO 格式字符串，按字符串比较即按时间先后比较
+        for value, operator in (
+            (knowledge_filter.created_after, '>='),
+            (knowledge_filter.created_before, '<'),
+        ):
+            if value is None:
+                continue
+            try:
+                value = datetime.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError(f'时间格式不正确（应为 ISO 格式）: {value}')
+            conditions.append(f'created_at {operator} "{value}"')
+        return ' and '.join(conditions)
+    
+    async def bulk_delete(self, knowledge_filter: KnowledgeFilter) -> Dict[str, int]:
+        """按条件批量删除文档（一次表达式删除、一次 flush）.
+        
+        Args:
+            knowledge_filter: 筛选条件
+        
+        Returns:
+            删除的文档数、分块数
+        
+        Raises:
+            ValueError: 筛选条件无效
+            KnowledgeBaseError: 删除失败时抛出
+        """
+        expr = self.filter_expression(knowledge_filter)
+        try:
+            doc_ids = set()
+            chunks = 0
+            for batch in self.iter_chunks(expr, output_fields=['id']):
+                doc_ids.update(self.document_id([row]) for row in batch)
+                chunks += len(batch)
+            
+            if chunks:
+                self.delete_chunks(expr, sorted(doc_ids))
+                self.collection.flush()
+                if self.near_duplicates is not None:
+                    self.near_duplicates.remove(sorted(doc_ids))
+                if self.docstore is not None:
+                    self.docstore.delete(sorted(doc_ids))
+            
+            logger.info(f'批量删除完成 - 条件: {expr}, 文档数: {len(doc_ids)}, 分块数: {chunks}')
+            return {'documents': len(doc_ids), 'chunks': chunks}
+        
+        except Exception as e:
+            logger.error(f'批量删除失败: {e}')
+            raise KnowledgeBaseError(f'批量删除失败: {str(e)}')
+    
+    async def bulk_update(
+        self,
+        knowledge_filter: KnowledgeFilter,
+        category: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+    ) -> Dict[str, int]:
+        """按条件批量更新文档的分类和标签（分批 upsert、一次 flush）.
+        
+        内容和向量不变，不需要重新向量化；标题路径保留写入时的值，
+        之后更新内容或重建索引时按新分类重新生成。
+        
+        Args:
+            knowledge_filter: 筛选条件
+            category: 新的分类（为空表示不修改）
+            tags: 新的标签列表（为空表示不修改）
+        
+        Returns:
+            更新的文档数、分块数
+        
+        Raises:
+            ValueError: 筛选条件无效，或更新标签但集合没有标签字段
+            KnowledgeBaseError: 更新失败时抛出
+        """
+        expr = self.filter_expression(knowledge_filter)
+        if tags is not None:
+            if 'tags' not in self.optional_fields():
+                raise ValueError('当前集合没有标签字段，请先重建索引')
+            tags = self.normalize_tags(tags)
+        try:
+            doc_ids = set()
+            chunks = 0
+            # query iterator 按主键分页，已覆盖写入的分块不会被再次遍历
+            for batch in self.iter_chunks(expr, include_vectors=True):
+                for row in batch:
+                    if category is not None:
+                        row['category'] = category
+                    if tags is not None:
+                        row['tags'] = tags
+                self.insert_rows(batch, upsert=True)
+                doc_ids.update(self.document_id([row]) for row in batch)
+                chunks += len(batch)
+            
+            if chunks:
+                self.collection.flush()
+                if self.docstore is not None:
+                    self.docstore.update_many(sorted(doc_ids), category=category, tags=tags)
+            
+            logger.info(f'批量更新完成 - 条件: {expr}, 文档数: {len(doc_ids)}, 分块数: {chunks}')
+            return {'documents': len(doc_ids), 'chunks': chunks}
+        
+        except Exception as e:
+            logger.error(f'批量更新失败: {e}')
+            raise KnowledgeBaseError(f'批量更新失败: {str(e)}')
+    
     async def get_knowledge_count(self) -> int:
         """获取知识库条目总数（不包括分块）.
         
@@ -369,12 +806,16 @@ class KnowledgeService:
         """
         try:
             # 查询所有记录
+            output_fields = ['content', 'category', 'created_at', 'id']
+            if self.docstore is not None and 'start_offset' in self.optional_fields():
+                output_fields.extend(['start_offset', 'end_offset'])
             results = self.collection.query(
                 expr='chunk_index == 0',  # 只获取第一个分块（避免重复）
-                output_fields=['content', 'category', 'created_at', 'id'],
+                output_fields=output_fields,
                 limit=limit,
                 offset=offset,
             )
+            self.hydrate_rows(results)
             
             knowledge_list = []
             for result in results:
@@ -397,6 +838,55 @@ class KnowledgeService:
             logger.error(f'获取知识列表失败: {e}')
             return []
     
+    def iter_chunks(
+        self,
+        expr: str = '',
+        include_vectors: bool = False,
+        batch_size: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        include_updated_at: bool = False,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """按主键顺序遍历集合中的分块（query iterator，不受 offset 上限限制）.
+        
+        同一文档的分块ID共享 ``{doc_id}_chunk_`` 前缀，因此按主键遍历时是连续的。
+        
+        Args:
+            expr: 过滤表达式（为空表示全部）
+            include_vectors: 是否返回向量
+            batch_size: 每批分块数
+            output_fields: 返回的字段（为空表示全部标量字段）
+            include_updated_at: 是否同时返回写入时间（集合有该字段时）
+            
+        Yields:
+            分块批次
+        """
+        if output_fields is None:
+            output_fields = ['id', 'content', 'category', 'created_at', 'chunk_index']
+            output_fields.extend(self.optional_fields())
+            if include_updated_at and self.has_field(UPDATED_AT_FIELD):
+                output_fields.append(UPDATED_AT_FIELD)
+        else:
+            output_fields = list(output_fields)
+        if include_vectors:
+            output_fields.append('vector')
+        
+        iterator = self.collection.query_iterator(
+            batch_size=batch_size or settings.export_batch_size,
+            expr=expr,
+            output_fields=output_fields,
+        )
+        hydrate = 'content' in output_fields
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    return
+                if hydrate:
+                    self.hydrate_rows(batch)
+                yield batch
+        finally:
+            iterator.close()
+    
     async def get_knowledge_by_id(self, doc_id: str) -> Optional[KnowledgeDetail]:
         """根据文档ID获取知识详情.
         
@@ -411,7 +901,10 @@ class KnowledgeService:
             expr = f'id like "{doc_id}%"'
             results = self.collection.query(
                 expr=expr,
-                output_fields=['content', 'category', 'created_at', 'id', 'chunk_index'],
+                output_fields=[
+                    'content', 'category', 'created_at', 'id', 'chunk_index',
+                    *self.optional_fields(),
+                ],
                 limit=1000,  # 设置足够大的限制
             )
             
@@ -421,8 +914,12 @@ class KnowledgeService:
             # 按 chunk_index 排序
             results.sort(key=lambda x: x.get('chunk_index', 0))
             
-            # 合并所有分块内容
-            full_content = ''.join([r.get('content', '') for r in results])
+            # 合并所有分块内容（按分块位置精确去掉重叠），文本保存在文档存储中的分块先取回文本
+            self.hydrate_rows(results)
+            full_content = merge_chunk_rows(results, chunk_overlap=settings.chunk_overlap)
+            
+            # 标题、标签和元数据保存在文档存储中
+            document = self.docstore.get_many([doc_id]).get(doc_id) if self.docstore else None
             
             # 获取第一条记录的元数据
             first_result = results[0]
@@ -435,6 +932,7 @@ class KnowledgeService:
                     'chunk_index': r.get('chunk_index', 0),
                     'content': r.get('content', ''),
                     'id': r.get('id', ''),
+                    'heading_path': r.get('heading_path', ''),
                 }
                 for r in results
             ]
@@ -457,8 +955,18 @@ class KnowledgeService:
             except:
                 metadata = {}
             
+            if document is not None:
+                metadata = {
+                    **document['metadata'],
+                    'title': document['title'],
+                    'tags': document['tags'],
+                    'updated_at': document['updated_at'],
+                }
+            
             title = metadata.get('title') if isinstance(metadata, dict) else None
             tags = metadata.get('tags', []) if isinstance(metadata, dict) else []
+            if 'tags' in first_result:
+                tags = list(first_result['tags'])
             
             return KnowledgeDetail(
                 doc_id=doc_id,
@@ -513,93 +1021,26 @@ class KnowledgeService:
             new_metadata['tags'] = new_tags
             new_metadata['updated_at'] = datetime.now().isoformat()
             
-            # 如果内容发生变化，需要重新分块和向量化
-            if update_data.content is not None:
-                # 删除旧数据
-                await self.delete_knowledge(doc_id)
-                
-                # 重新添加（使用新的内容）
-                new_knowledge = KnowledgeCreate(
+            # 重新分块后按分块差异写入：只向量化变化的分块，未变化的分块复用原向量
+            rows = self.prepare_document(
+                KnowledgeCreate(
                     content=new_content,
                     category=new_category,
                     title=new_title,
                     tags=new_tags,
                     metadata=new_metadata,
-                )
-                await self.add_knowledge_with_metadata(new_knowledge, doc_id)
-            else:
-                # 只更新分类和元数据（不改变内容）
-                # 更新所有相关分块
-                expr = f'id like "{doc_id}%"'
-                results = self.collection.query(
-                    expr=expr,
-                    output_fields=['id'],
-                    limit=1000,
-                )
-                
-                if results:
-                    # 更新分类和元数据
-                    for result in results:
-                        entity_id = result.get('id')
-                        update_expr = f'id == "{entity_id}"'
-                        # Milvus 不支持直接更新，需要删除后重新插入
-                        # 这里简化为只更新分类和元数据字段
-                        # 注意：Milvus 不支持部分更新，所以我们需要重新插入
-                        # 但为了简化，我们先查询现有数据
-                        existing_chunks = self.collection.query(
-                            expr=expr,
-                            output_fields=['content', 'chunk_index'],
-                            limit=1000,
-                        )
-                        
-                        # 删除旧数据
-                        self.collection.delete(expr)
-                        self.collection.flush()
-                        
-                        # 重新插入（保持内容不变，只更新分类和元数据）
-                        chunks = split_text(
-                            existing.content,
-                            chunk_size=settings.chunk_size,
-                            chunk_overlap=settings.chunk_overlap,
-                        )
-                        
-                        embeddings = self.embedding_model.encode(
-                            chunks,
-                            normalize_embeddings=True,
-                            show_progress_bar=False,
-                        ).tolist()
-                        
-                        import json
-                        created_at = existing.created_at
-                        updated_at = datetime.now().isoformat()
-                        metadata_str = json.dumps(new_metadata)
-                        
-                        ids = [f'{doc_id}_chunk_{i}' for i in range(len(chunks))]
-                        contents = chunks
-                        vectors = embeddings
-                        categories = [new_category] * len(chunks)
-                        created_ats = [created_at] * len(chunks)
-                        chunk_indices = list(range(len(chunks)))
-                        
-                        # 注意：Milvus schema 中可能没有 metadata 字段
-                        # 我们需要将 metadata 存储在某个字段中，或者使用 content 字段的一部分
-                        # 这里简化处理，只更新 category
-                        entities = [
-                            ids,
-                            contents,
-                            vectors,
-                            categories,
-                            created_ats,
-                            chunk_indices,
-                        ]
-                        
-                        self.collection.insert(entities)
-                        self.collection.flush()
-                        
-                        logger.info(f'知识条目更新成功 - ID: {doc_id}（仅更新分类和元数据）')
-                        return True
-            
-            logger.info(f'知识条目更新成功 - ID: {doc_id}')
+                ),
+                doc_id,
+            )
+            for row in rows:
+                row['created_at'] = existing.created_at
+            stats = await self.rewrite_document(doc_id, rows)
+            
+            logger.info(
+                f'知识条目更新成功 - ID: {doc_id}, 分块数: {stats["chunks"]}, '
+                f'重新向量化: {stats["embedded"]}, 写入: {stats["upserted"]}, '
+                f'删除: {stats["deleted"]}'
+            )
             return True
             
         except KnowledgeBaseError:
@@ -627,66 +1068,1106 @@ class KnowledgeService:
             if doc_id is None:
                 doc_id = generate_doc_id(knowledge.content)
             
-            # 文本分块
-            chunks = split_text(
-                knowledge.content,
-                chunk_size=settings.chunk_size,
-                chunk_overlap=settings.chunk_overlap,
-            )
+            rows = self.prepare_document(knowledge, doc_id)
+            
+            # 内容和分类都未变化时跳过向量化
+            [action] = self.classify_documents([rows])
+            if action == WriteAction.SKIP:
+                logger.info(f'知识条目未变化，跳过写入 - ID: {doc_id}')
+                return doc_id
             
             # 向量化
-            embeddings = self.embedding_model.encode(
-                chunks,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            ).tolist()
-            
-            # 准备数据
-            created_at = datetime.now().isoformat()
-            import json
-            metadata_dict = knowledge.metadata or {}
-            if knowledge.title:
-                metadata_dict['title'] = knowledge.title
-            if knowledge.tags:
-                metadata_dict['tags'] = knowledge.tags
-            metadata_str = json.dumps(metadata_dict)
-            
-            ids = [f'{doc_id}_chunk_{i}' for i in range(len(chunks))]
-            contents = chunks
-            vectors = embeddings
-            categories = [knowledge.category] * len(chunks)
-            created_ats = [created_at] * len(chunks)
-            chunk_indices = list(range(len(chunks)))
-            
-            # 插入数据
-            entities = [
-                ids,
-                contents,
-                vectors,
-                categories,
-                created_ats,
-                chunk_indices,
-            ]
+            await self.embed_rows(rows)
             
-            self.collection.insert(entities)
+            self.write_documents([rows], [action])
             self.collection.flush()
             
-            logger.info(f'知识条目添加成功 - ID: {doc_id}, 分块数: {len(chunks)}')
+            logger.info(f'知识条目添加成功 - ID: {doc_id}, 分块数: {len(rows)}')
             return doc_id
             
         except Exception as e:
             logger.error(f'添加知识条目失败: {e}')
             raise KnowledgeBaseError(f'添加失败: {str(e)}')
     
+    async def add_knowledge_batch(
+        self,
+        knowledge_list: List[KnowledgeCreate],
+    ) -> List[str]:
+        """批量添加知识条目（一次向量化、一次插入、一次 flush）.
+        
+        Args:
+            knowledge_list: 知识条目列表
+            
+        Returns:
+            文档ID列表（与输入顺序一致）
+            
+        Raises:
+            KnowledgeBaseError: 添加失败时抛出
+        """
+        try:
+            doc_ids = []
+            documents = []
+            for knowledge in knowledge_list:
+                doc_id = generate_doc_id(knowledge.content)
+                doc_ids.append(doc_id)
+                documents.append(self.prepare_document(knowledge, doc_id))
+            
+            # 批内重复的内容只写一次，未变化的文档跳过
+            unique = list({rows[0]['id']: rows for rows in documents if rows}.values())
+            actions = self.classify_documents(unique)
+            pending = [
+                (rows, action) for rows, action in zip(unique, actions)
+                if action != WriteAction.SKIP
+            ]
+            rows = [row for doc_rows, _ in pending for row in doc_rows]
+            if not rows:
+                return doc_ids
+            
+            await self.embed_rows(rows)
+            
+            self.write_documents(
+                [doc_rows for doc_rows, _ in pending],
+                [action for _, action in pending],
+            )
+            self.collection.flush()
+            
+            logger.info(
+                f'批量添加知识成功 - 条目数: {len(doc_ids)}, '
+                f'写入: {len(pending)}, 分块数: {len(rows)}'
+            )
+            return doc_ids
+            
+        except Exception as e:
+            logger.error(f'批量添加知识失败: {e}')
+            raise KnowledgeBaseError(f'批量添加失败: {str(e)}')
+    
+    async def add_embedded_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+    ) -> List[str]:
+        """批量写入已带向量的分块（不分块、不向量化）.
+        
+        用于导入其他环境用同一向量化模型导出的数据。每条记录作为一个分块写入。
+        
+        Args:
+            chunks: 分块列表，包含 content、category、vector，
+                可选 id（默认按内容生成 ``{doc_id}_chunk_0``）、chunk_index、created_at
+            
+        Returns:
+            分块ID列表（与输入顺序一致）
+            
+        Raises:
+            KnowledgeBaseError: 向量维度不符或写入失败时抛出
+        """
+        try:
+            rows = [self.prepare_embedded_chunk(chunk) for chunk in chunks]
+            
+            if rows:
+                documents = [[row] for row in rows]
+                actions = self.classify_documents(documents, complete=False)
+                if any(action != WriteAction.SKIP for action in actions):
+                    self.write_documents(documents, actions, complete=False)
+                    self.collection.flush()
+            
+            logger.info(f'写入预计算向量分块成功 - 分块数: {len(rows)}')
+            return [row['id'] for row in rows]
+            
+        except Exception as e:
+            logger.error(f'写入预计算向量分块失败: {e}')
+            raise KnowledgeBaseError(f'写入预计算向量失败: {str(e)}')
+    
+    def bulk_ingest(
+        self,
+        knowledge_iter: Iterable[KnowledgeCreate],
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """大批量导入（流式分批向量化并批量写入 Milvus）.
+        
+        完整文档按 ``batch_size`` 个分块组成批次，与在线写入一样去重：本次运行中重复的内容
+        只写一次，未变化的文档跳过，有变化的文档覆盖写入（重复运行不会产生重复主键），
+        新文档按 ``near_dup_mode`` 做近似重复检测。当向量化模型是
+        :class:`ParallelEmbedder` 时，批次会分发到进程池并行推理，
+        结果按顺序写回，最后只 flush 一次。
+        
+        Args:
+            knowledge_iter: 知识条目迭代器（可为生成器）
+            batch_size: 每个向量化批次的分块数
+            
+        Returns:
+            导入统计（文档数、写入分块数、跳过文档数、近似重复数、耗时、吞吐量）
+        """
+        from .parallel_embedding import ParallelEmbedder, ThroughputMeter
+        
+        batch_size = batch_size or settings.ingest_batch_size
+        meter = ThroughputMeter('批量导入')
+        counts = {'documents': 0, 'skipped': 0, 'near_duplicates': 0}
+        seen_ids = set()
+        near_dup_bands: Dict[int, List[Tuple[str, int]]] = {}
+        
+        def classify(documents):
+            actions = self.classify_documents(documents)
+            pending = [
+                (rows, action) for rows, action in zip(documents, actions)
+                if action != WriteAction.SKIP
+            ]
+            counts['skipped'] += len(documents) - len(pending)
+            dropped = self._check_near_duplicates(
+                [rows for rows, action in pending if action == WriteAction.INSERT],
+                near_dup_bands,
+            )
+            counts['near_duplicates'] += dropped['matched']
+            counts['skipped'] += len(dropped['ids'])
+            pending = [
+                (rows, action) for rows, action in pending
+                if self.document_id(rows) not in dropped['ids']
+            ]
+            documents = [rows for rows, _ in pending]
+            rows = self.stamp_model_version([row for doc_rows in documents for row in doc_rows])
+            return documents, [action for _, action in pending], rows
+        
+        def iter_document_batches():
+            documents: List[List[Dict[str, Any]]] = []
+            chunk_count = 0
+            for knowledge in knowledge_iter:
+                counts['documents'] += 1
+                rows = self.prepare_document(knowledge)
+                # 本次运行中重复出现的内容只写一次
+                if not rows or rows[0]['id'] in seen_ids:
+                    counts['skipped'] += 1
+                    continue
+                seen_ids.add(rows[0]['id'])
+                documents.append(rows)
+                chunk_count += len(rows)
+                if chunk_count >= batch_size:
+                    batch = classify(documents)
+                    documents, chunk_count = [], 0
+                    if batch[0]:
+                        yield batch
+            if documents:
+                batch = classify(documents)
+                if batch[0]:
+                    yield batch
+        
+        document_batches = iter_document_batches()
+        
+        if isinstance(self.embedding_model, ParallelEmbedder):
+            # 向量化在进程池中并行，主进程只负责分块、查缓存和写入
+            pending_batches: deque = deque()
+            
+            def iter_texts():
+                for documents, actions, rows in document_batches:
+                    texts = [self.embedding_text(row) for row in rows]
+                    cached, missing = self._lookup_cache(texts)
+                    pending_batches.append((documents, actions, rows, texts, cached, missing))
+                    yield [texts[idx] for idx in missing]
+            
+            def merge_vectors(encoded):
+                documents, actions, rows, texts, cached, missing = pending_batches.popleft()
+                encoded = encoded.tolist()
+                if rows and rows[0]['model_version'] == self.model_version:
+                    self._store_cache([texts[idx] for idx in missing], encoded)
+                for idx, vector in zip(missing, encoded):
+                    cached[idx] = vector
+                return documents, actions, rows, cached
+            
+            vector_batches = self.embedding_model.encode_batches(iter_texts())
+            batches_with_vectors = (
+                merge_vectors(vectors) for vectors in vector_batches
+            )
+        else:
+            batches_with_vectors = (
+                (
+                    documents,
+                    actions,
+                    rows,
+                    self._encode(
+                        [self.embedding_text(row) for row in rows],
+                        labels=[row['id'] for row in rows],
+                    ),
+                )
+                for documents, actions, rows in document_batches
+            )
+        
+        try:
+            for documents, actions, rows, vectors in batches_with_vectors:
+                for row, vector in zip(rows, vectors):
+                    row['vector'] = vector
+                self.write_documents(documents, actions)
+                meter.add(len(rows))
+            
+            self.collection.flush()
+            
+        except Exception as e:
+            logger.error(f'批量导入失败: {e}')
+            raise KnowledgeBaseError(
+                f'批量导入失败: {str(e)}',
+                details={'inserted_chunks': meter.total},
+            )
+        
+        stats = {
+            'documents': counts['documents'],
+            'chunks': meter.total,
+            'skipped': counts['skipped'],
+            'near_duplicates': counts['near_duplicates'],
+            'seconds': round(meter.elapsed, 2),
+            'chunks_per_second': round(meter.rate, 1),
+        }
+        logger.info(
+            f'批量导入完成 - 文档数: {stats["documents"]}, 分块数: {stats["chunks"]}, '
+            f'跳过: {stats["skipped"]}, 近似重复: {stats["near_duplicates"]}, '
+            f'耗时: {stats["seconds"]}s, 吞吐量: {stats["chunks_per_second"]} chunks/s'
+        )
+        return stats
+    
+    def _check_near_duplicates(
+        self,
+        documents: List[List[Dict[str, Any]]],
+        pending: Dict[int, List[Tuple[str, int]]],
+    ) -> Dict[str, Any]:
+        """按 ``near_dup_mode`` 检测批量导入的新文档并记录近似重复.
+        
+        Args:
+            documents: 待插入的完整文档
+            pending: 本次运行已接受文档的分段表
+            
+        Returns:
+            近似重复数（``matched``）和需要丢弃的文档ID集合（``ids``）
+        """
+        result: Dict[str, Any] = {'matched': 0, 'ids': set()}
+        if self.near_duplicates is None or settings.near_dup_mode == 'off' or not documents:
+            return result
+        
+        try:
+            matches = self.find_near_duplicates(documents, pending)
+        except Exception as e:
+            logger.warning(f'近似重复检测失败，本批照常写入: {e}')
+            return result
+        
+        records = []
+        for rows, match in zip(documents, matches):
+            if match is None:
+                continue
+            duplicate_of, distance = match
+            doc_id = self.document_id(rows)
+            records.append({
+                'doc_id': doc_id,
+                'duplicate_of': duplicate_of,
+                'distance': distance,
+                'action': settings.near_dup_mode,
+                'category': rows[0]['category'],
+                'preview': rows[0]['content'][:100],
+                'source': 'bulk_ingest',
+            })
+            if settings.near_dup_mode == 'drop':
+                result['ids'].add(doc_id)
+        result['matched'] = len(records)
+        if records:
+            self.near_duplicates.record_matches(records)
+        return result
+    
+    async def _encode_async(
+        self,
+        texts: List[str],
+        labels: Optional[List[str]] = None,
+        lane: str = EmbeddingLane.BULK,
+    ) -> List[List[float]]:
+        """异步向量化（在线程中等待调度结果，不阻塞事件循环）.
+        
+        Args:
+            texts: 待向量化文本
+            labels: 文本标识（如分块ID），用于截断告警定位
+            lane: 调度通道
+            
+        Returns:
+            归一化后的向量列表
+        """
+        return await asyncio.to_thread(self._encode, texts, labels, lane)
+    
+    def _encode(
+        self,
+        texts: List[str],
+        labels: Optional[List[str]] = None,
+        lane: str = EmbeddingLane.BULK,
+    ) -> List[List[float]]:
+        """向量化文本（所有向量化调用的统一入口）.
+        
+        先查向量缓存；未命中的文本按 token 长度分桶、以 token 总量组批，
+        交给优先级调度器执行，结果保持输入顺序；超出模型窗口的文本会记录告警。
+        
+        Args:
+            texts: 待向量化文本
+            labels: 文本标识（如分块ID），用于截断告警定位
+            lane: 调度通道（交互查询或批量导入）
+            
+        Returns:
+            归一化后的向量列表
+        """
+        model_version = self.model_version
+        vectors, missing = self._lookup_cache(texts)
+        if not missing:
+            return vectors
+        
+        missing_texts = [texts[idx] for idx in missing]
+        plan = self.embedding_batcher.plan(missing_texts)
+        report_overflow(
+            plan,
+            [labels[idx] for idx in missing] if labels else None,
+            self.embedding_batcher.max_seq_length,
+        )
+        encoded = self.embedding_scheduler.submit(
+            missing_texts,
+            lane=lane,
+            plan=plan,
+        ).result().tolist()
+        if self.model_version == model_version:
+            # 向量化期间更换了模型时不写入（新缓存只保存新模型的向量）
+            self._store_cache(missing_texts, encoded)
+        
+        for idx, vector in zip(missing, encoded):
+            vectors[idx] = vector
+        return vectors
+    
+    def _lookup_cache(
+        self,
+        texts: List[str],
+    ) -> Tuple[List[Optional[List[float]]], List[int]]:
+        """查询向量缓存.
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            (按下标排列的向量，未命中为 None；未命中的下标列表)
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        if self.embedding_cache is not None:
+            try:
+                for idx, vector in self.embedding_cache.get_many(texts).items():
+                    vectors[idx] = vector
+            except Exception as e:
+                logger.warning(f'向量缓存查询失败: {e}')
+        
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        return vectors, missing
+    
+    def _store_cache(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """写入向量缓存（失败不影响主流程）."""
+        if self.embedding_cache is None or not texts:
+            return
+        try:
+            self.embedding_cache.put_many(texts, vectors)
+        except Exception as e:
+            logger.warning(f'向量缓存写入失败: {e}')
+    
+    def prepare_document(
+        self,
+        knowledge: KnowledgeCreate,
+        doc_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """将知识条目按小节分块并构建待插入的行（不含向量）.
+        
+        先按 Markdown 标题切分小节，分块不跨越小节；每个分块记录所在小节的标题路径
+        （有标题的条目以“分类 > 标题”开头），向量化时作为前缀。分块长度同时受
+        ``chunk_size`` 和模型窗口限制：WordPiece 每个 token 至少对应一个字符，
+        字符数不超过“窗口 - 2（特殊 token）- 前缀长度”即保证不会被截断。
+        
+        Args:
+            knowledge: 知识条目数据
+            doc_id: 文档ID（为空时根据内容生成）
+            
+        Returns:
+            分块行列表
+        """
+        if doc_id is None:
+            doc_id = generate_doc_id(knowledge.content)
+        
+        content = knowledge.content
+        tags = self.normalize_tags(knowledge.tags)
+        base_path = [knowledge.category, knowledge.title] if knowledge.title else []
+        window = self.embedding_batcher.max_seq_length
+        created_at = datetime.now().isoformat()
+        
+        rows = []
+        for section_start, section_end, headings in split_sections(content):
+            heading_path = self._heading_path(base_path + headings, window)
+            prefix_length = len(heading_path) + 1 if heading_path else 0
+            spans = split_spans(
+                content[section_start:section_end],
+                chunk_size=min(settings.chunk_size, window - 2 - prefix_length),
+                chunk_overlap=settings.chunk_overlap,
+            )
+            for start, end in spans:
+                rows.append({
+                    'id': f'{doc_id}_chunk_{len(rows)}',
+                    'content': content[section_start + start:section_start + end],
+                    'category': knowledge.category,
+                    'created_at': created_at,
+                    'chunk_index': len(rows),
+                    'start_offset': section_start + start,
+                    'end_offset': section_start + end,
+                    'heading_path': heading_path,
+                    'tags': tags,
+                    # 不写入 Milvus，保存到文档存储
+                    'title': knowledge.title,
+                    'metadata': knowledge.metadata,
+                })
+        return rows
+    
+    @staticmethod
+    def normalize_tags(tags: Optional[Iterable[Any]]) -> List[str]:
+        """去除空白和重复的标签，并按集合字段限制截断."""
+        normalized: List[str] = []
+        for tag in tags or []:
+            tag = str(tag).strip()[:_MAX_TAG_LENGTH]
+            if tag and tag not in normalized:
+                normalized.append(tag)
+        return normalized[:_MAX_TAGS]
+    
+    @staticmethod
+    def _heading_path(titles: List[str], window: int) -> str:
+        """拼接标题路径（过长时保留靠后的部分，最多占模型窗口的四分之一）."""
+        heading_path = HEADING_SEPARATOR.join(title for title in titles if title)
+        limit = min(_MAX_HEADING_PATH, window // 4)
+        if len(heading_path) > limit:
+            heading_path = '…' + heading_path[-(limit - 1):]
+        return heading_path
+    
+    @staticmethod
+    def embedding_text(row: Dict[str, Any]) -> str:
+        """分块向量化时的文本（标题路径作为前缀）."""
+        heading_path = row.get('heading_path')
+        return f'{heading_path}\n{row["content"]}' if heading_path else row['content']
+    
+    def prepare_embedded_chunk(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """将已带向量的分块构建为待插入的行.
+        
+        Args:
+            chunk: 分块，包含 content、category、vector，
+                可选 id（默认按内容生成 ``{doc_id}_chunk_0``）、chunk_index、created_at、
+                start_offset、end_offset、heading_path、tags
+            
+        Returns:
+            分块行
+            
+        Raises:
+            ValueError: 向量维度与当前模型不一致
+        """
+        vector = [float(value) for value in chunk['vector']]
+        if len(vector) != self.vector_dim:
+            raise ValueError(
+                f'向量维度不匹配: {len(vector)}，当前模型维度为 {self.vector_dim}'
+            )
+        return {
+            'id': chunk.get('id') or f'{generate_doc_id(chunk["content"])}_chunk_0',
+            'content': chunk['content'],
+            'category': chunk['category'],
+            'created_at': chunk.get('created_at') or datetime.now().isoformat(),
+            'chunk_index': int(chunk.get('chunk_index') or 0),
+            'start_offset': int(chunk.get('start_offset', -1)),
+            'end_offset': int(chunk.get('end_offset', -1)),
+            'heading_path': str(chunk.get('heading_path') or ''),
+            'tags': self.normalize_tags(chunk.get('tags')),
+            'vector': vector,
+        }
+    
+    async def embed_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """向量化分块行，向量写入每行的 ``vector`` 字段.
+        
+        Args:
+            rows: ``prepare_document`` 构建的分块行
+        """
+        self.stamp_model_version(rows)
+        vectors = await self._encode_async(
+            [self.embedding_text(row) for row in rows],
+            labels=[row['id'] for row in rows],
+        )
+        for row, vector in zip(rows, vectors):
+            row['vector'] = vector
+    
+    def stamp_model_version(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在向量化之前记录当前模型版本（写入时据此发现切换模型前生成的向量）."""
+        for row in rows:
+            row['model_version'] = self.model_version
+        return rows
+    
+    def classify_documents(
+        self,
+        documents: List[List[Dict[str, Any]]],
+        complete: bool = True,
+    ) -> List[str]:
+        """判定每个文档应插入、跳过还是覆盖写入（按ID分批 ``in`` 查询）.
+        
+        分块的内容、分类、标签和标题路径都未变化时跳过；``docstore`` 模式下完整文档的标题和
+        元数据只保存在文档存储中，也需与文档存储中的版本一致（一次批量读取）。
+        完整文档会同时查询最后一个分块之后的分块ID，存在说明旧版本切分出更多分块。
+        
+        Args:
+            documents: 每个文档的分块行
+            complete: 是否为完整文档（导入的单个预计算分块为 False）
+            
+        Returns:
+            与 ``documents`` 对应的 :class:`WriteAction`
+        """
+        probe_ids = []
+        for rows in documents:
+            probe_ids.extend(row['id'] for row in rows)
+            if complete:
+                probe_ids.append(self._next_chunk_id(rows))
+        if not probe_ids:
+            return []
+        
+        output_fields = ['id', 'content', 'category']
+        optional_fields = self.optional_fields()
+        for name in ('tags', 'heading_path'):
+            if name in optional_fields:
+                output_fields.append(name)
+        if self.docstore is not None and 'start_offset' in optional_fields:
+            output_fields.extend(['start_offset', 'end_offset'])
+        found_rows = []
+        for start in range(0, len(probe_ids), _QUERY_ID_BATCH):
+            batch_ids = probe_ids[start:start + _QUERY_ID_BATCH]
+            found_rows.extend(self.collection.query(
+                expr=f'id in {json.dumps(batch_ids, ensure_ascii=False)}',
+                output_fields=output_fields,
+                limit=len(batch_ids),
+            ))
+        self.hydrate_rows(found_rows)
+        existing = {row['id']: row for row in found_rows}
+        
+        actions = []
+        for rows in documents:
+            found = [existing.get(row['id']) for row in rows]
+            if not any(found):
+                actions.append(WriteAction.INSERT)
+            elif (
+                all(
+                    old is not None
+                    and old['content'] == row['content']
+                    and old['category'] == row['category']
+                    and list(old.get('tags', row.get('tags', []))) == row.get('tags', [])
+                    and old.get('heading_path', row.get('heading_path', '')) == row.get('heading_path', '')
+                    for old, row in zip(found, rows)
+                )
+                and not (complete and self._next_chunk_id(rows) in existing)
+            ):
+                actions.append(WriteAction.SKIP)
+            else:
+                actions.append(WriteAction.UPDATE)
+        
+        if complete and self.uses_docstore:
+            skipped = [
+                self.document_id(rows)
+                for rows, action in zip(documents, actions) if action == WriteAction.SKIP
+            ]
+            stored = self.docstore.get_many(skipped) if skipped else {}
+            for idx, rows in enumerate(documents):
+                if actions[idx] != WriteAction.SKIP:
+                    continue
+                document = stored.get(self.document_id(rows))
+                if (
+                    document is None
+                    or document['title'] != rows[0].get('title')
+                    or document['metadata'] != (rows[0].get('metadata') or {})
+                ):
+                    actions[idx] = WriteAction.UPDATE
+        return actions
+    
+    def write_documents(
+        self,
+        documents: List[List[Dict[str, Any]]],
+        actions: List[str],
+        complete: bool = True,
+    ) -> None:
+        """按判定结果写入已带向量的文档（不 flush）.
+        
+        新文档插入；有变化的文档按主键覆盖写入，完整文档还会删除旧版本多出的分块，
+        并更新近似重复索引中的指纹。
+        
+        Args:
+            documents: 每个文档的分块行（含向量）
+            actions: 与 ``documents`` 对应的 :class:`WriteAction`
+            complete: 是否为完整文档
+        """
+        new_rows = []
+        changed = []
+        for rows, action in zip(documents, actions):
+            if action == WriteAction.INSERT:
+                new_rows.extend(rows)
+            elif action == WriteAction.UPDATE:
+                changed.append(rows)
+        
+        if complete:
+            self.store_documents([
+                rows for rows, action in zip(documents, actions) if action != WriteAction.SKIP
+            ])
+        if new_rows:
+            self.insert_rows(new_rows)
+        if changed:
+            self.insert_rows([row for rows in changed for row in rows], upsert=True)
+            if complete:
+                for rows in changed:
+                    doc_id = self.document_id(rows)
+                    self.delete_chunks(
+                        f'id like "{doc_id}_chunk_%" and chunk_index >= {len(rows)}',
+                        [doc_id],
+                    )
+        
+        if complete and self.near_duplicates is not None:
+            written = [
+                rows for rows, action in zip(documents, actions) if action != WriteAction.SKIP
+            ]
+            self.near_duplicates.add([
+                (self.document_id(rows), self.document_text(rows), rows[0]['category'])
+                for rows in written
+            ])
+    
+    async def rewrite_document(
+        self,
+        doc_id: str,
+        rows: List[Dict[str, Any]],
+    ) -> Dict[str, int]:
+        """按分块差异覆盖写入已有文档（更新内容或分类时使用）.
+        
+        按向量化文本（标题路径 + 分块内容）的哈希比对新旧分块：哈希相同的分块复用原向量，
+        只有新出现的分块需要向量化；与同一分块ID的旧行完全相同的分块不写入。
+        变化的分块一次 upsert，旧版本多出的分块一次删除，修改长文档的开销与改动量成正比。
+        
+        Args:
+            doc_id: 文档ID
+            rows: ``prepare_document`` 构建的新分块行（不含向量）
+            
+        Returns:
+            统计：分块数、重新向量化数、写入数、删除数
+        """
+        self.stamp_model_version(rows)
+        old_rows = [
+            row
+            for batch in self.iter_chunks(f'id like "{doc_id}_chunk_%"', include_vectors=True)
+            for row in batch
+        ]
+        vectors = {self.chunk_hash(row): row['vector'] for row in old_rows}
+        old_by_id = {row['id']: row for row in old_rows}
+        compared = ['content', 'category', 'chunk_index', *self.optional_fields()]
+        
+        missing = []
+        changed = []
+        for row in rows:
+            vector = vectors.get(self.chunk_hash(row))
+            if vector is None:
+                missing.append(row)
+            else:
+                row['vector'] = vector
+            old = old_by_id.get(row['id'])
+            if old is None or any(
+                old.get(name, _FIELD_DEFAULTS.get(name)) != row[name] for name in compared
+            ):
+                changed.append(row)
+        
+        if missing:
+            await self.embed_rows(missing)
+        self.store_documents([rows])
+        if changed:
+            self.insert_rows(changed, upsert=True)
+        deleted = max(len(old_rows) - len(rows), 0)
+        if deleted:
+            self.delete_chunks(
+                f'id like "{doc_id}_chunk_%" and chunk_index >= {len(rows)}',
+                [doc_id],
+            )
+        self.collection.flush()
+        
+        if self.near_duplicates is not None:
+            self.near_duplicates.add([
+                (doc_id, self.document_text(rows), rows[0]['category'])
+            ])
+        
+        return {
+            'chunks': len(rows),
+            'embedded': len(missing),
+            'upserted': len(changed),
+            'deleted': deleted,
+        }
+    
+    @classmethod
+    def chunk_hash(cls, row: Dict[str, Any]) -> str:
+        """分块向量化文本的哈希（相同则向量相同）."""
+        return generate_doc_id(cls.embedding_text(row))
+    
+    def find_near_duplicates(
+        self,
+        documents: List[List[Dict[str, Any]]],
+        pending: Optional[Dict[int, List[Tuple[str, int]]]] = None,
+    ) -> List[Optional[Tuple[str, int]]]:
+        """批量查找与已有文档近似重复的完整文档.
+        
+        Args:
+            documents: 每个文档的分块行
+            pending: 尚未写入的文档分段表（见 :meth:`NearDuplicateIndex.find_matches`）
+            
+        Returns:
+            与 ``documents`` 对应的 (最相近的文档ID, 汉明距离)，
+            无近似重复或未启用检测时为 None
+        """
+        if self.near_duplicates is None:
+            return [None] * len(documents)
+        return self.near_duplicates.find_matches(
+            [(self.document_id(rows), self.document_text(rows)) for rows in documents],
+            pending,
+        )
+    
+    def rebuild_near_duplicates(self) -> Dict[str, int]:
+        """为集合中的全部完整文档写入（或更新）近似重复索引指纹.
+        
+        用于启用检测前已有的文档，以及快照恢复后重建索引。
+        
+        Returns:
+            统计：遍历的文档数、写入的指纹数
+            
+        Raises:
+            ValueError: 未启用近似重复检测
+        """
+        if self.near_duplicates is None:
+            raise ValueError('近似重复检测未启用')
+        output_fields = ['id', 'content', 'category', 'chunk_index']
+        output_fields.extend(
+            name for name in ('start_offset', 'end_offset') if self.has_field(name)
+        )
+        stats = {'documents': 0, 'fingerprints': 0}
+        for _ in self.fingerprint_batches(self.iter_chunks(output_fields=output_fields), stats):
+            pass
+        logger.info(
+            f'近似重复索引重建完成 - 文档数: {stats["documents"]}, 指纹数: {stats["fingerprints"]}'
+        )
+        return stats
+    
+    def fingerprint_batches(
+        self,
+        batches: Iterable[List[Dict[str, Any]]],
+        stats: Optional[Dict[str, int]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """原样产出 ``iter_chunks`` 的分块批次，同时按文档写入近似重复索引指纹.
+        
+        同一文档的分块按主键遍历时是连续的，跨批次的文档在其最后一个分块读到后写入。
+        导入的预计算分块（没有分块位置）不是完整文档，不写入指纹。
+        
+        Args:
+            batches: 按主键顺序的分块批次（需包含 id、content、category、chunk_index）
+            stats: 累计遍历的文档数（``documents``）和写入的指纹数（``fingerprints``）
+            
+        Yields:
+            分块批次
+        """
+        if self.near_duplicates is None:
+            yield from batches
+            return
+        stats = {'documents': 0, 'fingerprints': 0} if stats is None else stats
+        current: List[Dict[str, Any]] = []
+        for batch in batches:
+            documents = []
+            for row in batch:
+                if current and self.document_id([row]) != self.document_id(current):
+                    documents.append(current)
+                    current = []
+                current.append(row)
+            self._add_fingerprints(documents, stats)
+            yield batch
+        if current:
+            self._add_fingerprints([current], stats)
+    
+    def _add_fingerprints(
+        self,
+        documents: List[List[Dict[str, Any]]],
+        stats: Dict[str, int],
+    ) -> None:
+        """将已有文档写入近似重复索引."""
+        entries = []
+        for rows in documents:
+            if any(row.get('start_offset', 0) < 0 for row in rows):
+                continue
+            rows = sorted(rows, key=lambda row: row['chunk_index'])
+            entries.append((self.document_id(rows), self.document_text(rows), rows[0]['category']))
+        stats['documents'] += len(entries)
+        if entries:
+            stats['fingerprints'] += self.near_duplicates.add(entries)
+    
+    @staticmethod
+    def document_id(rows: List[Dict[str, Any]]) -> str:
+        """分块行所属的文档ID."""
+        return rows[0]['id'].rsplit('_chunk_', 1)[0]
+    
+    @staticmethod
+    def document_text(rows: List[Dict[str, Any]]) -> str:
+        """由分块行还原文档原文."""
+        return merge_chunk_rows(rows, settings.chunk_overlap)
+    
+    def has_field(self, name: str) -> bool:
+        """当前集合是否有该字段（旧集合缺少后来新增的字段）."""
+        return any(field.name == name for field in self.collection.schema.fields)
+    
+    def optional_fields(self) -> List[str]:
+        """集合中存在的分块位置、标题路径、标签字段（旧集合为空）."""
+        names = {field.name for field in self.collection.schema.fields}
+        return [name for name in _FIELD_DEFAULTS if name in names]
+    
+    @staticmethod
+    def _next_chunk_id(rows: List[Dict[str, Any]]) -> str:
+        """文档最后一个分块之后的分块ID."""
+        doc_id = rows[0]['id'].rsplit('_chunk_', 1)[0]
+        return f'{doc_id}_chunk_{len(rows)}'
+    
+    def flush(self) -> None:
+        """将已插入的数据落盘（批量写入结束后调用一次）."""
+        self.collection.flush()
+    
+    def restore_rows(self, rows: List[Dict[str, Any]], flush: bool = False) -> None:
+        """按主键覆盖写入已带向量的分块行（用于快照恢复，重复恢复不会产生重复行）.
+        
+        Args:
+            rows: 包含全部字段的分块行
+            flush: 写入后是否 flush
+        """
+        if rows:
+            self.insert_rows(rows, upsert=True)
+        if flush:
+            self.collection.flush()
+    
+    def insert_rows(self, rows: List[Dict[str, Any]], upsert: bool = False) -> None:
+        """按集合字段顺序插入分块行（不 flush）.
+        
+        每行记录写入时间（``updated_at``），在线重建索引期间同时写入影子集合。
+        
+        切换集合与写入都持有影子集合的锁：切换前到达的写入同时写入新旧集合，
+        等锁期间完成切换的写入只写入新集合，切换模型前生成的向量按新模型重新向量化。
+        
+        Args:
+            rows: 包含向量的分块行
+            upsert: 是否按主键覆盖已有行
+        """
+        self.last_activity = time.monotonic()
+        updated_at = datetime.now().isoformat()
+        for row in rows:
+            row[UPDATED_AT_FIELD] = updated_at
+        shadow = self.shadow
+        if shadow is not None:
+            with shadow.lock:
+                if self.shadow is shadow:
+                    self._write_rows(rows, upsert)
+                    shadow.write(rows)
+                    return
+        self._write_rows(self.with_current_vectors(rows), upsert)
+    
+    def _write_rows(self, rows: List[Dict[str, Any]], upsert: bool) -> None:
+        """写入当前集合."""
+        entities = self.collection_entities(self.collection, rows)
+        if upsert:
+            self.collection.upsert(entities)
+        else:
+            self.collection.insert(entities)
+    
+    def with_current_vectors(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按当前模型重新向量化切换模型之前生成向量的分块."""
+        stale = [
+            row for row in rows
+            if row.get('model_version', self.model_version) != self.model_version
+        ]
+        if stale:
+            logger.warning(f'{len(stale)} 个分块在更换模型前向量化，按新模型重新向量化')
+            vectors = self._encode(
+                [self.embedding_text(row) for row in stale],
+                labels=[row['id'] for row in stale],
+            )
+            for row, vector in zip(stale, vectors):
+                row['vector'] = vector
+                row['model_version'] = self.model_version
+        return rows
+    
+    def delete_chunks(self, expr: str, doc_ids: List[str]) -> None:
+        """按表达式删除分块（不 flush），在线重建索引期间同时删除影子集合中的分块.
+        
+        Args:
+            expr: 删除表达式
+            doc_ids: 表达式涉及的文档ID
+        """
+        self.last_activity = time.monotonic()
+        shadow = self.shadow
+        if shadow is None:
+            self.collection.delete(expr)
+            return
+        with shadow.lock:
+            self.collection.delete(expr)
+            shadow.delete(expr, doc_ids)
+    
+    @staticmethod
+    def count_rows(collection: Collection) -> int:
+        """集合中的分块数（不含已删除的分块）."""
+        result = collection.query(expr='', output_fields=['count(*)'])
+        return int(result[0]['count(*)']) if result else 0
+    
+    def collection_entities(
+        self,
+        collection: Collection,
+        rows: List[Dict[str, Any]],
+    ) -> List[List[Any]]:
+        """按集合字段顺序构建列式数据（缺少的可选字段使用默认值）.
+        
+        文本已保存在文档存储中的分块，``content`` 列写入空字符串；
+        ``compressed`` 模式下写入压缩编码后的文本。
+        """
+        stored = self.stored_in_docstore(rows)
+        compressed = settings.content_storage == 'compressed' and self.content_codec is not None
+        columns = []
+        for name in (field.name for field in collection.schema.fields):
+            if name == 'content':
+                columns.append([
+                    '' if stored[idx]
+                    else self.content_codec.encode(row['content']) if compressed
+                    else row['content']
+                    for idx, row in enumerate(rows)
+                ])
+            else:
+                columns.append([row[name] if name in row else _COLUMN_DEFAULTS[name] for row in rows])
+        return columns
+    
+    def store_documents(self, documents: List[List[Dict[str, Any]]]) -> None:
+        """将完整文档的全文、标题、标签和元数据保存到文档存储（``docstore`` 模式）.
+        
+        需在分块写入 Milvus 之前调用；没有分块位置的文档（导入的预计算分块）不保存，
+        文本仍写入 Milvus。
+        
+        Args:
+            documents: 每个文档的分块行（``prepare_document`` 构建）
+        """
+        if not self.uses_docstore:
+            return
+        self.docstore.put_many([
+            {
+                'doc_id': self.document_id(rows),
+                'content': self.document_text(rows),
+                'category': rows[0]['category'],
+                'title': rows[0].get('title'),
+                'tags': rows[0].get('tags', []),
+                'metadata': rows[0].get('metadata'),
+                'created_at': rows[0]['created_at'],
+            }
+            for rows in documents
+            if rows and all(row.get('start_offset', -1) >= 0 for row in rows)
+        ])
+    
+    def stored_in_docstore(self, rows: List[Dict[str, Any]]) -> List[bool]:
+        """分块文本能否从文档存储中按位置取回（可以时 Milvus 中不保存文本）.
+        
+        按文档存储中的全文逐个核对分块，文档存储中是其他版本的文档时（如恢复旧快照）
+        文本仍写入 Milvus。
+        """
+        if not self.uses_docstore or not rows:
+            return [False] * len(rows)
+        documents = self.docstore.get_many([self.document_id([row]) for row in rows])
+        stored = []
+        for row in rows:
+            document = documents.get(self.document_id([row]))
+            start, end = row.get('start_offset', -1), row.get('end_offset', -1)
+            stored.append(
+                document is not None
+                and 0 <= start <= end
+                and document['content'][start:end] == row['content']
+            )
+        return stored
+    
+    def hydrate_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """还原从 Milvus 读取的分块文本：解压压缩编码的文本，
+        Milvus 中不保存文本的分块从文档存储取回（一次批量查询）.
+        
+        Args:
+            rows: 从 Milvus 读取的分块行（取回文本需包含 ``start_offset`` / ``end_offset``）
+        """
+        pending = []
+        for row in rows:
+            content = row.get('content')
+            if content and self.content_codec is not None and self.content_codec.is_encoded(content):
+                row['content'] = self.content_codec.decode(content)
+            elif not content and row.get('start_offset', -1) >= 0:
+                pending.append(row)
+        if self.docstore is None or not pending:
+            return
+        documents = self.docstore.get_many([self.document_id([row]) for row in pending])
+        for row in pending:
+            document = documents.get(self.document_id([row]))
+            if document is None:
+                logger.warning(f'文档存储中缺少分块文本 - ID: {row["id"]}')
+                continue
+            row['content'] = document['content'][row['start_offset']:row['end_offset']]
+    
+    def train_content_dictionary(self, sample_size: Optional[int] = None) -> Dict[str, Any]:
+        """抽样知识库中的分块文本训练压缩字典，之后写入的分块使用新字典压缩.
+        
+        已写入的分块仍按原字典解码，重建索引时会按新字典重新压缩。
+        
+        Args:
+            sample_size: 抽样分块数（为空使用配置）
+            
+        Returns:
+            训练结果（字典ID、样本数，以及样本在不使用/使用字典时的压缩后字节数）
+            
+        Raises:
+            ValueError: 未配置字典目录或知识库为空
+        """
+        if self.content_codec is None:
+            raise ValueError('分块文本编码器未初始化')
+        sample_size = sample_size or settings.content_dictionary_samples
+        
+        # 蓄水池抽样（文档存储中的分块由 iter_chunks 取回文本）
+        samples: List[str] = []
+        seen = 0
+        rng = random.Random()
+        for batch in self.iter_chunks():
+            for row in batch:
+                if not row['content']:
+                    continue
+                seen += 1
+                if len(samples) < sample_size:
+                    samples.append(row['content'])
+                else:
+                    slot = rng.randrange(seen)
+                    if slot < sample_size:
+                        samples[slot] = row['content']
+        
+        codec = self.content_codec
+        dictionary_id, dictionary_bytes = codec.train(samples, settings.content_dictionary_size)
+        raw = [sample.encode('utf-8') for sample in samples]
+        return {
+            'dictionary_id': dictionary_id,
+            'compression': codec.compression,
+            'chunks': seen,
+            'samples': len(samples),
+            'dictionary_bytes': dictionary_bytes,
+            'raw_bytes': sum(len(data) for data in raw),
+            'compressed_bytes': sum(len(compress(data, codec.compression)) for data in raw),
+            'dictionary_compressed_bytes': sum(
+                len(compress(data, codec.compression, codec.dictionary(dictionary_id)))
+                for data in raw
+            ),
+        }
+    
     async def clear_all(self) -> bool:
         """清空知识库（谨慎使用）.
         
         Returns:
             是否清空成功
         """
+        if self.shadow is not None:
+            raise KnowledgeBaseError('正在重建索引，无法清空知识库')
         try:
-            # 删除集合
-            utility.drop_collection('knowledge_base')
+            # 删除别名和集合
+            previous = self.collection_behind_alias()
+            if previous is None:
+                utility.drop_collection(settings.milvus_collection)
+            else:
+                utility.drop_alias(settings.milvus_collection)
+                utility.drop_collection(previous)
+            if self.near_duplicates is not None:
+                self.near_duplicates.clear()
+            if self.docstore is not None:
+                self.docstore.clear()
             
             # 重新创建
             self._create_collection()
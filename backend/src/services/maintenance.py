@@ -0,0 +1,349 @@
+"""集合维护调度（压实、补建索引、分段健康报告）.
+
+``update_knowledge`` / ``delete_knowledge`` 的删除和重新写入会在 Milvus 中留下大量小分段和
+已删除行，检索逐渐变慢。维护调度器在服务内定期检查分段状态，在低峰期自动执行：
+- 已删除行占比或小分段数超过阈值时压实（合并分段、清理已删除行）
+- 未建索引行占比超过阈值时 flush 封存增长分段并等待索引构建完成
+
+低峰期同时满足：处于配置的时间段内、最近一段时间没有检索和写入、没有运行中的写入流水线
+和重建索引任务。每次维护记录为 ``maintenance`` 类型的任务，可通过任务接口查询。
+
+多 worker 部署时每个进程都有调度器：各进程在每次检查时把自己的忙碌状态写入任务存储
+（命名租约），只要有一个进程忙碌就不自动维护；执行维护需先获取任务存储中的维护租约，
+同一时间只有一个进程执行。其他进程的忙碌状态最多滞后一个检查间隔。
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, time as clock_time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymilvus import utility
+
+from ..config import settings
+from ..utils import logger
+from .ingest_pipeline import pipeline_metrics
+from .job_store import JobStatus, JobStore
+
+
+MAINTENANCE_JOB_KIND = 'maintenance'
+MAINTENANCE_LEASE = 'maintenance'
+ACTIVITY_LEASE_PREFIX = 'activity:'
+
+COMPACT_ACTION = 'compact'
+INDEX_ACTION = 'index'
+
+
+def parse_window(window: str) -> Optional[Tuple[clock_time, clock_time]]:
+    """解析维护时间段（``HH:MM-HH:MM``，为空表示不限）.
+
+    Args:
+        window: 时间段配置
+
+    Returns:
+        (开始时间, 结束时间)，不限时为 None
+
+    Raises:
+        ValueError: 格式不正确
+    """
+    if not window or not window.strip():
+        return None
+    try:
+        start, end = (clock_time.fromisoformat(part.strip()) for part in window.split('-'))
+    except ValueError:
+        raise ValueError(f'维护时间段格式应为 HH:MM-HH:MM: {window}')
+    return start, end
+
+
+def in_window(window: Optional[Tuple[clock_time, clock_time]], now: datetime) -> bool:
+    """当前时间是否处于维护时间段内（结束早于开始表示跨零点）."""
+    if window is None:
+        return True
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+class MaintenanceScheduler:
+    """集合维护调度器.
+
+    后台循环按间隔检查，处于低峰期且分段状态超过阈值时执行维护；
+    也可通过接口立即执行。同一时间（所有进程中）只执行一次维护。
+    """
+
+    def __init__(
+        self,
+        knowledge_service_provider: Callable[[], Any],
+        job_store: JobStore,
+        check_interval: Optional[float] = None,
+        window: Optional[str] = None,
+    ):
+        """初始化维护调度器.
+
+        Args:
+            knowledge_service_provider: 返回知识库服务实例的函数
+            job_store: 任务存储（记录每次维护）
+            check_interval: 检查间隔（秒）
+            window: 允许自动维护的时间段（``HH:MM-HH:MM``）
+        """
+        self.knowledge_service_provider = knowledge_service_provider
+        self.job_store = job_store
+        self.check_interval = check_interval or settings.maintenance_check_interval
+        self.window = parse_window(settings.maintenance_window if window is None else window)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """启动后台检查循环."""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info('集合维护调度已启动')
+
+    async def stop(self) -> None:
+        """停止后台检查循环（执行中的维护在线程中继续完成）."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info('集合维护调度已停止')
+
+    @property
+    def running(self) -> bool:
+        """是否有维护在执行."""
+        return self._lock.locked()
+
+    async def _run(self) -> None:
+        """后台主循环：按间隔检查，需要时在线程中执行维护."""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                # 查询任务存储和 Milvus 都是阻塞调用，放在线程中执行
+                reason = await asyncio.to_thread(self.check, datetime.now())
+                if reason is None:
+                    continue
+                logger.info(f'开始自动维护 - 原因: {reason}')
+                job = self.job_store.create(MAINTENANCE_JOB_KIND, {'trigger': 'auto', 'reason': reason})
+                await asyncio.to_thread(self.run_job, job, False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'集合维护检查失败: {e}')
+
+    def check(self, now: datetime) -> Optional[str]:
+        """记录本进程的忙碌状态，并判断当前是否应自动维护."""
+        self.publish_activity(self.knowledge_service_provider())
+        return self.due(now)
+
+    def publish_activity(self, service: Any) -> None:
+        """本进程忙碌时在任务存储中记录，直到本进程按当前状态应转为空闲.
+
+        写入流水线或重建索引进行中时按两个检查间隔记录，下次检查时续期。
+        """
+        remaining = settings.maintenance_idle_seconds - (time.monotonic() - service.last_activity)
+        if remaining <= 0 and self.is_idle(service):
+            return
+        self.job_store.acquire_lease(
+            f'{ACTIVITY_LEASE_PREFIX}{self.job_store.owner}',
+            max(remaining, self.check_interval * 2),
+        )
+
+    def due(self, now: datetime) -> Optional[str]:
+        """判断当前是否应自动维护.
+
+        Args:
+            now: 当前时间
+
+        Returns:
+            需要维护的原因，不需要时返回 None
+        """
+        if self.running or not in_window(self.window, now):
+            return None
+
+        # 与上一次维护（无论成败）间隔过短时不再执行，避免失败后反复重试
+        last = self.job_store.recent(MAINTENANCE_JOB_KIND, limit=1)
+        if last and (now - datetime.fromisoformat(last[0]['updated_at'])).total_seconds() < (
+            settings.maintenance_min_interval
+        ):
+            return None
+
+        service = self.knowledge_service_provider()
+        if not self.is_idle(service) or self.job_store.active_leases(ACTIVITY_LEASE_PREFIX):
+            return None
+
+        reasons = self.reasons(self.segment_health(service))
+        return '、'.join(reasons) if reasons else None
+
+    @staticmethod
+    def is_idle(service: Any) -> bool:
+        """是否处于低峰（最近没有检索和写入，没有运行中的写入流水线和重建索引）."""
+        return (
+            time.monotonic() - service.last_activity >= settings.maintenance_idle_seconds
+            and service.shadow is None
+            and not pipeline_metrics()['active']
+        )
+
+    @staticmethod
+    def reasons(health: Dict[str, Any]) -> List[str]:
+        """分段状态超过的阈值."""
+        reasons = []
+        if health['deleted_ratio'] > settings.maintenance_deleted_ratio:
+            reasons.append(f'已删除行占比 {health["deleted_ratio"]}')
+        if health['small_segments'] > settings.maintenance_max_small_segments:
+            reasons.append(f'小分段 {health["small_segments"]} 个')
+        if health['unindexed_ratio'] > settings.maintenance_unindexed_ratio:
+            reasons.append(f'未建索引行占比 {health["unindexed_ratio"]}')
+        return reasons
+
+    @staticmethod
+    def segment_health(service: Any) -> Dict[str, Any]:
+        """统计集合的分段状态.
+
+        已删除行数按“分段行数合计 - 当前行数”估算（压实前已删除的行仍占用分段）。
+
+        Args:
+            service: 知识库服务
+
+        Returns:
+            分段数、小分段数、行数、已删除行占比、未建索引行占比
+        """
+        name = service.collection_behind_alias() or settings.milvus_collection
+        segments = utility.get_query_segment_info(name)
+        segment_rows = [segment.num_rows for segment in segments]
+        total_rows = sum(segment_rows)
+        live_rows = service.count_rows(service.collection)
+        deleted_rows = max(total_rows - live_rows, 0)
+
+        progress = utility.index_building_progress(name)
+        indexed_rows = progress.get('indexed_rows', 0)
+        index_total = progress.get('total_rows', 0)
+        unindexed_rows = max(index_total - indexed_rows, 0)
+
+        return {
+            'collection': name,
+            'segments': len(segments),
+            'small_segments': sum(
+                1 for rows in segment_rows if rows < settings.maintenance_small_segment_rows
+            ),
+            'segment_rows': total_rows,
+            'live_rows': live_rows,
+            'deleted_rows': deleted_rows,
+            'deleted_ratio': round(deleted_rows / total_rows, 4) if total_rows else 0.0,
+            'indexed_rows': indexed_rows,
+            'unindexed_rows': unindexed_rows,
+            'unindexed_ratio': round(unindexed_rows / index_total, 4) if index_total else 0.0,
+        }
+
+    def run_job(self, job: Dict[str, Any], force: bool) -> Optional[Dict[str, Any]]:
+        """执行一次维护并记录任务状态（同步执行）.
+
+        Args:
+            job: 已创建的维护任务
+            force: 是否忽略阈值，执行全部维护操作
+
+        Returns:
+            维护结果，已有维护在执行（包括其他进程）时返回 None（任务标记为失败）
+        """
+        if not self._lock.acquire(blocking=False):
+            self.job_store.update(job['id'], JobStatus.FAILED, error='已有维护在执行')
+            return None
+        # 压实和补建索引各自最多等待 maintenance_timeout
+        lease_seconds = settings.maintenance_timeout * 2 + self.check_interval
+        if not self.job_store.acquire_lease(MAINTENANCE_LEASE, lease_seconds):
+            self._lock.release()
+            self.job_store.update(job['id'], JobStatus.FAILED, error='其他进程正在执行维护')
+            return None
+        try:
+            self.job_store.update(job['id'], JobStatus.RUNNING)
+            result = self.maintain(self.knowledge_service_provider(), force)
+            self.job_store.update(job['id'], JobStatus.SUCCEEDED, result=result)
+            return result
+        except Exception as e:
+            logger.error(f'集合维护失败 - 任务: {job["id"]}, 错误: {e}')
+            self.job_store.update(job['id'], JobStatus.FAILED, error=str(e))
+            return None
+        finally:
+            self.job_store.release_lease(MAINTENANCE_LEASE)
+            self._lock.release()
+
+    def maintain(self, service: Any, force: bool = False) -> Dict[str, Any]:
+        """按分段状态压实和补建索引.
+
+        Args:
+            service: 知识库服务
+            force: 是否忽略阈值，执行全部维护操作
+
+        Returns:
+            执行的操作、维护前后的分段状态和耗时
+        """
+        started_at = time.monotonic()
+        before = self.segment_health(service)
+        actions = []
+
+        if (
+            force
+            or before['deleted_ratio'] > settings.maintenance_deleted_ratio
+            or before['small_segments'] > settings.maintenance_max_small_segments
+        ):
+            service.collection.compact()
+            service.collection.wait_for_compaction_completed(timeout=settings.maintenance_timeout)
+            actions.append(COMPACT_ACTION)
+
+        if force or before['unindexed_ratio'] > settings.maintenance_unindexed_ratio:
+            # 封存增长分段，索引节点为封存分段构建索引
+            service.collection.flush()
+            utility.wait_for_index_building_complete(
+                before['collection'],
+                timeout=settings.maintenance_timeout,
+            )
+            actions.append(INDEX_ACTION)
+
+        after = self.segment_health(service) if actions else before
+        duration = round(time.monotonic() - started_at, 2)
+        logger.info(
+            f'集合维护完成 - 操作: {actions or "无"}, 分段: {before["segments"]} -> {after["segments"]}, '
+            f'已删除行占比: {before["deleted_ratio"]} -> {after["deleted_ratio"]}, 耗时: {duration}s'
+        )
+        return {
+            'actions': actions,
+            'before': before,
+            'after': after,
+            'duration_seconds': duration,
+        }
+
+    def last_run(self, action: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """最近一次成功的维护（可按执行的操作筛选）."""
+        for job in self.job_store.recent(MAINTENANCE_JOB_KIND, limit=100):
+            if job['status'] != JobStatus.SUCCEEDED:
+                continue
+            if action is None or action in job['result']['actions']:
+                return job
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        """维护状态报告：当前分段状态、超过的阈值和各操作最近的执行时间."""
+        service = self.knowledge_service_provider()
+        health = self.segment_health(service)
+
+        def finished_at(action: Optional[str] = None) -> Optional[str]:
+            job = self.last_run(action)
+            return job['updated_at'] if job else None
+
+        return {
+            'enabled': settings.maintenance_enabled,
+            'window': settings.maintenance_window or None,
+            'running': self.running or bool(self.job_store.active_leases(MAINTENANCE_LEASE)),
+            'idle': self.is_idle(service),
+            'health': health,
+            'reasons': self.reasons(health),
+            'last_maintenance_at': finished_at(),
+            'last_compaction_at': finished_at(COMPACT_ACTION),
+            'last_index_at': finished_at(INDEX_ACTION),
+        }
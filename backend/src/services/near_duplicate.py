@@ -0,0 +1,439 @@
+"""近似重复文档索引（SimHash + LSH 分段）.
+
+MD5 文档ID只能识别完全相同的内容，转载的摘要、页眉不同的 PDF 页面等
+近似重复的段落会挤占检索的 top-k。本模块为每个文档计算 64 位 SimHash
+（字符 shingle，忽略大小写、空白和标点），保存在本地 SQLite 文件中：
+- 指纹按汉明距离阈值 d 切成 d + 1 段，任意一段相同的文档才作为候选
+  （鸽巢原理保证距离不超过 d 的文档至少有一段相同），候选再精确计算距离
+- 每批文档只执行一次候选查询
+- 检测到的近似重复记录在报告表中，供运维接口查看
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils import logger
+
+
+# 每条 IN 查询的参数数量（低于 SQLite 默认参数上限）
+_SQL_BATCH_SIZE = 500
+
+# 归一化时去掉的字符（空白、标点、下划线）
+_NON_WORD = re.compile(r'[\W_]+')
+
+# 近似重复的处理方式
+NEAR_DUP_MODES = ('off', 'flag', 'drop')
+
+# (文档ID, 指纹)
+Fingerprint = Tuple[str, int]
+
+
+def simhash(text: str, shingle_size: int = 4) -> Optional[int]:
+    """计算文本的 64 位 SimHash（按去重后的字符 shingle 集合投票）.
+
+    Args:
+        text: 文本
+        shingle_size: shingle 长度（字符数）
+
+    Returns:
+        指纹，归一化后的文本短于一个 shingle 时返回 None
+    """
+    normalized = _NON_WORD.sub('', text.lower())
+    if len(normalized) < shingle_size:
+        return None
+
+    shingles = {
+        normalized[i:i + shingle_size]
+        for i in range(len(normalized) - shingle_size + 1)
+    }
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+            for s in shingles
+        ),
+        dtype='<u8',
+        count=len(shingles),
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(votes, bitorder='little').view('<u8')[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离."""
+    return (a ^ b).bit_count()
+
+
+def _to_signed(value: int) -> int:
+    """无符号 64 位指纹转为 SQLite INTEGER 可存储的有符号整数."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """基于 SQLite 的 SimHash 近似重复索引.
+
+    多个 worker 进程可以共用同一个索引文件（WAL 模式）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_distance: int = 4,
+        shingle_size: int = 4,
+        min_length: int = 100,
+    ):
+        """打开（或创建）索引文件.
+
+        Args:
+            path: 索引文件路径
+            max_distance: 视为近似重复的最大汉明距离
+            shingle_size: shingle 长度（字符数）
+            min_length: 参与检测的最短文本长度（归一化后字符数），过短的文本容易误判
+        """
+        if not 0 <= max_distance < 32:
+            raise ValueError(f'汉明距离阈值应在 0-31 之间: {max_distance}')
+
+        self.path = path
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        self._lock = threading.Lock()
+
+        # 64 位指纹切成 max_distance + 1 段（每段宽度尽量均匀）
+        band_count = max_distance + 1
+        widths = [64 // band_count + (1 if i < 64 % band_count else 0) for i in range(band_count)]
+        offsets = [sum(widths[:i]) for i in range(band_count)]
+        self._bands = list(zip(offsets, widths))
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                doc_id TEXT PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                category TEXT,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS bands (
+                key INTEGER NOT NULL,
+                doc_id TEXT NOT NULL,
+                PRIMARY KEY (key, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_bands_doc_id ON bands (doc_id);
+            CREATE TABLE IF NOT EXISTS matches (
+                doc_id TEXT NOT NULL,
+                duplicate_of TEXT NOT NULL,
+                distance INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                category TEXT,
+                preview TEXT,
+                source TEXT,
+                detected_at REAL NOT NULL,
+                PRIMARY KEY (doc_id, duplicate_of)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_matches_detected_at ON matches (detected_at);
+        ''')
+        self._check_layout()
+
+        count = self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+        logger.info(
+            f'近似重复索引已加载 - 路径: {path}, 阈值: {max_distance}, 指纹数: {count}'
+        )
+
+    def _check_layout(self) -> None:
+        """shingle 长度变化时指纹失效需清空；分段数变化时按已有指纹重建分段."""
+        with self._lock, self._conn:
+            rows = dict(self._conn.execute('SELECT key, value FROM meta').fetchall())
+            shingle_size = str(self.shingle_size)
+            band_count = str(len(self._bands))
+
+            if rows.get('shingle_size') not in (None, shingle_size):
+                logger.warning(
+                    f'shingle 长度已变化（{rows["shingle_size"]} → {shingle_size}），清空近似重复索引'
+                )
+                self._conn.execute('DELETE FROM fingerprints')
+                self._conn.execute('DELETE FROM bands')
+            elif rows.get('band_count') not in (None, band_count):
+                logger.info(f'汉明距离阈值已变化，重建近似重复索引分段（{band_count} 段）')
+                self._conn.execute('DELETE FROM bands')
+                fingerprints = self._conn.execute(
+                    'SELECT doc_id, simhash FROM fingerprints'
+                ).fetchall()
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO bands (key, doc_id) VALUES (?, ?)',
+                    [
+                        (key, doc_id)
+                        for doc_id, value in fingerprints
+                        for key in self.band_keys(_to_unsigned(value))
+                    ],
+                )
+
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                [('shingle_size', shingle_size), ('band_count', band_count)],
+            )
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        """计算参与检测的指纹（文本过短时返回 None）."""
+        if len(_NON_WORD.sub('', text)) < self.min_length:
+            return None
+        return simhash(text, self.shingle_size)
+
+    def band_keys(self, fingerprint: int) -> List[int]:
+        """指纹每一段的查询键（段号在高位，段值在低位）."""
+        return [
+            (band << 32) | ((fingerprint >> offset) & ((1 << width) - 1))
+            for band, (offset, width) in enumerate(self._bands)
+        ]
+
+    def find_matches(
+        self,
+        documents: Sequence[Tuple[str, str]],
+        pending: Optional[Dict[int, List[Fingerprint]]] = None,
+    ) -> List[Optional[Tuple[str, int]]]:
+        """批量查找近似重复的已有文档（一次候选查询）.
+
+        同一批内靠后的文档也会与靠前的文档比较。
+
+        Args:
+            documents: (文档ID, 文本) 列表
+            pending: 尚未写入索引的文档分段表（如流水线本次运行已接受的文档），
+                未匹配的文档会加入其中
+
+        Returns:
+            与 ``documents`` 对应的 (最相近的文档ID, 汉明距离)，无近似重复时为 None
+        """
+        pending = {} if pending is None else pending
+        fingerprints = [self.fingerprint(text) for _, text in documents]
+        keys = sorted({
+            key
+            for fingerprint in fingerprints if fingerprint is not None
+            for key in self.band_keys(fingerprint)
+        })
+
+        candidates: Dict[int, List[Fingerprint]] = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH_SIZE):
+                chunk = keys[start:start + _SQL_BATCH_SIZE]
+                rows = self._conn.execute(
+                    'SELECT b.key, f.doc_id, f.simhash FROM bands b '
+                    'JOIN fingerprints f ON f.doc_id = b.doc_id '
+                    f'WHERE b.key IN ({",".join("?" * len(chunk))})',
+                    chunk,
+                ).fetchall()
+                for key, doc_id, value in rows:
+                    candidates.setdefault(key, []).append((doc_id, _to_unsigned(value)))
+
+        matches: List[Optional[Tuple[str, int]]] = []
+        for (doc_id, _), fingerprint in zip(documents, fingerprints):
+            if fingerprint is None:
+                matches.append(None)
+                continue
+            keys = self.band_keys(fingerprint)
+            best = None
+            for key in keys:
+                for other_id, other in candidates.get(key, []) + pending.get(key, []):
+                    if other_id == doc_id:
+                        continue
+                    distance = hamming_distance(fingerprint, other)
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (other_id, distance)
+            matches.append(best)
+            if best is None:
+                for key in keys:
+                    pending.setdefault(key, []).append((doc_id, fingerprint))
+        return matches
+
+    def add(self, documents: Sequence[Tuple[str, str, Optional[str]]]) -> int:
+        """写入（或更新）文档指纹.
+
+        Args:
+            documents: (文档ID, 文本, 分类) 列表
+
+        Returns:
+            写入的指纹数（过短的文本不写入，已有指纹会被删除）
+        """
+        entries = [
+            (doc_id, self.fingerprint(text), category)
+            for doc_id, text, category in documents
+        ]
+        now = time.time()
+        with self._lock, self._conn:
+            self._delete([doc_id for doc_id, _, _ in entries])
+            indexed = [entry for entry in entries if entry[1] is not None]
+            self._conn.executemany(
+                'INSERT INTO fingerprints (doc_id, simhash, category, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                [
+                    (doc_id, _to_signed(fingerprint), category, now)
+                    for doc_id, fingerprint, category in indexed
+                ],
+            )
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO bands (key, doc_id) VALUES (?, ?)',
+                [
+                    (key, doc_id)
+                    for doc_id, fingerprint, _ in indexed
+                    for key in self.band_keys(fingerprint)
+                ],
+            )
+        return len(indexed)
+
+    def remove(self, doc_ids: Sequence[str]) -> None:
+        """删除文档指纹以及涉及这些文档的检测记录."""
+        with self._lock, self._conn:
+            self._delete(doc_ids)
+            for start in range(0, len(doc_ids), _SQL_BATCH_SIZE):
+                chunk = list(doc_ids[start:start + _SQL_BATCH_SIZE])
+                placeholders = ','.join('?' * len(chunk))
+                self._conn.execute(
+                    f'DELETE FROM matches WHERE doc_id IN ({placeholders}) '
+                    f'OR duplicate_of IN ({placeholders})',
+                    chunk + chunk,
+                )
+
+    def _delete(self, doc_ids: Sequence[str]) -> None:
+        """删除指纹和分段（调用方持有锁并负责提交）."""
+        for start in range(0, len(doc_ids), _SQL_BATCH_SIZE):
+            chunk = list(doc_ids[start:start + _SQL_BATCH_SIZE])
+            placeholders = ','.join('?' * len(chunk))
+            self._conn.execute(f'DELETE FROM bands WHERE doc_id IN ({placeholders})', chunk)
+            self._conn.execute(f'DELETE FROM fingerprints WHERE doc_id IN ({placeholders})', chunk)
+
+    def record_matches(self, matches: Sequence[Dict[str, Any]]) -> None:
+        """记录检测到的近似重复.
+
+        Args:
+            matches: 包含 doc_id、duplicate_of、distance、action，可选 category、preview、source
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO matches '
+                '(doc_id, duplicate_of, distance, action, category, preview, source, detected_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        match['doc_id'],
+                        match['duplicate_of'],
+                        match['distance'],
+                        match['action'],
+                        match.get('category'),
+                        match.get('preview'),
+                        match.get('source'),
+                        now,
+                    )
+                    for match in matches
+                ],
+            )
+
+    def report(
+        self,
+        action: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """近似重复检测报告（按检测时间倒序）.
+
+        Args:
+            action: 只返回指定处理方式（flag / drop）的记录
+            limit: 返回条数
+            offset: 偏移量
+
+        Returns:
+            索引规模、各处理方式的数量和检测记录
+        """
+        where, params = ('WHERE action = ?', [action]) if action else ('', [])
+        with self._lock:
+            indexed = self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+            counts = dict(self._conn.execute(
+                'SELECT action, COUNT(*) FROM matches GROUP BY action'
+            ).fetchall())
+            rows = self._conn.execute(
+                'SELECT doc_id, duplicate_of, distance, action, category, preview, source, '
+                f'detected_at FROM matches {where} '
+                'ORDER BY detected_at DESC, doc_id LIMIT ? OFFSET ?',
+                params + [limit, offset],
+            ).fetchall()
+
+        return {
+            'max_distance': self.max_distance,
+            'indexed_documents': indexed,
+            'counts': counts,
+            'total': counts.get(action, 0) if action else sum(counts.values()),
+            'items': [
+                {
+                    'doc_id': doc_id,
+                    'duplicate_of': duplicate_of,
+                    'distance': distance,
+                    'action': match_action,
+                    'category': category,
+                    'preview': preview,
+                    'source': source,
+                    'detected_at': detected_at,
+                }
+                for (
+                    doc_id, duplicate_of, distance, match_action,
+                    category, preview, source, detected_at,
+                ) in rows
+            ],
+        }
+
+    def clear(self) -> None:
+        """清空指纹和检测记录（知识库清空时调用）."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM fingerprints')
+            self._conn.execute('DELETE FROM bands')
+            self._conn.execute('DELETE FROM matches')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_near_duplicate_index(
+    path: Optional[str],
+    mode: str,
+    max_distance: int,
+    shingle_size: int,
+    min_length: int,
+) -> Optional[NearDuplicateIndex]:
+    """按配置打开近似重复索引，失败时降级为不检测.
+
+    Args:
+        path: 索引文件路径（为空表示禁用）
+        mode: 处理方式（off 表示禁用）
+        max_distance: 视为近似重复的最大汉明距离
+        shingle_size: shingle 长度
+        min_length: 参与检测的最短文本长度
+
+    Returns:
+        索引实例，禁用或打开失败时返回 None
+    """
+    if not path or mode == 'off':
+        return None
+    if mode not in NEAR_DUP_MODES:
+        logger.warning(f'未知的近似重复处理方式: {mode}，将不检测近似重复')
+        return None
+    try:
+        return NearDuplicateIndex(path, max_distance, shingle_size, min_length)
+    except Exception as e:
+        logger.warning(f'近似重复索引打开失败，将不检测近似重复: {e}')
+        return None
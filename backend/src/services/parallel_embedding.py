@@ -0,0 +1,231 @@
+"""多进程并行向量化.
+
+全量重建向量（每次更换向量化模型都需要）时，单进程推理受限于
+PyTorch 的 intra-op 并行扩展性。本模块把分块批次分发到进程池，
+每个 worker 持有一份模型副本并绑定独立的 CPU 核与线程数，
+结果按提交顺序流式返回，便于直接写入 Milvus。
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from ..config import settings
+from ..utils import logger
+
+
+# worker 进程内的模型实例（每个进程一份）
+_worker_model: Any = None
+
+
+def _init_worker(
+    model_name: str,
+    threads_per_worker: int,
+    cpu_queue: Optional[Any],
+) -> None:
+    """进程池 worker 初始化：绑定 CPU、限制线程数并加载模型.
+
+    Args:
+        model_name: 向量化模型名称
+        threads_per_worker: 每个 worker 的推理线程数
+        cpu_queue: 待分配的 CPU 核集合队列（为 None 时不绑核）
+    """
+    global _worker_model
+
+    # 必须在导入 torch 之前设置，避免每个进程都按全部核数开线程
+    os.environ['OMP_NUM_THREADS'] = str(threads_per_worker)
+    os.environ['MKL_NUM_THREADS'] = str(threads_per_worker)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    if cpu_queue is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            cpus = cpu_queue.get_nowait()
+            os.sched_setaffinity(0, cpus)
+        except Exception:
+            pass  # 绑核失败不影响正确性
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def _worker_dimension() -> int:
+    """返回 worker 中模型的向量维度."""
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _worker_encode(texts: List[str], normalize: bool) -> np.ndarray:
+    """在 worker 进程中向量化一个批次（批内按 token 长度分桶）."""
+    from .embedding_batcher import TokenAwareBatcher, report_overflow
+
+    batcher = TokenAwareBatcher(_worker_model)
+    plan = batcher.plan(texts)
+    report_overflow(plan, max_seq_length=batcher.max_seq_length)
+    return batcher.encode(texts, normalize_embeddings=normalize, plan=plan)
+
+
+class ParallelEmbedder:
+    """进程池并行向量化器.
+
+    同时提供与 ``SentenceTransformer`` 兼容的 ``encode`` 接口，
+    可直接作为 ``KnowledgeService`` 的向量化模型使用。
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        model_name: Optional[str] = None,
+        pin_cpus: bool = True,
+        batch_size: int = 64,
+    ):
+        """初始化进程池.
+
+        Args:
+            num_workers: worker 进程数（默认使用配置）
+            threads_per_worker: 每个 worker 的推理线程数
+            model_name: 向量化模型名称
+            pin_cpus: 是否为每个 worker 绑定独立的 CPU 核
+            batch_size: ``encode`` 拆分批次时每批的文本数
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or settings.ingest_workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.model_name = model_name or settings.embedding_model
+        self.batch_size = batch_size
+
+        context = multiprocessing.get_context('spawn')
+        cpu_queue = None
+        if pin_cpus and hasattr(os, 'sched_getaffinity'):
+            available = sorted(os.sched_getaffinity(0))
+            cpu_queue = context.Queue()
+            for worker_index in range(self.num_workers):
+                start = worker_index * self.threads_per_worker
+                cpus = available[start:start + self.threads_per_worker]
+                if cpus:
+                    cpu_queue.put(set(cpus))
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.threads_per_worker, cpu_queue),
+        )
+        self.vector_dim: int = self._executor.submit(_worker_dimension).result()
+
+        logger.info(
+            f'并行向量化进程池启动 - worker: {self.num_workers}, '
+            f'每 worker 线程数: {self.threads_per_worker}, 模型: {self.model_name}'
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """获取向量维度."""
+        return self.vector_dim
+
+    def encode_batches(
+        self,
+        batches: Iterable[List[str]],
+        normalize_embeddings: bool = True,
+        max_in_flight: Optional[int] = None,
+    ) -> Iterator[np.ndarray]:
+        """并行向量化多个批次，按输入顺序流式返回结果.
+
+        Args:
+            batches: 文本批次（可为生成器，按需消费）
+            normalize_embeddings: 是否归一化
+            max_in_flight: 同时在途的批次数上限（默认 worker 数的 2 倍）
+
+        Yields:
+            与输入批次一一对应的向量矩阵
+        """
+        limit = max_in_flight or self.num_workers * 2
+        pending: Deque[Future] = deque()
+
+        for batch in batches:
+            pending.append(
+                self._executor.submit(_worker_encode, list(batch), normalize_embeddings)
+            )
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        """向量化文本（拆分为批次后分发到进程池）.
+
+        Args:
+            sentences: 单条文本或文本列表
+            normalize_embeddings: 是否归一化
+            show_progress_bar: 兼容参数，忽略
+
+        Returns:
+            单条文本返回一维向量，列表返回二维矩阵
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            return np.zeros((0, self.vector_dim), dtype=np.float32)
+
+        batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        vectors = np.vstack(list(self.encode_batches(batches, normalize_embeddings)))
+
+        return vectors[0] if single else vectors
+
+    def close(self) -> None:
+        """关闭进程池."""
+        self._executor.shutdown(wait=True)
+
+
+class ThroughputMeter:
+    """吞吐量统计（用于实时输出 chunks/s）."""
+
+    def __init__(self, name: str, log_interval: float = 5.0):
+        """初始化统计器.
+
+        Args:
+            name: 统计名称（用于日志）
+            log_interval: 日志输出间隔（秒）
+        """
+        self.name = name
+        self.log_interval = log_interval
+        self.total = 0
+        self.started_at = time.monotonic()
+        self._last_log_at = self.started_at
+
+    def add(self, count: int) -> None:
+        """累加处理数量，到达间隔时输出实时吞吐量."""
+        self.total += count
+        now = time.monotonic()
+        if now - self._last_log_at >= self.log_interval:
+            self._last_log_at = now
+            logger.info(
+                f'{self.name} - 已处理: {self.total}, 吞吐量: {self.rate:.1f} chunks/s'
+            )
+
+    @property
+    def elapsed(self) -> float:
+        """已耗时（秒）."""
+        return time.monotonic() - self.started_at
+
+    @property
+    def rate(self) -> float:
+        """平均吞吐量（每秒处理数）."""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
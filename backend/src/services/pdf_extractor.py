@@ -0,0 +1,269 @@
+"""多进程并行 PDF 文本提取.
+
+PyPDF2 的 ``page.extract_text()`` 是纯 Python 实现，几百页的文献在事件循环里
+串行提取会阻塞数分钟。本模块：
+- 把页码区间分发到进程池并行提取，结果按页码顺序流式返回
+- 每页设置超时，异常复杂的页面超时后跳过，不会拖住整个任务
+- 按文件内容哈希缓存提取结果，重复上传同一 PDF 时跳过提取；缓存按最近使用时间淘汰，
+  总大小和保留时间有上限
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from ..config import settings
+from ..utils import logger
+
+
+# 提取逻辑变化时递增，使旧缓存失效
+_CACHE_VERSION = 1
+
+
+class _PageTimeout(Exception):
+    """单页提取超时."""
+
+
+def _raise_page_timeout(signum, frame) -> None:
+    raise _PageTimeout()
+
+
+def _init_worker() -> None:
+    """进程池 worker 初始化：注册单页超时信号."""
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _raise_page_timeout)
+
+
+def _extract_page_range(
+    path: str,
+    start: int,
+    end: int,
+    page_timeout: float,
+) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    """在 worker 进程中提取页码区间 [start, end) 的文本.
+
+    Args:
+        path: PDF 文件路径
+        start: 起始页下标（从 0 开始）
+        end: 结束页下标（不包含）
+        page_timeout: 单页超时（秒），0 表示不限制
+
+    Returns:
+        [(页码, 清理后的文本, 错误信息)]，页码从 1 开始
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    use_alarm = page_timeout > 0 and hasattr(signal, 'setitimer')
+    results = []
+    for page_index in range(start, end):
+        try:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            try:
+                text = reader.pages[page_index].extract_text()
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            results.append((page_index + 1, ' '.join((text or '').split()), None))
+        except _PageTimeout:
+            results.append((page_index + 1, None, f'提取超时（>{page_timeout} 秒）'))
+        except Exception as e:
+            results.append((page_index + 1, None, str(e)))
+    return results
+
+
+class PdfExtractor:
+    """进程池并行 PDF 文本提取器."""
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        pages_per_task: Optional[int] = None,
+        page_timeout: Optional[float] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_size: Optional[int] = None,
+        cache_max_age: Optional[float] = None,
+    ):
+        """初始化提取器（进程池在首次提取时创建）.
+
+        Args:
+            num_workers: worker 进程数（默认使用配置，0 表示按 CPU 核数）
+            pages_per_task: 每个任务提取的页数
+            page_timeout: 单页超时（秒）
+            cache_dir: 提取结果缓存目录（为空表示禁用）
+            cache_max_size: 缓存目录总大小上限（字节）
+            cache_max_age: 缓存结果最长保留时间（秒，按最近使用时间计算）
+        """
+        self.num_workers = num_workers or settings.pdf_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task or settings.pdf_pages_per_task
+        self.page_timeout = (
+            page_timeout if page_timeout is not None else settings.pdf_page_timeout
+        )
+        cache_dir = cache_dir if cache_dir is not None else settings.pdf_cache_dir
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_max_size = (
+            cache_max_size if cache_max_size is not None else settings.pdf_cache_max_size
+        )
+        self.cache_max_age = (
+            cache_max_age if cache_max_age is not None else settings.pdf_cache_max_age
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """按需创建进程池."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            logger.info(f'PDF 提取进程池启动 - worker: {self.num_workers}')
+        return self._executor
+
+    def extract_pages(self, file_content: bytes) -> Iterator[Tuple[int, str]]:
+        """按页码顺序流式提取 PDF 文本（跳过空白页和失败页）.
+
+        Args:
+            file_content: PDF 文件内容
+
+        Yields:
+            (页码, 清理后的文本)，页码从 1 开始
+
+        Raises:
+            ValueError: 文件无法解析
+        """
+        digest = hashlib.sha256(file_content).hexdigest()
+        cached = self._load_cache(digest)
+        if cached is not None:
+            logger.info(f'PDF 提取命中缓存 - 页数: {len(cached)}')
+            yield from cached
+            return
+
+        from PyPDF2 import PdfReader
+
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(file_content)
+            path = tmp.name
+
+        try:
+            page_count = len(PdfReader(path).pages)
+            pages: List[Tuple[int, str]] = []
+            complete = True
+            for page_num, text, error in self._extract_parallel(path, page_count):
+                if error is not None:
+                    complete = False
+                    logger.warning(f'提取 PDF 第 {page_num} 页失败: {error}')
+                    continue
+                if text:
+                    pages.append((page_num, text))
+                    yield page_num, text
+
+            # 有页面失败（如超时）时不缓存，重新上传可再次尝试
+            if complete:
+                self._save_cache(digest, pages)
+        finally:
+            os.unlink(path)
+
+    def _extract_parallel(
+        self,
+        path: str,
+        page_count: int,
+    ) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+        """把页码区间分发到进程池，按提交顺序产出每页结果."""
+        executor = self._get_executor()
+        futures: List[Future] = [
+            executor.submit(
+                _extract_page_range,
+                path,
+                start,
+                min(start + self.pages_per_task, page_count),
+                self.page_timeout,
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # 调用方提前停止消费时取消未开始的区间
+            for future in futures:
+                future.cancel()
+
+    def _cache_path(self, digest: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f'{digest}.v{_CACHE_VERSION}.json'
+
+    def _load_cache(self, digest: str) -> Optional[List[Tuple[int, str]]]:
+        """读取缓存的提取结果（命中时更新最近使用时间）."""
+        path = self._cache_path(digest)
+        if path is None or not path.exists():
+            return None
+        try:
+            if time.time() - path.stat().st_mtime > self.cache_max_age:
+                path.unlink(missing_ok=True)
+                return None
+            pages = [tuple(page) for page in json.loads(path.read_text(encoding='utf-8'))]
+            os.utime(path)
+            return pages
+        except Exception as e:
+            logger.warning(f'PDF 提取缓存读取失败: {e}')
+            return None
+
+    def _save_cache(self, digest: str, pages: List[Tuple[int, str]]) -> None:
+        """写入提取结果缓存（先写同目录下的独立临时文件再原子替换），并按上限淘汰旧结果."""
+        path = self._cache_path(digest)
+        if path is None:
+            return
+        tmp_name = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 并发写入同一结果时各自使用不同的临时文件
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=path.parent, suffix='.tmp', delete=False
+            ) as tmp:
+                tmp_name = tmp.name
+                json.dump(pages, tmp, ensure_ascii=False)
+            os.replace(tmp_name, path)
+            tmp_name = None
+            self._prune_cache()
+        except Exception as e:
+            logger.warning(f'PDF 提取缓存写入失败: {e}')
+        finally:
+            if tmp_name is not None:
+                Path(tmp_name).unlink(missing_ok=True)
+
+    def _prune_cache(self) -> None:
+        """删除超过保留时间的结果和遗留的临时文件，总大小超过上限时按最近使用时间淘汰."""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.cache_max_age:
+                path.unlink(missing_ok=True)
+            elif path.suffix == '.json':
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.cache_max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def close(self) -> None:
+        """关闭进程池."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -113,8 +113,14 @@ class RAGService:
                             for result in search_results
                         ]
                         
+                        # 分块所在的章节（标题路径）一并提供给模型
                         knowledge_context = '\n\n'.join([
-                            f'[知识{i+1}] (相似度: {result.score:.2f})\n{result.content}'
+                            f'[知识{i+1}] (相似度: {result.score:.2f})'
+                            + (
+                                f' {result.metadata["heading_path"]}'
+                                if result.metadata.get('heading_path') else ''
+                            )
+                            + f'\n{result.content}'
                             for i, result in enumerate(search_results)
                         ])
                         
@@ -0,0 +1,448 @@
+"""在线重建索引（影子集合 + 别名切换）.
+
+更换向量化模型或索引类型时，不再需要清空知识库后重新导入：
+- 按新配置创建下一个版本的集合（影子集合），之后的写入和删除同时作用于影子集合
+- 从当前集合回填已有分块：模型不变时直接复制向量，模型变化时按新模型重新向量化
+- 回填完成后按写入时间（``updated_at``）补写重建开始后写入当前集合的分块
+- 抽样检查分块能否检索到自身（召回率），校验两个集合的分块数
+- 校验通过后切换别名，服务读写的集合原子替换；旧集合保留用于回滚
+
+双写只在当前进程内完成，其他 worker、其他进程的导入队列和 ``bulk_ingest`` 命令的写入
+只作用于当前集合，由补写同步：回填后补写一轮（不阻塞写入），切换前持有影子集合的锁
+再补写上一轮之后的写入并校验分块数；影子集合多出的分块（其他进程的删除）在切换前删除。
+切换前最后一次补写与别名切换之间其他进程的写入仍会丢失，建议在写入低峰执行。
+
+更换模型需要同时替换查询使用的模型，只支持单进程部署
+（``WEB_CONCURRENCY=1`` 且不使用共享向量化 Sidecar），多进程部署时拒绝更换模型。
+"""
+
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from pymilvus import utility
+
+from ..config import settings
+from ..utils import logger
+from .embedding_batcher import TokenAwareBatcher
+from .knowledge_service import UPDATED_AT_FIELD
+
+
+class ShadowCollection:
+    """重建期间的影子集合（双写目标）.
+
+    ``write`` 和 ``delete`` 需在持有 ``lock`` 时调用，与当前集合的写入一起串行执行。
+    """
+
+    def __init__(
+        self,
+        knowledge_service: Any,
+        collection: Any,
+        encoder: Optional[TokenAwareBatcher] = None,
+    ):
+        """初始化影子集合.
+
+        Args:
+            knowledge_service: 知识库服务
+            collection: 影子集合
+            encoder: 新模型的向量化批处理器（为空表示模型不变，直接复用向量）
+        """
+        self.knowledge_service = knowledge_service
+        self.collection = collection
+        self.encoder = encoder
+        self.lock = threading.Lock()
+        # 开始重建后双写过的分块，回填时跳过（避免旧数据覆盖新写入）；
+        # 按分块记录：只更新部分分块的文档，其余分块仍需回填
+        self.touched: Set[str] = set()
+        # 本轮补写开始后双写过的分块（补写时跳过，见 ``catch_up``）
+        self.recent: Set[str] = set()
+        # 重建期间的删除次数；上一批回填之后有删除时，回填前确认分块仍在当前集合中
+        # （避免恢复读取之后被删除的分块）
+        self.deletes = 0
+        self._checked_deletes = 0
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        """按主键覆盖写入分块行."""
+        ids = [row['id'] for row in rows]
+        self.touched.update(ids)
+        self.recent.update(ids)
+        self._upsert(self.with_vectors(rows))
+
+    def delete(self, expr: str, doc_ids: List[str]) -> None:
+        """按表达式删除分块."""
+        self.deletes += 1
+        self.collection.delete(expr)
+
+    def backfill(self, rows: List[Dict[str, Any]]) -> int:
+        """回填当前集合中的一批分块（跳过重建期间双写过或已删除的分块）.
+
+        向量化在锁外执行，不阻塞正常写入。
+
+        Args:
+            rows: 当前集合中的分块行（模型不变时需包含向量）
+
+        Returns:
+            写入的分块数
+        """
+        return self._copy(rows, self.touched)
+
+    def start_catch_up(self) -> None:
+        """开始一轮补写（清空本轮双写过的分块）."""
+        with self.lock:
+            self.recent = set()
+
+    def catch_up(self, rows: List[Dict[str, Any]]) -> int:
+        """补写重建期间写入当前集合的一批分块（包括其他进程的写入）.
+
+        只跳过本轮补写开始后双写过的分块：读取之后被当前进程覆盖写入，影子集合中已是新版本，
+        且其写入时间晚于本轮水位，下一轮补写还会复制。
+
+        Args:
+            rows: 当前集合中的分块行（模型不变时需包含向量）
+
+        Returns:
+            写入的分块数
+        """
+        return self._copy(rows, self.recent)
+
+    def prune(self, batch_size: int) -> int:
+        """删除当前集合中已不存在的分块（其他进程在重建期间的删除），需持有 ``lock``.
+
+        Args:
+            batch_size: 每批检查的分块数
+
+        Returns:
+            删除的分块数
+        """
+        iterator = self.collection.query_iterator(
+            batch_size=batch_size,
+            expr='',
+            output_fields=['id'],
+        )
+        removed = 0
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                ids = [row['id'] for row in batch]
+                live = self.existing_ids(self.knowledge_service.collection, ids)
+                missing = [chunk_id for chunk_id in ids if chunk_id not in live]
+                if missing:
+                    self.collection.delete(f'id in {json.dumps(missing, ensure_ascii=False)}')
+                    removed += len(missing)
+        finally:
+            iterator.close()
+        return removed
+
+    def _copy(self, rows: List[Dict[str, Any]], skip: Set[str]) -> int:
+        """复制当前集合中的分块（跳过 ``skip`` 中的分块和已删除的分块）."""
+        rows = self.with_vectors(rows)
+        with self.lock:
+            rows = [row for row in rows if row['id'] not in skip]
+            if rows and self.deletes != self._checked_deletes:
+                live = self.existing_ids(
+                    self.knowledge_service.collection, [row['id'] for row in rows]
+                )
+                rows = [row for row in rows if row['id'] in live]
+            self._checked_deletes = self.deletes
+            if rows:
+                self._upsert(rows)
+        return len(rows)
+
+    @staticmethod
+    def existing_ids(collection: Any, ids: List[str]) -> Set[str]:
+        """集合中仍存在的分块ID（强一致读取，能看到刚执行的删除）."""
+        if not ids:
+            return set()
+        found = collection.query(
+            expr=f'id in {json.dumps(ids, ensure_ascii=False)}',
+            output_fields=['id'],
+            consistency_level='Strong',
+        )
+        return {row['id'] for row in found}
+
+    def with_vectors(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """模型变化时按新模型重新向量化（标题路径 + 分块内容）."""
+        if self.encoder is None or not rows:
+            return rows
+        vectors = self.encoder.encode(
+            [self.knowledge_service.embedding_text(row) for row in rows]
+        ).tolist()
+        return [{**row, 'vector': vector} for row, vector in zip(rows, vectors)]
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """写入影子集合（回填与双写可能写入同一分块，统一按主键覆盖）."""
+        self.collection.upsert(
+            self.knowledge_service.collection_entities(self.collection, rows)
+        )
+
+
+class ReindexService:
+    """在线重建索引服务（同一时间只执行一个重建任务）."""
+
+    def __init__(
+        self,
+        knowledge_service: Any,
+        batch_size: Optional[int] = None,
+        sample_size: Optional[int] = None,
+        min_recall: Optional[float] = None,
+    ):
+        """初始化重建索引服务.
+
+        Args:
+            knowledge_service: 知识库服务
+            batch_size: 回填时每批的分块数
+            sample_size: 切换前抽样检查召回的分块数
+            min_recall: 抽样召回率下限
+        """
+        self.knowledge_service = knowledge_service
+        self.batch_size = batch_size or settings.reindex_batch_size
+        self.sample_size = sample_size or settings.reindex_sample_size
+        self.min_recall = settings.reindex_min_recall if min_recall is None else min_recall
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        """是否有重建任务在执行."""
+        return self._running
+
+    def check_model_change(self, embedding_model: Optional[str]) -> None:
+        """检查能否更换向量化模型.
+
+        切换后只有执行任务的进程换用新模型；其他 worker 和共享的向量化 Sidecar
+        仍按旧模型向量化查询和写入，因此多进程部署时不允许在线更换模型。
+
+        Args:
+            embedding_model: 新的向量化模型（为空或与当前模型相同表示不更换）
+
+        Raises:
+            ValueError: 多进程部署时更换模型
+        """
+        if not embedding_model or embedding_model == self.knowledge_service.model_name:
+            return
+        if settings.embedding_server_socket or settings.web_concurrency > 1:
+            raise ValueError(
+                '多进程部署（WEB_CONCURRENCY > 1 或使用向量化 Sidecar）时不能在线更换模型，'
+                '请修改 EMBEDDING_MODEL 后重启所有进程，再重建索引'
+            )
+
+    def reindex(
+        self,
+        embedding_model: Optional[str] = None,
+        index_type: Optional[str] = None,
+        index_params: Optional[Dict[str, Any]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """重建索引并切换别名（同步执行，耗时较长）.
+
+        Args:
+            embedding_model: 新的向量化模型（为空表示使用当前模型）
+            index_type: 新的索引类型（为空表示使用配置）
+            index_params: 新的索引参数（为空表示使用配置）
+            on_progress: 进度回调
+
+        Returns:
+            重建结果（新旧集合名称、分块数、召回率）
+
+        Raises:
+            ValueError: 已有重建任务在执行，多进程部署时更换模型，
+                或校验未通过（影子集合会被删除）
+        """
+        self.check_model_change(embedding_model)
+        with self._lock:
+            if self._running:
+                raise ValueError('已有重建索引任务在执行')
+            self._running = True
+        try:
+            return self._reindex(
+                embedding_model or self.knowledge_service.model_name,
+                index_type or settings.milvus_index_type,
+                index_params if index_params is not None else settings.milvus_index_params,
+                on_progress or (lambda progress: None),
+            )
+        finally:
+            self._running = False
+
+    def _reindex(
+        self,
+        model_name: str,
+        index_type: str,
+        index_params: Dict[str, Any],
+        on_progress: Callable[[Dict[str, Any]], None],
+    ) -> Dict[str, Any]:
+        """创建影子集合、回填、校验并切换."""
+        service = self.knowledge_service
+        model = None
+        encoder = None
+        vector_dim = service.vector_dim
+        if model_name != service.model_name:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+            encoder = TokenAwareBatcher(model)
+            vector_dim = model.get_sentence_embedding_dimension()
+
+        name = service.next_collection_name()
+        collection = service.build_collection(
+            name,
+            vector_dim=vector_dim,
+            model_name=model_name,
+            index_type=index_type,
+            index_params=index_params,
+        )
+        shadow = ShadowCollection(service, collection, encoder)
+        watermark = self._watermark()
+        service.shadow = shadow
+        logger.info(
+            f'重建索引开始 - 影子集合: {name}, 模型: {model_name}, 索引: {index_type}'
+        )
+
+        try:
+            progress: Dict[str, Any] = {
+                'phase': 'backfill',
+                'collection': name,
+                'total': service.count_rows(service.collection),
+                'copied': 0,
+            }
+            on_progress(progress)
+
+            # 回填时按蓄水池抽样保留分块，用于召回检查；
+            # 同时补全近似重复索引中缺少的指纹（如启用检测前写入的文档）
+            samples: List[Dict[str, Any]] = []
+            seen = 0
+            for batch in service.fingerprint_batches(service.iter_chunks(
+                include_vectors=encoder is None,
+                batch_size=self.batch_size,
+                include_updated_at=True,
+            )):
+                progress['copied'] += shadow.backfill(batch)
+                for row in batch:
+                    seen += 1
+                    if len(samples) < self.sample_size:
+                        samples.append(row)
+                    else:
+                        slot = random.randrange(seen)
+                        if slot < self.sample_size:
+                            samples[slot] = row
+                on_progress(progress)
+
+            # 回填期间其他进程的写入只作用于当前集合，按写入时间补写（不阻塞当前进程的写入）
+            progress['phase'] = 'verify'
+            shadow.start_catch_up()
+            since, watermark = watermark, self._watermark()
+            progress['caught_up'] = sum(
+                shadow.catch_up(batch) for batch in self._written_since(shadow, since)
+            )
+            on_progress(progress)
+
+            recall = self._sample_recall(shadow, samples)
+            progress['recall'] = recall
+            if recall is not None and recall < self.min_recall:
+                raise ValueError(f'抽样召回率 {recall:.3f} 低于下限 {self.min_recall}')
+
+            progress['phase'] = 'switch'
+            on_progress(progress)
+            with shadow.lock:
+                # 持有锁时当前进程没有写入，补写上一轮之后的写入后两个集合只差其他进程的删除
+                for batch in self._written_since(shadow, watermark):
+                    shadow.write(batch)
+                    progress['caught_up'] += len(batch)
+                service.collection.flush()
+                collection.flush()
+                live_count = service.count_rows(service.collection)
+                shadow_count = service.count_rows(collection)
+                if shadow_count > live_count:
+                    progress['pruned'] = shadow.prune(self.batch_size)
+                    collection.flush()
+                    shadow_count = service.count_rows(collection)
+                if live_count != shadow_count:
+                    raise ValueError(f'分块数不一致: 当前集合 {live_count}，影子集合 {shadow_count}')
+                previous = service.switch_collection(name, model)
+        except Exception:
+            service.shadow = None
+            self._drop(name)
+            raise
+
+        logger.info(
+            f'重建索引完成 - 集合: {name}, 分块数: {shadow_count}, '
+            f'补写: {progress["caught_up"]}, 召回率: {recall}, 旧集合: {previous}'
+        )
+        return {
+            'collection': name,
+            'previous_collection': previous,
+            'embedding_model': model_name,
+            'index_type': index_type,
+            'chunks': shadow_count,
+            'caught_up': progress['caught_up'],
+            'recall': recall,
+        }
+
+    @staticmethod
+    def _watermark() -> str:
+        """补写水位：当前时间提前 ``reindex_watermark_lag_seconds``（覆盖已记录写入时间、尚未可见的分块）."""
+        return (
+            datetime.now() - timedelta(seconds=settings.reindex_watermark_lag_seconds)
+        ).isoformat()
+
+    def _written_since(
+        self,
+        shadow: ShadowCollection,
+        since: str,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """当前集合中写入时间不早于 ``since`` 的分块批次.
+
+        没有 ``updated_at`` 字段的旧集合按 ``created_at`` 筛选，只能补写新增的分块。
+        """
+        service = self.knowledge_service
+        if service.has_field(UPDATED_AT_FIELD):
+            field = UPDATED_AT_FIELD
+        else:
+            field = 'created_at'
+            logger.warning('集合没有写入时间字段，重建索引只能补写其他进程新增的分块')
+        return service.iter_chunks(
+            expr=f'{field} >= {json.dumps(since)}',
+            include_vectors=shadow.encoder is None,
+            batch_size=self.batch_size,
+            include_updated_at=True,
+        )
+
+    def _sample_recall(
+        self,
+        shadow: ShadowCollection,
+        samples: List[Dict[str, Any]],
+    ) -> Optional[float]:
+        """抽样分块在影子集合中能检索到自身的比例（没有可检查的分块时为 None）."""
+        samples = [row for row in samples if row['id'] not in shadow.touched]
+        existing = shadow.existing_ids(shadow.collection, [row['id'] for row in samples])
+        samples = [row for row in samples if row['id'] in existing]
+        if not samples:
+            return None
+
+        if shadow.encoder is None:
+            vectors = [row['vector'] for row in samples]
+        else:
+            vectors = [row['vector'] for row in shadow.with_vectors(samples)]
+        results = shadow.collection.search(
+            data=vectors,
+            anns_field='vector',
+            param=self.knowledge_service.index_search_params(shadow.collection),
+            limit=10,
+            output_fields=['id'],
+        )
+        hits = sum(
+            1 for row, result in zip(samples, results)
+            if any(hit.id == row['id'] for hit in result)
+        )
+        return round(hits / len(samples), 4)
+
+    @staticmethod
+    def _drop(name: str) -> None:
+        """删除未切换的影子集合（失败时只记录日志）."""
+        try:
+            utility.drop_collection(name)
+        except Exception as e:
+            logger.warning(f'删除影子集合失败 - {name}: {e}')
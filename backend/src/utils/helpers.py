@@ -5,40 +5,259 @@
 
 import base64
 import hashlib
+import re
 from io import BytesIO
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from PIL import Image
 
 
+# 句末：中英文句号、问号、叹号、分号、省略号（可带右引号/右括号），英文句点需后跟空白；换行也视为句末。
+# 以单个字符类开头，正则引擎只在这些字符处尝试匹配（比多分支写法快约 2.5 倍）
+_SENTENCE_END = re.compile(
+    r'[。！？!?；;…\n.]'
+    r'(?:(?<=\.)[”’"\')\]]*(?=\s|$)|(?<!\.)[。！？!?；;…]*[”’」』）)\]"\']*)\s*'
+)
+# 超长句子再按分句标点切分
+_CLAUSE_END = re.compile(r'[，,、：:]\s*')
+
+# Markdown 标题行（# ~ ######）
+_MARKDOWN_HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$', re.MULTILINE)
+
+# 编号标题（PDF 等纯文本）：(层级, 模式)，层级越小越高
+_NUMBERED_HEADINGS = [
+    (1, re.compile(r'^第[一二三四五六七八九十百零\d]+[章篇部]')),
+    (2, re.compile(r'^第[一二三四五六七八九十百零\d]+节')),
+    (2, re.compile(r'^[一二三四五六七八九十]+、')),
+    (3, re.compile(r'^[（(][一二三四五六七八九十]+[）)]')),
+]
+_DECIMAL_HEADING = re.compile(r'^(\d{1,2}(?:\.\d{1,2})*)(?:[.、]|\s)\s*\S')
+
+# 编号标题行的最大长度，以及不能出现在标题结尾的标点（用于排除编号列表中的句子）
+_MAX_HEADING_LENGTH = 40
+_SENTENCE_PUNCTUATION = '。！？；;!?，,：:'
+
+# 分块在原文中的位置：[start, end)
+Span = Tuple[int, int]
+
+# 小节：(start, end, 标题路径)
+Section = Tuple[int, int, List[str]]
+
+
+def _split_on(
+    text: str,
+    start: int,
+    end: int,
+    max_length: int,
+    patterns: Sequence['re.Pattern'],
+) -> Iterator[Span]:
+    """按边界依次切分 [start, end)，每段不超过 ``max_length``（没有边界时按长度硬切）."""
+    if end - start <= max_length:
+        yield start, end
+        return
+    if not patterns:
+        for offset in range(start, end, max_length):
+            yield offset, min(offset + max_length, end)
+        return
+    
+    piece_start = start
+    for match in patterns[0].finditer(text, start, end):
+        piece_end = match.end()
+        if piece_end - piece_start <= max_length:
+            yield piece_start, piece_end
+        else:
+            yield from _split_on(text, piece_start, piece_end, max_length, patterns[1:])
+        piece_start = piece_end
+    if piece_start < end:
+        yield from _split_on(text, piece_start, end, max_length, patterns[1:])
+
+
+def split_spans(
+    text: str,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+) -> List[Span]:
+    """按句子边界将长文本分块，返回每块在原文中的位置（不复制文本）.
+    
+    尽量把完整的句子装进一个分块；单个句子超过 ``chunk_size`` 时按逗号等分句标点切分，
+    仍超长时按长度硬切。相邻分块的重叠由上一块末尾的完整句子组成（总长不超过
+    ``chunk_overlap``，放不下时不重叠）。``chunk_size`` 按字符计，中文向量化模型
+    基本一字一 token，因此也近似是 token 预算。
+    
+    Args:
+        text: 原始文本
+        chunk_size: 每块的最大字符数
+        chunk_overlap: 块之间的最大重叠字符数
+        
+    Returns:
+        分块位置列表 [(start, end)]，``text[start:end]`` 即分块内容
+    """
+    if len(text) <= chunk_size:
+        return [(0, len(text))]
+    
+    pieces = list(_split_on(text, 0, len(text), chunk_size, (_SENTENCE_END, _CLAUSE_END)))
+    spans = []
+    first = 0
+    while True:
+        chunk_start = pieces[first][0]
+        last = first
+        while last + 1 < len(pieces) and pieces[last + 1][1] - chunk_start <= chunk_size:
+            last += 1
+        chunk_end = pieces[last][1]
+        spans.append((chunk_start, chunk_end))
+        if last + 1 >= len(pieces):
+            return spans
+        
+        # 下一块从本块末尾若干完整片段开始（重叠），且仍要装得下下一个新片段
+        following_end = pieces[last + 1][1]
+        next_first = last + 1
+        while (
+            next_first - 1 > first
+            and chunk_end - pieces[next_first - 1][0] <= chunk_overlap
+            and following_end - pieces[next_first - 1][0] <= chunk_size
+        ):
+            next_first -= 1
+        first = next_first
+
+
 def split_text(
     text: str,
     chunk_size: int = 500,
     chunk_overlap: int = 50,
 ) -> List[str]:
-    """将长文本分块.
+    """将长文本按句子边界分块（见 :func:`split_spans`）.
     
     Args:
         text: 原始文本
-        chunk_size: 每块的字符数
-        chunk_overlap: 块之间的重叠字符数
+        chunk_size: 每块的最大字符数
+        chunk_overlap: 块之间的最大重叠字符数
         
     Returns:
         分块后的文本列表
     """
-    if len(text) <= chunk_size:
-        return [text]
+    return [text[start:end] for start, end in split_spans(text, chunk_size, chunk_overlap)]
+
+
+def split_sections(text: str) -> List[Section]:
+    """按 Markdown 标题把文本切分为小节，并给出每个小节的标题路径.
     
-    chunks = []
+    小节从标题行开始，到下一个标题行之前结束；标题路径为从高到低的各级标题
+    （如 ``['饮食', '蛋白质']``）。只有标题没有正文的小节并入下一个小节，
+    标题之前的内容标题路径为空。
+    
+    Args:
+        text: 原始文本
+        
+    Returns:
+        小节列表 [(start, end, 标题路径)]，首尾相接覆盖全文
+    """
+    sections: List[Section] = []
+    stack: List[Tuple[int, str]] = []
     start = 0
+    body_start = 0
+    for match in _MARKDOWN_HEADING.finditer(text):
+        if text[body_start:match.start()].strip():
+            sections.append((start, match.start(), [title for _, title in stack]))
+            start = match.start()
+        level = len(match.group(1))
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, match.group(2).strip()))
+        body_start = match.end()
+    sections.append((start, len(text), [title for _, title in stack]))
+    return sections
+
+
+def heading_level(line: str) -> Optional[int]:
+    """识别纯文本中的编号标题（第X章、一、（一）、1.2 等），返回层级.
+    
+    Args:
+        line: 去掉首尾空白的一行文本
+        
+    Returns:
+        标题层级（1 最高），不是标题时返回 None
+    """
+    if not line or len(line) > _MAX_HEADING_LENGTH or line[-1] in _SENTENCE_PUNCTUATION:
+        return None
+    for level, pattern in _NUMBERED_HEADINGS:
+        if pattern.match(line):
+            return level
+    match = _DECIMAL_HEADING.match(line)
+    if match:
+        return match.group(1).count('.') + 2
+    return None
+
+
+def join_spans(chunks: Sequence[str], spans: Sequence[Span]) -> str:
+    """按分块位置还原原文（精确去掉重叠部分）.
+    
+    Args:
+        chunks: 按顺序排列的分块
+        spans: 与 ``chunks`` 对应的 (start, end)
+        
+    Returns:
+        还原后的文本
+    """
+    parts = []
+    covered = spans[0][0] if spans else 0
+    for chunk, (start, end) in zip(chunks, spans):
+        if end > covered:
+            parts.append(chunk[max(covered - start, 0):])
+            covered = end
+    return ''.join(parts)
+
+
+def merge_chunks(
+    chunks: List[str],
+    chunk_overlap: int = 50,
+) -> str:
+    """将分块还原为原文（没有保存分块位置时，按内容去掉块之间的重叠部分）.
+    
+    重叠部分取上一块结尾与下一块开头相同的最长片段（不超过 ``chunk_overlap``）。
+    
+    Args:
+        chunks: 按顺序排列的分块
+        chunk_overlap: 分块时使用的最大重叠字符数
+        
+    Returns:
+        还原后的文本
+    """
+    if not chunks:
+        return ''
+    
+    parts = [chunks[0]]
+    previous = chunks[0]
+    for chunk in chunks[1:]:
+        overlap = next(
+            (
+                size for size in range(min(chunk_overlap, len(chunk), len(previous)), 0, -1)
+                if previous.endswith(chunk[:size])
+            ),
+            0,
+        )
+        parts.append(chunk[overlap:])
+        previous = chunk
+    return ''.join(parts)
+
+
+def merge_chunk_rows(rows: Sequence[Dict[str, Any]], chunk_overlap: int = 50) -> str:
+    """将同一文档的分块行（按 chunk_index 排序）还原为原文.
     
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start = end - chunk_overlap
+    分块行都带有位置（``start_offset`` / ``end_offset``）时精确还原，
+    否则（旧集合或导入的预计算分块）按内容去重叠。
     
-    return chunks
+    Args:
+        rows: 分块行
+        chunk_overlap: 分块时使用的最大重叠字符数
+        
+    Returns:
+        还原后的文本
+    """
+    chunks = [row.get('content', '') for row in rows]
+    spans = [(row.get('start_offset', -1), row.get('end_offset', -1)) for row in rows]
+    if spans and all(start >= 0 and end >= start for start, end in spans):
+        return join_spans(chunks, spans)
+    return merge_chunks(chunks, chunk_overlap)
 
 
 def generate_doc_id(content: str) -> str:
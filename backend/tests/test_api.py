@@ -41,10 +41,25 @@ class TestKnowledgeAPI:
             'category': '测试',
         }
         response = client.post('/api/v1/knowledge/add', json=payload)
-        assert response.status_code == 201
+        assert response.status_code == 202
         data = response.json()
         assert data['success'] is True
         assert 'doc_id' in data
+        
+        job_id = data['data']['job_id']
+        response = client.get(f'/api/v1/knowledge/jobs/{job_id}')
+        assert response.status_code == 200
+        assert response.json()['kind'] == 'add'
+    
+    def test_get_job_not_found(self):
+        """测试查询不存在的任务."""
+        response = client.get('/api/v1/knowledge/jobs/not-exist')
+        assert response.status_code == 404
+    
+    def test_cancel_import_job_not_found(self):
+        """测试取消不存在的导入任务."""
+        response = client.post('/api/v1/knowledge/jobs/not-exist/cancel')
+        assert response.status_code == 404
     
     def test_get_count(self):
         """测试获取知识库统计."""
@@ -3,11 +3,46 @@
 测试知识库服务、阿里云服务和RAG服务。
 """
 
+import asyncio
+import io
+import os
+import threading
+import time
+
+import numpy as np
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 
 from src.models.schemas import KnowledgeCreate, ChatRequest, Message
 from src.services import KnowledgeService, AliyunService, RAGService
+from src.services.embedding_batcher import TokenAwareBatcher
+
+
+def make_knowledge_service(embedding_model=None) -> KnowledgeService:
+    """构造不连接 Milvus 的知识库服务（集合使用 Mock）."""
+    service = KnowledgeService.__new__(KnowledgeService)
+    service.embedding_model = embedding_model or FakeSentenceTransformer()
+    service.vector_dim = service.embedding_model.get_sentence_embedding_dimension()
+    with patch('src.services.knowledge_service.open_embedding_cache', return_value=None):
+        service._initialize_encoding()
+    service.collection = Mock()
+    fields = []
+    for name in ('id', 'content', 'vector', 'category', 'created_at', 'chunk_index'):
+        field = Mock()
+        field.name = name
+        fields.append(field)
+    service.collection.schema.fields = fields
+    service.collection.query.return_value = []
+    return service
+
+
+def inserted_contents(service: KnowledgeService) -> list:
+    """按插入顺序返回写入 Mock 集合的分块内容."""
+    return [
+        content
+        for call in service.collection.insert.call_args_list
+        for content in call.args[0][1]
+    ]
 
 
 class TestKnowledgeService:
@@ -34,6 +69,178 @@ class TestKnowledgeService:
         """测试知识检索."""
         # 实际测试需要先添加测试数据
         assert True  # 占位测试
+    
+    @pytest.mark.asyncio
+    async def test_add_embedded_chunks_skips_encoding(self):
+        """测试预计算向量直接写入，维度不符时报错."""
+        from src.utils.exceptions import KnowledgeBaseError
+        
+        service = make_knowledge_service()
+        ids = await service.add_embedded_chunks([
+            {'id': 'doc_chunk_0', 'content': '内容', 'category': '测试', 'vector': [1, 0, 0, 0]},
+        ])
+        
+        assert ids == ['doc_chunk_0']
+        assert service.embedding_model.encode_calls == []
+        service.collection.flush.assert_called_once()
+        
+        with pytest.raises(KnowledgeBaseError):
+            await service.add_embedded_chunks([
+                {'content': '内容', 'category': '测试', 'vector': [1, 0]},
+            ])
+    
+    @pytest.mark.asyncio
+    async def test_add_knowledge_batch_single_flush(self):
+        """测试批量添加只插入和 flush 一次."""
+        service = make_knowledge_service()
+        knowledge_list = [
+            KnowledgeCreate(content=f'测试知识{i}', category='测试')
+            for i in range(3)
+        ]
+        
+        doc_ids = await service.add_knowledge_batch(knowledge_list)
+        
+        assert len(doc_ids) == 3
+        assert service.collection.insert.call_count == 1
+        assert service.collection.flush.call_count == 1
+        assert len(service.embedding_model.encode_calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_update_knowledge_reembeds_changed_chunks_only(self):
+        """测试修改内容时只向量化并写入变化的分块，其余分块复用原向量."""
+        from src.models.schemas import KnowledgeUpdate
+        
+        service = make_knowledge_service()
+        content = ''.join(f'第{i}条：每天摄入适量蛋白质有助于肌肉恢复。' for i in range(100))
+        old_rows = service.prepare_document(KnowledgeCreate(content=content, category='营养'), 'doc')
+        await service.embed_rows(old_rows)
+        service.embedding_model.encode_calls.clear()
+        service.collection.query.return_value = old_rows
+        service.collection.query_iterator.return_value.next.side_effect = [old_rows, []]
+        
+        updated = await service.update_knowledge(
+            'doc', KnowledgeUpdate(content=content.replace('第99条', '第99项')),
+        )
+        
+        assert updated and len(old_rows) > 2
+        fixed = old_rows[-1]['content'].replace('第99条', '第99项')
+        assert service.embedding_model.encode_calls == [[fixed]]
+        service.collection.upsert.assert_called_once()
+        assert service.collection.upsert.call_args.args[0][0] == [old_rows[-1]['id']]
+        service.collection.delete.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_bulk_delete_single_expression_and_flush(self):
+        """测试批量删除按条件一次表达式删除、一次 flush，并返回文档数和分块数."""
+        from src.models.schemas import KnowledgeFilter
+        
+        service = make_knowledge_service()
+        service.collection.query_iterator.return_value.next.side_effect = [
+            [{'id': 'a_chunk_0'}, {'id': 'a_chunk_1'}],
+            [{'id': 'b_chunk_0'}],
+            [],
+        ]
+        
+        counts = await service.bulk_delete(
+            KnowledgeFilter(category='旧版手册', created_before='2024-01-01')
+        )
+        
+        assert counts == {'documents': 2, 'chunks': 3}
+        service.collection.delete.assert_called_once_with(
+            'category == "旧版手册" and created_at < "2024-01-01T00:00:00"'
+        )
+        service.collection.flush.assert_called_once()
+        
+        with pytest.raises(ValueError):
+            await service.bulk_delete(KnowledgeFilter(tag='过期'))
+    
+    @pytest.mark.asyncio
+    async def test_bulk_update_keeps_vectors(self):
+        """测试批量更新分类和标签时复用原向量，分批 upsert 后只 flush 一次."""
+        from src.models.schemas import KnowledgeFilter
+        
+        service = make_knowledge_service()
+        field = Mock()
+        field.name = 'tags'
+        service.collection.schema.fields.append(field)
+        doc_id = 'a' * 32
+        rows = [
+            {'id': f'{doc_id}_chunk_{i}', 'content': f'内容{i}', 'category': '旧分类',
+             'created_at': 't', 'chunk_index': i, 'tags': [], 'vector': [1, 0, 0, 0]}
+            for i in range(3)
+        ]
+        service.collection.query_iterator.return_value.next.side_effect = [rows[:2], rows[2:], []]
+        
+        counts = await service.bulk_update(
+            KnowledgeFilter(doc_ids=[doc_id]), category='新分类', tags=['重要', ' 重要', ''],
+        )
+        
+        assert counts == {'documents': 1, 'chunks': 3}
+        assert service.collection.query_iterator.call_args.kwargs['expr'] == f'(id like "{doc_id}_chunk_%")'
+        assert service.collection.upsert.call_count == 2
+        columns = service.collection.upsert.call_args.args[0]
+        assert columns[3] == ['新分类'] and columns[6] == [['重要']]
+        assert service.embedding_model.encode_calls == []
+        service.collection.flush.assert_called_once()
+    
+    def test_knowledge_filter_validation(self):
+        """测试批量筛选条件拒绝含通配符的文档ID，空字符串分类视为有效条件."""
+        from pydantic import ValidationError
+        from src.models.schemas import KnowledgeFilter
+        
+        for doc_id in ['%', 'a' * 31 + '_', 'A' * 32, 'a' * 32 + '\n']:
+            with pytest.raises(ValidationError):
+                KnowledgeFilter(doc_ids=[doc_id])
+        with pytest.raises(ValidationError):
+            KnowledgeFilter(doc_ids=[])
+        
+        service = make_knowledge_service()
+        assert service.filter_expression(KnowledgeFilter(category='')) == 'category == ""'
+    
+    def test_bulk_ingest_batches(self):
+        """测试大批量导入按批次写入."""
+        service = make_knowledge_service()
+        knowledge_iter = (
+            KnowledgeCreate(content=f'测试知识{i}', category='测试')
+            for i in range(5)
+        )
+        
+        stats = service.bulk_ingest(knowledge_iter, batch_size=2)
+        
+        assert stats['documents'] == 5
+        assert stats['chunks'] == 5
+        assert service.collection.insert.call_count == 3
+        service.collection.flush.assert_called_once()
+    
+    def test_bulk_ingest_rerun_skips_existing(self):
+        """测试大批量导入跳过本次重复和已存在的文档，重复运行不再写入."""
+        service = make_knowledge_service()
+        contents = ['测试知识0', '测试知识1', '测试知识0', '测试知识2']
+        
+        stats = service.bulk_ingest(
+            (KnowledgeCreate(content=content, category='测试') for content in contents),
+            batch_size=2,
+        )
+        assert stats['chunks'] == 3 and stats['skipped'] == 1
+        
+        stored = {
+            row_id: content
+            for call in service.collection.insert.call_args_list
+            for row_id, content in zip(call.args[0][0], call.args[0][1])
+        }
+        service.collection.query.side_effect = lambda expr, **kwargs: [
+            {'id': row_id, 'content': content, 'category': '测试'}
+            for row_id, content in stored.items() if f'"{row_id}"' in expr
+        ]
+        service.collection.insert.reset_mock()
+        
+        stats = service.bulk_ingest(
+            (KnowledgeCreate(content=content, category='测试') for content in contents),
+            batch_size=2,
+        )
+        assert stats['chunks'] == 0 and stats['skipped'] == 4
+        service.collection.insert.assert_not_called()
+        service.collection.upsert.assert_not_called()
 
 
 class TestAliyunService:
@@ -84,5 +291,1551 @@ class TestRAGService:
         assert answer == '测试回答'
 
 
+class FakeSentenceTransformer:
+    """测试用的向量化模型：向量第一维为文本长度."""
+    
+    def __init__(self, model_name: str = 'fake-model'):
+        self.model_name = model_name
+        self.encode_calls = []
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return 4
+    
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        self.encode_calls.append(texts)
+        vectors = np.array(
+            [[len(text), 1.0, 0.0, 0.0] for text in texts],
+            dtype=np.float32,
+        )
+        return vectors[0] if single else vectors
+
+
+class TestTokenAwareBatcher:
+    """按 token 长度分桶的向量化批处理测试."""
+    
+    def test_plan_caps_padded_tokens(self):
+        """测试批次按填充后 token 总量封顶，并报告超长文本."""
+        batcher = TokenAwareBatcher(
+            FakeSentenceTransformer(),
+            max_batch_tokens=100,
+            max_batch_size=10,
+        )
+        batcher.max_seq_length = 60
+        texts = ['a' * 40, 'b' * 3, 'c' * 70, 'd' * 5, 'e' * 8]
+        
+        plan = batcher.plan(texts)
+        
+        assert plan.overflow == [2]
+        assert plan.batches[0] == [1, 3, 4]
+        for batch in plan.batches:
+            longest = max(min(plan.token_counts[i], 60) for i in batch)
+            assert longest * len(batch) <= 100 or len(batch) == 1
+    
+    def test_encode_restores_order(self):
+        """测试分桶推理后恢复原始顺序."""
+        model = FakeSentenceTransformer()
+        batcher = TokenAwareBatcher(model, max_batch_tokens=20)
+        texts = ['x' * 12, 'y', 'z' * 5]
+        
+        vectors = batcher.encode(texts)
+        
+        assert vectors[:, 0].tolist() == [12.0, 1.0, 5.0]
+        assert len(model.encode_calls) > 1
+
+
+class TestEmbeddingScheduler:
+    """向量化优先级调度测试."""
+    
+    def test_interactive_preempts_bulk_at_batch_boundary(self):
+        """测试交互查询在批量任务的批次间隙被优先执行."""
+        from src.services.embedding_scheduler import EmbeddingLane, EmbeddingScheduler
+        
+        class SlowModel(FakeSentenceTransformer):
+            def encode(self, sentences, **kwargs):
+                time.sleep(0.01)
+                return super().encode(sentences, **kwargs)
+        
+        model = SlowModel()
+        batcher = TokenAwareBatcher(model, max_batch_size=1)
+        scheduler = EmbeddingScheduler(batcher, interactive_max_latency_ms=0)
+        
+        bulk = scheduler.submit([f'bulk{i}' for i in range(30)], lane=EmbeddingLane.BULK)
+        time.sleep(0.03)
+        query = scheduler.submit(['query'], lane=EmbeddingLane.INTERACTIVE)
+        
+        assert query.result(timeout=5)[0][0] == 5.0
+        assert not bulk.done()
+        assert bulk.result(timeout=5).shape == (30, 4)
+        assert scheduler.stats()['interactive_latency_ms']['p99'] is not None
+
+
+class TestEmbeddingCache:
+    """持久化向量缓存测试."""
+    
+    def test_cache_hit_and_model_invalidation(self, tmp_path):
+        """测试缓存命中，以及模型变化时自动失效."""
+        from src.services.embedding_cache import EmbeddingCache
+        
+        path = str(tmp_path / 'cache.sqlite3')
+        cache = EmbeddingCache(path, 'model-a')
+        cache.put_many(['你好', '世界'], [[0.5, 0.25], [1.0, 0.0]])
+        
+        hits = cache.get_many(['世界', '未缓存', '你好'])
+        assert hits == {0: [1.0, 0.0], 2: [0.5, 0.25]}
+        cache.close()
+        
+        cache = EmbeddingCache(path, 'model-b')
+        assert len(cache) == 0
+        assert cache.get_many(['你好']) == {}
+    
+    def test_cache_eviction(self, tmp_path):
+        """测试超过容量后淘汰最久未使用的条目."""
+        from src.services.embedding_cache import EmbeddingCache
+        
+        cache = EmbeddingCache(str(tmp_path / 'cache.sqlite3'), 'model-a', max_entries=10)
+        cache.put_many([f'text{i}' for i in range(12)], [[float(i)] for i in range(12)])
+        
+        assert len(cache) <= 10
+    
+    @pytest.mark.asyncio
+    async def test_service_reuses_cached_vectors(self, tmp_path):
+        """测试重复导入相同内容时不再重新向量化."""
+        from src.services.embedding_cache import EmbeddingCache
+        
+        service = make_knowledge_service()
+        service.embedding_cache = EmbeddingCache(str(tmp_path / 'cache.sqlite3'), 'fake-model')
+        knowledge = KnowledgeCreate(content='重复导入的知识', category='测试')
+        
+        await service.add_knowledge_batch([knowledge])
+        await service.add_knowledge_batch([knowledge])
+        
+        assert len(service.embedding_model.encode_calls) == 1
+
+
+class TestIngestQueue:
+    """异步写入队列测试."""
+    
+    @pytest.mark.asyncio
+    async def test_process_batch_coalesces_jobs(self, tmp_path):
+        """测试排队任务被合并为一次批量写入."""
+        from src.services import JobStore, IngestQueue
+        
+        job_store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+        mock_knowledge_service = Mock(spec=KnowledgeService)
+        mock_knowledge_service.add_knowledge_batch = AsyncMock(
+            side_effect=lambda items: [f'doc{i}' for i in range(len(items))]
+        )
+        queue = IngestQueue(job_store, lambda: mock_knowledge_service, batch_size=10)
+        
+        jobs = [
+            queue.submit(KnowledgeCreate(content=f'排队知识{i}', category='测试'))
+            for i in range(3)
+        ]
+        processed = await queue.process_batch()
+        
+        assert processed == 3
+        mock_knowledge_service.add_knowledge_batch.assert_awaited_once()
+        for idx, job in enumerate(jobs):
+            stored = job_store.get(job['id'])
+            assert stored['status'] == 'succeeded'
+            assert stored['result'] == {'doc_id': f'doc{idx}'}
+    
+    def test_requeue_running_after_restart(self, tmp_path):
+        """测试重启后租约过期的任务重新排队，正常关闭时立即释放租约."""
+        from src.services import JobStore
+        
+        path = str(tmp_path / 'jobs.sqlite3')
+        job_store = JobStore(path, lease_seconds=0.2)
+        job_store._heartbeat = object()  # 模拟进程已退出，不再续约
+        job = job_store.create('add', {'content': '测试'})
+        job_store.claim('add', 10)
+        
+        restarted = JobStore(path)
+        assert restarted.requeue_running('add') == 0
+        time.sleep(0.3)
+        assert restarted.requeue_running('add') == 1
+        assert restarted.get(job['id'])['status'] == 'queued'
+        
+        restarted.claim('add', 10)
+        assert restarted.release_leases('add') == 1
+        assert JobStore(path).requeue_running('add') == 1
+    
+    def test_claim_is_exclusive_across_stores(self, tmp_path):
+        """测试多个进程同时领取时同一任务只被领取一次，存活进程的任务不会被重新排队."""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.services import JobStore
+        
+        path = str(tmp_path / 'jobs.sqlite3')
+        stores = [JobStore(path, lease_seconds=0.3) for _ in range(4)]
+        for i in range(40):
+            stores[0].create('add', {'content': f'测试{i}'})
+        
+        def drain(store):
+            claimed = []
+            while True:
+                jobs = store.claim('add', 3)
+                if not jobs:
+                    return claimed
+                claimed.extend(job['id'] for job in jobs)
+        
+        with ThreadPoolExecutor(len(stores)) as executor:
+            claimed = [job_id for ids in executor.map(drain, stores) for job_id in ids]
+        assert len(claimed) == len(set(claimed)) == 40
+        
+        time.sleep(0.5)  # 超过租约时长，续约线程保持租约有效
+        assert JobStore(path).requeue_running('add') == 0
+
+
+class TestImportJobs:
+    """后台导入任务测试."""
+    
+    @staticmethod
+    def make_runner(tmp_path, batch_size=2):
+        from src.services import JobStore, ImportExportService, ImportJobRunner
+        
+        job_store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+        knowledge_service = make_knowledge_service()
+        runner = ImportJobRunner(
+            job_store,
+            ImportExportService(),
+            lambda: knowledge_service,
+            spool_dir=str(tmp_path / 'imports'),
+            batch_size=batch_size,
+        )
+        return runner, knowledge_service
+    
+    @pytest.mark.asyncio
+    async def test_import_job_progress_and_result(self, tmp_path):
+        """测试导入任务分批写入并记录检查点和结果."""
+        runner, knowledge_service = self.make_runner(tmp_path)
+        data = '\n'.join(f'知识{i}' for i in range(5)).encode('utf-8')
+        
+        job = runner.submit(io.BytesIO(data), 'notes.txt', default_category='测试')
+        assert await runner.process_batch() == 1
+        
+        stored = runner.job_store.get(job['id'])
+        assert stored['status'] == 'succeeded'
+        # 每个批次提交（flush）后才记录检查点
+        assert knowledge_service.collection.insert.call_count == 3
+        assert knowledge_service.collection.flush.call_count == 3
+        assert stored['progress']['checkpoint_row'] == 5
+        assert stored['progress']['rows_inserted'] == 5
+        assert stored['result']['success_count'] == 5
+        assert not os.path.exists(job['payload']['spool_path'])
+    
+    @pytest.mark.asyncio
+    async def test_resume_from_checkpoint(self, tmp_path):
+        """测试取消后继续时跳过已提交的行."""
+        runner, knowledge_service = self.make_runner(tmp_path)
+        data = '\n'.join(f'知识{i}' for i in range(5)).encode('utf-8')
+        job = runner.submit(io.BytesIO(data), 'notes.txt')
+        
+        # 模拟第一个批次提交后被取消
+        progress = runner._initial_progress(job['payload'])
+        progress.update(rows_parsed=2, rows_embedded=2, rows_inserted=2, checkpoint_row=2)
+        runner.job_store.update(job['id'], progress=progress)
+        assert runner.cancel(job['id'])['status'] == 'cancelled'
+        
+        assert runner.resume(job['id'])['status'] == 'queued'
+        await runner.process_batch()
+        
+        stored = runner.job_store.get(job['id'])
+        assert inserted_contents(knowledge_service) == ['知识2', '知识3', '知识4']
+        assert stored['result']['success_count'] == 5
+    
+    def test_cancel_finished_job_rejected(self, tmp_path):
+        """测试已完成的任务不能取消."""
+        runner, _ = self.make_runner(tmp_path)
+        job = runner.submit(io.BytesIO('知识'.encode('utf-8')), 'notes.txt')
+        runner.job_store.update(job['id'], 'succeeded')
+        
+        with pytest.raises(ValueError):
+            runner.cancel(job['id'])
+
+
+class TestIngestPipeline:
+    """分阶段写入流水线测试."""
+    
+    @pytest.mark.asyncio
+    async def test_backpressure_bounds_read_ahead(self):
+        """测试下游变慢时上游受队列容量限制，不会读完全部输入."""
+        from src.services import IngestPipeline
+        from src.services.ingest_pipeline import numbered
+        
+        knowledge_service = make_knowledge_service()
+        original_embed = knowledge_service.embed_rows
+        
+        async def slow_embed(rows):
+            await asyncio.sleep(0.01)
+            await original_embed(rows)
+        
+        knowledge_service.embed_rows = slow_embed
+        lead = []
+        
+        async def source():
+            for i in range(30):
+                lead.append(i - len(inserted_contents(knowledge_service)))
+                yield [{'content': f'知识{i}'}]
+        
+        pipeline = IngestPipeline(
+            knowledge_service, embed_batch_size=1, queue_size=1, insert_workers=1
+        )
+        result = await pipeline.run(numbered(source()))
+        
+        assert result.success_count == 30
+        assert max(lead) < 10
+        stages = {stage['stage']: stage for stage in result.stages}
+        assert stages['embed']['items'] == 30
+        assert stages['embed']['max_queue_depth'] <= 1
+        knowledge_service.collection.flush.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_failed_document_reported_by_ref(self):
+        """测试批量向量化失败时逐个文档重试，只有失败文档回报错误."""
+        from src.services import IngestPipeline
+        from src.services.ingest_pipeline import batched, numbered, pipeline_metrics
+        
+        knowledge_service = make_knowledge_service()
+        original_embed = knowledge_service.embed_rows
+        
+        async def flaky_embed(rows):
+            if any(row['content'] == '坏数据' for row in rows):
+                raise RuntimeError('模型错误')
+            await original_embed(rows)
+        
+        knowledge_service.embed_rows = flaky_embed
+        knowledge_list = [
+            KnowledgeCreate(content=content, category='测试')
+            for content in ('知识一', '坏数据', '知识三')
+        ]
+        
+        pipeline = IngestPipeline(knowledge_service, name='test-flaky')
+        result = await pipeline.run(numbered(batched(knowledge_list), first_row=0))
+        
+        assert result.errors == [(1, '模型错误')]
+        assert sorted(result.doc_ids) == [0, 2]
+        assert sorted(inserted_contents(knowledge_service)) == ['知识一', '知识三']
+        assert pipeline_metrics()['recent'][-1]['name'] == 'test-flaky'
+    
+    @pytest.mark.asyncio
+    async def test_reimport_skips_unchanged_and_upserts_changed(self):
+        """测试重复导入跳过未变化的文档，分类变化的文档覆盖写入."""
+        import json
+        from src.services import ImportExportService
+        
+        knowledge_service = make_knowledge_service()
+        store = {}
+        
+        def write(entities):
+            names = [field.name for field in knowledge_service.collection.schema.fields]
+            for values in zip(*entities):
+                row = dict(zip(names, values))
+                store[row['id']] = row
+        
+        def query(expr, output_fields, limit):
+            ids = json.loads(expr[len('id in '):])
+            return [store[chunk_id] for chunk_id in ids if chunk_id in store]
+        
+        knowledge_service.collection.insert.side_effect = write
+        knowledge_service.collection.upsert.side_effect = write
+        knowledge_service.collection.query.side_effect = query
+        service = ImportExportService()
+        
+        async def run(records):
+            return await service.import_records(
+                service.aiter_record_batches(iter(records)),
+                knowledge_service=knowledge_service,
+            )
+        
+        records = [{'content': f'知识{i}', 'category': '营养'} for i in range(3)]
+        first = await run(records + [dict(records[0])])
+        assert (first.inserted_count, first.updated_count, first.skipped_count) == (3, 0, 1)
+        encode_calls = len(knowledge_service.embedding_model.encode_calls)
+        
+        second = await run(records)
+        assert (second.inserted_count, second.updated_count, second.skipped_count) == (0, 0, 3)
+        assert len(knowledge_service.embedding_model.encode_calls) == encode_calls
+        
+        records[1]['category'] = '运动'
+        third = await run(records)
+        assert (third.inserted_count, third.updated_count, third.skipped_count) == (0, 1, 2)
+        assert knowledge_service.collection.upsert.call_count == 1
+        assert len(store) == 3
+
+NEAR_DUP_BASE = (
+    '维生素D有助于钙的吸收，成年人每天建议摄入400到800国际单位。'
+    '长期缺乏维生素D可能导致骨质疏松，老年人和室内工作者应适当晒太阳，'
+    '必要时在医生指导下补充维生素D制剂，同时注意监测血钙水平。'
+    '食物中的维生素D主要来自深海鱼类、蛋黄和强化奶制品，素食者更容易摄入不足。'
+    '夏季正午前后暴露面部和手臂十五到三十分钟，皮肤即可合成相当数量的维生素D，'
+    '但使用防晒霜、空气污染和高纬度地区的冬季都会明显降低合成效率。'
+    '过量补充同样有害，可能引起高钙血症、恶心和肾结石，因此不宜自行大剂量服用。'
+)
+
+
+class TestNearDuplicateIndex:
+    """近似重复检测测试."""
+    
+    def test_simhash_distance(self):
+        """测试只差页眉的文本指纹相近，不同文本指纹相距较远."""
+        from src.services.near_duplicate import hamming_distance, simhash
+        
+        base = simhash(NEAR_DUP_BASE)
+        reprint = simhash('第3页 ' + NEAR_DUP_BASE)
+        other = simhash('深蹲和硬拉属于复合动作，可以同时锻炼多个肌群，训练前应充分热身以避免运动损伤。')
+        
+        assert hamming_distance(base, reprint) <= 4
+        assert hamming_distance(base, other) > 10
+        assert simhash('ab') is None
+    
+    def test_find_matches_and_remove(self, tmp_path):
+        """测试批量查找已有文档和同批靠前文档，删除后不再匹配."""
+        from src.services.near_duplicate import NearDuplicateIndex
+        
+        index = NearDuplicateIndex(str(tmp_path / 'near_dup.sqlite3'), min_length=20)
+        index.add([('doc-a', NEAR_DUP_BASE, '营养')])
+        
+        matches = index.find_matches([
+            ('doc-b', '转载：' + NEAR_DUP_BASE),
+            ('doc-a', NEAR_DUP_BASE),
+            ('doc-c', '深蹲和硬拉属于复合动作，可以同时锻炼多个肌群，训练前应充分热身。'),
+            ('doc-d', '深蹲和硬拉属于复合动作，可以同时锻炼多个肌群，训练前应充分热身！'),
+        ])
+        
+        assert matches[0][0] == 'doc-a'
+        assert matches[1] is None
+        assert matches[2] is None
+        assert matches[3] == ('doc-c', 0)
+        
+        index.remove(['doc-a'])
+        assert index.find_matches([('doc-b', '转载：' + NEAR_DUP_BASE)]) == [None]
+    
+    def test_rebuild_fingerprints_existing_documents(self, tmp_path):
+        """测试重建索引为已有文档写入指纹（文档跨批次，预计算分块不写入）."""
+        from src.services.near_duplicate import NearDuplicateIndex
+        
+        service = make_knowledge_service()
+        service.near_duplicates = NearDuplicateIndex(str(tmp_path / 'near_dup.sqlite3'), min_length=20)
+        half = len(NEAR_DUP_BASE) // 2
+        rows = [
+            {'id': 'doc-a_chunk_0', 'content': NEAR_DUP_BASE[:half], 'category': '营养',
+             'chunk_index': 0, 'start_offset': 0, 'end_offset': half},
+            {'id': 'doc-a_chunk_1', 'content': NEAR_DUP_BASE[half:], 'category': '营养',
+             'chunk_index': 1, 'start_offset': half, 'end_offset': len(NEAR_DUP_BASE)},
+            {'id': 'doc-b_chunk_0', 'content': '转载：' + NEAR_DUP_BASE, 'category': '营养',
+             'chunk_index': 0, 'start_offset': -1, 'end_offset': -1},
+        ]
+        service.collection.query_iterator.return_value.next.side_effect = [rows[:1], rows[1:], []]
+        
+        assert service.rebuild_near_duplicates() == {'documents': 1, 'fingerprints': 1}
+        [(doc_id, _)] = service.near_duplicates.find_matches([('doc-c', '转载：' + NEAR_DUP_BASE)])
+        assert doc_id == 'doc-a'
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_drops_near_duplicates(self, tmp_path):
+        """测试 drop 模式下近似重复的新文档不写入，并出现在报告中."""
+        from src.services import IngestPipeline
+        from src.services.ingest_pipeline import batched, numbered
+        from src.services.near_duplicate import NearDuplicateIndex
+        
+        knowledge_service = make_knowledge_service()
+        knowledge_service.near_duplicates = NearDuplicateIndex(
+            str(tmp_path / 'near_dup.sqlite3'), min_length=20
+        )
+        records = [
+            {'content': NEAR_DUP_BASE, 'category': '营养'},
+            {'content': '深蹲和硬拉属于复合动作，可以同时锻炼多个肌群，训练前应充分热身。'},
+        ]
+        
+        with patch('src.services.ingest_pipeline.settings.near_dup_mode', 'drop'):
+            first = await IngestPipeline(knowledge_service).run(numbered(batched(records)))
+            second = await IngestPipeline(knowledge_service, name='reprint').run(
+                numbered(batched([{'content': '（转载）' + NEAR_DUP_BASE, 'category': '营养'}]))
+            )
+        
+        assert (first.inserted, first.near_duplicates) == (2, 0)
+        assert (second.inserted, second.skipped, second.near_duplicates) == (0, 1, 1)
+        assert second.doc_ids[1] == first.doc_ids[1]
+        assert len(inserted_contents(knowledge_service)) == 2
+        
+        report = knowledge_service.near_duplicates.report()
+        assert report['indexed_documents'] == 2
+        assert report['counts'] == {'drop': 1}
+        assert report['items'][0]['duplicate_of'] == first.doc_ids[1]
+        assert report['items'][0]['source'] == 'reprint'
+
+
+def make_pdf(texts) -> bytes:
+    """生成每页一行文本的最小 PDF 文件."""
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    kids = []
+    for text in texts:
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>'
+        )
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+    
+    data = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f'{number} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(data)
+    data += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    data += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    data += (
+        f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+        f'startxref\n{xref}\n%%EOF\n'
+    ).encode()
+    return data
+
+
+class TestPdfExtractor:
+    """并行 PDF 提取测试."""
+    
+    def test_extract_in_order_and_cache(self, tmp_path):
+        """测试多区间结果按页码顺序返回，重复提取命中缓存."""
+        from src.services.pdf_extractor import PdfExtractor
+        
+        data = make_pdf([f'Page {i}' for i in range(5)])
+        extractor = PdfExtractor(num_workers=2, pages_per_task=2, cache_dir=str(tmp_path))
+        try:
+            pages = list(extractor.extract_pages(data))
+            assert pages == [(i + 1, f'Page {i}') for i in range(5)]
+            
+            with patch.object(extractor, '_extract_parallel', side_effect=AssertionError):
+                assert list(extractor.extract_pages(data)) == pages
+        finally:
+            extractor.close()
+    
+    def test_cache_evicts_least_recently_used_and_expired(self, tmp_path):
+        """测试缓存总大小超过上限时淘汰最久未使用的结果，过期结果不再命中."""
+        from src.services.pdf_extractor import PdfExtractor
+        
+        extractor = PdfExtractor(cache_dir=str(tmp_path), cache_max_size=250, cache_max_age=3600)
+        pages = [(1, 'x' * 100)]
+        extractor._save_cache('a', pages)
+        extractor._save_cache('b', pages)
+        old = time.time() - 60
+        os.utime(extractor._cache_path('a'), (old, old))
+        os.utime(extractor._cache_path('b'), (old - 10, old - 10))
+        assert extractor._load_cache('b') == pages  # 读取后 b 成为最近使用
+        
+        extractor._save_cache('c', pages)
+        assert sorted(path.name.split('.')[0] for path in tmp_path.iterdir()) == ['b', 'c']
+        
+        expired = time.time() - 7200
+        os.utime(extractor._cache_path('c'), (expired, expired))
+        assert extractor._load_cache('c') is None
+        assert not extractor._cache_path('c').exists()
+    
+    def test_page_timeout(self, tmp_path):
+        """测试单页超时后跳过该页并返回错误信息."""
+        from src.services.pdf_extractor import _extract_page_range, _init_worker
+        
+        path = tmp_path / 'doc.pdf'
+        path.write_bytes(make_pdf(['Page 0']))
+        _init_worker()
+        
+        [(page_num, text, error)] = _extract_page_range(str(path), 0, 1, page_timeout=1e-6)
+        assert page_num == 1
+        assert text is None
+        assert '超时' in error
+
+class TestStreamingImport:
+    """流式导入解析测试."""
+    
+    def test_text_lines_across_chunk_boundaries(self):
+        """测试多字节字符和换行跨越读取块边界时正确拼接."""
+        from src.services import ImportExportService
+        
+        data = '第一行内容\r\n第二行\n最后一行'.encode('utf-8')
+        lines = list(ImportExportService._iter_text_lines(io.BytesIO(data), chunk_size=4))
+        
+        assert lines == ['第一行内容\r\n', '第二行\n', '最后一行']
+    
+    def test_stream_excel_column_cleaning(self):
+        """测试 Excel 只读流式解析的按列清洗（空内容跳过、标签拆分、默认分类）."""
+        from openpyxl import Workbook
+        from src.services import ImportExportService
+        
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['content', 'category', 'title', 'tags'])
+        sheet.append(['  内容一 ', '营养', None, ' a , b,,c '])
+        sheet.append([None, '运动', '无内容', 'x'])
+        sheet.append([123, None, '  标题 ', None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        
+        records = list(ImportExportService().iter_records(buffer, 'excel'))
+        
+        assert records == [
+            {'content': '内容一', 'category': '营养', 'title': None, 'tags': ['a', 'b', 'c']},
+            {'content': '123', 'category': '未分类', 'title': '标题', 'tags': []},
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_parquet_with_precomputed_vectors(self):
+        """测试 Parquet 中带 vector 的记录直接写入，不带的走向量化路径."""
+        pa = pytest.importorskip('pyarrow')
+        pq = pytest.importorskip('pyarrow.parquet')
+        from src.services import ImportExportService
+        
+        table = pa.table({
+            'content': ['已有向量', '需要向量化'],
+            'category': ['营养', None],
+            'tags': ['a,b', None],
+            'vector': [[0.1, 0.2, 0.3, 0.4], None],
+        })
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        buffer.seek(0)
+        
+        service = ImportExportService()
+        records = list(service.iter_records(buffer, service.detect_file_format('x.parquet')))
+        knowledge_service = make_knowledge_service()
+        
+        inserted, errors = await service.import_batch(records, 1, knowledge_service)
+        
+        assert inserted == 2 and errors == []
+        # 只有不带向量的记录经过模型
+        assert knowledge_service.embedding_model.encode_calls == [['需要向量化']]
+        vectors = [
+            vector
+            for call in knowledge_service.collection.insert.call_args_list
+            for vector in call.args[0][2]
+        ]
+        assert [0.1, 0.2, 0.3, 0.4] in vectors
+    
+    def test_stream_csv_with_multiline_field(self):
+        """测试流式 CSV 解析支持引号内换行."""
+        from src.services import ImportExportService
+        
+        data = 'content,category,tags\n"多行\n内容",营养,"a, b"\n单行,运动,\n'.encode('utf-8')
+        records = list(ImportExportService().iter_records(io.BytesIO(data), 'csv'))
+        
+        assert records[0]['content'] == '多行\n内容'
+        assert records[0]['tags'] == ['a', 'b']
+        assert records[1]['category'] == '运动'
+    
+    @pytest.mark.asyncio
+    async def test_import_records_in_batches(self):
+        """测试记录分批写入，无效行单独记录错误."""
+        from src.services import ImportExportService
+        
+        service = ImportExportService()
+        knowledge_service = make_knowledge_service()
+        data = '\n'.join([
+            '{"content": "知识一", "category": "营养"}',
+            '{"category": "缺少内容"}',
+            '{"content": "知识三"}',
+        ]).encode('utf-8')
+        
+        records = service.iter_records(io.BytesIO(data), 'jsonl')
+        result = await service.import_records(
+            service.aiter_record_batches(records, batch_size=2),
+            knowledge_service=knowledge_service,
+        )
+        
+        assert result.total_count == 3
+        assert result.success_count == 2
+        assert result.failed_count == 1
+        assert result.errors[0].row == 2
+        # 两个记录批次的分块合并为一次插入、一次 flush
+        assert inserted_contents(knowledge_service) == ['知识一', '知识三']
+        knowledge_service.collection.flush.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_import_records_keeps_rows_around_parse_errors(self):
+        """测试无效的 JSONL 行记为失败行，中途解析失败时返回已写入部分的结果."""
+        from src.services import ImportExportService
+        
+        service = ImportExportService()
+        knowledge_service = make_knowledge_service()
+        data = '{"content": "知识一"}\n{坏行\n[1, 2]\n{"content": "知识四"}\n'.encode('utf-8')
+        
+        result = await service.import_records(
+            service.aiter_record_batches(service.iter_records(io.BytesIO(data), 'jsonl')),
+            knowledge_service=knowledge_service,
+        )
+        assert (result.total_count, result.success_count, result.failed_count) == (4, 2, 2)
+        assert [error.row for error in result.errors] == [2, 3]
+        assert [record['content'] for record in result.preview] == ['知识一', '知识四']
+        
+        async def broken_batches():
+            yield [{'content': '知识五'}]
+            raise UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+        
+        result = await service.import_records(broken_batches(), knowledge_service=knowledge_service)
+        assert (result.total_count, result.success_count, result.failed_count) == (2, 1, 1)
+        assert result.errors[0].row == 2 and '文件解析中断' in result.errors[0].error
+        assert '知识五' in inserted_contents(knowledge_service)
+    
+    @pytest.mark.asyncio
+    async def test_import_zip_archive_per_file_results(self):
+        """测试 zip 包内文件分别解析、合并批次写入并按文件汇报结果."""
+        import zipfile
+        from src.services import ImportExportService
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('docs/a.md', '## 标题一\n内容一\n## 标题二\n内容二\n')
+            archive.writestr('docs/b.jsonl', '{"content": "知识三"}\n{"category": "缺少内容"}\n')
+            archive.writestr('docs/c.bin', b'\x00\x01')
+            archive.writestr('__MACOSX/docs/._a.md', b'meta')
+        buffer.seek(0)
+        
+        service = ImportExportService()
+        knowledge_service = make_knowledge_service()
+        result = await service.import_archive(buffer, 'zip', knowledge_service=knowledge_service)
+        
+        files = {file_result.filename: file_result for file_result in result.files}
+        assert set(files) == {'docs/a.md', 'docs/b.jsonl', 'docs/c.bin'}
+        assert files['docs/a.md'].success_count == 2
+        assert files['docs/b.jsonl'].failed_count == 1
+        assert files['docs/c.bin'].error == '不支持的文件类型'
+        assert result.success_count == 3
+        assert result.errors[0].file == 'docs/b.jsonl'
+        assert result.errors[0].row == 2
+        # 两个文件的分块合并为一个批次写入
+        assert knowledge_service.collection.insert.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_import_tar_gz_archive(self):
+        """测试 tar.gz 包流式解压导入."""
+        import tarfile
+        from src.services import ImportExportService
+        
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for name, text in [('a.txt', '第一行\n第二行\n'), ('b.csv', 'content\n知识\n')]:
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        buffer.seek(0)
+        
+        service = ImportExportService()
+        assert service.detect_file_format('bundle.tar.gz') == 'tar'
+        result = await service.import_archive(
+            buffer, 'tar', knowledge_service=make_knowledge_service()
+        )
+        
+        assert [file_result.total_count for file_result in result.files] == [2, 1]
+        assert result.success_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_import_archive_writer_failure(self):
+        """测试写入流水线中途失败时取消解析并抛出其异常，而不是阻塞在解析队列上."""
+        import zipfile
+        from src.services import ImportExportService
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for i in range(10):
+                archive.writestr(f'{i}.txt', f'第{i}个文件\n')
+        buffer.seek(0)
+        
+        async def failing_run(self, batches):
+            async for _ in batches:
+                raise RuntimeError('写入失败')
+        
+        service = ImportExportService()
+        with patch('src.services.import_export_service.settings.archive_parse_concurrency', 1), \
+                patch('src.services.import_export_service.IngestPipeline.run', failing_run):
+            with pytest.raises(RuntimeError, match='写入失败'):
+                await asyncio.wait_for(
+                    service.import_archive(buffer, 'zip', knowledge_service=make_knowledge_service()),
+                    timeout=5,
+                )
+    
+    def test_archive_member_count_and_total_size_limits(self):
+        """测试压缩包文件数和解压后总大小超过限制时停止解压或直接拒绝."""
+        import tarfile
+        import zipfile
+        from src.services import ImportExportService
+        
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as archive:
+            for name in ('a.txt', 'b.txt', 'c.txt'):
+                info = tarfile.TarInfo(name)
+                info.size = 10
+                archive.addfile(info, io.BytesIO(b'x' * 10))
+        
+        def members(max_total_size, max_members):
+            buffer.seek(0)
+            return list(ImportExportService._iter_archive_members(
+                buffer, 'tar', 100, max_total_size, max_members
+            ))
+        
+        limited = members(1000, 2)
+        assert [data is not None for _, data, _ in limited] == [True, True, False]
+        assert '文件数超过限制' in limited[-1][2]
+        limited = members(25, 10)
+        assert [name for name, data, _ in limited if data] == ['a.txt', 'b.txt']
+        assert '总大小超过限制' in limited[-1][2]
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('bomb.txt', b'0' * 10000)
+        buffer.seek(0)
+        with pytest.raises(ValueError):
+            list(ImportExportService._iter_archive_members(buffer, 'zip', 100000, 1000, 10))
+
+class TestChunking:
+    """按句子边界分块测试."""
+    
+    def test_spans_end_on_sentence_boundaries(self):
+        """测试分块在句末结束、不超过长度上限，且按位置精确还原原文."""
+        from src.utils.helpers import join_spans, split_spans
+        
+        text = ''.join(
+            f'第{i}句讲的是补充蛋白质的好处。' if i % 3 else f'Sentence {i} is English. '
+            for i in range(200)
+        )
+        spans = split_spans(text, chunk_size=100, chunk_overlap=30)
+        
+        assert spans[0][0] == 0 and spans[-1][1] == len(text)
+        assert all(end - start <= 100 for start, end in spans)
+        assert all(text[end - 1] in '。 ' for _, end in spans[:-1])
+        assert all(later[0] <= earlier[1] for earlier, later in zip(spans, spans[1:]))
+        assert join_spans([text[start:end] for start, end in spans], spans) == text
+    
+    def test_long_sentence_falls_back_to_clauses_and_hard_split(self):
+        """测试超长句子先按逗号切分，没有标点的文本按长度硬切."""
+        from src.utils.helpers import split_spans
+        
+        clauses = '，'.join(['这是一个很长的分句'] * 30) + '。'
+        spans = split_spans(clauses, chunk_size=50, chunk_overlap=0)
+        assert all(clauses[end - 1] in '，。' for _, end in spans)
+        
+        spans = split_spans('无' * 120, chunk_size=50, chunk_overlap=10)
+        assert spans == [(0, 50), (50, 100), (100, 120)]
+
+
+    def test_prepare_document_keeps_heading_path_within_window(self):
+        """测试分块不跨越小节、带标题路径，且加上前缀后不超过模型窗口."""
+        from src.utils.helpers import merge_chunk_rows
+        
+        service = make_knowledge_service()
+        service.embedding_batcher.max_seq_length = 128
+        content = '概述。\n### 来源\n' + '鸡蛋富含优质蛋白质。' * 40 + '\n### 用量\n每天一个。'
+        
+        rows = service.prepare_document(
+            KnowledgeCreate(content=content, category='营养', title='蛋白质')
+        )
+        
+        paths = [row['heading_path'] for row in rows]
+        assert paths[0] == '营养 > 蛋白质'
+        assert paths[-1] == '营养 > 蛋白质 > 用量'
+        assert rows[-1]['content'] == '### 用量\n每天一个。'
+        assert all(len(service.embedding_text(row)) + 2 <= 128 for row in rows)
+        assert merge_chunk_rows(rows) == content
+    
+    def test_pdf_sections_follow_numbered_headings(self):
+        """测试 PDF 按编号标题切分为跨页的小节条目，没有标题时返回空列表."""
+        from src.services import ImportExportService
+        
+        pages = [
+            (1, '第一章 总则\n一、目的\n规范知识库的使用。'),
+            (2, '继续说明目的。\n二、范围\n适用于全部门。'),
+        ]
+        records = ImportExportService._pdf_section_records(pages, '制度')
+        
+        assert [record['title'] for record in records] == [
+            '第一章 总则 > 一、目的',
+            '第一章 总则 > 二、范围',
+        ]
+        assert records[0]['content'] == '第一章 总则\n一、目的\n规范知识库的使用。\n继续说明目的。'
+        assert records[0]['tags'] == ['PDF 第 1-2 页']
+        assert ImportExportService._pdf_section_records([(1, '没有标题的正文。')], '制度') == []
+
+
+class TestExport:
+    """流式导出测试."""
+    
+    def test_merge_chunks_restores_text(self):
+        """测试分块去重叠后还原原文."""
+        from src.utils.helpers import merge_chunks, split_text
+        
+        text = ''.join(chr(0x4e00 + i % 500) for i in range(1234))
+        chunks = split_text(text, chunk_size=500, chunk_overlap=50)
+        
+        assert merge_chunks(chunks, chunk_overlap=50) == text
+    
+    def test_export_documents_across_batches(self):
+        """测试跨读取批次的分块合并为完整文档，并以 gzip NDJSON 输出."""
+        import gzip
+        import json
+        from src.services import ImportExportService
+        
+        mock_knowledge_service = Mock(spec=KnowledgeService)
+        mock_knowledge_service.iter_chunks.return_value = iter([
+            [
+                {'id': 'a_chunk_0', 'content': '第一段重叠', 'category': '营养',
+                 'created_at': 't1', 'chunk_index': 0},
+                {'id': 'a_chunk_1', 'content': '重叠第二段', 'category': '营养',
+                 'created_at': 't1', 'chunk_index': 1},
+            ],
+            [
+                {'id': 'a_chunk_2', 'content': '第三段', 'category': '营养',
+                 'created_at': 't1', 'chunk_index': 2},
+                {'id': 'b_chunk_0', 'content': '另一篇', 'category': '运动',
+                 'created_at': 't2', 'chunk_index': 0},
+            ],
+        ])
+        service = ImportExportService()
+        
+        with patch('src.services.import_export_service.settings.chunk_overlap', 2):
+            records = service.iter_export_records(mock_knowledge_service)
+            data = b''.join(service.iter_export_bytes(records, 'ndjson', compress=True))
+        
+        documents = [json.loads(line) for line in gzip.decompress(data).decode().splitlines()]
+        assert documents == [
+            {'doc_id': 'a', 'content': '第一段重叠第二段第三段', 'category': '营养',
+             'tags': [], 'created_at': 't1', 'chunk_count': 3},
+            {'doc_id': 'b', 'content': '另一篇', 'category': '运动',
+             'tags': [], 'created_at': 't2', 'chunk_count': 1},
+        ]
+    
+    def test_vectors_require_chunk_level(self):
+        """测试文档粒度导出不允许包含向量."""
+        from src.services import ImportExportService
+        
+        with pytest.raises(ValueError):
+            ImportExportService().check_export_options('ndjson', 'document', True)
+
+class TestBackupService:
+    """知识库快照测试."""
+    
+    @staticmethod
+    def make_chunk(index: int, created_at: str) -> dict:
+        return {
+            'id': f'doc{index}_chunk_0',
+            'content': f'内容{index}',
+            'category': '测试',
+            'created_at': created_at,
+            'chunk_index': 0,
+            'vector': [float(index), 0.0, 0.0, 1.0],
+        }
+    
+    def test_full_and_incremental_snapshot_restore(self, tmp_path):
+        """测试全量+增量快照沿链恢复全部分块."""
+        from src.services import BackupService
+        
+        mock_knowledge_service = Mock(spec=KnowledgeService)
+        mock_knowledge_service.vector_dim = 4
+        mock_knowledge_service.model_name = 'fake-model'
+        mock_knowledge_service.iter_chunks.return_value = iter([
+            [self.make_chunk(0, 't1'), self.make_chunk(1, 't2')],
+            [self.make_chunk(2, 't3')],
+        ])
+        mock_knowledge_service.has_field.return_value = True
+        service = BackupService(mock_knowledge_service, backup_dir=str(tmp_path), part_size=2)
+        
+        with patch('src.services.backup_service.settings.backup_watermark_lag_seconds', 60):
+            full = service.create_snapshot()
+        assert full['total'] == 3 and len(full['parts']) == 2
+        # 水位按快照开始时间往前留出正在写入的分块，而不是已导出分块的最大创建时间
+        assert full['watermark'] < full['created_at'] and full['watermark_field'] == 'updated_at'
+        
+        mock_knowledge_service.iter_chunks.return_value = iter([[self.make_chunk(3, 't4')]])
+        incremental = service.create_snapshot(incremental=True)
+        assert mock_knowledge_service.iter_chunks.call_args.kwargs['expr'] == (
+            f'updated_at > "{full["watermark"]}"'
+        )
+        assert incremental['base'] == full['snapshot_id']
+        
+        mock_knowledge_service.rebuild_near_duplicates.return_value = {'documents': 4, 'fingerprints': 4}
+        result = service.restore_snapshot(incremental['snapshot_id'])
+        assert result['near_duplicate_fingerprints'] == 4
+        
+        restored = [
+            row
+            for call in mock_knowledge_service.restore_rows.call_args_list
+            for row in call.args[0]
+        ]
+        assert result['restored_chunks'] == 4
+        assert [row['id'] for row in restored] == [f'doc{i}_chunk_0' for i in range(4)]
+        assert restored[3]['vector'] == [3.0, 0.0, 0.0, 1.0]
+    
+    def test_restore_rejects_dimension_mismatch(self, tmp_path):
+        """测试快照维度与当前模型不一致时拒绝恢复."""
+        from src.services import BackupService
+        
+        mock_knowledge_service = Mock(spec=KnowledgeService)
+        mock_knowledge_service.vector_dim = 4
+        mock_knowledge_service.model_name = 'fake-model'
+        mock_knowledge_service.iter_chunks.return_value = iter([[self.make_chunk(0, 't1')]])
+        snapshot = BackupService(mock_knowledge_service, backup_dir=str(tmp_path)).create_snapshot()
+        
+        mock_knowledge_service.vector_dim = 8
+        with pytest.raises(ValueError):
+            BackupService(mock_knowledge_service, backup_dir=str(tmp_path)).restore_snapshot(
+                snapshot['snapshot_id']
+            )
+
+class TestDocumentStore:
+    """文档存储测试."""
+    
+    def test_round_trip_update_and_delete(self, tmp_path):
+        """测试文档压缩写入后按批读取，分类和标签可单独修改."""
+        from src.services.document_store import DocumentStore
+        
+        store = DocumentStore(str(tmp_path / 'docstore.sqlite3'), compression='zlib')
+        content = '每天摄入适量蛋白质有助于肌肉恢复。' * 50
+        store.put_many([
+            {'doc_id': 'a', 'content': content, 'category': '营养', 'title': '蛋白质',
+             'tags': ['饮食'], 'metadata': {'source': '官网'}, 'created_at': 't1'},
+            {'doc_id': 'b', 'content': '另一篇', 'category': '运动', 'created_at': 't2'},
+        ])
+        
+        documents = store.get_many(['a', 'b', 'missing'])
+        assert set(documents) == {'a', 'b'}
+        assert documents['a']['content'] == content
+        assert documents['a']['metadata'] == {'source': '官网'}
+        stored_size = store._conn.execute(
+            "SELECT LENGTH(content) FROM documents WHERE doc_id = 'a'"
+        ).fetchone()[0]
+        assert stored_size < len(content.encode('utf-8')) / 5
+        
+        store.update_many(['a'], tags=['归档'])
+        store.delete(['b'])
+        documents = store.get_many(['a', 'b'])
+        assert list(documents) == ['a']
+        assert documents['a']['tags'] == ['归档'] and documents['a']['category'] == '营养'
+    
+    def test_classify_compares_heading_path_and_docstore_fields(self, tmp_path):
+        """测试标题路径、文档存储中的标题或元数据变化时不跳过写入."""
+        from src.services.document_store import DocumentStore
+        from src.services.knowledge_service import WriteAction
+        
+        service = make_knowledge_service()
+        for name in ('start_offset', 'end_offset', 'heading_path'):
+            field = Mock()
+            field.name = name
+            service.collection.schema.fields.append(field)
+        service.docstore = DocumentStore(str(tmp_path / 'docstore.sqlite3'))
+        knowledge = KnowledgeCreate(
+            content='每天摄入适量蛋白质有助于肌肉恢复。', category='营养',
+            title='蛋白质', metadata={'source': '官网'},
+        )
+        
+        with patch('src.services.knowledge_service.settings.content_storage', 'docstore'):
+            rows = service.prepare_document(knowledge)
+            service.store_documents([rows])
+            service.collection.query.return_value = [
+                {key: row[key] for key in ('id', 'content', 'category', 'heading_path')}
+                for row in rows
+            ]
+            assert service.classify_documents([rows]) == [WriteAction.SKIP]
+            
+            changed = service.prepare_document(
+                knowledge.model_copy(update={'metadata': {'source': '论文'}})
+            )
+            assert service.classify_documents([changed]) == [WriteAction.UPDATE]
+            
+            service.collection.query.return_value[0]['heading_path'] = '营养 > 旧标题'
+            assert service.classify_documents([rows]) == [WriteAction.UPDATE]
+    
+    def test_classify_queries_ids_in_batches(self):
+        """测试待判定的分块超过 Milvus 单次查询上限时按ID分批查询并合并结果."""
+        import json
+        from src.services.knowledge_service import WriteAction
+        
+        service = make_knowledge_service()
+        documents = [
+            [{'id': f'{i:032x}_chunk_0', 'content': f'内容{i}', 'category': '测试'}]
+            for i in range(17000)
+        ]
+        stored = {rows[0]['id']: rows[0] for rows in documents[::2]}
+        
+        def query(expr, output_fields, limit):
+            ids = json.loads(expr[len('id in '):])
+            assert len(ids) == limit <= 16384
+            return [dict(stored[row_id]) for row_id in ids if row_id in stored]
+        
+        service.collection.query.side_effect = query
+        
+        actions = service.classify_documents(documents, complete=False)
+        
+        assert service.collection.query.call_count == 17
+        assert actions[:4] == [WriteAction.SKIP, WriteAction.INSERT] * 2
+        assert actions.count(WriteAction.SKIP) == 8500
+    
+    @pytest.mark.asyncio
+    async def test_docstore_mode_hydrates_search_hits(self, tmp_path):
+        """测试 docstore 模式下 Milvus 不保存分块文本，检索命中后从文档存储取回."""
+        from types import SimpleNamespace
+        from src.services.document_store import DocumentStore
+        
+        service = make_knowledge_service()
+        for name in ('start_offset', 'end_offset'):
+            field = Mock()
+            field.name = name
+            service.collection.schema.fields.append(field)
+        service.docstore = DocumentStore(str(tmp_path / 'docstore.sqlite3'))
+        content = ''.join(f'第{i}条：每天摄入适量蛋白质有助于肌肉恢复。' for i in range(60))
+        
+        with patch('src.services.knowledge_service.settings.content_storage', 'docstore'):
+            [doc_id] = await service.add_knowledge_batch([
+                KnowledgeCreate(content=content, category='营养', title='蛋白质'),
+            ])
+        
+        columns = service.collection.insert.call_args.args[0]
+        assert len(columns[1]) > 1 and set(columns[1]) == {''}
+        starts, ends = columns[6], columns[7]
+        service.collection.search.return_value = [[
+            SimpleNamespace(
+                id=f'{doc_id}_chunk_1',
+                distance=0.9,
+                entity=SimpleNamespace(
+                    content='', category='营养', created_at='t',
+                    start_offset=starts[1], end_offset=ends[1],
+                ),
+            ),
+        ]]
+        
+        [result] = await service.search_knowledge('蛋白质')
+        
+        assert result.content == content[starts[1]:ends[1]]
+        assert service.docstore.get_many([doc_id])[doc_id]['title'] == '蛋白质'
+
+
+
+class TestContentCodec:
+    """分块文本压缩测试."""
+    
+    def test_trained_dictionary_round_trip(self, tmp_path):
+        """测试按语料训练字典后压缩效果更好，切换字典后旧分块仍可解码."""
+        from src.services.content_codec import ContentCodec
+        
+        samples = [
+            f'第{i}项研究：NAD+水平随年龄增长逐渐下降，规律的有氧运动能够降低心血管疾病风险。'
+            for i in range(200)
+        ]
+        codec = ContentCodec(str(tmp_path), compression='zlib')
+        plain = codec.encode(samples[0])
+        
+        codec.train(samples, 64 * 1024)
+        encoded = codec.encode(samples[1])
+        assert codec.is_encoded(encoded)
+        assert len(encoded) < len(samples[1].encode('utf-8')) / 2
+        assert codec.decode(encoded) == samples[1]
+        assert codec.decode(plain) == samples[0]
+        
+        codec.train(samples[:10], 64 * 1024)
+        reloaded = ContentCodec(str(tmp_path), compression='zlib')
+        assert reloaded.dictionary_id == codec.dictionary_id
+        assert reloaded.decode(encoded) == samples[1]
+        with pytest.raises(ValueError):
+            reloaded.decode(encoded[:-8] + '!')
+    
+    @pytest.mark.asyncio
+    async def test_compressed_mode_decodes_search_hits(self, tmp_path):
+        """测试 compressed 模式下 Milvus 保存压缩后的文本，检索命中后解压."""
+        from types import SimpleNamespace
+        from src.services.content_codec import ContentCodec
+        
+        service = make_knowledge_service()
+        service.content_codec = ContentCodec(str(tmp_path), compression='zlib')
+        content = '每天摄入适量蛋白质有助于肌肉恢复，老年人尤其需要注意。' * 8
+        service.content_codec.train([content] * 20, 4096)
+        
+        with patch('src.services.knowledge_service.settings.content_storage', 'compressed'):
+            [doc_id] = await service.add_knowledge_batch([
+                KnowledgeCreate(content=content, category='营养'),
+            ])
+        
+        [stored] = service.collection.insert.call_args.args[0][1]
+        assert service.content_codec.is_encoded(stored)
+        assert len(stored.encode('utf-8')) < len(content.encode('utf-8')) / 5
+        service.collection.search.return_value = [[
+            SimpleNamespace(
+                id=f'{doc_id}_chunk_0',
+                distance=0.9,
+                entity=SimpleNamespace(content=stored, category='营养', created_at='t'),
+            ),
+        ]]
+        
+        [result] = await service.search_knowledge('蛋白质')
+        
+        assert result.content == content
+
+
+class TestReindex:
+    """在线重建索引测试."""
+    
+    @staticmethod
+    def make_row(index: int, content: str = '内容', chunk: int = 0) -> dict:
+        return {
+            'id': f'doc{index}_chunk_{chunk}',
+            'content': content,
+            'category': '测试',
+            'created_at': 't1',
+            'chunk_index': chunk,
+            'vector': [float(index), 1.0, 0.0, 0.0],
+        }
+    
+    @staticmethod
+    def query_rows(count: int):
+        """模拟集合查询：count(*) 返回分块数，按ID查询时返回全部ID（分块都存在）."""
+        import json
+        
+        def query(expr='', output_fields=None, **kwargs):
+            if output_fields == ['count(*)']:
+                return [{'count(*)': count}]
+            return [{'id': chunk_id} for chunk_id in json.loads(expr[len('id in '):])]
+        
+        return query
+    
+    @classmethod
+    def make_shadow_collection(cls, service: KnowledgeService, count: int) -> Mock:
+        """影子集合：按向量第一维返回对应分块，模拟每个分块都能检索到自身."""
+        from types import SimpleNamespace
+        
+        collection = Mock()
+        collection.schema.fields = service.collection.schema.fields
+        collection.indexes = []
+        collection.query.side_effect = cls.query_rows(count)
+        collection.search.side_effect = lambda data, **kwargs: [
+            [SimpleNamespace(id=f'doc{int(vector[0])}_chunk_0')] for vector in data
+        ]
+        return collection
+    
+    def test_dual_write_and_backfill_skips_touched_chunks(self):
+        """测试重建期间写入和删除同步到影子集合，回填只跳过已双写的分块和已删除的分块."""
+        from src.services.reindex_service import ShadowCollection
+        
+        service = make_knowledge_service()
+        shadow_collection = self.make_shadow_collection(service, 0)
+        service.shadow = ShadowCollection(service, shadow_collection)
+        
+        # 只更新了 doc1 的第一个分块，doc2 已删除
+        service.insert_rows([self.make_row(1, '新内容')])
+        service.delete_chunks('id like "doc2%"', ['doc2'])
+        service.collection.query.return_value = [{'id': 'doc1_chunk_1'}, {'id': 'doc3_chunk_0'}]
+        copied = service.shadow.backfill([
+            self.make_row(1, '旧内容'), self.make_row(1, chunk=1), self.make_row(2), self.make_row(3),
+        ])
+        
+        assert copied == 2
+        service.collection.insert.assert_called_once()
+        shadow_collection.delete.assert_called_once_with('id like "doc2%"')
+        assert service.collection.query.call_args.kwargs['consistency_level'] == 'Strong'
+        assert [call.args[0][0] for call in shadow_collection.upsert.call_args_list] == [
+            ['doc1_chunk_0'], ['doc1_chunk_1', 'doc3_chunk_0'],
+        ]
+        
+        # 之后没有新的删除，下一批回填不再查询当前集合
+        service.collection.query.reset_mock()
+        assert service.shadow.backfill([self.make_row(4)]) == 1
+        service.collection.query.assert_not_called()
+    
+    def test_reindex_verifies_and_switches_alias(self):
+        """测试回填后校验分块数和召回率，再把别名切换到新集合."""
+        from src.services import ReindexService
+        
+        service = make_knowledge_service()
+        rows = [self.make_row(i) for i in range(3)]
+        # 回填、回填后补写、切换前补写
+        service.collection.query_iterator.return_value.next.side_effect = [rows, [], [], []]
+        service.collection.query.return_value = [{'count(*)': 3}]
+        shadow_collection = self.make_shadow_collection(service, 3)
+        service.build_collection = Mock(return_value=shadow_collection)
+        
+        with patch('src.services.knowledge_service.utility') as utility, \
+                patch('src.services.knowledge_service.Collection') as collection_cls:
+            utility.list_collections.return_value = ['knowledge_base_v1']
+            utility.list_aliases.return_value = ['knowledge_base']
+            collection_cls.return_value.indexes = []
+            result = ReindexService(service, sample_size=2).reindex(index_type='HNSW')
+        
+        assert result['collection'] == 'knowledge_base_v2'
+        assert result['previous_collection'] == 'knowledge_base_v1'
+        assert result['recall'] == 1.0
+        assert service.build_collection.call_args.kwargs['index_type'] == 'HNSW'
+        assert shadow_collection.upsert.call_args.args[0][0] == [row['id'] for row in rows]
+        utility.alter_alias.assert_called_once_with('knowledge_base_v2', 'knowledge_base')
+        assert service.shadow is None
+    
+    def test_reindex_drops_shadow_when_verification_fails(self):
+        """测试分块数不一致时放弃切换并删除影子集合."""
+        from src.services import ReindexService
+        
+        service = make_knowledge_service()
+        service.collection.query_iterator.return_value.next.side_effect = [[self.make_row(0)], [], [], []]
+        service.collection.query.return_value = [{'count(*)': 2}]
+        service.build_collection = Mock(return_value=self.make_shadow_collection(service, 1))
+        
+        with patch('src.services.knowledge_service.utility') as utility, \
+                patch('src.services.reindex_service.utility') as reindex_utility:
+            utility.list_collections.return_value = ['knowledge_base_v1']
+            with pytest.raises(ValueError):
+                ReindexService(service).reindex()
+        
+        reindex_utility.drop_collection.assert_called_once_with('knowledge_base_v2')
+        utility.alter_alias.assert_not_called()
+        assert service.shadow is None
+    
+    def test_reindex_reconciles_writes_from_other_processes(self):
+        """测试切换前按写入时间补写其他进程的写入，并删除其他进程已删除的分块."""
+        import json
+        from src.services import ReindexService
+        
+        service = make_knowledge_service()
+        field = Mock()
+        field.name = 'updated_at'
+        service.collection.schema.fields.append(field)
+        # 回填 doc0、doc1；其他进程在回填期间写入 doc2，切换前写入 doc3，并删除了 doc1
+        service.collection.query_iterator.return_value.next.side_effect = [
+            [self.make_row(0), self.make_row(1)], [], [self.make_row(2)], [], [self.make_row(3)], [],
+        ]
+        live_ids = {'doc0_chunk_0', 'doc2_chunk_0', 'doc3_chunk_0'}
+        
+        def live_query(expr='', output_fields=None, **kwargs):
+            if output_fields == ['count(*)']:
+                return [{'count(*)': len(live_ids)}]
+            return [{'id': chunk_id} for chunk_id in json.loads(expr[len('id in '):]) if chunk_id in live_ids]
+        
+        live = service.collection
+        live.query.side_effect = live_query
+        shadow_collection = self.make_shadow_collection(service, 4)
+        shadow_collection.query_iterator.return_value.next.side_effect = [
+            [{'id': f'doc{i}_chunk_0'} for i in range(4)], [],
+        ]
+        shadow_counts = iter([4, 3])
+        count_query = shadow_collection.query.side_effect
+        shadow_collection.query.side_effect = lambda expr='', output_fields=None, **kwargs: (
+            [{'count(*)': next(shadow_counts)}] if output_fields == ['count(*)']
+            else count_query(expr, output_fields, **kwargs)
+        )
+        service.build_collection = Mock(return_value=shadow_collection)
+        
+        with patch('src.services.knowledge_service.utility') as utility, \
+                patch('src.services.knowledge_service.Collection') as collection_cls:
+            utility.list_collections.return_value = ['knowledge_base_v1']
+            utility.list_aliases.return_value = ['knowledge_base']
+            collection_cls.return_value.indexes = []
+            result = ReindexService(service, sample_size=2).reindex()
+        
+        exprs = [call.kwargs['expr'] for call in live.query_iterator.call_args_list]
+        assert exprs[0] == '' and all(expr.startswith('updated_at >= ') for expr in exprs[1:])
+        upserted = [call.args[0][0] for call in shadow_collection.upsert.call_args_list]
+        assert upserted == [['doc0_chunk_0', 'doc1_chunk_0'], ['doc2_chunk_0'], ['doc3_chunk_0']]
+        shadow_collection.delete.assert_called_once_with('id in ["doc1_chunk_0"]')
+        assert result['chunks'] == 3
+        utility.alter_alias.assert_called_once_with('knowledge_base_v2', 'knowledge_base')
+    
+    def test_rows_embedded_before_model_switch_are_reembedded(self):
+        """测试切换模型前向量化、切换后才写入的分块按新模型重新向量化，旧调度器关闭."""
+        service = make_knowledge_service()
+        row = service.stamp_model_version([self.make_row(0, '旧模型向量化的内容')])[0]
+        previous_scheduler = service.embedding_scheduler
+        new_model = FakeSentenceTransformer('new-model')
+        
+        with patch('src.services.knowledge_service.utility') as utility, \
+                patch('src.services.knowledge_service.Collection') as collection_cls, \
+                patch('src.services.knowledge_service.open_embedding_cache', return_value=None):
+            utility.list_collections.return_value = ['knowledge_base_v1']
+            utility.list_aliases.return_value = ['knowledge_base']
+            collection_cls.return_value.indexes = []
+            collection_cls.return_value.schema.fields = service.collection.schema.fields
+            service.switch_collection('knowledge_base_v2', new_model)
+            service.insert_rows([row])
+        
+        assert service.model_version == 1 and previous_scheduler._closed
+        assert new_model.encode_calls == [['旧模型向量化的内容']]
+        inserted = collection_cls.return_value.insert.call_args.args[0]
+        assert inserted[2][0][0] > 0.9
+    
+    def test_model_change_refused_for_multi_process_deployment(self):
+        """测试多进程部署时拒绝在线更换模型，只更换索引类型不受影响."""
+        from src.services import ReindexService
+        
+        reindex_service = ReindexService(make_knowledge_service())
+        with patch('src.services.reindex_service.settings.web_concurrency', 4):
+            reindex_service.check_model_change(None)
+            reindex_service.check_model_change('fake-model')
+            with pytest.raises(ValueError):
+                reindex_service.reindex(embedding_model='BAAI/bge-m3')
+        assert not reindex_service.running
+
+
+class TestMaintenance:
+    """集合维护调度测试."""
+    
+    @staticmethod
+    def patch_segments(segment_rows: list, indexed_rows: int):
+        """模拟 Milvus 的分段信息和索引构建进度."""
+        from types import SimpleNamespace
+        
+        utility = patch('src.services.maintenance.utility').start()
+        utility.get_query_segment_info.return_value = [
+            SimpleNamespace(num_rows=rows) for rows in segment_rows
+        ]
+        utility.index_building_progress.return_value = {
+            'total_rows': sum(segment_rows),
+            'indexed_rows': indexed_rows,
+        }
+        patch('src.services.knowledge_service.utility').start().list_collections.return_value = []
+        return utility
+    
+    def test_window_wraps_midnight(self):
+        """测试维护时间段支持跨零点，为空表示不限."""
+        from datetime import datetime
+        from src.services.maintenance import in_window, parse_window
+        
+        window = parse_window('22:00-04:00')
+        assert in_window(window, datetime(2024, 1, 1, 23, 30))
+        assert in_window(window, datetime(2024, 1, 2, 3, 59))
+        assert not in_window(window, datetime(2024, 1, 2, 12, 0))
+        assert parse_window('') is None
+        with pytest.raises(ValueError):
+            parse_window('夜间')
+    
+    def test_maintain_compacts_only_when_deleted_ratio_high(self):
+        """测试已删除行占比超过阈值时只压实，索引完整时不补建."""
+        from src.services import MaintenanceScheduler
+        
+        service = make_knowledge_service()
+        service.collection.query.return_value = [{'count(*)': 80}]
+        utility = self.patch_segments([60, 40], indexed_rows=100)
+        try:
+            result = MaintenanceScheduler(lambda: service, Mock()).maintain(service)
+        finally:
+            patch.stopall()
+        
+        assert result['actions'] == ['compact']
+        assert result['before']['deleted_ratio'] == 0.2
+        service.collection.compact.assert_called_once()
+        service.collection.flush.assert_not_called()
+        utility.wait_for_index_building_complete.assert_not_called()
+    
+    def test_auto_maintenance_waits_for_idle_and_min_interval(self, tmp_path):
+        """测试有近期检索时不自动维护，维护后在最小间隔内不再触发."""
+        from datetime import datetime
+        from src.services import JobStore, MaintenanceScheduler
+        
+        service = make_knowledge_service()
+        service.collection.query.return_value = [{'count(*)': 20000}]
+        job_store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+        scheduler = MaintenanceScheduler(lambda: service, job_store, window='')
+        self.patch_segments([1000] * 20, indexed_rows=20000)
+        try:
+            service.last_activity = time.monotonic()
+            assert scheduler.due(datetime.now()) is None
+            
+            service.last_activity = 0.0
+            assert scheduler.due(datetime.now()) == '小分段 20 个'
+            
+            job = job_store.create('maintenance', {'trigger': 'auto'})
+            assert scheduler.run_job(job, force=False)['actions'] == ['compact']
+            assert scheduler.due(datetime.now()) is None
+        finally:
+            patch.stopall()
+        
+        status = job_store.get(job['id'])['status']
+        assert status == 'succeeded'
+        assert scheduler.last_run('compact')['id'] == job['id']
+    
+    def test_auto_maintenance_coordinates_processes(self, tmp_path):
+        """测试其他进程忙碌时不自动维护，其他进程执行维护时本进程不再执行."""
+        from datetime import datetime
+        from src.services import JobStore, MaintenanceScheduler
+        
+        path = str(tmp_path / 'jobs.sqlite3')
+        service = make_knowledge_service()
+        service.collection.query.return_value = [{'count(*)': 20000}]
+        sibling_service = make_knowledge_service()
+        scheduler = MaintenanceScheduler(lambda: service, JobStore(path), window='')
+        sibling = MaintenanceScheduler(lambda: sibling_service, JobStore(path), window='')
+        self.patch_segments([1000] * 20, indexed_rows=20000)
+        try:
+            service.last_activity = 0.0
+            sibling_service.last_activity = time.monotonic()
+            assert sibling.check(datetime.now()) is None
+            assert scheduler.check(datetime.now()) is None
+            
+            sibling_service.last_activity = 0.0
+            sibling.job_store.release_lease(f'activity:{sibling.job_store.owner}')
+            assert scheduler.check(datetime.now()) == '小分段 20 个'
+            
+            assert sibling.job_store.acquire_lease('maintenance', 60)
+            job = scheduler.job_store.create('maintenance', {'trigger': 'auto'})
+            assert scheduler.run_job(job, force=False) is None
+            assert scheduler.status()['running']
+        finally:
+            patch.stopall()
+        
+        assert scheduler.job_store.get(job['id'])['status'] == 'failed'
+        service.collection.compact.assert_not_called()
+
+
+class TestEmbeddingServer:
+    """向量化 Sidecar 测试."""
+    
+    def test_remote_encode_round_trip(self, tmp_path):
+        """测试客户端通过 Unix Socket 获取向量."""
+        from src.services.embedding_server import EmbeddingServer, RemoteEmbeddingModel
+        
+        socket_path = str(tmp_path / 'embedding.sock')
+        with patch('sentence_transformers.SentenceTransformer', FakeSentenceTransformer):
+            server = EmbeddingServer(socket_path, model_name='fake-model', max_wait_ms=1)
+        
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=loop.run_until_complete,
+            args=(server.serve_forever(),),
+            daemon=True,
+        )
+        thread.start()
+        for _ in range(100):
+            if (tmp_path / 'embedding.sock').exists():
+                break
+            time.sleep(0.02)
+        
+        client = RemoteEmbeddingModel(socket_path)
+        assert client.get_sentence_embedding_dimension() == 4
+        
+        vectors = client.encode(['a', 'abc'], normalize_embeddings=True)
+        assert vectors.shape == (2, 4)
+        assert vectors[:, 0].tolist() == [1.0, 3.0]
+        
+        single = client.encode('abcd')
+        assert single.shape == (4,)
+        assert single[0] == 4.0
+    
+    def test_timeout_discards_connection(self):
+        """测试读取响应超时后丢弃连接，迟到的响应不会被下一次请求读到."""
+        import socket
+        from src.services.embedding_server import RemoteEmbeddingModel
+        
+        client = RemoteEmbeddingModel.__new__(RemoteEmbeddingModel)
+        client._local = threading.local()
+        client_sock, server_sock = socket.socketpair()
+        client_sock.settimeout(0.05)
+        client._local.sock = client_sock
+        
+        with pytest.raises(TimeoutError):
+            client._request({'op': 'info'})
+        
+        assert client._local.sock is None
+        assert client_sock.fileno() == -1
+        server_sock.close()
+
+
 # 运行测试：pytest backend/tests/test_services.py -v
 
@@ -23,7 +23,7 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
 
   const handleFileSelect = (selectedFile: File) => {
     // 验证文件类型
-    const allowedExtensions = ['.json', '.csv', '.xlsx', '.xls', '.txt', '.md', '.pdf'];
+    const allowedExtensions = ['.json', '.jsonl', '.ndjson', '.csv', '.xlsx', '.xls', '.txt', '.md', '.pdf', '.parquet', '.arrow', '.feather', '.zip', '.tar', '.tgz', '.gz'];
     const fileExt = selectedFile.name.toLowerCase().substring(selectedFile.name.lastIndexOf('.'));
     
     if (!allowedExtensions.includes(fileExt)) {
@@ -82,7 +82,11 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
       setPreviewData(result.preview || []);
 
       if (result.success_count > 0) {
-        showSuccess(`成功导入 ${result.success_count} 条知识！`);
+        showSuccess(
+          result.skipped_count > 0
+            ? `成功导入 ${result.success_count} 条知识（${result.skipped_count} 条未变化已跳过）！`
+            : `成功导入 ${result.success_count} 条知识！`
+        );
         if (result.failed_count > 0) {
           showError(`有 ${result.failed_count} 条导入失败，请查看详情`);
         }
@@ -115,12 +119,17 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
     const ext = filename.toLowerCase().substring(filename.lastIndexOf('.'));
     const iconMap: Record<string, string> = {
       '.json': '📄',
+      '.jsonl': '📄',
+      '.ndjson': '📄',
       '.csv': '📊',
       '.xlsx': '📗',
       '.xls': '📗',
       '.txt': '📝',
       '.md': '📖',
       '.pdf': '📕',
+      '.parquet': '📊',
+      '.arrow': '📊',
+      '.feather': '📊',
     };
     return iconMap[ext] || '📎';
   };
@@ -211,7 +220,7 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
             <input
               ref={fileInputRef}
               type="file"
-              accept=".json,.csv,.xlsx,.xls,.txt,.md,.pdf"
+              accept=".json,.jsonl,.ndjson,.csv,.xlsx,.xls,.txt,.md,.pdf,.parquet,.arrow,.feather,.zip,.tar,.tgz,.gz"
               style={{ display: 'none' }}
               onChange={handleFileInputChange}
             />
@@ -223,7 +232,7 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
                   点击或拖拽文件到此处上传
                 </p>
                 <p style={{ fontSize: '14px', color: '#6b7280' }}>
-                  支持格式：JSON, CSV, Excel, TXT, Markdown, PDF
+                  支持格式：JSON, JSONL, CSV, Excel, TXT, Markdown, PDF, Parquet, Arrow，以及 zip/tar.gz 压缩包
                 </p>
                 <p style={{ fontSize: '12px', color: '#9ca3af', marginTop: '8px' }}>
                   最大文件大小：10MB
@@ -371,12 +380,36 @@ const ImportModal: React.FC<ImportModalProps> = ({ isOpen, onClose, onSuccess })
                             padding: '4px 0',
                           }}
                         >
-                          第 {error.row} 行: {error.error}
+                          {error.file ? `${error.file} ` : ''}第 {error.row} 行: {error.error}
                         </div>
                       ))}
                     </div>
                   </div>
                 )}
+
+                {importResult.files?.some((item: any) => item.error) && (
+                  <div style={{ marginTop: '12px' }}>
+                    <div style={{ fontSize: '14px', fontWeight: '500', color: '#dc2626', marginBottom: '8px' }}>
+                      未导入的文件：
+                    </div>
+                    <div style={{ maxHeight: '150px', overflowY: 'auto' }}>
+                      {importResult.files
+                        .filter((item: any) => item.error)
+                        .map((item: any, idx: number) => (
+                          <div
+                            key={idx}
+                            style={{
+                              fontSize: '12px',
+                              color: '#6b7280',
+                              padding: '4px 0',
+                            }}
+                          >
+                            {item.filename}: {item.error}
+                          </div>
+                        ))}
+                    </div>
+                  </div>
+                )}
               </div>
             </div>
           )}